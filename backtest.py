@@ -0,0 +1,378 @@
+# This Python file uses the following encoding: utf-8
+import sys
+import json
+import time
+import argparse
+
+#pandas and numpy imports for data storage and manipulation
+import pandas as pd
+import numpy as np
+
+#queries of the screens and the screener evaluating their row nodes
+import screen
+#screening predicates over the technical indicators (and the cached indicators the command line backtests use)
+from indicators import OPERATORS, read_Indicators
+#quarters matching the sales box in the quarterly rollups
+from rollups import quarters_matching
+#day every insider transaction was filed (it is public from then on)
+from events import filing_dates
+#clustered insider buys
+import clusters
+from clusters import detect_clusters, WINDOW_DAYS, MIN_INSIDERS
+#the prepared data of the last start of the window for the command line backtests
+import cube
+import rollups
+import sectors
+import snapshot
+import scheduler
+import watchlists
+
+#trading days a signal is held for (the forward returns are measured over each of them)
+HORIZONS = [5, 20, 60]
+#trading days in a year, used to annualize the returns of the signal portfolios
+YEAR = 252
+#columns of the report, one row per horizon
+REPORT_COLUMNS = ["Signals", "Tickers", "Mean", "Median", "Hit_rate", "Excess", "Universe", "Annual", "Max_drawdown", "Exposure"]
+
+
+##########################################
+#Signals over the dense layout           #
+##########################################
+#panel row and column of every row of the screener stocks frame (-1 where the panel doesn't have it)
+#the ticker codes of the screener are mapped once, so the rows are placed without looking up their names
+def _cells(screener, panel):
+    codes = np.array([panel.codes.get(t, -1) for t in screener.indexes["tickers"]], dtype=np.int64)
+    rows = codes[screener.codes] if len(codes) > 0 else np.zeros(0, dtype=np.int64)
+    dates = panel.dates.values.astype("datetime64[ns]")
+    cols = np.searchsorted(dates, screener.dates)
+    found = cols < len(dates)
+    found[found] = dates[cols[found]] == screener.dates[found]
+    cols = np.where(found, cols, -1)
+    rows = np.where(cols >= 0, rows, -1)
+    return rows, np.where(rows >= 0, cols, -1)
+
+#scatter some rows of the stocks frame into a (tickers x days) matrix
+def _scatter(shape, cells, rows):
+    matrix = np.zeros(shape, dtype=bool)
+    r, c = cells[0][rows], cells[1][rows]
+    found = r >= 0
+    matrix[r[found], c[found]] = True
+    return matrix
+
+#dense values of a name for an Indicator node: an indicator aligned with the panel or a column of the panel (None otherwise)
+def _dense(name, screener, panel):
+    indicators = screener.indicators
+    if indicators is not None and name in indicators.data and indicators.shape == panel.shape and np.array_equal(indicators.tickers, panel.tickers) and indicators.dates.equals(panel.dates):
+        return indicators[name]
+    if name in panel.data:
+        return panel[name]
+    return None
+
+#column positions where a window of calendar days starts and ends (end excluded) for events on some days:
+#an event on day d is seen on the trading days t with d + after <= t <= d + before
+def _window(panel, days, after, before):
+    dates = panel.dates.values.astype("datetime64[ns]")
+    first = np.searchsorted(dates, days + np.timedelta64(int(after), "D"), side="left")
+    last = np.searchsorted(dates, days + np.timedelta64(int(before), "D"), side="right")
+    return first, np.maximum(last, first)
+
+#sum over the days of interval values: +value where the interval starts, -value where it ends, then a cumulative sum
+def _coverage(shape, rows, first, last, values):
+    diff = np.zeros((shape[0], shape[1] + 1), dtype=np.float64)
+    np.add.at(diff, (rows, first), values)
+    np.add.at(diff, (rows, last), -values)
+    return np.cumsum(diff, axis=1)[:, :-1]
+
+#window of an insider or cluster node: an event on day d is seen on the days d + after to d + before, and only the events
+#between first and last are kept (None for no limit)
+#relative dates move along the days (start -90 and end 0 for the 90 days up to each day), absolute dates keep the events
+#between them, each seen from its own day on (never before it happened)
+def _bounds(node, panel, relative):
+    if relative:
+        return -int(node.end), -int(node.start), None, None
+    return 0, (panel.dates[-1] - panel.dates[0]).days + 1, node.start, node.end
+
+#events on some days kept between two days (None for no limit)
+def _between(days, first, last):
+    keep = np.ones(len(days), dtype=bool)
+    if first is not None:
+        keep &= days >= np.datetime64(pd.Timestamp(first).normalize(), "ns")
+    if last is not None:
+        keep &= days <= np.datetime64(pd.Timestamp(last).normalize(), "ns")
+    return keep
+
+#insider activity of every ticker on every day over a window of days before it (point in time, e.g. start -90 and end 0 for
+#the 90 days up to each day): total value and number of distinct insiders, compared to the minimums of the node
+#a transaction is placed on the day it was filed, not the day it was traded (the dates of the node are the traded days)
+def _insider_window(node, screener, panel, relative=True):
+    insider = screener.insider
+    shape = panel.shape
+    if insider is None or len(insider) == 0:
+        return np.zeros(shape, dtype=bool)
+    after, before, since, until = _bounds(node, panel, relative)
+    keep = _between(pd.to_datetime(insider["Date"]).values.astype("datetime64[D]").astype("datetime64[ns]"), since, until)
+    if node.transaction is not None:
+        keep &= (insider["Transaction"] == node.transaction).values
+    rows = insider.loc[keep]
+    tickers = rows["Ticker"].astype(str).str.strip()
+    codes = tickers.map(panel.codes).fillna(-1).astype(np.int64).values
+    days = filing_dates(rows).astype("datetime64[D]").astype("datetime64[ns]")
+    found = codes >= 0
+    codes, days = codes[found], days[found]
+    value = pd.to_numeric(rows["Value ($)"], errors="coerce").fillna(0).values[found]
+    insiders = pd.factorize(rows["Insider_id"].values[found])[0]
+
+    signal = np.ones(shape, dtype=bool)
+    if node.min_value is not None:
+        first, last = _window(panel, days, after, before)
+        signal &= _coverage(shape, codes, first, last, value) >= node.min_value - 1e-6
+    if node.min_insiders is not None or node.min_value is None:
+        #the windows of the same insider and ticker are cut where the next one starts, so an insider is counted once a day
+        order = np.lexsort((days, insiders, codes))
+        codes, days, insiders = codes[order], days[order], insiders[order]
+        first, last = _window(panel, days, after, before)
+        same = np.r_[(codes[1:] == codes[:-1]) & (insiders[1:] == insiders[:-1]), False]
+        last = np.where(same, np.minimum(last, np.r_[first[1:], 0]), last)
+        count = _coverage(shape, codes, first, np.maximum(last, first), np.ones(len(codes)))
+        signal &= count >= (node.min_insiders if node.min_insiders is not None else 1) - 1e-6
+    return signal
+
+#day every cluster is public: the last filing of the buys of its ticker from its first to its last buy (its end without them)
+def _cluster_filed(found, insider):
+    filed = pd.to_datetime(found["End"]).values.astype("datetime64[D]").astype("datetime64[ns]")
+    if insider is None or len(insider) == 0 or len(found) == 0:
+        return filed
+    buys = insider.loc[(insider["Transaction"] == "Buy").values]
+    buys = pd.DataFrame({"Ticker": buys["Ticker"].astype(str).str.strip().values, "Date": pd.to_datetime(buys["Date"]).values.astype("datetime64[ns]"), "Filed": filing_dates(buys)})
+    spans = pd.DataFrame({"Cluster": np.arange(len(found)), "Ticker": found["Ticker"].astype(str).str.strip().values,
+                          "Start": pd.to_datetime(found["Start"]).values.astype("datetime64[ns]"), "End": filed})
+    members = spans.merge(buys, on="Ticker")
+    members = members.loc[((members["Date"] >= members["Start"]) & (members["Date"] <= members["End"])).values]
+    last = members.groupby("Cluster")["Filed"].max()
+    filed[last.index.values] = np.maximum(filed[last.index.values], last.values.astype("datetime64[ns]"))
+    return filed
+
+#clusters of insider buys ending in a window of days before every day (point in time), seen from the day they are public
+def _cluster_window(node, screener, panel, relative=True):
+    if screener.clusters is not None and node.window == WINDOW_DAYS and node.min_insiders == MIN_INSIDERS:
+        found = screener.clusters
+    else:
+        found = detect_clusters(screener.insider, node.window, node.min_insiders)
+    keep = np.array(found["Insiders"] >= node.min_insiders, dtype=bool)
+    if node.min_value is not None:
+        keep &= (found["Value"] >= node.min_value).values
+    after, before, since, until = _bounds(node, panel, relative)
+    keep &= _between(pd.to_datetime(found["End"]).values.astype("datetime64[D]").astype("datetime64[ns]"), since, until)
+    found = found.loc[keep]
+    codes = found["Ticker"].astype(str).str.strip().map(panel.codes).fillna(-1).astype(np.int64).values
+    days = _cluster_filed(found, screener.insider)[codes >= 0]
+    first, last = _window(panel, days, after, before)
+    return _coverage(panel.shape, codes[codes >= 0], first, last, np.ones(len(days))) > 0.5
+
+#quarters whose summed close changed by a percentage, seen once they are over: from the first day after the end of the
+#quarter to the end of the next one (the change of a quarter is only known after its last close)
+def _quarters_window(node, screener, panel):
+    quarters = quarters_matching(screener.quarterly, node.percent) if screener.quarterly is not None else []
+    if len(quarters) == 0:
+        return np.zeros(panel.shape, dtype=bool)
+    codes = pd.Index(quarters.get_level_values(0)).astype(str).str.strip().map(panel.codes).fillna(-1).astype(np.int64).values
+    periods = pd.PeriodIndex([str(int(y)) + "Q" + str(int(q)) for (y, q) in zip(quarters.get_level_values(1), quarters.get_level_values(2))], freq="Q")
+    found = codes >= 0
+    dates = panel.dates.values.astype("datetime64[ns]")
+    first = np.searchsorted(dates, periods.end_time.normalize().values.astype("datetime64[ns]"), side="right")
+    last = np.searchsorted(dates, (periods + 1).end_time.normalize().values.astype("datetime64[ns]"), side="right")
+    return _coverage(panel.shape, codes[found], first[found], last[found], np.ones(found.sum())) > 0.5
+
+#names of the nodes of a query that are evaluated with the data as it is now on every day of the history (the EPS nodes use
+#the last EPS change of every ticker), their signals know things the day didn't
+def lookahead(spec):
+    if spec[0] in ["And", "Or", "Not"]:
+        return sorted(set(name for arg in spec[1:] for name in lookahead(arg)))
+    return [spec[0]] if spec[0] in ["EPS", "EPSRange"] else []
+
+#signal of a query (its JSON form, see screen.to_spec) on every ticker and day of a panel: a (tickers x days) boolean matrix
+#every node is evaluated once for the whole history: the ticker nodes as a column of tickers, the row nodes over every row of the
+#screener (or directly on the indicator arrays), and the insider and cluster nodes with dates relative to today are moved along
+#the days (start -90 and end 0 match the tickers with activity in the 90 days before each day, not before today), with
+#absolute dates a ticker only matches from the day its activity between them is enough (see _bounds), and the quarters
+#of the sales box are seen after they end
+#the EPS nodes use the EPS of every ticker as it is now (see lookahead)
+def signals(spec, screener, panel, cells=None):
+    name, args = spec[0], spec[1:]
+    if name in ["And", "Or"]:
+        result = None
+        for arg in args:
+            matrix = signals(arg, screener, panel, cells)
+            result = matrix if result is None else (result & matrix if name == "And" else result | matrix)
+        return result if result is not None else np.full(panel.shape, name == "And")
+    if name == "Not":
+        return ~signals(args[0], screener, panel, cells)
+
+    if name in ["Insider", "Cluster"] and screen.is_relative(spec):
+        #a missing bound of a relative window is today (or, for the start, every day before)
+        node = screen.NODES[name](*args)
+        if node.end is None:
+            node.end = 0
+        if node.start is None:
+            node.start = -(panel.dates[-1] - panel.dates[0]).days - 1
+        return (_insider_window if name == "Insider" else _cluster_window)(node, screener, panel)
+
+    node = screen.from_spec(spec)
+    if isinstance(node, (screen.Insider, screen.Cluster)):
+        return (_insider_window if name == "Insider" else _cluster_window)(node, screener, panel, relative=False)
+    if isinstance(node, screen.Quarters):
+        return _quarters_window(node, screener, panel)
+    if isinstance(node, screen.Tickers):
+        names = node.names_for(screener)
+        selected = np.array([t in names for t in panel.tickers], dtype=bool)
+        return np.repeat(selected[:, None], panel.shape[1], axis=1)
+    if isinstance(node, screen.Indicator):
+        left = _dense(node.left, screener, panel)
+        right = _dense(node.right, screener, panel) if isinstance(node.right, str) else node.right
+        if left is not None and right is not None:
+            with np.errstate(invalid="ignore"):
+                return OPERATORS[node.op](left, right)
+    if isinstance(node, screen.DateRange):
+        dates = panel.dates.values.astype("datetime64[ns]")
+        keep = np.ones(len(dates), dtype=bool)
+        if node.start is not None:
+            keep &= dates >= node.start
+        if node.end is not None:
+            keep &= dates <= node.end
+        return np.repeat(keep[None, :], panel.shape[0], axis=0)
+
+    #the other row nodes are matched over every row of the stocks frame at once
+    if cells is None:
+        cells = _cells(screener, panel)
+    return _scatter(panel.shape, cells, screener.rows(node))
+
+
+##########################################
+#Forward returns and signal portfolios   #
+##########################################
+#closes of a panel carried over the days a ticker has no price (not after its last price), the adjusted close when there is one
+def _closes(panel):
+    close = np.array(panel["Adj Close"] if "Adj Close" in panel.data else panel["Close"], dtype=np.float64)
+    valid = np.isfinite(close) & (close > 0)
+    positions = np.where(valid, np.arange(close.shape[1])[None, :], 0)
+    np.maximum.accumulate(positions, axis=1, out=positions)
+    filled = np.take_along_axis(close, positions, axis=1)
+    #nothing before the first price and after the last one
+    started = np.logical_or.accumulate(valid, axis=1)
+    ended = np.logical_or.accumulate(valid[:, ::-1], axis=1)[:, ::-1]
+    filled[~(started & ended)] = np.nan
+    return filled
+
+#largest fall of an equity curve from its previous peak (a negative fraction, 0 without a fall)
+def max_drawdown(equity):
+    if len(equity) == 0:
+        return 0.0
+    return float(np.min(equity / np.maximum.accumulate(equity) - 1))
+
+#daily returns of an equal weighted portfolio holding every ticker for a number of days after each of its signals
+#(bought at the close of the signal day), a day without positions is in cash
+def portfolio_returns(signal, close, horizon):
+    held = np.cumsum(signal, axis=1, dtype=np.int32)
+    held[:, horizon:] -= held[:, :-horizon].copy()
+    held = held > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        daily = close[:, 1:] / close[:, :-1] - 1
+    counted = held[:, :-1] & np.isfinite(daily)
+    count = counted.sum(axis=0)
+    total = np.where(counted, daily, 0).sum(axis=0)
+    returns = np.divide(total, count, out=np.zeros(len(count)), where=count > 0)
+    return returns, count
+
+#backtest of a query over the history of a panel: every (ticker, day) matching the query is a signal, and for every horizon
+#the forward returns of the signals are compared to the equal weighted universe of the same days (Excess), Hit_rate is the
+#share of positive forward returns, Annual and Max_drawdown are those of a portfolio holding the signals for the horizon
+#start and end limit the signal days, the forward returns can reach past end
+def backtest(spec, screener, panel, horizons=HORIZONS, start=None, end=None):
+    signal = signals(spec, screener, panel, _cells(screener, panel))
+    dates = panel.dates
+    within = np.ones(len(dates), dtype=bool)
+    if start is not None:
+        within &= dates >= pd.Timestamp(start)
+    if end is not None:
+        within &= dates <= pd.Timestamp(end)
+    signal = signal & within[None, :]
+    close = _closes(panel)
+    signal &= np.isfinite(close)
+
+    report = []
+    curves = {}
+    for horizon in horizons:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            forward = np.full(close.shape, np.nan)
+            forward[:, :-horizon] = close[:, horizon:] / close[:, :-horizon] - 1
+            measured = np.isfinite(forward) & within[None, :]
+            universe = np.where(measured, forward, 0).sum(axis=0) / measured.sum(axis=0)
+        r, c = np.nonzero(signal)
+        values = forward[r, c]
+        measured = np.isfinite(values)
+        values, excess = values[measured], values[measured] - universe[c[measured]]
+
+        returns, count = portfolio_returns(signal, close, horizon)
+        #the portfolio runs from the first signal day until its last position is closed
+        days = np.flatnonzero(signal.any(axis=0))
+        if len(days) > 0:
+            returns = returns[days[0]:min(days[-1] + horizon, len(returns))]
+            count = count[days[0]:days[0] + len(returns)]
+        else:
+            returns, count = returns[:0], count[:0]
+        equity = np.cumprod(1 + returns)
+        curves[horizon] = pd.Series(equity, index=dates[1:][days[0]:days[0] + len(equity)] if len(days) > 0 else dates[:0])
+        annual = equity[-1] ** (YEAR / len(equity)) - 1 if len(equity) > 0 else np.nan
+
+        report.append([int(signal.sum()), int(signal.any(axis=1).sum()), np.mean(values) if len(values) > 0 else np.nan, np.median(values) if len(values) > 0 else np.nan,
+                       np.mean(values > 0) if len(values) > 0 else np.nan, np.mean(excess) if len(values) > 0 else np.nan, np.mean(universe[np.isfinite(universe)]) if np.isfinite(universe).any() else np.nan,
+                       annual, max_drawdown(equity), np.mean(count > 0) if len(count) > 0 else np.nan])
+        del forward
+    return pd.DataFrame(report, index=pd.Index(horizons, name="Horizon"), columns=REPORT_COLUMNS), curves
+
+
+#python backtest.py QUERY|SCREEN [--horizons 5 20 60] [--start DAY] [--end DAY] backtests a query over the data the window last loaded
+#QUERY is the JSON form of a query (see watchlists.py) or the name of a saved screen, e.g.
+#'["And", ["Match", "Close_change", -5], ["Insider", "Buy", -90, 0, 1000000, null]]' (the days falling 5% with more than $1M
+#of insider buys in the 90 days before)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Forward returns, hit rate and drawdown of a screen over the history")
+    parser.add_argument("query", nargs="+")
+    parser.add_argument("--horizons", type=int, nargs="+", default=HORIZONS)
+    parser.add_argument("--start", default=None)
+    parser.add_argument("--end", default=None)
+    args = parser.parse_args()
+
+    #the data of the last start of the window (its snapshot), the price cube and the cached rollups, indicators and clusters
+    warm = snapshot.read_Snapshot(snapshot.sources(scheduler.MARKETS))
+    prices = cube.read_Cube()
+    if warm is None or prices is None:
+        print("no prepared data yet, it is written when the window loads the data")
+        sys.exit(1)
+
+    text = " ".join(args.query)
+    saved = watchlists.Watchlists()
+    if text in saved.screens:
+        spec = saved.screens[text]["query"]
+        if saved.screens[text]["watchlist"] is not None:
+            spec = ["And", ["Tickers", saved.lists.get(saved.screens[text]["watchlist"], [])], spec]
+    else:
+        try:
+            spec = json.loads(text)
+            screen.from_spec(spec)
+        except (ValueError, TypeError, IndexError) as e:
+            print("invalid query: " + str(e))
+            sys.exit(1)
+
+    markets = {index: [p[0] for p in pairs] for (index, (pairs, _, _)) in warm["markets"].items()}
+    quarterly = pd.concat([rollups.read_Rollups(index, "quarterly") for index in markets], sort=False)
+    quarterly = quarterly[~quarterly.index.duplicated()]
+    screener = screen.Screener(warm["stocks"], markets, warm["eps"], warm["insider"], quarterly, read_Indicators()[0], clusters.refresh_Clusters(warm["insider"]),
+                               indexes=warm["indexes"], sectors=sectors.read_Sectors())
+    if len(lookahead(spec)) > 0:
+        print("look-ahead: the " + ", ".join(lookahead(spec)) + " nodes use the data as it is now on every day of the history")
+    began = time.time()
+    report, _ = backtest(spec, screener, prices.panel(), args.horizons, args.start, args.end)
+    print(report.to_string(formatters={"Mean": "{:.2%}".format, "Median": "{:.2%}".format, "Hit_rate": "{:.1%}".format, "Excess": "{:+.2%}".format, "Universe": "{:.2%}".format,
+                                       "Annual": "{:.1%}".format, "Max_drawdown": "{:.1%}".format, "Exposure": "{:.0%}".format}))
+    print("{:.1f} seconds over {} tickers and {} days".format(time.time() - began, *prices.panel().shape))
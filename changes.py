@@ -0,0 +1,268 @@
+# This Python file uses the following encoding: utf-8
+import os
+import json
+import argparse
+import datetime
+
+#pandas and numpy imports for data storage and manipulation
+import pandas as pd
+import numpy as np
+
+#atomic writes of the feed and of its state
+import jobs
+#keys of the insider transactions
+import events
+
+#file where the change feed is stored, one JSON line per version of the data
+FEED_PATH = "Data/changes.jsonl"
+#files with what the last version was made of: the version and the EPS of every ticker, the hash of every partition of the
+#prices (a ticker and a year) and the keys of the insider transactions
+STATE_PATH = "Data/changes_state.json"
+PARTITIONS_PATH = "Data/changes_partitions.csv"
+INSIDER_PATH = "Data/changes_insider.npz"
+#version of the stored state, a state stored with another layout is built again (and the next version is a full one)
+LAYOUT = 1
+#versions kept in the feed, a client asking for the changes since an older version has to take everything again
+KEEP = 500
+#columns of the prices a row hash is computed over (the change columns are derived from them)
+PRICE_COLUMNS = ["Open", "High", "Low", "Close_x", "Close", "Adj Close", "Volume"]
+PARTITION_COLUMNS = ["Ticker", "Year", "Hash", "Rows", "First", "Last"]
+
+
+##########################################
+#Partitions of the prices                #
+##########################################
+#hash of the prices of every row: the bits of the day and of the prices weighted by odd constants, mixed once by the pandas hash
+def _row_hashes(dates, stocks):
+    total = dates.view(np.uint64).copy()
+    for (i, column) in enumerate(PRICE_COLUMNS):
+        if column in stocks.columns:
+            bits = pd.to_numeric(stocks[column], errors="coerce").values.astype(np.float64).view(np.uint64)
+            total += bits * np.uint64(0x9E3779B97F4A7C15 + 2 * i)
+    return pd.util.hash_array(total)
+
+#one row per ticker and day of the stocks frame (indexes are the screener indexes, see screen.build_indexes) with its
+#partition (the ticker code and the year) and the hash of its prices
+#a ticker listed in several markets has its rows once per market, only the first is kept
+def _price_rows(stocks, indexes):
+    dates = indexes["dates"]
+    year = dates.astype("datetime64[Y]").astype(np.int64) + 1970
+    codes = indexes["codes"].astype(np.int64)
+    first = ~pd.Index(codes * (1 << 20) + dates.astype("datetime64[D]").astype(np.int64)).duplicated()
+    if first.all():
+        first = slice(None)
+    return pd.DataFrame({"Partition": (codes * 10000 + year)[first], "Date": dates[first], "Hash": _row_hashes(dates, stocks)[first]})
+
+#hash (the sum of the row hashes, so the order of the rows doesn't matter), rows, first and last day of every ticker and year
+def partitions(rows, tickers):
+    grouped = rows.groupby("Partition", sort=True)
+    table = pd.DataFrame({"Hash": grouped["Hash"].sum().astype(str), "Rows": grouped.size(), "First": grouped["Date"].min(), "Last": grouped["Date"].max()})
+    table.insert(0, "Ticker", np.asarray(tickers, dtype=object)[table.index.values // 10000])
+    table.insert(1, "Year", table.index.values % 10000)
+    return table.reset_index(drop=True)[PARTITION_COLUMNS]
+
+#what changed in the prices of every ticker between two versions of the partitions
+#returns {ticker: {"first", "last", "rows", "rewritten"}} and the tickers whose rows are all gone:
+#first is the first day that changed (the first new day when rows were only added after the last stored day, the first day
+#of the partition otherwise), last the last day of the ticker now, rows the rows added (negative when rows were removed)
+#and rewritten whether a stored day changed
+#a partition that changed is looked at row by row: when its rows up to its old last day still hash the same, only days
+#after it were added
+def price_changes(old, rows, new, tickers):
+    merged = new.merge(old, on=["Ticker", "Year"], how="outer", suffixes=("", "_old"), indicator=True)
+    merged = merged.loc[(merged["_merge"] != "both") | (merged["Hash"] != merged["Hash_old"])]
+    if len(merged) == 0:
+        return {}, []
+
+    #rows of the partitions that changed and existed before, up to their old last day
+    both = merged.loc[merged["_merge"] == "both"]
+    appended = pd.Series(False, index=merged.index)
+    added_first = pd.Series(pd.NaT, index=merged.index, dtype="datetime64[ns]")
+    if len(both) > 0:
+        keys = pd.Index(tickers).get_indexer(both["Ticker"].values).astype(np.int64) * 10000 + both["Year"].values.astype(np.int64)
+        inside = rows.loc[np.isin(rows["Partition"].values, keys)]
+        before = inside["Date"].values <= pd.Series(both["Last_old"].values, index=keys).reindex(inside["Partition"].values).values
+        prefix = inside.loc[before].groupby("Partition")["Hash"].sum().astype(str).reindex(keys)
+        appended.loc[both.index] = prefix.values == both["Hash_old"].values
+        added_first.loc[both.index] = inside.loc[~before].groupby("Partition")["Date"].min().reindex(keys).values
+
+    #first day that changed in every partition: the first added day, or the first day of the partition before or after
+    first = merged[["First", "First_old"]].min(axis=1)
+    first = first.where(~appended, added_first)
+    #only new days after the last stored day of the ticker leave the stored days as they were
+    #(left_only is a new partition, right_only a partition whose rows are all gone)
+    ticker_last_old = merged["Ticker"].map(old.groupby("Ticker")["Last"].max())
+    rewritten = (merged["_merge"] == "right_only") | ((merged["_merge"] == "both") & ~appended) | ((merged["_merge"] == "left_only") & (merged["First"] <= ticker_last_old))
+
+    result = {}
+    counts = new.groupby("Ticker")["Rows"].sum()
+    old_counts = old.groupby("Ticker")["Rows"].sum()
+    last = new.groupby("Ticker")["Last"].max()
+    table = pd.DataFrame({"Ticker": merged["Ticker"], "First": first, "Rewritten": rewritten}).groupby("Ticker").agg(First=("First", "min"), Rewritten=("Rewritten", "any"))
+    removed = sorted(str(t) for t in table.index if t not in counts.index)
+    for (ticker, row) in table.loc[table.index.isin(counts.index)].iterrows():
+        result[str(ticker)] = {"first": str(row["First"].date()), "last": str(last[ticker].date()), "rows": int(counts[ticker] - old_counts.get(ticker, 0)), "rewritten": bool(row["Rewritten"])}
+    return result, removed
+
+
+##########################################
+#EPS and insider transactions            #
+##########################################
+#EPS change of every ticker, missing values as None
+def _eps(eps):
+    values = pd.to_numeric(eps["EPS"], errors="coerce").values
+    return {str(name): (float(value) if value == value else None) for (name, value) in zip(eps["Name"].values, values)}
+
+#EPS values that moved: {ticker: [old, new]} (None when the ticker had or has no value)
+def eps_changes(old, new):
+    return {ticker: [old.get(ticker), new.get(ticker)] for ticker in sorted(set(old) | set(new)) if old.get(ticker) != new.get(ticker)}
+
+#keys and tickers of the insider transactions
+def _insider(insider):
+    if len(insider) == 0:
+        return np.array([], dtype=np.uint64), np.array([], dtype=str)
+    return events.transaction_keys(insider).astype(np.uint64), np.asarray(insider["Ticker"].astype(str).str.strip(), dtype=str)
+
+#the new insider transactions by ticker {ticker: [keys]} (the keys of the events table) and the tickers whose transactions were removed
+def insider_changes(old_keys, old_tickers, keys, tickers):
+    new = ~np.isin(keys, old_keys)
+    gone = ~np.isin(old_keys, keys)
+    added = {}
+    for (ticker, key) in zip(tickers[new], keys[new]):
+        added.setdefault(str(ticker), []).append(str(key))
+    return {ticker: added[ticker] for ticker in sorted(added)}, sorted(set(str(t) for t in old_tickers[gone]))
+
+
+##########################################
+#Feed                                    #
+##########################################
+#what the last version was made of (None without a state or with a state of another layout)
+def _read_state():
+    if not os.path.exists(STATE_PATH):
+        return None
+    with open(STATE_PATH, "r") as f:
+        state = json.load(f)
+    if state.get("layout") != LAYOUT or not os.path.exists(PARTITIONS_PATH) or not os.path.exists(INSIDER_PATH):
+        return None
+    state["partitions"] = pd.read_csv(PARTITIONS_PATH, dtype={"Ticker": str, "Hash": str}, parse_dates=["First", "Last"], keep_default_na=False)
+    with np.load(INSIDER_PATH, allow_pickle=False) as stored:
+        state["keys"], state["tickers"] = stored["keys"], stored["tickers"]
+    return state
+
+#the versions in the feed, oldest first
+def read_Feed(path=FEED_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip() != ""]
+
+#version of the data the last entry of the feed describes (0 before the first refresh)
+def version():
+    feed = read_Feed()
+    return feed[-1]["version"] if len(feed) > 0 else 0
+
+#record what changed in the stocks, EPS and insider frames since the last version as a new version of the feed
+#indexes are the screener indexes of the stocks frame (see screen.build_indexes)
+#returns the new entry, or None when nothing changed (no version is added)
+#without a stored state (first run, or another layout) the entry is a full one: everything has to be taken again
+#the entry is written before the state, a refresh stopped in between records the same changes again in the next version
+def refresh_Changes(stocks, eps, insider, indexes):
+    state = _read_state()
+    rows = _price_rows(stocks, indexes)
+    parts = partitions(rows, indexes["tickers"])
+    eps_values = _eps(eps)
+    keys, tickers = _insider(insider)
+
+    number = (state["version"] if state is not None else version()) + 1
+    entry = {"version": number, "time": datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")}
+    if state is None:
+        entry["full"] = True
+    else:
+        entry["prices"], entry["removed"] = price_changes(state["partitions"], rows, parts, indexes["tickers"])
+        entry["eps"] = eps_changes(state["eps"], eps_values)
+        entry["insider"], entry["insider_removed"] = insider_changes(state["keys"], state["tickers"], keys, tickers)
+        if not any(len(entry[name]) > 0 for name in ["prices", "removed", "eps", "insider", "insider_removed"]):
+            return None
+
+    feed = read_Feed()[-(KEEP - 1):]
+    with jobs.atomic_file(FEED_PATH) as f:
+        for line in feed + [entry]:
+            f.write(json.dumps(line) + "\n")
+    jobs.write_csv(parts, PARTITIONS_PATH, index=False, date_format="%Y-%m-%d")
+    with jobs.atomic_file(INSIDER_PATH, "wb") as f:
+        np.savez(f, keys=keys, tickers=tickers)
+    with jobs.atomic_file(STATE_PATH) as f:
+        json.dump({"layout": LAYOUT, "version": number, "eps": eps_values}, f)
+    return entry
+
+#everything that changed after a version of the data, the entries of the later versions merged into one
+#{"version", "since", "full", "prices", "removed", "eps", "insider", "insider_removed"} (see refresh_Changes)
+#full is True when the version is older than the feed or a later version is a full one, the client has to take everything again
+def changes_since(since, path=FEED_PATH):
+    feed = read_Feed(path)
+    latest = feed[-1]["version"] if len(feed) > 0 else 0
+    result = {"version": latest, "since": since, "full": False, "prices": {}, "removed": [], "eps": {}, "insider": {}, "insider_removed": []}
+    later = [entry for entry in feed if entry["version"] > since]
+    if len(later) == 0:
+        return result
+    if later[0]["version"] != since + 1 or any(entry.get("full", False) for entry in later):
+        result["full"] = True
+        return result
+
+    removed = set()
+    insider_removed = set()
+    for entry in later:
+        for (ticker, change) in entry["prices"].items():
+            before = result["prices"].get(ticker)
+            if before is None:
+                #a ticker removed and listed again is rewritten
+                result["prices"][ticker] = dict(change, rewritten=change["rewritten"] or ticker in removed)
+            else:
+                result["prices"][ticker] = {"first": min(before["first"], change["first"]), "last": change["last"], "rows": before["rows"] + change["rows"],
+                                            "rewritten": before["rewritten"] or change["rewritten"]}
+            removed.discard(ticker)
+        for ticker in entry["removed"]:
+            result["prices"].pop(ticker, None)
+            removed.add(ticker)
+        for (ticker, (old, new)) in entry["eps"].items():
+            result["eps"][ticker] = [result["eps"].get(ticker, [old])[0], new]
+        for (ticker, keys) in entry["insider"].items():
+            result["insider"].setdefault(ticker, []).extend(keys)
+        insider_removed.update(entry["insider_removed"])
+
+    result["removed"] = sorted(removed)
+    result["eps"] = {ticker: values for (ticker, values) in result["eps"].items() if values[0] != values[1]}
+    result["insider_removed"] = sorted(insider_removed)
+    return result
+
+#tickers whose prices, EPS or insider transactions changed in some changes (an entry of the feed or changes_since),
+#None when everything has to be taken again
+def tickers(changes):
+    if changes.get("full", False):
+        return None
+    return set(changes["prices"]) | set(changes["removed"]) | set(changes["eps"]) | set(changes["insider"]) | set(changes["insider_removed"])
+
+
+#python changes.py [--since V] prints what changed after a version of the data (the last version by default)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="What the refreshes of the data changed")
+    parser.add_argument("--since", type=int, default=None)
+    args = parser.parse_args()
+
+    latest = version()
+    since = args.since if args.since is not None else max(latest - 1, 0)
+    result = changes_since(since)
+    print("version " + str(result["version"]) + ", changes since version " + str(since))
+    if result["full"]:
+        print("everything changed, the data has to be taken again")
+    else:
+        for (ticker, change) in sorted(result["prices"].items()):
+            print("prices  " + ticker + ": " + "{:+d}".format(change["rows"]) + " rows from " + change["first"] + " to " + change["last"] + (" (rewritten)" if change["rewritten"] else ""))
+        for ticker in result["removed"]:
+            print("prices  " + ticker + ": removed")
+        for (ticker, (old, new)) in sorted(result["eps"].items()):
+            print("eps     " + ticker + ": " + str(old) + " -> " + str(new))
+        for (ticker, keys) in sorted(result["insider"].items()):
+            print("insider " + ticker + ": " + str(len(keys)) + " new transactions")
+        for ticker in result["insider_removed"]:
+            print("insider " + ticker + ": transactions removed")
@@ -0,0 +1,234 @@
+# This Python file uses the following encoding: utf-8
+from collections import OrderedDict
+
+#Qt imports for drawing the chart
+from PySide2.QtWidgets import QWidget
+from PySide2.QtCore import Qt, QPointF, QRectF
+from PySide2.QtGui import QPainter, QPen, QColor, QPolygonF
+
+#pandas and numpy imports for data storage and manipulation
+import pandas as pd
+import numpy as np
+
+#points of a level allowed per pixel before the next (coarser) level is used
+POINTS_PER_PIXEL = 4
+#tickers whose levels are kept
+CACHE_TICKERS = 32
+#zoom factor of a wheel step and the smallest window that can be shown (days)
+ZOOM_STEP = 1.25
+MIN_DAYS = 10
+
+
+#rollups of a daily series: every level has the first, low, high and last value of each period (day, week, month)
+#and the days the low, high and last value were on
+#the low and high keep the peaks of the finer levels, so a coarse level still has the shape of the daily series
+class Levels:
+    def __init__(self, dates, values):
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        values = np.asarray(values, dtype=np.float64)
+        keep = ~np.isnan(values)
+        order = np.argsort(dates[keep], kind="mergesort")
+        dates = dates[keep][order]
+        values = values[keep][order]
+
+        days = dates.astype(np.int64)
+        self.levels = [("Daily", days, values, values, values, values, days, days, days)]
+        #weeks starting on Monday (1970-01-01 was a Thursday) and calendar months
+        for (name, periods) in [("Weekly", (days + 3) // 7), ("Monthly", dates.astype("datetime64[M]").astype(np.int64))]:
+            if len(days) == 0:
+                self.levels.append((name, days, values, values, values, values, days, days, days))
+                continue
+            starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+            ends = np.r_[starts[1:], len(days)] - 1
+            low, at_low = _extreme(np.minimum, values, starts)
+            high, at_high = _extreme(np.maximum, values, starts)
+            self.levels.append((name, days[starts], values[starts], low, high, values[ends], days[at_low], days[at_high], days[ends]))
+
+    #first and last day of the series (as days since 1970)
+    def span(self):
+        days = self.levels[0][1]
+        return (int(days[0]), int(days[-1])) if len(days) > 0 else (0, 0)
+
+    #points to draw between two days on a width in pixels: (level name, days, values)
+    #the finest level with at most POINTS_PER_PIXEL points per pixel is used, and only the first, lowest, highest and last point
+    #of every pixel column are kept, in time order (at most 4 per pixel, a weekly or monthly period that fits a column gives all four)
+    def view(self, start, end, width):
+        width = max(int(width), 1)
+        for (name, days, first, low, high, last, low_days, high_days, last_days) in self.levels:
+            lo = np.searchsorted(days, start, side="left")
+            hi = np.searchsorted(days, end, side="right")
+            if hi - lo <= POINTS_PER_PIXEL * width:
+                break
+        if hi <= lo:
+            return name, days[lo:hi], last[lo:hi]
+        columns = [column[lo:hi] for column in (days, first, low, high, last, low_days, high_days, last_days)]
+        return (name,) + _m4(*columns, start, end, width)
+
+
+#lowest or highest value of every period (reduce is np.minimum or np.maximum) and the position of its first occurrence
+def _extreme(reduce, values, starts):
+    n = len(values)
+    bucket = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, n]))
+    extreme = reduce.reduceat(values, starts)
+    return extreme, np.minimum.reduceat(np.where(values == extreme[bucket], np.arange(n), n), starts)
+
+#first, lowest, highest and last point of every pixel column of the periods
+#(days is the first day of every period, low_days, high_days and last_days the days of its low, high and last value)
+def _m4(days, first, low, high, last, low_days, high_days, last_days, start, end, width):
+    n = len(days)
+    pixel = np.minimum(((days - start) * width) // max(end - start, 1), width - 1)
+    starts = np.flatnonzero(np.r_[True, pixel[1:] != pixel[:-1]])
+    ends = np.r_[starts[1:], n] - 1
+
+    #(first) lowest and highest period of every column
+    lowest, at_low = _extreme(np.minimum, low, starts)
+    highest, at_high = _extreme(np.maximum, high, starts)
+
+    #the four points of each column in time order (a day that is more than one of them is kept once)
+    when = np.stack([days[starts], low_days[at_low], high_days[at_high], last_days[ends]], axis=1)
+    values = np.stack([first[starts], lowest, highest, last[ends]], axis=1)
+    order = np.argsort(when, axis=1, kind="mergesort")
+    when = np.take_along_axis(when, order, axis=1).ravel()
+    values = np.take_along_axis(values, order, axis=1).ravel()
+    keep = np.r_[True, (when[1:] != when[:-1]) | (values[1:] != values[:-1])]
+    return when[keep], values[keep]
+
+
+#levels of the close of every ticker shown lately, dropped when the data version changes
+_cache = OrderedDict()
+
+#levels of the close of a ticker from the price cube, or from the stocks frame when the cube doesn't have it (None without data)
+def levels_for(ticker, cube=None, stocks=None, version=None):
+    key = (ticker, version)
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+    if cube is not None and ticker in cube.codes:
+        levels = Levels(cube.calendar.values, cube.series(ticker, "Close"))
+    elif stocks is not None and len(stocks) > 0:
+        rows = stocks.loc[stocks["Name"] == ticker]
+        #the merge in the stocks loaders renames the daily close to Close_x
+        close = rows["Close_x"] if "Close_x" in rows.columns else rows["Close"]
+        levels = Levels(pd.DatetimeIndex(rows.index).values, close.values)
+    else:
+        return None
+    if len(levels.levels[0][1]) == 0:
+        return None
+
+    for old in [k for k in _cache if k[1] != version]:
+        del _cache[old]
+    _cache[key] = levels
+    if len(_cache) > CACHE_TICKERS:
+        _cache.popitem(last=False)
+    return levels
+
+
+#price chart of a ticker: the wheel zooms around the mouse, dragging pans and a double click shows the whole history
+#only the points the width of the widget can show are drawn
+class ChartPanel(QWidget):
+    def __init__(self, parent=None):
+        super(ChartPanel, self).__init__(parent)
+        self.setWindowFlags(Qt.Window)
+        self.setMinimumSize(400, 200)
+        self.resize(900, 420)
+        self.levels = None
+        self.title = ""
+        self.focus = None
+        self.view_days = (0, 1)
+        self.drag = None
+        #level and number of points of the last drawing
+        self.drawn = ("", 0)
+
+    #show the levels of a ticker, centred on a day (a Timestamp) with some months around it, or the whole history
+    def plot(self, title, levels, focus=None):
+        self.title = title
+        self.levels = levels
+        self.focus = int(np.datetime64(focus, "D").astype(np.int64)) if focus is not None else None
+        first, last = levels.span()
+        if self.focus is not None:
+            self._set_window(self.focus - 180, self.focus + 180)
+        else:
+            self._set_window(first, last)
+        self.setWindowTitle(title)
+        self.show()
+        self.raise_()
+
+    #keep the window inside the history and at least MIN_DAYS long
+    def _set_window(self, start, end):
+        first, last = self.levels.span()
+        length = min(max(end - start, MIN_DAYS), max(last - first, MIN_DAYS))
+        start = min(max(start, first), max(last - length, first))
+        self.view_days = (start, start + length)
+        self.update()
+
+    def _plot_rect(self):
+        return QRectF(60, 30, max(self.width() - 80, 1), max(self.height() - 60, 1))
+
+    def wheelEvent(self, event):
+        if self.levels is None:
+            return
+        start, end = self.view_days
+        rect = self._plot_rect()
+        #the day under the mouse stays in place
+        x = min(max((event.position().x() if hasattr(event, "position") else event.pos().x()) - rect.left(), 0), rect.width()) / rect.width()
+        center = start + x * (end - start)
+        factor = 1 / ZOOM_STEP if event.angleDelta().y() > 0 else ZOOM_STEP
+        self._set_window(int(center - x * (end - start) * factor), int(center + (1 - x) * (end - start) * factor))
+
+    def mousePressEvent(self, event):
+        self.drag = (event.pos().x(), self.view_days)
+
+    def mouseMoveEvent(self, event):
+        if self.drag is None or self.levels is None:
+            return
+        x, (start, end) = self.drag
+        shift = int((x - event.pos().x()) * (end - start) / self._plot_rect().width())
+        self._set_window(start + shift, end + shift)
+
+    def mouseReleaseEvent(self, event):
+        self.drag = None
+
+    def mouseDoubleClickEvent(self, event):
+        if self.levels is not None:
+            self._set_window(*self.levels.span())
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(255, 255, 255))
+        if self.levels is None:
+            return
+        rect = self._plot_rect()
+        start, end = self.view_days
+        name, days, values = self.levels.view(start, end, rect.width())
+        self.drawn = (name, len(days))
+
+        painter.setPen(QPen(QColor(160, 160, 160)))
+        painter.drawRect(rect)
+        painter.setPen(QPen(QColor(0, 0, 0)))
+        first = str(np.datetime64(int(start), "D"))
+        last = str(np.datetime64(int(end), "D"))
+        painter.drawText(QPointF(rect.left(), 20), self.title + "   " + first + " to " + last + "   (" + name + ", " + str(len(days)) + " points)")
+        if len(days) == 0:
+            return
+
+        low = float(np.min(values))
+        high = float(np.max(values))
+        if high == low:
+            high = low + 1
+        painter.drawText(QPointF(5, rect.top() + 10), "{:.2f}".format(high))
+        painter.drawText(QPointF(5, rect.bottom()), "{:.2f}".format(low))
+        painter.drawText(QPointF(rect.left(), rect.bottom() + 20), first)
+        painter.drawText(QPointF(rect.right() - painter.fontMetrics().horizontalAdvance(last), rect.bottom() + 20), last)
+
+        #the day the chart was opened on
+        span = max(end - start, 1)
+        if self.focus is not None and start <= self.focus <= end:
+            painter.setPen(QPen(QColor(230, 160, 60)))
+            x = rect.left() + (self.focus - start) * rect.width() / span
+            painter.drawLine(QPointF(x, rect.top()), QPointF(x, rect.bottom()))
+
+        xs = rect.left() + (days - start) * rect.width() / span
+        ys = rect.bottom() - (values - low) * rect.height() / (high - low)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QPen(QColor(40, 90, 180), 1.2))
+        painter.drawPolyline(QPolygonF([QPointF(x, y) for (x, y) in zip(xs.tolist(), ys.tolist())]))
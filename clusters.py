@@ -0,0 +1,139 @@
+# This Python file uses the following encoding: utf-8
+import os
+import json
+
+#pandas and numpy imports for data storage and manipulation
+import pandas as pd
+import numpy as np
+
+#days of the window the buys of a cluster fall in
+WINDOW_DAYS = 30
+#distinct insiders buying within the window that make a cluster
+MIN_INSIDERS = 3
+#columns of the cluster table
+COLUMNS = ["Ticker", "Start", "End", "Insiders", "Buys", "Value"]
+
+
+#files where the clusters and the checksums of the buys they were computed from are stored
+def clusters_path():
+    return "Data/insider_clusters.csv"
+
+def _meta_path():
+    return "Data/insider_clusters.json"
+
+#buy rows sorted by ticker and date once: tickers, days, insider ids and values
+def _buys(insider):
+    if len(insider) == 0 or "Transaction" not in insider.columns:
+        return np.array([], dtype=object), np.array([], dtype="datetime64[D]"), np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+    rows = insider.loc[insider["Transaction"] == "Buy"]
+    tickers = rows["Ticker"].astype(str).str.strip().values.astype(object)
+    days = pd.to_datetime(rows["Date"]).values.astype("datetime64[D]")
+    ids = rows["Insider_id"].values.astype(np.int64)
+    values = pd.to_numeric(rows["Value ($)"], errors="coerce").fillna(0).values.astype(np.float64)
+    order = np.lexsort((days, tickers))
+    return tickers[order], days[order], ids[order], values[order]
+
+#clusters of insider buys: windows of WINDOW_DAYS in which at least MIN_INSIDERS distinct insiders bought a ticker
+#overlapping windows of a ticker are merged into a single cluster with its first and last buy, distinct insiders, buys and total value
+def detect_clusters(insider, window=WINDOW_DAYS, min_insiders=MIN_INSIDERS):
+    tickers, days, ids, values = _buys(insider)
+    n = len(tickers)
+    if n == 0:
+        return pd.DataFrame(columns=COLUMNS)
+
+    #one sorted key per row (ticker block, then day), the window of a row starts at the first key within the window
+    codes = pd.factorize(tickers)[0].astype(np.int64)
+    offset = (days - days.min()).astype(np.int64)
+    span = offset.max() + window + 1
+    key = codes * span + offset
+    lo = np.searchsorted(key, key - (window - 1), side="left")
+    positions = np.arange(n)
+
+    #next buy of the same insider in the same ticker (n if none), a row counts as a distinct insider of a window
+    #ending at i when the next buy of its insider comes after i
+    pair = pd.factorize(pd.Series(codes).astype(str) + ":" + pd.Series(ids).astype(str))[0]
+    by_pair = np.lexsort((positions, pair))
+    next_same = np.full(n, n)
+    same = pair[by_pair[1:]] == pair[by_pair[:-1]]
+    next_same[by_pair[:-1][same]] = by_pair[1:][same]
+
+    #distinct insiders of every window, one step per position in the window (not per ticker)
+    length = positions - lo + 1
+    distinct = np.zeros(n, dtype=np.int64)
+    for k in range(length.max()):
+        rows = np.flatnonzero(length > k)
+        distinct[rows] += next_same[rows - k] > rows
+
+    flagged = np.flatnonzero(distinct >= min_insiders)
+    if len(flagged) == 0:
+        return pd.DataFrame(columns=COLUMNS)
+
+    #a flagged window whose start is after the previous flagged row (or in another ticker) starts a new cluster
+    new = np.ones(len(flagged), dtype=bool)
+    new[1:] = (codes[flagged[1:]] != codes[flagged[:-1]]) | (lo[flagged[1:]] > flagged[:-1])
+    first = np.minimum.reduceat(lo[flagged], np.flatnonzero(new))
+    last = np.maximum.reduceat(flagged, np.flatnonzero(new))
+
+    #distinct insiders over the whole span of each cluster
+    sizes = last - first + 1
+    members = np.repeat(first - np.r_[0, np.cumsum(sizes)[:-1]], sizes) + np.arange(sizes.sum())
+    owners = np.repeat(np.arange(len(first)), sizes)
+    insiders = pd.DataFrame({"c": owners, "p": pair[members]}).drop_duplicates().groupby("c").size().values
+
+    total = np.r_[0, np.cumsum(values)]
+    return pd.DataFrame({"Ticker": tickers[first], "Start": pd.to_datetime(days[first]), "End": pd.to_datetime(days[last]),
+                         "Insiders": insiders, "Buys": sizes, "Value": total[last + 1] - total[first]}, columns=COLUMNS)
+
+#strongest cluster of every ticker ending between two dates, ranked by distinct insiders and then by value
+def rank_clusters(clusters, start=None, end=None):
+    rows = clusters
+    if start is not None:
+        rows = rows.loc[pd.to_datetime(rows["End"]) >= pd.Timestamp(start)]
+    if end is not None:
+        rows = rows.loc[pd.to_datetime(rows["End"]) <= pd.Timestamp(end)]
+    rows = rows.sort_values(["Insiders", "Value", "End"], ascending=False, kind="mergesort").drop_duplicates(subset=["Ticker"])
+    rows = rows.reset_index(drop=True)
+    rows["Rank"] = np.arange(1, len(rows) + 1)
+    return rows
+
+#checksum of the buys of every ticker, a ticker whose buys didn't change keeps its clusters
+def _checksums(insider):
+    tickers, days, ids, values = _buys(insider)
+    if len(tickers) == 0:
+        return {}
+    hashes = pd.util.hash_pandas_object(pd.DataFrame({"d": days, "i": ids, "v": values}), index=False).values
+    sums = pd.Series(hashes).groupby(tickers).sum()
+    return {str(t): str(s) for (t, s) in sums.items()}
+
+#bring previously detected clusters up to date, only the tickers whose buys changed are detected again
+def update_clusters(old, old_checksums, insider, window=WINDOW_DAYS, min_insiders=MIN_INSIDERS):
+    checksums = _checksums(insider)
+    if old is None:
+        return detect_clusters(insider, window, min_insiders), checksums
+    changed = set(t for (t, s) in checksums.items() if old_checksums.get(t) != s) | (set(old_checksums) - set(checksums))
+    if len(changed) == 0:
+        return old, checksums
+
+    rows = insider.loc[insider["Ticker"].astype(str).str.strip().isin(changed)]
+    new = detect_clusters(rows, window, min_insiders)
+    kept = old.loc[~old["Ticker"].isin(changed)]
+    result = pd.concat([kept, new], sort=False) if len(new) > 0 else kept
+    return result.sort_values(["Ticker", "Start"], kind="mergesort").reset_index(drop=True), checksums
+
+#clusters of the insider buys (cached in Data), detected again only for the tickers with new buys
+def refresh_Clusters(insider, window=WINDOW_DAYS, min_insiders=MIN_INSIDERS):
+    old = None
+    old_checksums = {}
+    if os.path.exists(_meta_path()) and os.path.exists(clusters_path()):
+        with open(_meta_path(), "r") as f:
+            meta = json.load(f)
+        if meta.get("window") == window and meta.get("min_insiders") == min_insiders:
+            old = pd.read_csv(clusters_path(), parse_dates=["Start", "End"])
+            old_checksums = meta["checksums"]
+
+    result, checksums = update_clusters(old, old_checksums, insider, window, min_insiders)
+    if result is not old:
+        result.to_csv(clusters_path(), index=False)
+        with open(_meta_path(), "w") as f:
+            json.dump({"window": window, "min_insiders": min_insiders, "checksums": checksums}, f)
+    return result
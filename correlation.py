@@ -0,0 +1,122 @@
+# This Python file uses the following encoding: utf-8
+import os
+import json
+
+#pandas and numpy imports for data storage and manipulation
+import pandas as pd
+import numpy as np
+
+#versioned folders of the stored matrices
+import jobs
+
+#dense ticker x date layout
+from panel import build_panel, panel_version
+
+#memory the blocks of a correlation are allowed to use (bytes)
+MEMORY_BUDGET = 256 * 1024 * 1024
+#minimum number of days two tickers have to share to be correlated
+MIN_PERIODS = 60
+
+
+#folder where the correlation matrix of a market is stored (a subfolder per version, see jobs.new_version)
+#every version has the matrix and a meta.json with the version of the prices it was computed from
+def correlation_path(index):
+    return "Data/" + index + "_correlation"
+
+#daily returns centered on each ticker mean with the missing days set to 0, and the mask of the days with data
+def _prepare(panel, days, dtype):
+    returns = panel["Close_change"]
+    if days is not None:
+        returns = returns[:, -days:]
+    mask = np.isfinite(returns)
+    with np.errstate(invalid="ignore"):
+        mean = np.nanmean(np.where(mask, returns, np.nan), axis=1)
+    centered = np.where(mask, returns - np.nan_to_num(mean)[:, None], 0)
+    return centered.astype(dtype), mask.astype(dtype)
+
+#number of tickers per block so that two blocks, their squares and the six pairwise sums fit in the budget
+def _block_size(n_tickers, n_days, budget, itemsize):
+    #6 b^2 + 6 b d <= budget / itemsize
+    items = budget / itemsize
+    size = int((-6 * n_days + np.sqrt(36 * n_days * n_days + 24 * items)) / 12)
+    return max(1, min(size, n_tickers))
+
+#pairwise complete Pearson correlation between two blocks of tickers (only the days both tickers have data count)
+def _corr_block(xa, ma, xb, mb, min_periods):
+    n = ma @ mb.T
+    sx = xa @ mb.T
+    sy = ma @ xb.T
+    sxx = (xa * xa) @ mb.T
+    syy = ma @ (xb * xb).T
+    sxy = xa @ xb.T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = (n * sxy - sx * sy) / np.sqrt((n * sxx - sx * sx) * (n * syy - sy * sy))
+    corr[n < min_periods] = np.nan
+    return np.clip(corr, -1, 1)
+
+#full correlation matrix of the daily returns of every ticker in a panel, computed block by block
+#out can be a memory mapped array to keep the result itself out of memory
+def correlation_matrix(panel, days=None, budget=MEMORY_BUDGET, dtype=np.float64, min_periods=MIN_PERIODS, out=None):
+    x, m = _prepare(panel, days, dtype)
+    count = x.shape[0]
+    size = _block_size(count, x.shape[1], budget, np.dtype(dtype).itemsize)
+    if out is None:
+        out = np.empty((count, count), dtype=dtype)
+
+    #only the blocks on and above the diagonal are computed, the matrix is symmetric
+    for i in range(0, count, size):
+        for j in range(i, count, size):
+            block = _corr_block(x[i:i+size], m[i:i+size], x[j:j+size], m[j:j+size], min_periods)
+            out[i:i+size, j:j+size] = block
+            out[j:j+size, i:i+size] = block.T
+    return out
+
+#the k tickers whose daily returns are most correlated with a ticker, without computing the full matrix
+def top_neighbours(panel, ticker, k=10, days=None, budget=MEMORY_BUDGET, dtype=np.float64, min_periods=MIN_PERIODS):
+    if ticker not in panel.codes:
+        return pd.DataFrame(columns=["Ticker", "Correlation"])
+    x, m = _prepare(panel, days, dtype)
+    row = panel.codes[ticker]
+    size = _block_size(x.shape[0], x.shape[1], budget, np.dtype(dtype).itemsize)
+    corr = np.concatenate([_corr_block(x[row:row+1], m[row:row+1], x[j:j+size], m[j:j+size], min_periods)[0] for j in range(0, x.shape[0], size)])
+    return _ranked(panel.tickers, corr, row, k)
+
+#the k tickers of a row of a correlation matrix with the highest correlation (the ticker itself excluded)
+def _ranked(tickers, corr, row, k):
+    corr = np.array(corr, dtype=np.float64)
+    corr[row] = np.nan
+    order = np.argsort(np.where(np.isnan(corr), np.inf, -corr), kind="mergesort")[:k]
+    order = order[~np.isnan(corr[order])]
+    return pd.DataFrame({"Ticker": np.asarray(tickers)[order], "Correlation": corr[order]})
+
+#the k neighbours of a ticker from a precomputed correlation matrix
+def neighbours(tickers, matrix, ticker, k=10):
+    codes = {t: i for i, t in enumerate(tickers)}
+    if ticker not in codes:
+        return pd.DataFrame(columns=["Ticker", "Correlation"])
+    return _ranked(tickers, matrix[codes[ticker]], codes[ticker], k)
+
+#correlation matrix of a market (memory mapped from Data), recomputed only when its prices changed
+#a new matrix is written to a new version of the folder, the version a reader has mapped is never written over
+def refresh_Correlation(index, stocks, days=None, budget=MEMORY_BUDGET, dtype=np.float32, path=None):
+    path = path if path is not None else correlation_path(index)
+    panel = build_panel(stocks, ["Close_change"], dtype=dtype)
+    version = panel_version(panel, ["Close_change"])
+    meta = {"version": version, "days": days, "dtype": np.dtype(dtype).name, "tickers": [str(t) for t in panel.tickers]}
+
+    folder = jobs.current_folder(path)
+    if folder is not None and os.path.exists(os.path.join(folder, "meta.json")):
+        with open(os.path.join(folder, "meta.json"), "r") as f:
+            if json.load(f) == meta:
+                return panel.tickers, np.load(os.path.join(folder, "matrix.npy"), mmap_mode="r")
+
+    #the matrix is written straight into the memory mapped file block by block, with its meta in the same version
+    tmp, number = jobs.new_version(path)
+    out = np.lib.format.open_memmap(os.path.join(tmp, "matrix.npy"), mode="w+", dtype=dtype, shape=(len(panel.tickers), len(panel.tickers)))
+    correlation_matrix(panel, days, budget, dtype, out=out)
+    out.flush()
+    del out
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    jobs.publish_version(path, tmp, number)
+    return panel.tickers, np.load(os.path.join(jobs.current_folder(path), "matrix.npy"), mmap_mode="r")
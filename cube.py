@@ -0,0 +1,95 @@
+# This Python file uses the following encoding: utf-8
+import os
+import json
+
+#pandas and numpy imports for data storage and manipulation
+import pandas as pd
+import numpy as np
+
+#dense ticker x date layout
+from panel import Panel, PRICE_COLUMNS, build_panel
+#versioned folder of the cube
+import jobs
+
+#folder where the cube is stored (a subfolder per version, see jobs.new_version)
+CUBE_DIR = "Data/cube"
+#version of the files layout, a cube written with another layout is rebuilt
+LAYOUT = 1
+#storage type of each column (volumes don't fit the float32 mantissa)
+DTYPES = {"Open": "float32", "High": "float32", "Low": "float32", "Close": "float32", "Adj Close": "float32", "Volume": "float64", "Close_change": "float32"}
+
+
+#file of a column in the cube folder
+def _column_file(path, column):
+    return os.path.join(path, column.replace(" ", "_") + ".npy")
+
+#dense ticker x trading day cube of the price columns, memory mapped read only from disk
+#every column is a (tickers x days) array, so the series of a ticker is a contiguous row
+#and the cross section of a day is a strided column, both are views of the mapped pages (no copies)
+class Cube:
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            self.meta = json.load(f)
+        self.tickers = np.load(os.path.join(path, "tickers.npy"), allow_pickle=False)
+        self.calendar = pd.to_datetime(np.load(os.path.join(path, "calendar.npy")))
+        self.codes = {t: i for i, t in enumerate(self.tickers)}
+        self.data = {column: np.load(_column_file(path, column), mmap_mode="r") for column in self.meta["columns"]}
+
+    def __getitem__(self, column):
+        return self.data[column]
+
+    #position of a day in the trading calendar (-1 if it isn't a trading day)
+    def day(self, date):
+        return self.calendar.get_indexer([pd.Timestamp(date)])[0]
+
+    #values of a column for a ticker over all the trading days
+    def series(self, ticker, column="Close"):
+        return self.data[column][self.codes[ticker]]
+
+    #values of a column for all the tickers on a day
+    def cross_section(self, date, column="Close"):
+        return self.data[column][:, self.day(date)]
+
+    #the cube as a panel for the stages working on the dense layout
+    def panel(self):
+        return Panel(self.tickers, self.calendar, self.data)
+
+
+#stats of the stocks files among the stats of the Data files
+def _stocks_sources(sources):
+    return {path: stats for (path, stats) in sources.items() if path.endswith("_stocks.csv")} if sources is not None else None
+
+#write the cube of a stocks frame, one column at a time to keep the memory bounded
+#sources are the stats of the stocks files the frame was read from (snapshot.sources), a cube of other files is stale
+#every write is a new version of the folder, the previous cube may still be memory mapped
+def write_Cube(stocks, sources=None, path=CUBE_DIR, columns=PRICE_COLUMNS):
+    tmp, number = jobs.new_version(path)
+
+    written = []
+    tickers = calendar = None
+    for column in columns:
+        panel = build_panel(stocks, [column], dtype=DTYPES.get(column, "float32"))
+        if column not in panel.data:
+            continue
+        np.save(_column_file(tmp, column), panel[column])
+        written.append(column)
+        tickers, calendar = panel.tickers, panel.dates
+
+    np.save(os.path.join(tmp, "tickers.npy"), np.asarray(tickers).astype(str))
+    np.save(os.path.join(tmp, "calendar.npy"), calendar.values.astype("datetime64[ns]"))
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({"layout": LAYOUT, "columns": written, "shape": [len(tickers), len(calendar)], "sources": _stocks_sources(sources)}, f)
+    jobs.publish_version(path, tmp, number)
+
+#open the stored cube (None when there is no cube, it was written with another layout or, when sources are given,
+#from other stocks files than the ones of sources)
+def read_Cube(sources=None, path=CUBE_DIR):
+    folder = jobs.current_folder(path)
+    if folder is None:
+        return None
+    cube = Cube(folder)
+    if cube.meta.get("layout") != LAYOUT:
+        return None
+    if sources is not None and cube.meta.get("sources") != json.loads(json.dumps(_stocks_sources(sources))):
+        return None
+    return cube
@@ -0,0 +1,168 @@
+# This Python file uses the following encoding: utf-8
+import os
+import json
+import sqlite3
+
+#pandas import for returning the query results as data frames
+import pandas as pd
+
+#chunked loading of the insider files
+import ingest
+
+#file of the SQLite store
+DB_PATH = "Data/screener.db"
+
+#columns of the insider CSV files and the columns of the insider table they are stored in
+INSIDER_COLUMNS = {"Insider Trading": "insider", "Relationship": "relationship", "Date": "date", "Transaction": "type", "Cost": "cost", "#Shares": "shares", "Value ($)": "value", "#Shares Total": "shares_total", "SEC Form 4": "sec_form4", "Insider_id": "insider_id", "Ticker": "ticker"}
+#columns that identify an insider transaction (an upsert of the same transaction updates the row)
+INSIDER_KEY = ["ticker", "insider_id", "date", "type", "cost", "shares", "shares_total", "sec_form4"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickers (
+    market TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    name TEXT NOT NULL,
+    eps REAL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (market, symbol)
+);
+CREATE INDEX IF NOT EXISTS tickers_symbol ON tickers (symbol);
+
+CREATE TABLE IF NOT EXISTS insider (
+    ticker TEXT NOT NULL,
+    insider_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    type TEXT NOT NULL,
+    cost REAL NOT NULL,
+    shares REAL NOT NULL,
+    shares_total REAL NOT NULL,
+    sec_form4 TEXT NOT NULL,
+    insider TEXT,
+    relationship TEXT,
+    value REAL,
+    UNIQUE (ticker, insider_id, date, type, cost, shares, shares_total, sec_form4)
+);
+CREATE INDEX IF NOT EXISTS insider_ticker_date ON insider (ticker, date);
+CREATE INDEX IF NOT EXISTS insider_date ON insider (date);
+CREATE INDEX IF NOT EXISTS insider_type_date ON insider (type, date);
+CREATE INDEX IF NOT EXISTS insider_id ON insider (insider_id);
+
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL
+);
+"""
+
+
+#split a line of a ticker list file in symbol, name and EPS change
+#the name can hold commas ("The Home Depot, Inc.") so only the first and the last comma separate fields
+def split_pair(line):
+    symbol, rest = line.split(",", 1)
+    name, eps = rest.rsplit(",", 1)
+    return [symbol, name, float(eps)]
+
+
+#EPS change as stored (SQLite has no NaN, missing changes are NULL)
+def _nullable(eps):
+    eps = float(eps)
+    return None if eps != eps else eps
+
+
+#embedded store of the ticker lists (with their EPS change) and the insider transactions of every market
+#the insider queries push the ticker, date and transaction filters down to the indexes
+class Database:
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        #readers don't block the writer (and the other way around)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    #insert or update the tickers of a market, the tickers no longer listed are removed from it
+    def upsert_Pairs(self, index, pairs):
+        with self.conn:
+            self.conn.executemany("INSERT INTO tickers (market, symbol, name, eps, position) VALUES (?, ?, ?, ?, ?) "
+                                  "ON CONFLICT (market, symbol) DO UPDATE SET name = excluded.name, eps = excluded.eps, position = excluded.position",
+                                  [(index, pair[0], pair[1], _nullable(pair[2]), i) for (i, pair) in enumerate(pairs)])
+            self.conn.execute("DELETE FROM tickers WHERE market = ? AND symbol NOT IN (SELECT value FROM json_each(?))", (index, json.dumps([pair[0] for pair in pairs])))
+
+    #ticker list of a market as [symbol, name, EPS change] in the listed order
+    def read_Pairs(self, index):
+        return [[symbol, name, eps if eps is not None else float("nan")] for (symbol, name, eps) in self.conn.execute("SELECT symbol, name, eps FROM tickers WHERE market = ? ORDER BY position", (index,))]
+
+    #EPS change of every ticker (once per ticker, in the order of the markets) as a numeric column
+    def read_EPS(self, indexes):
+        rows = []
+        for index in indexes:
+            rows += self.conn.execute("SELECT eps, symbol FROM tickers WHERE market = ? ORDER BY position", (index,)).fetchall()
+        eps = pd.DataFrame(rows, columns=["EPS", "Name"])
+        eps["EPS"] = eps["EPS"].astype(float)
+        return eps.drop_duplicates(subset=["Name"])
+
+    #insert or update insider transactions given in the layout of the insider CSV files
+    def upsert_Insider(self, insider):
+        if len(insider) == 0:
+            return
+        rows = insider[list(INSIDER_COLUMNS)].rename(columns=INSIDER_COLUMNS)
+        rows = rows.assign(ticker=rows["ticker"].astype(str).str.strip(), date=pd.to_datetime(rows["date"]).dt.strftime("%Y-%m-%d"))
+        rows = rows.astype(object).where(rows.notna(), None)
+        columns = list(rows.columns)
+        updates = ", ".join(c + " = excluded." + c for c in columns if c not in INSIDER_KEY)
+        with self.conn:
+            self.conn.executemany("INSERT INTO insider (" + ", ".join(columns) + ") VALUES (" + ", ".join("?" * len(columns)) + ") "
+                                  "ON CONFLICT (" + ", ".join(INSIDER_KEY) + ") DO UPDATE SET " + updates,
+                                  rows.itertuples(index=False, name=None))
+
+    #insider transactions in the layout of the insider CSV files, only the matching rows are read
+    #markets and tickers are lists, start and end are inclusive dates, transaction is e.g. "Buy" or "Sale"
+    def read_Insider(self, markets=None, tickers=None, start=None, end=None, transaction=None):
+        where = []
+        params = []
+        if markets is not None:
+            where.append("ticker IN (SELECT symbol FROM tickers WHERE market IN (" + ", ".join("?" * len(markets)) + "))")
+            params += list(markets)
+        if tickers is not None:
+            where.append("ticker IN (" + ", ".join("?" * len(tickers)) + ")")
+            params += list(tickers)
+        if start is not None:
+            where.append("date >= ?")
+            params.append(pd.Timestamp(start).strftime("%Y-%m-%d"))
+        if end is not None:
+            where.append("date <= ?")
+            params.append(pd.Timestamp(end).strftime("%Y-%m-%d"))
+        if transaction is not None:
+            where.append("type = ?")
+            params.append(transaction)
+
+        query = "SELECT " + ", ".join(INSIDER_COLUMNS.values()) + " FROM insider"
+        if len(where) > 0:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY rowid"
+        rows = pd.read_sql_query(query, self.conn, params=params)
+        return rows.rename(columns={v: k for (k, v) in INSIDER_COLUMNS.items()})
+
+    #import the ticker list and insider files of a market if they changed since they were last imported
+    #insider are the rows the insider file gained since then when they are known (appended by the background refresh), only those are imported
+    def sync(self, index, insider=None):
+        pairs_path = "Data/" + index + ".csv"
+        insider_path = "Data/" + index + "_insider.csv"
+        if self._changed(pairs_path):
+            with open(pairs_path, "r") as f:
+                self.upsert_Pairs(index, [split_pair(line) for line in f.read().splitlines() if line != ""])
+            self._imported(pairs_path)
+        if self._changed(insider_path):
+            self.upsert_Insider(ingest.read_insider_csv(insider_path) if insider is None else insider)
+            self._imported(insider_path)
+
+    def _changed(self, path):
+        if not os.path.exists(path):
+            return False
+        row = self.conn.execute("SELECT mtime FROM sources WHERE path = ?", (path,)).fetchone()
+        return row is None or row[0] != os.path.getmtime(path)
+
+    def _imported(self, path):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO sources (path, mtime) VALUES (?, ?)", (path, os.path.getmtime(path)))
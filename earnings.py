@@ -0,0 +1,245 @@
+# This Python file uses the following encoding: utf-8
+import io
+import os
+import sys
+import glob
+import json
+import time
+import datetime
+import threading
+from html.parser import HTMLParser
+
+#pandas import for the comparison with the full table parse
+import pandas as pd
+
+#timeouts, retries and circuit breaking for every download
+import fetch
+#atomic writes of the history file
+import jobs
+
+#analysis page of a ticker
+ANALYSIS_URL = "https://finance.yahoo.com/quote/{}/analysis"
+#title of the table with the estimated and actual EPS of the last quarters
+TABLE_TITLE = "Earnings History"
+#position of that table in the page, used when no table has the title
+TABLE_INDEX = 2
+#file where the EPS history of every ticker is kept and how many quarters are kept per ticker
+HISTORY_PATH = "Data/eps_history.json"
+HISTORY_QUARTERS = 40
+#folder of the saved analysis pages used to validate and time the extractor
+FIXTURES_DIR = "Data/fixtures/analysis"
+
+
+#incremental parser that only keeps the rows of the earnings history table
+#the cells of every other table are skipped, and the parse stops as soon as the table is closed
+class _HistoryParser(HTMLParser):
+    def __init__(self):
+        super(_HistoryParser, self).__init__(convert_charrefs=True)
+        self.tables = 0
+        self.depth = 0
+        self.rows = None
+        self.row = None
+        self.cell = None
+        self.fallback = None
+        self.found = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            self.depth += 1
+            if self.depth == 1:
+                self.rows = []
+                self.tables += 1
+        elif self.depth == 1:
+            if tag == "tr":
+                self._end_row()
+                self.row = []
+            elif tag in ("td", "th"):
+                self._end_cell()
+                self.cell = []
+
+    def handle_endtag(self, tag):
+        if tag == "table" and self.depth > 0:
+            self.depth -= 1
+            if self.depth == 0:
+                self._end_row()
+                if len(self.rows) > 0 and len(self.rows[0]) > 0 and self.rows[0][0] == TABLE_TITLE:
+                    self.found = self.rows
+                elif self.tables == TABLE_INDEX + 1:
+                    self.fallback = self.rows
+                self.rows = None
+        elif self.depth == 1:
+            if tag in ("td", "th"):
+                self._end_cell()
+            elif tag == "tr":
+                self._end_row()
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell.append(data)
+
+    #cells and rows can be left open in HTML, the next one (or the end of the table) closes them
+    def _end_cell(self):
+        if self.cell is not None and self.row is not None:
+            self.row.append(" ".join("".join(self.cell).split()))
+        self.cell = None
+
+    def _end_row(self):
+        self._end_cell()
+        if self.row is not None and self.rows is not None:
+            self.rows.append(self.row)
+        self.row = None
+
+
+#number of a table cell (None for N/A, - and the like)
+def _number(text):
+    try:
+        return float(text.replace(",", ""))
+    except ValueError:
+        return None
+
+#row of the table with a label, or the row at a position when no row has it
+def _row(rows, label, position):
+    for row in rows[1:]:
+        if len(row) > 0 and row[0] == label:
+            return row
+    return rows[position + 1] if len(rows) > position + 1 else []
+
+#EPS history of an analysis page given as text chunks: {"quarters": [...], "estimate": [...], "actual": [...]}
+#(None when the page has no earnings history table)
+def parse_history(chunks):
+    parser = _HistoryParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        if parser.found is not None:
+            break
+    rows = parser.found if parser.found is not None else parser.fallback
+    if rows is None or len(rows) < 2:
+        return None
+
+    quarters = rows[0][1:]
+    estimate = _row(rows, "EPS Est.", 0)[1:]
+    actual = _row(rows, "EPS Actual", 1)[1:]
+    return {"quarters": quarters, "estimate": [_number(x) for x in estimate], "actual": [_number(x) for x in actual]}
+
+#change between the actual EPS of the last two quarters of a history
+#raises IndexError with less than two quarters, ValueError when one of them is missing and ZeroDivisionError from 0
+def last_change(history):
+    actual = history["actual"]
+    if len(actual) < 2:
+        raise IndexError("less than two quarters of EPS")
+    if actual[-1] is None or actual[-2] is None:
+        raise ValueError("missing EPS")
+    return (actual[-1] - actual[-2]) / actual[-2]
+
+
+#EPS history of every ticker, the quarters of each download are merged into the stored ones
+class EPSHistory:
+    def __init__(self, path=HISTORY_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = None
+        self.changed = False
+
+    def _load(self):
+        if self.data is None:
+            self.data = {}
+            if os.path.exists(self.path):
+                with open(self.path, "r") as f:
+                    self.data = json.load(f)
+
+    #stored history of a ticker (None if it was never downloaded)
+    def get(self, ticker):
+        with self.lock:
+            self._load()
+            return self.data.get(ticker)
+
+    #merge the quarters of a download, the values of a quarter already stored are replaced
+    def update(self, ticker, history):
+        with self.lock:
+            self._load()
+            old = self.data.get(ticker, {"quarters": [], "estimate": [], "actual": []})
+            quarters = {q: (e, a) for (q, e, a) in zip(old["quarters"], old["estimate"], old["actual"])}
+            quarters.update({q: (e, a) for (q, e, a) in zip(history["quarters"], history["estimate"], history["actual"])})
+            order = [q for q in old["quarters"] if q not in history["quarters"]] + history["quarters"]
+            order = order[-HISTORY_QUARTERS:]
+            self.data[ticker] = {"quarters": order, "estimate": [quarters[q][0] for q in order], "actual": [quarters[q][1] for q in order], "updated": datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S")}
+            self.changed = True
+
+    #write the histories if they changed
+    def save(self):
+        with self.lock:
+            if not self.changed:
+                return
+            with jobs.atomic_file(self.path) as f:
+                json.dump(self.data, f)
+            self.changed = False
+
+
+#histories shared by all the loaders
+history = EPSHistory()
+
+#download the EPS history of a ticker and add it to the stored histories
+#raises FetchError when the page can't be downloaded and ValueError when it has no earnings history
+#policy is the fetch policy of the caller (the background scheduler has one of its own), the shared one by default
+def download_history(ticker, policy=None):
+    page = (policy if policy is not None else fetch.policy).stream(ANALYSIS_URL.format(ticker), parse_history)
+    if page is None:
+        raise ValueError("no earnings history for " + ticker)
+    history.update(ticker, page)
+    return page
+
+#change of the actual EPS of a ticker in the last quarter
+def eps_change(ticker):
+    return last_change(download_history(ticker))
+
+
+#last quarter EPS of a saved page read the way the loaders used to (every table parsed by pandas)
+def _read_html_actual(text):
+    t = pd.read_html(text)
+    return [float(x) if str(x) not in ["N/A", "-", "nan"] else None for x in t[2].loc[1][1:]]
+
+#compare the extractor with the full table parse on the saved pages and time both
+def bench(folder=FIXTURES_DIR, repeat=5):
+    pages = sorted(glob.glob(os.path.join(folder, "*.html")))
+    totals = {"extractor": 0.0, "read_html": 0.0}
+    mismatches = []
+    for path in pages:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        chunks = [text[i:i+64*1024] for i in range(0, len(text), 64*1024)]
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            page = parse_history(iter(chunks))
+        totals["extractor"] += (time.perf_counter() - start) / repeat
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            try:
+                expected = _read_html_actual(io.StringIO(text))
+            except (ValueError, IndexError):
+                expected = None
+        totals["read_html"] += (time.perf_counter() - start) / repeat
+
+        if (page["actual"] if page is not None else None) != expected:
+            mismatches.append(os.path.basename(path))
+
+    print(str(len(pages)) + " pages, " + str(len(mismatches)) + " mismatches " + str(mismatches))
+    for (name, total) in totals.items():
+        print(name + ": " + "{:.2f}".format(1000 * total / max(len(pages), 1)) + " ms per page")
+    return len(mismatches) == 0
+
+#save the analysis pages of some tickers as fixtures for the benchmark
+def save_fixtures(tickers, folder=FIXTURES_DIR):
+    os.makedirs(folder, exist_ok=True)
+    for ticker in tickers:
+        with jobs.atomic_file(os.path.join(folder, ticker + ".html")) as f:
+            f.write(fetch.get(ANALYSIS_URL.format(ticker)).text)
+
+
+#python earnings.py save TICKER... saves fixtures, python earnings.py bench [folder] validates and times the extractor
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "save":
+        save_fixtures(sys.argv[2:])
+    else:
+        sys.exit(0 if bench(*sys.argv[2:3]) else 1)
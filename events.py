@@ -0,0 +1,205 @@
+# This Python file uses the following encoding: utf-8
+import os
+import json
+import argparse
+
+#pandas and numpy imports for data storage and manipulation
+import pandas as pd
+import numpy as np
+
+#atomic writes of the events
+import jobs
+
+#files where the returns after every insider transaction and the layout they were computed with are stored
+EVENTS_PATH = "Data/insider_events.csv"
+META_PATH = "Data/insider_events.json"
+#version of the stored events, events stored with another layout or other horizons are computed again
+LAYOUT = 2
+#trading days after a transaction its returns are measured over
+HORIZONS = [5, 20, 60]
+#columns a transaction is identified by (it is aligned to the prices by its ticker and the day it was filed)
+KEYS = ["Ticker", "Date", "Transaction", "Insider_id"]
+#groups the track records can be computed for
+GROUPS = ["Transaction", "Relationship", "Insider_id"]
+
+
+#columns of the events table for some horizons
+def columns(horizons=HORIZONS):
+    return ["Key"] + KEYS + ["Filed", "Insider", "Relationship", "Value", "Entry", "Unmatched"] + [name + "_" + str(h) for h in horizons for name in ["Return", "Abnormal"]]
+
+#key of every insider transaction (its columns and its occurrence among the identical rows), a transaction keeps its key across downloads
+#(the change feed lists the new transactions by these keys too)
+def transaction_keys(insider):
+    frame = pd.DataFrame({"Ticker": insider["Ticker"].astype(str).str.strip().values, "Date": pd.to_datetime(insider["Date"]).values,
+                          "Transaction": insider["Transaction"].astype(str).values, "Insider_id": insider["Insider_id"].values,
+                          "Value": pd.to_numeric(insider["Value ($)"], errors="coerce").values, "Shares": pd.to_numeric(insider["#Shares"], errors="coerce").values})
+    frame["Occurrence"] = frame.groupby(list(frame.columns), dropna=False).cumcount()
+    return pd.util.hash_pandas_object(frame, index=False).values.astype(str)
+
+#day every transaction was filed: its SEC Form 4 column has the month and day without the year (e.g. "Nov 23 07:00 PM" for a
+#transaction on 2020-11-20), so it is the first such day on or after the transaction (the transaction day when it can't be read)
+def filing_dates(insider):
+    dates = pd.Series(pd.to_datetime(insider["Date"]).values.astype("datetime64[ns]"))
+    day = pd.Series(insider["SEC Form 4"].astype(str).values).str.extract(r"^\s*([A-Za-z]{3} \d{1,2})", expand=False)
+    year = dates.dt.year.astype("Int64").astype(str)
+    filed = pd.to_datetime(day + " " + year, format="%b %d %Y", errors="coerce")
+    later = pd.to_datetime(day + " " + (dates.dt.year + 1).astype("Int64").astype(str), format="%b %d %Y", errors="coerce")
+    filed = filed.where(filed >= dates, later)
+    return filed.where(filed.notna(), dates).values.astype("datetime64[ns]")
+
+
+##########################################
+#Returns after the transactions          #
+##########################################
+#forward returns of every ticker from every trading day: one row per ticker code and day sorted by day, with the return over
+#every horizon (NaN until the prices of the later days are there) and the abnormal return over the equal weighted mean of all
+#the tickers from the same day
+def _forward_returns(codes, dates, close, horizons):
+    keep = np.isfinite(close) & (close > 0)
+    codes, dates, close = codes[keep], dates[keep], close[keep]
+    order = np.lexsort((dates, codes))
+    codes, dates, close = codes[order], dates[order], close[order]
+    #a ticker listed in several markets has its rows once per market
+    first = np.r_[True, (codes[1:] != codes[:-1]) | (dates[1:] != dates[:-1])]
+    codes, dates, close = codes[first], dates[first], close[first]
+
+    n = len(codes)
+    days, calendar = pd.factorize(dates)
+    prices = {"Code": codes, "Entry": dates}
+    for h in horizons:
+        later = np.arange(n) + h
+        same = later < n
+        same[same] = codes[later[same]] == codes[same]
+        result = np.full(n, np.nan)
+        result[same] = close[later[same]] / close[same] - 1
+        #mean return of the day over the tickers with a return
+        measured = np.isfinite(result)
+        counts = np.bincount(days[measured], minlength=len(calendar))
+        sums = np.bincount(days[measured], weights=result[measured], minlength=len(calendar))
+        market = np.divide(sums, counts, out=np.full(len(calendar), np.nan), where=counts > 0)
+        prices["Return_" + str(h)] = result
+        prices["Abnormal_" + str(h)] = result - market[days]
+    order = np.argsort(dates, kind="stable")
+    return pd.DataFrame({name: values[order] for (name, values) in prices.items()})
+
+#returns after some insider transactions, in one as-of join of the transactions (sorted by filing day) to the forward returns:
+#a transaction is public once it is filed, so it is entered at the close of the first trading day of its ticker after its filing day
+#only the prices from the day of the first filing on are read (the returns of a day and its market mean only need the later days)
+#the transactions of tickers without prices after their filing are unmatched, they are not joined again when the prices change
+def event_returns(insider, keys, stocks, horizons=HORIZONS):
+    events = pd.DataFrame({"Key": keys, "Ticker": insider["Ticker"].astype(str).str.strip().values, "Date": pd.to_datetime(insider["Date"]).values.astype("datetime64[ns]"),
+                           "Transaction": insider["Transaction"].astype(str).values, "Insider_id": insider["Insider_id"].values, "Filed": filing_dates(insider),
+                           "Insider": insider["Insider Trading"].astype(str).str.strip().values, "Relationship": insider["Relationship"].astype(str).str.strip().values,
+                           "Value": pd.to_numeric(insider["Value ($)"], errors="coerce").values, "Unmatched": False})
+    events = events.loc[events["Date"].notna()].sort_values("Filed", kind="mergesort")
+    if len(events) == 0:
+        return pd.DataFrame(columns=columns(horizons))
+    dates = pd.DatetimeIndex(stocks.index).values.astype("datetime64[ns]")
+    rows = np.flatnonzero(dates > events["Filed"].values[0])
+    if len(rows) == 0:
+        return events.reindex(columns=columns(horizons))
+
+    #the tickers are joined by their codes in the stocks rows
+    codes, tickers = pd.factorize(stocks["Name"].values[rows])
+    close = stocks["Adj Close"] if "Adj Close" in stocks.columns else stocks["Close_x"] if "Close_x" in stocks.columns else stocks["Close"]
+    close = pd.to_numeric(close, errors="coerce").values[rows].astype(np.float64)
+    events["Code"] = pd.Index(tickers).get_indexer(events["Ticker"].values)
+    events["Unmatched"] = events["Code"].values < 0
+    joined = pd.merge_asof(events, _forward_returns(codes.astype(np.int64), dates[rows], close, horizons), left_on="Filed", right_on="Entry", by="Code",
+                           direction="forward", allow_exact_matches=False)
+    return joined[columns(horizons)]
+
+#bring previously computed events up to date: the new transactions are joined to the prices, and when the prices changed
+#(recheck) so are the old ones whose longest horizon hadn't passed yet (their returns were NaN), not the unmatched ones
+#the transactions no longer in the insider frame are dropped
+def update_events(old, insider, stocks, horizons=HORIZONS, recheck=True):
+    keys = transaction_keys(insider) if len(insider) > 0 else np.array([], dtype=str)
+    if old is None:
+        return event_returns(insider, keys, stocks, horizons)
+    kept = old.loc[old["Key"].isin(keys)]
+    if recheck:
+        kept = kept.loc[kept["Abnormal_" + str(max(horizons))].notna() | kept["Unmatched"].astype(bool)]
+    todo = ~pd.Index(keys).isin(kept["Key"])
+    if not todo.any():
+        return kept if len(kept) < len(old) else old
+    new = event_returns(insider.iloc[np.flatnonzero(todo)], keys[todo], stocks, horizons)
+    result = pd.concat([kept, new], sort=False) if len(kept) > 0 else new
+    return result.sort_values(["Date", "Ticker", "Key"], kind="mergesort").reset_index(drop=True)
+
+#rows and last day of the prices, the events waiting for returns are joined again when they change
+def _prices_mark(stocks):
+    return [len(stocks), str(pd.DatetimeIndex(stocks.index).max())]
+
+def _meta(meta_path):
+    if not os.path.exists(meta_path):
+        return {}
+    with open(meta_path, "r") as f:
+        return json.load(f)
+
+#read the stored events (None when there are none or they were computed with another layout or other horizons)
+def read_Events(horizons=HORIZONS, path=EVENTS_PATH, meta_path=META_PATH):
+    meta = _meta(meta_path)
+    if not os.path.exists(path) or meta.get("layout") != LAYOUT or meta.get("horizons") != list(horizons):
+        return None
+    return pd.read_csv(path, parse_dates=["Date", "Filed", "Entry"], dtype={"Key": str, "Ticker": str, "Transaction": str, "Insider": str, "Relationship": str, "Unmatched": bool},
+                       keep_default_na=False, na_values=[""])
+
+#returns after every insider transaction (cached in Data), only the new transactions and the ones still waiting for prices are joined
+def refresh_Events(insider, stocks, horizons=HORIZONS, path=EVENTS_PATH, meta_path=META_PATH):
+    old = read_Events(horizons, path, meta_path)
+    if len(insider) == 0 or len(stocks) == 0:
+        return old if old is not None else pd.DataFrame(columns=columns(horizons))
+    mark = _prices_mark(stocks)
+    moved = _meta(meta_path).get("prices") != mark
+    result = update_events(old, insider, stocks, horizons, moved)
+    if result is not old:
+        jobs.write_csv(result, path, index=False)
+    if result is not old or moved:
+        with jobs.atomic_file(meta_path) as f:
+            json.dump({"layout": LAYOUT, "horizons": list(horizons), "prices": mark}, f)
+    return result
+
+
+##########################################
+#Track records                           #
+##########################################
+#track record of every transaction type, relationship or insider over a horizon: events with returns, mean and median abnormal
+#return, share of positive abnormal returns and t statistic of the mean, ranked by mean abnormal return
+#(the groups with fewer than min_events events are left out, transaction keeps the events of one type only)
+def track_records(events, by="Insider_id", horizon=HORIZONS[1], transaction=None, min_events=1):
+    column = "Abnormal_" + str(horizon)
+    rows = events.loc[events[column].notna()]
+    if transaction is not None:
+        rows = rows.loc[rows["Transaction"] == transaction]
+    abnormal = rows[column].astype(np.float64)
+    grouped = abnormal.groupby(rows[by].values)
+    table = pd.DataFrame({"Events": grouped.size(), "Mean": grouped.mean(), "Median": grouped.median(), "Hit_rate": (abnormal > 0).groupby(rows[by].values).mean(),
+                          "Return": rows["Return_" + str(horizon)].astype(np.float64).groupby(rows[by].values).mean()})
+    with np.errstate(divide="ignore", invalid="ignore"):
+        table["T_stat"] = table["Mean"] / (grouped.std() / np.sqrt(table["Events"]))
+    if by == "Insider_id":
+        #the last name an insider was listed with
+        table.insert(0, "Insider", rows.groupby("Insider_id")["Insider"].last())
+    table.index.name = by
+    table = table.loc[table["Events"] >= min_events]
+    return table.sort_values(["Mean", "Events"], ascending=False)
+
+
+#python events.py [--by Insider_id|Relationship|Transaction] [--horizon 20] [--transaction Buy] [--min-events 3] [--top 30]
+#prints the track records of the stored events (they are brought up to date when the window loads the data)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Abnormal returns after the insider transactions")
+    parser.add_argument("--by", choices=GROUPS, default="Insider_id")
+    parser.add_argument("--horizon", type=int, choices=HORIZONS, default=HORIZONS[1])
+    parser.add_argument("--transaction", default=None)
+    parser.add_argument("--min-events", type=int, default=3)
+    parser.add_argument("--top", type=int, default=30)
+    args = parser.parse_args()
+
+    stored = read_Events()
+    if stored is None:
+        print("no events yet, they are computed when the window loads the data")
+    else:
+        table = track_records(stored, args.by, args.horizon, args.transaction, args.min_events)
+        print(table.head(args.top).to_string(formatters={"Mean": "{:+.2%}".format, "Median": "{:+.2%}".format, "Hit_rate": "{:.1%}".format, "Return": "{:+.2%}".format, "T_stat": "{:.2f}".format}))
+        print(str(len(table)) + " groups, " + str(int(stored["Abnormal_" + str(args.horizon)].notna().sum())) + " events with returns")
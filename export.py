@@ -0,0 +1,192 @@
+# This Python file uses the following encoding: utf-8
+import os
+import json
+import tempfile
+import argparse
+
+#pandas and numpy imports for data storage and manipulation
+import pandas as pd
+import numpy as np
+
+#atomic writes of the exported files
+import jobs
+
+#rows copied out of the data at a time, the memory an export takes doesn't grow with the rows exported
+CHUNK_ROWS = 50000
+#formats of an export: a CSV file, or a folder with one .npy file per column (strings as codes into their distinct values)
+FORMATS = ["csv", "columns"]
+
+
+#rows of a frame in chunks of at most size rows, only one chunk is copied at a time
+#rows are the positions of the result in the frame (e.g. the screener rows of a query), None for the whole frame
+def chunks(frame, rows=None, size=CHUNK_ROWS):
+    total = len(frame) if rows is None else len(rows)
+    for start in range(0, total, size):
+        yield frame.iloc[start:start + size] if rows is None else frame.iloc[rows[start:start + size]]
+
+#CSV text of the rows of a frame, chunk by chunk (the header comes with the first one), the index is written when it is named
+def csv_chunks(frame, rows=None, size=CHUNK_ROWS):
+    index = frame.index.name is not None
+    first = True
+    for chunk in chunks(frame, rows, size):
+        yield chunk.to_csv(header=first, index=index)
+        first = False
+    if first:
+        yield frame.iloc[:0].to_csv(index=index)
+
+#export the rows of a frame to a CSV file, returns the number of rows written
+def write_csv(frame, path, rows=None, size=CHUNK_ROWS):
+    with jobs.atomic_file(path) as f:
+        for text in csv_chunks(frame, rows, size):
+            f.write(text)
+    return len(frame) if rows is None else len(rows)
+
+
+#storage of a column in a columns export: numbers and dates as they are, anything else (and the pandas extension arrays) as strings
+def _kind(values):
+    return "values" if isinstance(values, np.ndarray) and values.dtype.kind in "biufmM" else "strings"
+
+#one column of a columns export, filled chunk by chunk: the values go straight into a file of the final size
+#(memory mapped) and the strings as codes, with the distinct strings collected along the way
+class _Column:
+    def __init__(self, path, name, values, total):
+        self.path = path
+        self.name = name
+        self.kind = _kind(values)
+        self.position = 0
+        if self.kind == "values":
+            self.file = np.lib.format.open_memmap(os.path.join(path, name + ".npy"), mode="w+", dtype=values.dtype, shape=(total,))
+        else:
+            self.file = np.lib.format.open_memmap(os.path.join(path, name + ".codes.npy"), mode="w+", dtype=np.int32, shape=(total,))
+            self.strings = {}
+
+    def add(self, values):
+        end = self.position + len(values)
+        if self.kind == "values":
+            self.file[self.position:end] = values
+        else:
+            #codes of the chunk mapped to the codes of the whole column (-1 stays a missing value)
+            codes, uniques = pd.factorize(values)
+            mapped = np.array([self.strings.setdefault(str(s), len(self.strings)) for s in uniques] + [-1], dtype=np.int32)
+            self.file[self.position:end] = mapped[codes]
+        self.position = end
+
+    def close(self):
+        self.file.flush()
+        self.file = None
+        if self.kind == "strings":
+            np.save(os.path.join(self.path, self.name + ".strings.npy"), np.array(list(self.strings), dtype=str))
+
+#files of a columns export in a folder (its meta.json and the .npy files of its columns)
+def _export_file(folder, name):
+    return (name == "meta.json" or (name.startswith("rows.") and name.endswith(".npy"))) and os.path.isfile(os.path.join(folder, name))
+
+#whether a path is a previous columns export: a folder with a meta.json and nothing but the files of an export
+def is_export(path):
+    if os.path.islink(path) or not os.path.isdir(path):
+        return False
+    names = os.listdir(path)
+    return "meta.json" in names and all(_export_file(path, name) for name in names)
+
+#delete a columns export (or one being written) file by file, anything else in the folder is left as it is along with the folder
+def _remove_export(folder):
+    for name in os.listdir(folder):
+        if _export_file(folder, name):
+            os.remove(os.path.join(folder, name))
+    try:
+        os.rmdir(folder)
+    except OSError:
+        pass
+
+#export the rows of a frame to a folder of columns, returns the number of rows written
+#the folder has a meta.json with the columns, their storage and the rows, the same layout as the snapshot frames
+#(a column file is written in place while the folder is built next to the final one, and swapped in once complete)
+#only a previous export is replaced, any other file or folder at the path raises a ValueError and is left untouched
+def write_columns(frame, path, rows=None, size=CHUNK_ROWS):
+    path = os.path.abspath(path)
+    if os.path.lexists(path) and not is_export(path):
+        raise ValueError(path + " is not a columns export, it is not replaced")
+    total = len(frame) if rows is None else len(rows)
+    #a new folder of its own next to the final one (nothing already there is cleared)
+    tmp = tempfile.mkdtemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path))
+    old = None
+    try:
+        names = [("rows." + str(i), frame[column]) for (i, column) in enumerate(frame.columns)]
+        index = frame.index.name is not None
+        files = [_Column(tmp, name, column.values[:0], total) for (name, column) in names]
+        if index:
+            files.append(_Column(tmp, "rows.index", frame.index.values[:0], total))
+        for chunk in chunks(frame, rows, size):
+            for (i, column) in enumerate(chunk.columns):
+                files[i].add(chunk[column].values)
+            if index:
+                files[-1].add(chunk.index.values)
+        for column in files:
+            column.close()
+
+        layout = {"columns": [[str(column), files[i].kind] for (i, column) in enumerate(frame.columns)], "index": [frame.index.name, files[-1].kind] if index else None, "rows": total}
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump({"layout": layout}, f)
+        #the previous export is moved aside before the new one takes its place, then deleted file by file
+        if os.path.lexists(path):
+            old = tmp + ".old"
+            os.replace(path, old)
+        os.replace(tmp, path)
+    except BaseException:
+        _remove_export(tmp)
+        #a failed swap puts the previous export back
+        if old is not None and not os.path.lexists(path):
+            os.replace(old, path)
+        raise
+    if old is not None:
+        _remove_export(old)
+    return total
+
+#read a columns export back as a frame (the numbers and dates memory mapped read only)
+def read_columns(path):
+    with open(os.path.join(path, "meta.json"), "r") as f:
+        layout = json.load(f)["layout"]
+    def read(name, kind):
+        if kind == "strings":
+            strings = np.load(os.path.join(path, name + ".strings.npy")).astype(object)
+            return np.append(strings, np.nan)[np.load(os.path.join(path, name + ".codes.npy"))]
+        return np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+    frame = pd.DataFrame({column: read("rows." + str(i), kind) for (i, (column, kind)) in enumerate(layout["columns"])}, columns=[c for (c, _) in layout["columns"]], copy=False)
+    if layout["index"] is not None:
+        frame.index = pd.Index(read("rows.index", layout["index"][1]), name=layout["index"][0])
+    return frame
+
+#export the rows of a frame in a format (see FORMATS)
+def export(frame, path, rows=None, format="csv", size=CHUNK_ROWS):
+    if format not in FORMATS:
+        raise ValueError("unknown export format " + str(format))
+    return (write_csv if format == "csv" else write_columns)(frame, path, rows, size)
+
+
+#positions of the insider transactions between two dates of a type (None for any), in the order of the frame
+def insider_rows(insider, start=None, end=None, transaction=None):
+    keep = np.ones(len(insider), dtype=bool)
+    if start is not None or end is not None:
+        dates = pd.to_datetime(insider["Date"]).values
+        if start is not None:
+            keep &= dates >= np.datetime64(pd.Timestamp(start))
+        if end is not None:
+            keep &= dates <= np.datetime64(pd.Timestamp(end))
+    if transaction is not None:
+        keep &= (insider["Transaction"] == transaction).values
+    return np.flatnonzero(keep)
+
+
+#python export.py PATH [--rows N] prints the first rows of a columns export (a folder) or of a CSV export
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show an exported screen")
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=int, default=20)
+    args = parser.parse_args()
+
+    if os.path.isdir(args.path):
+        exported = read_columns(args.path)
+        print(exported.head(args.rows).to_string())
+        print(str(len(exported)) + " rows")
+    else:
+        print(pd.read_csv(args.path, nrows=args.rows).to_string())
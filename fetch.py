@@ -0,0 +1,251 @@
+# This Python file uses the following encoding: utf-8
+import io
+import time
+import random
+import threading
+from urllib.parse import urlparse
+
+#HTTP requests for the various websites
+import requests
+
+#pandas import for reading tables from the websites
+import pandas as pd
+
+#default policy values
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+#attempts after the first one and the exponential backoff between them (seconds)
+RETRIES = 3
+BACKOFF = 0.5
+BACKOFF_MAX = 10
+#consecutive failures that open the circuit of a host and for how long it stays open (seconds)
+FAILURES_TO_OPEN = 5
+OPEN_SECONDS = 120
+#time budget of a whole refresh (seconds)
+REFRESH_BUDGET = 8 * 3600
+#status codes worth retrying
+RETRY_STATUS = [429, 500, 502, 503, 504]
+
+#browser user agent, some of the websites refuse the default one of requests
+USER_AGENT = "Mozilla/5.0 (Windows NT 6.1; WOW64; rv:50.0) Gecko/20100101 Firefox/50.0"
+
+
+#base error of every failed fetch
+class FetchError(Exception):
+    pass
+
+#the host failed too many times in a row and is not contacted until its circuit closes again
+class CircuitOpenError(FetchError):
+    pass
+
+#the time budget of the refresh is used up
+class BudgetExceededError(FetchError):
+    pass
+
+
+#circuit breaker of a host: opens after some consecutive failures, lets a single trial call through after a while
+class CircuitBreaker:
+    def __init__(self, failures_to_open=FAILURES_TO_OPEN, open_seconds=OPEN_SECONDS):
+        self.failures_to_open = failures_to_open
+        self.open_seconds = open_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            #half open: let one call through and keep the circuit open for the others
+            if time.monotonic() - self.opened_at >= self.open_seconds:
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failures_to_open:
+                self.opened_at = time.monotonic()
+
+
+#common fetch policy of the loaders: timeouts, retries with jittered exponential backoff,
+#a circuit breaker per host and a time budget per refresh
+class FetchPolicy:
+    def __init__(self, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, retries=RETRIES, backoff=BACKOFF, backoff_max=BACKOFF_MAX, failures_to_open=FAILURES_TO_OPEN, open_seconds=OPEN_SECONDS):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.failures_to_open = failures_to_open
+        self.open_seconds = open_seconds
+        self.breakers = {}
+        self.lock = threading.Lock()
+        self.deadline = None
+        self.latencies = []
+        self.errors = 0
+        self.failed = []
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": USER_AGENT})
+
+    #start a refresh with a time budget in seconds (None for no budget), the statistics start over
+    def start_refresh(self, budget=None):
+        self.deadline = time.monotonic() + budget if budget is not None else None
+        self.latencies = []
+        self.errors = 0
+        self.failed = []
+
+    #seconds left in the refresh budget (None for no budget)
+    def remaining(self):
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    #circuit breaker of a host
+    def breaker(self, host):
+        with self.lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(self.failures_to_open, self.open_seconds)
+            return self.breakers[host]
+
+    #read timeout capped to what is left of the budget
+    def _read_timeout(self):
+        remaining = self.remaining()
+        if remaining is None:
+            return self.read_timeout
+        if remaining <= 0:
+            self.failed.append(("", "refresh time budget exceeded"))
+            raise BudgetExceededError("refresh time budget exceeded")
+        return min(self.read_timeout, remaining)
+
+    #run an attempt function with the retries, backoff and circuit breaker of a host
+    #the attempt returns a result or raises, retryable tells whether an error is worth another attempt
+    def _run(self, host, attempt, retryable):
+        breaker = self.breaker(host)
+        error = None
+        for n in range(self.retries + 1):
+            if not breaker.allow():
+                self.failed.append((host, "circuit open"))
+                raise CircuitOpenError("circuit open for " + host)
+            timeout = self._read_timeout()
+            start = time.monotonic()
+            try:
+                result = attempt(timeout)
+                breaker.success()
+                self.latencies.append(time.monotonic() - start)
+                return result
+            except Exception as e:
+                self.latencies.append(time.monotonic() - start)
+                self.errors += 1
+                error = e
+                #only network and server errors count against the host, a missing page means the host is fine
+                if not retryable(e):
+                    breaker.success()
+                    break
+                breaker.failure()
+                if n == self.retries:
+                    break
+            #full jitter exponential backoff, never sleeping past the budget
+            sleep = random.uniform(0, min(self.backoff_max, self.backoff * 2 ** n))
+            remaining = self.remaining()
+            if remaining is not None:
+                sleep = min(sleep, max(remaining, 0))
+            time.sleep(sleep)
+
+        #keep the fetches that failed for good so the refresh can report them
+        self.failed.append((host, str(error)))
+        if isinstance(error, FetchError):
+            raise error
+        raise FetchError(host + ": " + str(error)) from error
+
+    #GET a URL and return the response, HTTP errors are raised as FetchError
+    def get(self, url, **kwargs):
+        def attempt(timeout):
+            resp = self.session.get(url, timeout=(self.connect_timeout, timeout), **kwargs)
+            if resp.status_code >= 400:
+                raise FetchError("HTTP " + str(resp.status_code) + " for " + url)
+            return resp
+
+        def retryable(e):
+            if isinstance(e, FetchError):
+                return any(("HTTP " + str(code)) in str(e) for code in RETRY_STATUS)
+            return isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+        return self._run(urlparse(url).netloc, attempt, retryable)
+
+    #GET a URL and pass the decoded text chunks to consume as they arrive, returning what consume returns
+    #consume can stop early, the rest of the page is then never downloaded
+    def stream(self, url, consume, chunk_size=64 * 1024, **kwargs):
+        def attempt(timeout):
+            with self.session.get(url, timeout=(self.connect_timeout, timeout), stream=True, **kwargs) as resp:
+                if resp.status_code >= 400:
+                    raise FetchError("HTTP " + str(resp.status_code) + " for " + url)
+                if resp.encoding is None:
+                    resp.encoding = "utf-8"
+                return consume(resp.iter_content(chunk_size, decode_unicode=True))
+
+        def retryable(e):
+            if isinstance(e, FetchError):
+                return any(("HTTP " + str(code)) in str(e) for code in RETRY_STATUS)
+            return isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError))
+
+        return self._run(urlparse(url).netloc, attempt, retryable)
+
+    #read every table of a page (pd.read_html fetching the URL itself has no timeout)
+    def read_html(self, url, **kwargs):
+        return pd.read_html(io.StringIO(self.get(url, **kwargs).text))
+
+    #call a library function that does its own requests (yfinance, finvizfinance) with the policy of a host
+    #the call runs in a daemon thread so a hung connection is abandoned after the read timeout
+    def call(self, host, fn, *args, **kwargs):
+        def attempt(timeout):
+            result = {}
+
+            def run():
+                try:
+                    result["value"] = fn(*args, **kwargs)
+                except Exception as e:
+                    result["error"] = e
+
+            thread = threading.Thread(target=run, daemon=True)
+            thread.start()
+            thread.join(timeout)
+            if thread.is_alive():
+                raise FetchError(host + ": timed out after " + str(round(timeout, 1)) + "s")
+            if "error" in result:
+                raise result["error"]
+            return result["value"]
+
+        def retryable(e):
+            return isinstance(e, (FetchError, requests.exceptions.ConnectionError, requests.exceptions.Timeout, ConnectionError, TimeoutError))
+
+        return self._run(host, attempt, retryable)
+
+    #request count, error count and latency percentiles of the current refresh
+    def stats(self):
+        latencies = sorted(self.latencies)
+        if len(latencies) == 0:
+            return {"requests": 0, "errors": self.errors, "p50": None, "p99": None}
+        return {"requests": len(latencies), "errors": self.errors, "p50": latencies[int(0.50 * (len(latencies) - 1))], "p99": latencies[int(0.99 * (len(latencies) - 1))]}
+
+
+#policy shared by all the loaders
+policy = FetchPolicy()
+
+def get(url, **kwargs):
+    return policy.get(url, **kwargs)
+
+def stream(url, consume, chunk_size=64 * 1024, **kwargs):
+    return policy.stream(url, consume, chunk_size, **kwargs)
+
+def read_html(url, **kwargs):
+    return policy.read_html(url, **kwargs)
+
+def call(host, fn, *args, **kwargs):
+    return policy.call(host, fn, *args, **kwargs)
@@ -0,0 +1,144 @@
+# This Python file uses the following encoding: utf-8
+import os
+import json
+import argparse
+
+#pandas and numpy imports for data storage and manipulation
+import pandas as pd
+import numpy as np
+
+#dense ticker x date layout
+from panel import build_panel, panel_version
+
+#number of recent trading days the models are fitted to
+WINDOW = 60
+#number of trading days ahead that are forecasted
+HORIZON = 20
+#z score of the confidence bands (95%)
+Z = 1.96
+#smoothing factors of the level and the trend for the exponential smoothing
+ALPHA = 0.3
+BETA = 0.1
+#trading days in a year, used to annualize the slopes
+YEAR = 252
+#columns of the ranked table
+COLUMNS = ["Ticker", "Last", "Days", "Slope", "R2", "T_stat", "Smoothed", "Drift", "Lower", "Upper", "Strength", "Rank"]
+
+
+#files where the forecast of a market and the version of the prices it was computed from are stored
+def forecast_path(index):
+    return "Data/" + index + "_forecast.csv"
+
+def _version_path(index):
+    return "Data/" + index + "_forecast.json"
+
+#least squares line through the log closes of every ticker at once (missing days have weight 0)
+def _regression(y, w):
+    x = np.arange(y.shape[1], dtype=np.float64)[None, :]
+    y = np.where(w, y, 0)
+    n = w.sum(axis=1)
+    sx = (w * x).sum(axis=1)
+    sy = y.sum(axis=1)
+    sxx = (w * x * x).sum(axis=1)
+    sxy = (y * x).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d = n * sxx - sx * sx
+        slope = (n * sxy - sx * sy) / d
+        intercept = (sy - slope * sx) / n
+        fitted = intercept[:, None] + slope[:, None] * x
+        ss_res = (w * (y - fitted) ** 2).sum(axis=1)
+        ss_tot = (w * (y - (sy / n)[:, None]) ** 2).sum(axis=1)
+        r2 = 1 - ss_res / ss_tot
+        #standard error of the slope and its t statistic
+        stderr = np.sqrt(ss_res / (n - 2) / (sxx - sx * sx / n))
+        t_stat = slope / stderr
+    return slope, r2, t_stat
+
+#linear exponential smoothing (level and trend) of every ticker at once, missing days keep the previous state
+def _holt(y, w):
+    level = np.full(y.shape[0], np.nan)
+    trend = np.zeros(y.shape[0])
+    for j in range(y.shape[1]):
+        has = w[:, j]
+        start = has & np.isnan(level)
+        level[start] = y[start, j]
+        step = has & ~start
+        new_level = ALPHA * y[step, j] + (1 - ALPHA) * (level[step] + trend[step])
+        trend[step] = BETA * (new_level - level[step]) + (1 - BETA) * trend[step]
+        level[step] = new_level
+    return level, trend
+
+#fit the models to the last WINDOW days of every ticker in one pass and rank them by trend strength
+def compute_forecast(panel):
+    close = panel["Close"][:, -WINDOW:].astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        y = np.log(close)
+    w = np.isfinite(y)
+    y = np.where(w, y, np.nan)
+
+    slope, r2, t_stat = _regression(y, w)
+    level, trend = _holt(y, w)
+
+    #drift model: mean and deviation of the daily log returns over the window
+    returns = np.diff(y, axis=1)
+    with np.errstate(invalid="ignore"):
+        drift = np.nanmean(returns, axis=1)
+        sigma = np.nanstd(returns, axis=1, ddof=1)
+    last = pd.DataFrame(close.T).ffill().values[-1]
+
+    result = pd.DataFrame({
+        "Ticker": panel.tickers,
+        "Last": last,
+        "Days": w.sum(axis=1),
+        "Slope": np.expm1(slope * YEAR),
+        "R2": r2,
+        "T_stat": t_stat,
+        "Smoothed": np.exp(level + trend * HORIZON),
+        "Drift": last * np.exp(drift * HORIZON),
+        "Lower": last * np.exp(drift * HORIZON - Z * sigma * np.sqrt(HORIZON)),
+        "Upper": last * np.exp(drift * HORIZON + Z * sigma * np.sqrt(HORIZON))})
+
+    #trend strength: annualized slope weighted by how well the line fits, signed by the direction
+    result["Strength"] = result["Slope"] * result["R2"]
+    #tickers without enough days in the window are not ranked
+    result = result.loc[result["Days"] >= WINDOW // 2].dropna(subset=["Strength"])
+    result = result.sort_values(by=["Strength"], ascending=False).reset_index(drop=True)
+    result["Rank"] = np.arange(1, len(result) + 1)
+    return result
+
+#read the stored forecast of a market if it was computed from the given prices version
+def read_Forecast(index, version):
+    if not os.path.exists(forecast_path(index)) or not os.path.exists(_version_path(index)):
+        return None
+    with open(_version_path(index), "r") as f:
+        if json.load(f).get("version") != version:
+            return None
+    return pd.read_csv(forecast_path(index))
+
+#ranked trend strength table of a market, recomputed only when its prices changed
+def refresh_Forecast(index, stocks):
+    panel = build_panel(stocks, ["Close"])
+    version = panel_version(panel)
+    result = read_Forecast(index, version)
+    if result is None:
+        result = compute_forecast(panel)
+        result.to_csv(forecast_path(index), index=False)
+        with open(_version_path(index), "w") as f:
+            json.dump({"version": version, "window": WINDOW, "horizon": HORIZON}, f)
+    return result
+
+
+#python forecast.py [--market SP500] [--top 30] prints the stored trend strength ranking of a market
+#(it is brought up to date when the window or the server loads the data)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tickers of a market ranked by trend strength")
+    parser.add_argument("--market", default="SP500")
+    parser.add_argument("--top", type=int, default=30)
+    args = parser.parse_args()
+
+    if not os.path.exists(forecast_path(args.market)):
+        print("no forecast yet, it is computed when the window loads the data")
+    else:
+        table = pd.read_csv(forecast_path(args.market))
+        print(table.head(args.top).to_string(index=False, formatters={"Slope": "{:+.1%}".format, "R2": "{:.2f}".format, "T_stat": "{:.1f}".format, "Strength": "{:+.3f}".format}))
+        print(str(len(table)) + " tickers ranked")
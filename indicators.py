@@ -0,0 +1,210 @@
+# This Python file uses the following encoding: utf-8
+import os
+import json
+
+#pandas and numpy imports for data storage and manipulation
+import pandas as pd
+import numpy as np
+
+#dense ticker x date layout
+from panel import Panel, build_panel
+#versioned folders of the cached arrays
+import jobs
+
+#folder where the indicators are cached alongside the price data (a subfolder per version, see jobs.new_version)
+INDICATORS_DIR = "Data/indicators"
+
+#rolling window indicators (recomputed from a lookback of the window size)
+SMA_WINDOWS = [20, 50, 200]
+HIGH_LOW_WINDOWS = [20, 252]
+BOLLINGER_WINDOW = 20
+BOLLINGER_WIDTH = 2
+
+#recursive indicators (continued from the last stored value)
+EMA_SPANS = [12, 26]
+MACD_SIGNAL_SPAN = 9
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+
+#the longest rolling window decides how many days before the new data have to be read again
+LOOKBACK = max(SMA_WINDOWS + HIGH_LOW_WINDOWS + [BOLLINGER_WINDOW]) - 1
+
+#comparison operators usable in the screening predicates
+OPERATORS = {">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal, "==": np.equal, "!=": np.not_equal}
+
+
+#every indicator stored in the cache (the RSI averages are kept to continue the RSI later)
+def indicator_names():
+    names = ["SMA_%d" % n for n in SMA_WINDOWS] + ["EMA_%d" % n for n in EMA_SPANS]
+    names += ["RSI_%d" % RSI_PERIOD, "RSI_gain", "RSI_loss", "MACD", "MACD_signal", "MACD_hist"]
+    names += ["BB_upper", "BB_lower", "ATR_%d" % ATR_PERIOD]
+    names += ["High_%d" % n for n in HIGH_LOW_WINDOWS] + ["Low_%d" % n for n in HIGH_LOW_WINDOWS]
+    return names
+
+#rolling window statistic along the dates axis for all the tickers at once
+def _rolling(values, window, how):
+    rolled = getattr(pd.DataFrame(values.T).rolling(window, min_periods=window), how)()
+    return rolled.values.T
+
+#recursive exponential average along the dates axis for all the tickers at once
+#prev is the last value of each ticker before the first column (NaN to start from the first data point)
+def _recursive(values, alpha, prev):
+    out = np.full(values.shape, np.nan)
+    prev = prev.copy()
+    for j in range(values.shape[1]):
+        col = values[:, j]
+        has = ~np.isnan(col)
+        start = has & np.isnan(prev)
+        prev[start] = col[start]
+        step = has & ~start
+        prev[step] = alpha * col[step] + (1 - alpha) * prev[step]
+        out[has, j] = prev[has]
+    return out
+
+#last non NaN value of each row up to (not including) column end
+def _last_valid(values, end):
+    if end <= 0:
+        return np.full(values.shape[0], np.nan)
+    block = values[:, :end]
+    pos = np.where(~np.isnan(block), np.arange(end), -1).max(axis=1)
+    result = np.full(values.shape[0], np.nan)
+    found = pos >= 0
+    result[found] = block[found, pos[found]]
+    return result
+
+#compute every indicator for the columns [start, end) of the panel
+#old holds the previously stored indicators for the columns before start (None for a full computation)
+def _compute(panel, start, old=None):
+    close = panel["Close"].astype(np.float64)
+    high = panel["High"].astype(np.float64)
+    low = panel["Low"].astype(np.float64)
+    first = max(start - LOOKBACK, 0)
+    out = {}
+
+    #rolling indicators are computed with the lookback and trimmed to the new columns
+    c = close[:, first:]
+    for n in SMA_WINDOWS:
+        out["SMA_%d" % n] = _rolling(c, n, "mean")[:, start - first:]
+    std = _rolling(c, BOLLINGER_WINDOW, "std")[:, start - first:]
+    middle = out["SMA_%d" % BOLLINGER_WINDOW] if BOLLINGER_WINDOW in SMA_WINDOWS else _rolling(c, BOLLINGER_WINDOW, "mean")[:, start - first:]
+    out["BB_upper"] = middle + BOLLINGER_WIDTH * std
+    out["BB_lower"] = middle - BOLLINGER_WIDTH * std
+    for n in HIGH_LOW_WINDOWS:
+        out["High_%d" % n] = _rolling(high[:, first:], n, "max")[:, start - first:]
+        out["Low_%d" % n] = _rolling(low[:, first:], n, "min")[:, start - first:]
+
+    #recursive indicators are continued from the last stored value of each ticker
+    def prev(name):
+        return _last_valid(old[name], start) if old is not None else np.full(close.shape[0], np.nan)
+
+    c = close[:, start:]
+    for n in EMA_SPANS:
+        out["EMA_%d" % n] = _recursive(c, 2.0 / (n + 1), prev("EMA_%d" % n))
+    macd = out["EMA_%d" % EMA_SPANS[0]] - out["EMA_%d" % EMA_SPANS[1]]
+    out["MACD"] = macd
+    out["MACD_signal"] = _recursive(macd, 2.0 / (MACD_SIGNAL_SPAN + 1), prev("MACD_signal"))
+    out["MACD_hist"] = macd - out["MACD_signal"]
+
+    #previous close of each trading day (the close of the last day the ticker traded)
+    base = np.concatenate([_last_valid(close, first)[:, None], close[:, first:]], axis=1)
+    prev_close = pd.DataFrame(base.T).ffill().values.T[:, start - first:-1]
+    change = c - prev_close
+    gain = np.where(np.isnan(change), change, np.maximum(change, 0))
+    loss = np.where(np.isnan(change), change, np.maximum(-change, 0))
+    out["RSI_gain"] = _recursive(gain, 1.0 / RSI_PERIOD, prev("RSI_gain"))
+    out["RSI_loss"] = _recursive(loss, 1.0 / RSI_PERIOD, prev("RSI_loss"))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["RSI_%d" % RSI_PERIOD] = np.where(out["RSI_loss"] == 0, 100.0, 100 - 100 / (1 + out["RSI_gain"] / out["RSI_loss"]))
+    out["RSI_%d" % RSI_PERIOD][np.isnan(out["RSI_gain"])] = np.nan
+
+    h = high[:, start:]
+    l = low[:, start:]
+    true_range = np.fmax(h - l, np.fmax(np.abs(h - prev_close), np.abs(l - prev_close)))
+    true_range[np.isnan(c)] = np.nan
+    out["ATR_%d" % ATR_PERIOD] = _recursive(true_range, 1.0 / ATR_PERIOD, prev("ATR_%d" % ATR_PERIOD))
+
+    return {name: values.astype(np.float32) for (name, values) in out.items()}
+
+#per day checksums of the prices, used to find the first day that changed since the last computation
+def _checksums(panel):
+    sums = [np.nansum(panel[c], axis=0) for c in ["Close", "High", "Low"]]
+    sums.append((~np.isnan(panel["Close"])).sum(axis=0).astype(np.float64))
+    return np.vstack(sums)
+
+#compute the indicators for a whole panel
+def compute_indicators(panel):
+    return Panel(panel.tickers, panel.dates, _compute(panel, 0))
+
+#bring previously computed indicators up to date with a new panel, only the days from the first changed one are recomputed
+def update_indicators(old, old_checksums, panel):
+    same = old is not None and len(old.tickers) == len(panel.tickers) and (old.tickers == panel.tickers).all()
+    same = same and len(old.dates) <= len(panel.dates) and (old.dates == panel.dates[:len(old.dates)]).all()
+    if not same:
+        return compute_indicators(panel)
+
+    #first day whose prices are different from the ones the stored indicators were computed from
+    checksums = _checksums(panel)[:, :len(old.dates)]
+    changed = np.flatnonzero(~np.isclose(checksums, old_checksums, equal_nan=True).all(axis=0))
+    start = changed[0] if len(changed) > 0 else len(old.dates)
+    if start == len(panel.dates):
+        return old
+
+    tail = _compute(panel, start, old.data)
+    data = {name: np.concatenate([old[name][:, :start], tail[name]], axis=1) for name in tail}
+    return Panel(panel.tickers, panel.dates, data)
+
+#read the cached indicators (memory mapped) and the checksums they were computed from
+def read_Indicators(path=INDICATORS_DIR):
+    folder = jobs.current_folder(path)
+    if folder is None:
+        return None, None
+    with open(os.path.join(folder, "meta.json"), "r") as f:
+        meta = json.load(f)
+    if sorted(meta["names"]) != sorted(indicator_names()):
+        return None, None
+
+    tickers = np.load(os.path.join(folder, "tickers.npy"), allow_pickle=False)
+    dates = pd.to_datetime(np.load(os.path.join(folder, "dates.npy")))
+    checksums = np.load(os.path.join(folder, "checksums.npy"))
+    data = {name: np.load(os.path.join(folder, name + ".npy"), mmap_mode="r") for name in meta["names"]}
+    return Panel(tickers, dates, data), checksums
+
+#store the indicators and the checksums of the prices they were computed from
+#every store is a new version of the folder, the arrays of the previous one may still be memory mapped (e.g. by the screener)
+def store_Indicators(indicators, checksums, path=INDICATORS_DIR):
+    tmp, number = jobs.new_version(path)
+    for name in indicators.data:
+        np.save(os.path.join(tmp, name + ".npy"), np.asarray(indicators[name]))
+    np.save(os.path.join(tmp, "tickers.npy"), indicators.tickers.astype(str))
+    np.save(os.path.join(tmp, "dates.npy"), indicators.dates.values.astype("datetime64[ns]"))
+    np.save(os.path.join(tmp, "checksums.npy"), checksums)
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({"names": list(indicators.data)}, f)
+    jobs.publish_version(path, tmp, number)
+
+#bring the cached indicators up to date with the stocks data and return them
+#an already built panel of the stocks (e.g. the memory mapped price cube) can be passed to skip building one
+def refresh_Indicators(stocks, panel=None):
+    if panel is None:
+        panel = build_panel(stocks, ["High", "Low", "Close"])
+    old, old_checksums = read_Indicators()
+    indicators = update_indicators(old, old_checksums, panel)
+    if indicators is not old:
+        store_Indicators(indicators, _checksums(panel))
+    return indicators
+
+#values of an indicator or of a price column for the rows of a stocks frame
+def _values(indicators, stocks, name):
+    if name in indicators.data:
+        dates = stocks.index if "Date" not in stocks.columns else stocks["Date"]
+        return indicators.lookup(name, stocks["Name"].values, dates)
+    #the stocks loaders rename the daily close to Close_x when merging the quarterly sums
+    return stocks[name if name in stocks.columns else name + "_x"].values
+
+#screening predicate over the indicators for the rows of a stocks frame (Date index, Name column)
+#left and right are the names of indicators or price columns, right can also be a number
+def indicator_mask(indicators, stocks, left, op, right):
+    values = _values(indicators, stocks, left)
+    other = _values(indicators, stocks, right) if isinstance(right, str) else right
+    with np.errstate(invalid="ignore"):
+        return OPERATORS[op](values, other)
@@ -0,0 +1,124 @@
+# This Python file uses the following encoding: utf-8
+import os
+import sys
+import time
+import tracemalloc
+
+#pandas and numpy imports for data storage and manipulation
+import pandas as pd
+import numpy as np
+
+#memory the parsed chunk of a file is allowed to use (bytes)
+CHUNK_BUDGET = 16 * 1024 * 1024
+#a parsed row takes about this many times its text (object columns, parser buffers)
+PARSE_FACTOR = 4
+
+#columns kept from the stocks files and their in-memory types (the dates are parsed while reading)
+STOCKS_SCHEMA = {"Date": "datetime64[ns]", "Open": "float64", "High": "float64", "Low": "float64", "Close_x": "float64", "Adj Close": "float64", "Volume": "int64",
+                 "Name": "object", "Close_change": "float64", "year": "int16", "Q": "int8", "Close_y": "float64"}
+#columns kept from the insider files (the unnamed index column is dropped)
+INSIDER_SCHEMA = {"Insider Trading": "object", "Relationship": "object", "Date": "datetime64[ns]", "Transaction": "object", "Cost": "float64", "#Shares": "float64", "Value ($)": "float64",
+                  "#Shares Total": "float64", "SEC Form 4": "object", "Insider_id": "int64", "Ticker": "object"}
+
+
+#number of data rows of a CSV file, counted on raw blocks without parsing
+def _count_rows(path):
+    lines = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)
+
+#rows per chunk so that a parsed chunk stays within the budget
+def _chunk_rows(path, rows, budget):
+    if rows == 0:
+        return 1
+    line = os.path.getsize(path) / (rows + 1)
+    return max(1000, int(budget / (line * PARSE_FACTOR)))
+
+#strings of a chunk as objects shared with the previous chunks (a ticker name is stored once, not once per row)
+def _pooled(values, pool):
+    codes, uniques = pd.factorize(values)
+    shared = np.array([pool.setdefault(u, u) for u in uniques] + [np.nan], dtype=object)
+    return shared[codes]
+
+#read a CSV file in bounded chunks with an explicit schema straight into preallocated columns
+#stats (a dict) gets the rows, chunks, seconds, final size and traced peak memory of the load
+def read_csv(path, schema, index=None, budget=CHUNK_BUDGET, stats=None):
+    start = time.perf_counter()
+    tracing = stats is not None and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+
+    header = pd.read_csv(path, nrows=0).columns
+    columns = [c for c in schema if c in header]
+    rows = _count_rows(path)
+    chunk_rows = _chunk_rows(path, rows, budget)
+
+    #the numbers are parsed as floats and narrowed into their columns, the strings are pooled
+    dtypes = {c: ("float64" if schema[c] not in ["object", "datetime64[ns]"] else "object") for c in columns if schema[c] != "datetime64[ns]"}
+    dates = [c for c in columns if schema[c] == "datetime64[ns]"]
+    data = {c: np.empty(rows, dtype=schema[c]) for c in columns}
+    pools = {c: {} for c in columns if schema[c] == "object"}
+
+    filled = 0
+    chunks = 0
+    for chunk in pd.read_csv(path, usecols=columns, dtype=dtypes, parse_dates=dates, chunksize=chunk_rows):
+        n = len(chunk)
+        for c in columns:
+            values = chunk[c].values
+            if c in pools:
+                values = _pooled(values, pools[c])
+            elif schema[c] == "datetime64[ns]":
+                values = pd.DatetimeIndex(chunk[c]).values.astype("datetime64[ns]")
+            elif np.issubdtype(data[c].dtype, np.integer) and np.isnan(values).any():
+                #missing values don't fit an integer column (a volume or id left empty), it is widened once
+                data[c] = data[c].astype(np.float64)
+            data[c][filled:filled+n] = values
+        filled += n
+        chunks += 1
+
+    frame = pd.DataFrame({c: data[c][:filled] for c in columns}, columns=columns, copy=False)
+    if index is not None:
+        frame = frame.set_index(index)
+
+    if stats is not None:
+        stats["rows"] = filled
+        stats["chunks"] = chunks
+        stats["seconds"] = time.perf_counter() - start
+        stats["bytes"] = int(frame.memory_usage(deep=True).sum())
+        if tracing:
+            stats["peak"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return frame
+
+#stocks file of a market, indexed by date like the downloaded frames
+def read_stocks_csv(path, budget=CHUNK_BUDGET, stats=None):
+    return read_csv(path, STOCKS_SCHEMA, "Date", budget, stats)
+
+#insider file of a market
+def read_insider_csv(path, budget=CHUNK_BUDGET, stats=None):
+    return read_csv(path, INSIDER_SCHEMA, None, budget, stats)
+
+
+#compare the streaming load of files with a plain pd.read_csv: python ingest.py FILE...
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        schema = INSIDER_SCHEMA if path.endswith("_insider.csv") else STOCKS_SCHEMA
+        stats = {}
+        read_csv(path, schema, "Date" if schema is STOCKS_SCHEMA else None, stats=stats)
+
+        tracemalloc.start()
+        begin = time.perf_counter()
+        plain = pd.read_csv(path)
+        seconds = time.perf_counter() - begin
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        print(path + ": " + str(stats["rows"]) + " rows in " + str(stats["chunks"]) + " chunks")
+        print("  streaming: " + "{:.2f}".format(stats["seconds"]) + " s, peak " + "{:.1f}".format(stats["peak"] / 2**20) + " MB, final " + "{:.1f}".format(stats["bytes"] / 2**20) + " MB")
+        print("  read_csv:  " + "{:.2f}".format(seconds) + " s, peak " + "{:.1f}".format(peak / 2**20) + " MB, final " + "{:.1f}".format(plain.memory_usage(deep=True).sum() / 2**20) + " MB")
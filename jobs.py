@@ -0,0 +1,206 @@
+# This Python file uses the following encoding: utf-8
+import os
+import json
+import time
+import uuid
+import shutil
+import datetime
+from contextlib import contextmanager
+
+#pandas import for storing the data frames of the units
+import pandas as pd
+
+#folder where the checkpoints of the running jobs are kept
+JOBS_DIR = "Data/jobs"
+#file naming the refresh the checkpoints belong to, and the hours after which an interrupted refresh is started over
+RUN_FILE = "run.json"
+RUN_HOURS = 24
+
+
+#open a file for writing that only replaces the real one once it has been written completely
+#(a crash while writing leaves the old file untouched)
+@contextmanager
+def atomic_file(path, mode="w"):
+    tmp = path + ".tmp"
+    f = open(tmp, mode, newline="") if "b" not in mode else open(tmp, mode)
+    try:
+        yield f
+        f.close()
+        os.replace(tmp, path)
+    except BaseException:
+        f.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+#write a data frame to a CSV file atomically
+def write_csv(df, path, **kwargs):
+    with atomic_file(path) as f:
+        df.to_csv(f, **kwargs)
+
+#append rows to a CSV file in the column order of its header (written whole when there is no file yet)
+#a failed append cuts the file back to its old size, so it never ends in half a row
+def append_csv(df, path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        write_csv(df, path)
+        return
+    if len(df) == 0:
+        return
+    header = pd.read_csv(path, nrows=0).columns
+    text = df.reindex(columns=header[1:]).to_csv(header=False)
+    size = os.path.getsize(path)
+    with open(path, "a", newline="") as f:
+        try:
+            f.write(text)
+            f.flush()
+        except BaseException:
+            f.truncate(size)
+            raise
+
+#rows of a previously written CSV that belong to the given keys (read in chunks, the file can be large)
+#a refresh where some tickers fail keeps their previous rows instead of dropping their history
+def previous_rows(path, column, keys, chunksize=200000, **kwargs):
+    keys = set(keys)
+    if len(keys) == 0 or not os.path.exists(path):
+        return pd.DataFrame()
+    try:
+        parts = [chunk.loc[chunk[column].isin(keys)] for chunk in pd.read_csv(path, chunksize=chunksize, **kwargs)]
+    except (ValueError, KeyError, pd.errors.ParserError):
+        return pd.DataFrame()
+    parts = [part for part in parts if len(part) > 0]
+    return pd.concat(parts, sort=False) if len(parts) > 0 else pd.DataFrame()
+
+
+#folders of memory mapped files are never replaced in place (a mapped file can't be replaced or removed on Windows):
+#every version is written to a subfolder of its own and current.json names the one to read
+#folder of the current version of a versioned folder (None when there is none)
+def current_folder(path):
+    current = _current_version(path)
+    return os.path.join(path, current["folder"]) if current is not None else None
+
+def _current_version(path):
+    if not os.path.exists(os.path.join(path, "current.json")):
+        return None
+    with open(os.path.join(path, "current.json"), "r") as f:
+        return json.load(f)
+
+#empty folder the next version of a versioned folder is written to, returns it and the number of the version
+def new_version(path):
+    os.makedirs(path, exist_ok=True)
+    current = _current_version(path)
+    number = current["number"] + 1 if current is not None else 1
+    tmp = os.path.join(path, "v" + str(number) + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    return tmp, number
+
+#make a version written to the folder given by new_version the current one and remove the others
+#(a version still mapped by a reader can't be removed on Windows, it is removed by a later version)
+def publish_version(path, tmp, number):
+    folder = "v" + str(number)
+    shutil.rmtree(os.path.join(path, folder), ignore_errors=True)
+    os.replace(tmp, os.path.join(path, folder))
+    with atomic_file(os.path.join(path, "current.json")) as f:
+        json.dump({"folder": folder, "number": number}, f)
+    for old in os.listdir(path):
+        if old == folder or old == "current.json":
+            continue
+        if os.path.isdir(os.path.join(path, old)):
+            shutil.rmtree(os.path.join(path, old), ignore_errors=True)
+        else:
+            try:
+                os.remove(os.path.join(path, old))
+            except OSError:
+                pass
+
+
+#refresh the checkpoints are written for: {"id", "day", "started"} (None when there is none)
+def _read_run(root):
+    path = os.path.join(root, RUN_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+#start a refresh: the one an interrupted refresh left is resumed (even after midnight) while some of its checkpoints are
+#left and it started less than RUN_HOURS ago, otherwise a new one is started
+#the checkpoints are keyed on its id and its downloads end on its day (the day it first started)
+def start_run(root=JOBS_DIR):
+    run = _read_run(root)
+    left = os.path.isdir(root) and any(os.path.isdir(os.path.join(root, name)) for name in os.listdir(root))
+    if run is not None and left and time.time() - run["started"] < RUN_HOURS * 3600:
+        return run
+    run = {"id": uuid.uuid4().hex, "day": str(datetime.date.today()), "started": time.time()}
+    os.makedirs(root, exist_ok=True)
+    with atomic_file(os.path.join(root, RUN_FILE)) as f:
+        json.dump(run, f)
+    return run
+
+#refresh the jobs are part of (the last one started, or a new one)
+def current_run(root=JOBS_DIR):
+    run = _read_run(root)
+    return run if run is not None else start_run(root)
+
+
+#refresh job split in units (tickers, pages...), the result of every finished unit is persisted right away
+#so a job started again after a crash skips the units it already finished
+class Job:
+    def __init__(self, name, params=None, root=JOBS_DIR):
+        self.name = name
+        self.path = os.path.join(root, name)
+        self.params = params
+
+        #a checkpoint left by a job with other parameters (e.g. another start date) can't be resumed
+        meta = os.path.join(self.path, "job.json")
+        if os.path.exists(meta):
+            with open(meta, "r") as f:
+                if json.load(f).get("params") != params:
+                    shutil.rmtree(self.path, ignore_errors=True)
+        if not os.path.exists(meta):
+            os.makedirs(self.path, exist_ok=True)
+            with atomic_file(meta) as f:
+                json.dump({"name": name, "params": params}, f)
+
+    #file of a unit (the unit names are tickers or page numbers, made safe for file names)
+    def _unit_file(self, unit, ext):
+        safe = "".join(ch if ch.isalnum() or ch in "-_" else "_" + str(ord(ch)) + "_" for ch in str(unit))
+        return os.path.join(self.path, "u_" + safe + ext)
+
+    #whether a unit has been finished already
+    def done(self, unit):
+        return os.path.exists(self._unit_file(unit, ".pkl")) or os.path.exists(self._unit_file(unit, ".json"))
+
+    #number of finished units
+    def count(self):
+        return len([f for f in os.listdir(self.path) if f.startswith("u_") and not f.endswith(".tmp")])
+
+    #persist the result of a unit and mark it as finished (data frames are pickled, the rest is stored as JSON)
+    def complete(self, unit, value):
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            with atomic_file(self._unit_file(unit, ".pkl"), "wb") as f:
+                pd.to_pickle(value, f)
+        else:
+            with atomic_file(self._unit_file(unit, ".json")) as f:
+                json.dump(value, f)
+
+    #stored result of a finished unit
+    def result(self, unit):
+        if os.path.exists(self._unit_file(unit, ".pkl")):
+            return pd.read_pickle(self._unit_file(unit, ".pkl"))
+        with open(self._unit_file(unit, ".json"), "r") as f:
+            return json.load(f)
+
+    #results of the given units in order (units that were not finished are left out)
+    def results(self, units):
+        return [self.result(unit) for unit in units if self.done(unit)]
+
+    #units that are not finished (e.g. downloads that failed and are tried again by a resumed job)
+    def missing(self, units):
+        return [unit for unit in units if not self.done(unit)]
+
+    #the job finished and its output was written, the checkpoint is not needed anymore
+    #(it is kept while some units are missing, so the next refresh only tries those again)
+    def finish(self, units=None):
+        if units is not None and len(self.missing(units)) > 0:
+            return
+        shutil.rmtree(self.path, ignore_errors=True)
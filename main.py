@@ -1,10 +1,12 @@
 # This Python file uses the following encoding: utf-8
 import sys
 import os
+import time
+import threading
 
 #Qt imports
-from PySide2.QtWidgets import QApplication, QMainWindow, QTableWidgetItem, QListWidgetItem, QMessageBox, QProgressDialog
-from PySide2.QtCore import QFile, QDate, Qt
+from PySide2.QtWidgets import QApplication, QMainWindow, QTableWidgetItem, QListWidgetItem, QMessageBox, QProgressDialog, QInputDialog, QFileDialog, QCheckBox
+from PySide2.QtCore import QFile, QDate, Qt, QObject, Signal
 from PySide2.QtUiTools import QUiLoader
 from PySide2.QtGui import QDoubleValidator, QBrush, QColor, QIcon
 
@@ -42,6 +44,7 @@ from pytrends.request import TrendReq
 import pytrends
 
 #HTTP requests for the various API modules
+import io
 import requests
 import requests_html
 import urllib.request
@@ -52,6 +55,69 @@ import unicodedata
 #BeautifulSoup import for reading tables from some of the websites
 from bs4 import BeautifulSoup
 
+#quarterly and yearly rollup tables for the period-level screens
+import rollups
+#technical indicators computed over all the tickers at once
+import indicators
+#trend forecasts fitted to all the tickers of a market at once
+import forecast
+#composable screens compiled to a single pass over the stocks
+import screen
+#co-movement of the daily returns between tickers
+import correlation
+#memory mapped dense price cube
+import cube
+#timeouts, retries and circuit breaking for every download
+import fetch
+#checkpointed refresh jobs that resume where they stopped
+import jobs
+
+#background refresh of the stalest tickers while the window is open
+import scheduler
+
+#indexed SQLite store of the ticker lists, EPS and insider transactions
+import database
+
+#EPS history extraction from the analysis pages
+import earnings
+
+#clustered insider buys
+import clusters
+
+#chunked loading of the stocks and insider files
+import ingest
+
+#client of the screening server (python main.py --client URL)
+import remote
+
+#warm start from the prepared data of the last run
+import snapshot
+
+#price chart of a ticker with level of detail
+import chart
+
+#live quotes of the tickers on screen
+import quotes
+
+#watchlists and saved screens with their alerts
+import watchlists
+
+#sector of every ticker and the daily aggregates of every sector
+import sectors
+#returns after the insider transactions and the track records of the insiders
+import events
+#export of the results to CSV files and column folders in bounded chunks
+import export
+#change feed of what every refresh changed in the prices, EPS and insider transactions
+import changes
+
+#signals of the background refresh, of the live quotes and of the peers search, emitted from their threads and delivered in the GUI thread
+class RefreshEvents(QObject):
+    #alerts of the saved screens once the combined data was rebuilt after a background refresh
+    refreshed = Signal(list)
+    ticked = Signal(dict)
+    peers = Signal(str, str, object)
+
 #Main Window Class
 class StockScreener(QMainWindow):
     #initialize window
@@ -82,11 +148,38 @@ class StockScreener(QMainWindow):
         self.ui.yearButton.clicked.connect(self.yq_on)
         #quarter button signal
         self.ui.quarterButton.clicked.connect(self.yq_off)
+        #cluster buys button signal
+        self.ui.clustersButton.clicked.connect(self.cl_toggle)
 
         #buys/sells control variable
         self.buys_sells = None
         #year/quarter control variable
         self.year_quarter = None
+        #cluster buys control variable
+        self.clusters = False
+
+        #refreshed data from the background scheduler
+        self.events = RefreshEvents()
+        self.events.refreshed.connect(self.dataRefreshed)
+
+        #live button signal, the quotes are polled while it is active
+        self.ui.liveButton.clicked.connect(self.live_toggle)
+        self.events.ticked.connect(self.liveTicked)
+        #peers found by the thread of a double click on a Top10 row
+        self.events.peers.connect(self.showPeersFound)
+        #markets whose peers are being searched
+        self.peers_running = set()
+        #save screen and watch button signals
+        self.ui.saveScreenButton.clicked.connect(self.saveScreen)
+        self.ui.watchButton.clicked.connect(self.watchTickers)
+        #export button signal
+        self.ui.exportButton.clicked.connect(self.exportResults)
+        #quote poller (None when live mode is off)
+        self.live = None
+        #stock results on the page, in the order of the results list (None when the list shows something else)
+        self.shown = None
+        #frame of the results and their row positions in it (None for the whole frame), what the export button writes
+        self.exported = None
 
 
         #########################
@@ -94,6 +187,12 @@ class StockScreener(QMainWindow):
         #########################
         #tab widget signal
         self.ui.Top10.currentChanged.connect(self.updateTop10)
+        #double clicking a ticker in a table shows the tickers that move together with it
+        self.ui.GSPCTab.cellDoubleClicked.connect(lambda row, column: self.showPeers("SP500", self.ui.GSPCTab, row))
+        self.ui.DJITab.cellDoubleClicked.connect(lambda row, column: self.showPeers("DJI", self.ui.DJITab, row))
+        self.ui.IXICTab.cellDoubleClicked.connect(lambda row, column: self.showPeers("IXIC", self.ui.IXICTab, row))
+        self.ui.NYATab.cellDoubleClicked.connect(lambda row, column: self.showPeers("NYA", self.ui.NYATab, row))
+        self.ui.RUTTab.cellDoubleClicked.connect(lambda row, column: self.showPeers("Russell2000", self.ui.RUTTab, row))
 
         ##################################
         #Setup the tables inside each tab#
@@ -253,6 +352,11 @@ class StockScreener(QMainWindow):
         #Previous Page
         self.ui.prevPage.clicked.connect(self.updateResults2)
 
+        #double clicking a result shows the price chart of its ticker
+        self.ui.resultsList.itemDoubleClicked.connect(self.showChart)
+        #chart window (created the first time a chart is shown)
+        self.chart = None
+
         #Number of results per page
         self.n = 20000 #chunk row size
         #Execute a results filter to update the list and various elements
@@ -333,6 +437,39 @@ class StockScreener(QMainWindow):
         self.filterInsiders()
 
 
+    #execute when cluster buys button is clicked
+    def cl_toggle(self):
+        #switch between the cluster buys ranking and the insider transactions
+        self.clusters = not self.clusters
+        #update the button colors
+        self.update_button_state()
+        #filter the insider transactions results according to the selection
+        self.filterInsiders()
+
+
+    #execute when live button is clicked
+    def live_toggle(self):
+        #start polling the quotes of the tickers on screen, or stop
+        if self.live is None:
+            self.live = quotes.QuotePoller(self.events.ticked.emit)
+            self.live.start()
+            self.watchLive()
+            self.ui.liveButton.setStyleSheet("background-color: #e04040; color: #fff;")
+            self.ui.statusbar.showMessage("Live quotes on")
+        else:
+            self.live.stop()
+            self.live = None
+            #the results and the combined data go back to the stored prices
+            live_prices.clear()
+            if rebuilder is not None:
+                rebuilder.push({"live": []})
+            if hasattr(self, "list_df"):
+                self.page -= 1
+                self.updateResults()
+            self.ui.liveButton.setStyleSheet("background-color: none; color: none;")
+            self.ui.statusbar.showMessage("Live quotes off")
+
+
     #update the insider transactions buttons states
     def update_button_state(self):
         #if the buys button is active
@@ -369,6 +506,12 @@ class StockScreener(QMainWindow):
             self.ui.quarterButton.setStyleSheet("background-color: none; color: none;")
             self.year_quarter = None
 
+        #if the cluster buys button is active
+        if self.clusters:
+            self.ui.clustersButton.setStyleSheet("background-color: #f0932a; color: #fff;")
+        else:
+            self.ui.clustersButton.setStyleSheet("background-color: none; color: none;")
+
 
     ############
     #Top10 Tabs#
@@ -407,7 +550,7 @@ class StockScreener(QMainWindow):
 
                 newItem = QTableWidgetItem(self.tr(row["topic_name"]))
                 self.ui.GSPCTab.setItem(index + 1, 1, newItem)
-                newItem = QTableWidgetItem(self.tr(row["topic_type"]))
+                newItem = QTableWidgetItem(self.tr(sector_names.get(ticker, row["topic_type"])))
                 self.ui.GSPCTab.setItem(index + 1, 2, newItem)
 
         #same as previous, but for the second tab
@@ -439,7 +582,7 @@ class StockScreener(QMainWindow):
 
                 newItem = QTableWidgetItem(self.tr(row["topic_name"]))
                 self.ui.DJITab.setItem(index + 1, 1, newItem)
-                newItem = QTableWidgetItem(self.tr(row["topic_type"]))
+                newItem = QTableWidgetItem(self.tr(sector_names.get(ticker, row["topic_type"])))
                 self.ui.DJITab.setItem(index + 1, 2, newItem)
 
         #same as previous, but for the third tab
@@ -467,7 +610,7 @@ class StockScreener(QMainWindow):
 
                 newItem = QTableWidgetItem(self.tr(row["topic_name"]))
                 self.ui.IXICTab.setItem(index + 1, 1, newItem)
-                newItem = QTableWidgetItem(self.tr(row["topic_type"]))
+                newItem = QTableWidgetItem(self.tr(sector_names.get(ticker, row["topic_type"])))
                 self.ui.IXICTab.setItem(index + 1, 2, newItem)
 
         #same as previous, but for the fourth tab
@@ -495,7 +638,7 @@ class StockScreener(QMainWindow):
 
                 newItem = QTableWidgetItem(self.tr(row["topic_name"]))
                 self.ui.NYATab.setItem(index + 1, 1, newItem)
-                newItem = QTableWidgetItem(self.tr(row["topic_type"]))
+                newItem = QTableWidgetItem(self.tr(sector_names.get(ticker, row["topic_type"])))
                 self.ui.NYATab.setItem(index + 1, 2, newItem)
 
         #same as previous, but for the fifth tab
@@ -523,43 +666,98 @@ class StockScreener(QMainWindow):
 
                 newItem = QTableWidgetItem(self.tr(row["topic_name"]))
                 self.ui.RUTTab.setItem(index + 1, 1, newItem)
-                newItem = QTableWidgetItem(self.tr(row["topic_type"]))
+                newItem = QTableWidgetItem(self.tr(sector_names.get(ticker, row["topic_type"])))
                 self.ui.RUTTab.setItem(index + 1, 2, newItem)
 
 
 
-    #filter the results list according to the selected parameters
-    def filterResults(self):
+    #show the tickers of the market whose daily returns are most correlated with the ticker in a Top10 table row
+    def showPeers(self, index, table, row):
+        #the ticker is in the last column, N/A when the topic didn't match a ticker
+        item = table.item(row, 3)
+        if item is None or item.text() in ["", "N/A", "Ticker"]:
+            return
+
+        stocks = {"SP500": SP500_stocks, "DJI": DJI_stocks, "IXIC": IXIC_stocks, "NYA": NYA_stocks, "Russell2000": Russell2000_stocks}[index]
+        if len(stocks) == 0 or index in self.peers_running:
+            return
+        #the correlation matrix of the market (cached until its prices change) is computed in a thread, the window stays responsive
+        self.peers_running.add(index)
+        self.ui.statusbar.showMessage("Finding the peers of " + item.text() + "...")
+        threading.Thread(target=self.findPeers, args=(index, stocks, item.text()), daemon=True).start()
+
+    #thread of showPeers, the peers (None when they couldn't be computed) are shown in the GUI thread
+    def findPeers(self, index, stocks, ticker):
+        peers = None
+        try:
+            tickers, matrix = correlation.refresh_Correlation(index, stocks)
+            peers = correlation.neighbours(tickers, matrix, ticker, 10)
+        finally:
+            self.events.peers.emit(index, ticker, peers)
+
+    #list the peers found in a message box
+    def showPeersFound(self, index, ticker, peers):
+        self.peers_running.discard(index)
+        self.ui.statusbar.clearMessage()
+        msgBox = QMessageBox(self)
+        msgBox.setIcon(QMessageBox.Information)
+        msgBox.setWindowTitle("Peers of " + ticker)
+        if peers is not None and len(peers) > 0:
+            msgBox.setText("\n".join(str(peer["Ticker"]) + "\t" + "{:.4f}".format(peer["Correlation"]) for _, peer in peers.iterrows()))
+        else:
+            msgBox.setText("No Peers for " + ticker)
+        msgBox.exec_()
+
+
+    #show the price chart of the ticker of a results list line, around the date of the line
+    def showChart(self, item):
+        #the ticker is the last field of every kind of line, the date is the first one (or the end of a cluster)
+        fields = [field.strip() for field in item.text().split("\t")]
+        if len(fields) < 2:
+            return
+        ticker = fields[-1]
+        focus = None
+        for field in [fields[0], fields[-2]]:
+            if len(field) >= 10 and field[4] == "-" and field[7] == "-":
+                focus = pd.Timestamp(field[:10])
+                break
+
+        levels = chart.levels_for(ticker, price_cube, stocks_final, data_version)
+        if levels is None:
+            self.ui.statusbar.showMessage("No prices for " + ticker)
+            return
+        if self.chart is None:
+            self.chart = chart.ChartPanel(self)
+        self.chart.plot(ticker, levels, focus)
+
+
+    #dates and boxes of the window: start, end, price, sales and eps (None for an empty box)
+    def formValues(self):
         #get the start date from the start date edit
         start = datetime.datetime(self.ui.startDate.date().year(),self.ui.startDate.date().month(),self.ui.startDate.date().day()).strftime("%Y-%m-%d")
         #get the end date from the end date edit
         end = datetime.datetime(self.ui.endDate.date().year(),self.ui.endDate.date().month(),self.ui.endDate.date().day()).strftime("%Y-%m-%d")
 
-        #apply the date filter to the stocks list
-        filter_stocks = stocks_final.loc[stocks_final.index.to_series().between(start, end)]
-
-        #if the text in the price line edit is not empty then filter by the price as well
-        if not self.ui.price.text() is "":
-            #compare the price in the input to the price in the stocks list
-            price_filter = (round(filter_stocks["Close_change"], 4) * 100 == float(self.ui.price.text()))
-            #filter the stocks list by this comparison
-            filter_stocks = filter_stocks.loc[price_filter]
-
-        #if the text in the sales line edit is not empty then filter by the sales as well
-        if not self.ui.sales.text() in "":
-            #compare the sales in the input to the sales in the stocks list
-            quarter_filter = (round(filter_stocks["Close_y"], 4) * 100 == float(self.ui.sales.text()))
-            #filter the stocks list by this comparison
-            filter_stocks = filter_stocks.loc[quarter_filter]
-
-        #if the text in the eps line edit is not empty then filter by the eps as well
-        if not self.ui.eps.text() in "":
-            #merge the stocks list with the eps list for each ticker and store in a temporary variable
-            tmp = pd.merge(filter_stocks, full_tickersEPS, on='Name', how='left').set_index(filter_stocks.index)
-            #compare the eps in the input to the eps in the temporary list
-            eps_filter = (tmp["EPS"] == str(round((float(self.ui.eps.text()) / 100), 4)))
-            #filter the stocks list by this comparison
-            filter_stocks = filter_stocks.loc[eps_filter]
+        #build the screen from the input fields, the empty boxes don't filter
+        price = self.ui.price.text() if not self.ui.price.text() in "" else None
+        sales = self.ui.sales.text() if not self.ui.sales.text() in "" else None
+        eps = self.ui.eps.text() if not self.ui.eps.text() in "" else None
+        return start, end, price, sales, eps
+
+
+    #filter the results list according to the selected parameters
+    def filterResults(self):
+        start, end, price, sales, eps = self.formValues()
+
+        #run every filter in a single pass over the stocks list (or over the cached result of a wider filter)
+        if client is not None:
+            filter_stocks = client.screen(start, end, price, sales, eps)
+            self.exported = (filter_stocks, None)
+        else:
+            rows = filter_cache.rows(screener, screen.form_query(start, end, price, sales, eps))
+            filter_stocks = screener.stocks.iloc[rows]
+            #the export reads the rows of the result from the stocks list, a chunk at a time
+            self.exported = (screener.stocks, rows)
 
         #split the filtered stocks by blocks of length self.n (20000 by default) and store in a final variable for printing
         self.list_df = [filter_stocks[i:i+self.n] for i in range(0,filter_stocks.shape[0],self.n)]
@@ -574,11 +772,15 @@ class StockScreener(QMainWindow):
 
     #filter the insiders list according to the selected parameters
     def filterInsiders(self):
+        #the filters are pushed down to the insider store, only the matching rows are read
+        start = None
+        transaction = None
+
         #if either year or quarter is selected
         if not self.year_quarter is None:
-            #if the year is selected then do no filtering because the full data is for the last year
+            #if the year is selected filter the data up to the last year
             if self.year_quarter:
-                filter_stocks = insider_final
+                start = datetime.datetime(datetime.date.today().year - 1, datetime.date.today().month, min(datetime.date.today().day, 28)).strftime("%Y-%m-%d")
             #if the quarter is selected filter the data up to the last 3 months
             else:
                 #last quarter (todays month - 3)
@@ -593,35 +795,36 @@ class StockScreener(QMainWindow):
                     #if the month is still > 0 then leave the year the same
                     year = datetime.date.today().year
 
-                #setup the start and end dates acording to todays date and the calculated month and year
+                #setup the start date acording to todays date and the calculated month and year
                 start = datetime.datetime(year, month, datetime.date.today().day).strftime("%Y-%m-%d")
-                end = datetime.datetime(datetime.date.today().year, datetime.date.today().month, datetime.date.today().day).strftime("%Y-%m-%d")
 
-                #filter the insider data by the dates
-                filter_stocks = insider_final.loc[insider_final.Date.between(start, end)]
-        else:
-            #if neither are selected then do no filtering
-            filter_stocks = insider_final
-
-        #if either buys or sells are selected
+        #if either buys or sells are selected filter by the transaction type
         if not self.buys_sells is None:
-            #if buys is selected
-            if self.buys_sells:
-                #comparison by the transaction type
-                buys_filter = (filter_stocks["Transaction"] == "Buy")
-                #filter data by this comparison
-                filter_stocks = filter_stocks.loc[buys_filter]
-            else:
-                #comparison by the transaction type
-                sale_filter = (filter_stocks["Transaction"] == "Sale")
-                #filter data by this comparison
-                filter_stocks = filter_stocks.loc[sale_filter]
+            transaction = "Buy" if self.buys_sells else "Sale"
 
         #if neither year or quarter or buys or sells are selected then go to the regular filter results and exit this function
-        if self.year_quarter is None and self.buys_sells is None:
+        if self.year_quarter is None and self.buys_sells is None and not self.clusters:
             self.filterResults()
             return
 
+        #rank the tickers by their strongest cluster of buys in the period (the buys/sells selection doesn't apply)
+        if self.clusters:
+            filter_stocks = client.clusters(start=start) if client is not None else clusters.rank_clusters(clusters_final, start=start)
+            self.exported = (filter_stocks, None)
+            self.list_df = [filter_stocks[i:i+self.n] for i in range(0,filter_stocks.shape[0],self.n)]
+            self.totalPages = int(len(filter_stocks.index) / self.n) + 1
+            self.page = -1
+            self.updateClusters()
+            return
+
+        #filter the insider data up to today
+        end = datetime.datetime(datetime.date.today().year, datetime.date.today().month, datetime.date.today().day).strftime("%Y-%m-%d") if start is not None else None
+        if client is not None:
+            filter_stocks = client.insider(start=start, end=end, transaction=transaction)
+        else:
+            filter_stocks = insider_db.read_Insider(start=start, end=end, transaction=transaction)
+        self.exported = (filter_stocks, None)
+
         #split the filtered insider information by blocks of self.n length and store in the self.list_df variable for printing
         self.list_df = [filter_stocks[i:i+self.n] for i in range(0,filter_stocks.shape[0],self.n)]
 
@@ -646,6 +849,10 @@ class StockScreener(QMainWindow):
 
     #go to the next page
     def updateResults(self):
+        #if the cluster buys button is active then go to the update clusters function and exit
+        if self.clusters:
+            self.updateClusters()
+            return
         #if either year, quater, buys or sells buttons are active then go to the update insiders function and exit
         if not self.year_quarter is None or not self.buys_sells is None:
             self.updateInsiders()
@@ -653,6 +860,7 @@ class StockScreener(QMainWindow):
 
         #clean the previous results list information
         self.ui.resultsList.clear()
+        self.shown = None
 
         #set the tags to the respective fields
         self.ui.Open.setText("Open")
@@ -670,22 +878,137 @@ class StockScreener(QMainWindow):
 
         #if the length of the filtered results list is > 0 then print results
         if len(self.list_df) > 0:
+            #the tickers on screen get refreshed first by the background scheduler
+            if refresh_state is not None:
+                refresh_state.viewed(self.list_df[self.page]["Name"].unique())
             #iterate through the self.n block of results and print them in the list
-            for i, row in self.list_df[self.page].sort_index().iterrows():
-                QListWidgetItem(self.tr(str(i).split()[0] + "\t" + "{:.4f}".format(row["Open"]) + "\t" + "{:.4f}".format(row["High"]) + "\t" + "{:.4f}".format(row["Low"]) + "\t" + "{:.4f}".format(row["Close_x"]) + "\t" + "{:.5f}".format(row["Adj Close"]) + "\t" + str(row["Volume"]) + "\t" + row["Name"]), self.ui.resultsList)
+            self.shown = self.list_df[self.page].sort_index()
+            for i, row in self.shown.iterrows():
+                QListWidgetItem(self.tr(self.stockLine(i, row)), self.ui.resultsList)
         else:
             #if there are no results then print a warning
             QListWidgetItem(self.tr("No Items for the Selected Parameters"), self.ui.resultsList)
 
+        #the live quotes replace the stored bars of their day, and the tickers of the page are the ones polled
+        self.showQuotes(live_prices)
+        self.watchLive()
+
         #update the label besides the results list with the new page number
         self.ui.pageOf.setText("Page " + str(self.page + 1) + " of " + str(self.totalPages))
         #label updates require a repaint execution for some reason
         self.ui.repaint()
 
+    #line of the results list of a stock row
+    def stockLine(self, day, row):
+        return str(day).split()[0] + "\t" + "{:.4f}".format(row["Open"]) + "\t" + "{:.4f}".format(row["High"]) + "\t" + "{:.4f}".format(row["Low"]) + "\t" + "{:.4f}".format(row["Close_x"]) + "\t" + "{:.5f}".format(row["Adj Close"]) + "\t" + str(row["Volume"]) + "\t" + row["Name"]
+
+    #poll the quotes of the tickers of the stock results on screen and of the watchlists while live mode is on
+    def watchLive(self):
+        if self.live is not None:
+            tickers = set(self.shown["Name"].unique()) if self.shown is not None else set()
+            self.live.watch(tickers.union(watch_lists.tickers()) if watch_lists is not None else tickers)
+
+    #save the boxes and the insider buttons of the window as a screen checked after every refresh
+    #an end date of today is left open and the year/quarter buttons are kept as the last 365/91 days
+    def saveScreen(self):
+        if watch_lists is None or screener is None:
+            self.ui.statusbar.showMessage("Screens are saved by the window that loads the data")
+            return
+        name, ok = QInputDialog.getText(self, "Save Screen", "Name of the screen:")
+        if not ok or name.strip() == "":
+            return
+        start, end, price, sales, eps = self.formValues()
+        if self.ui.endDate.date() == QDate.currentDate():
+            end = None
+        try:
+            spec = screen.to_spec(screen.form_query(start, end, price, sales, eps))
+        except ValueError:
+            self.ui.statusbar.showMessage("The boxes of the screen are not numbers")
+            return
+        days = None if self.year_quarter is None else (-365 if self.year_quarter else -91)
+        if self.clusters:
+            spec.append(["Cluster", days, None])
+        elif not self.buys_sells is None or days is not None:
+            spec.append(["Insider", None if self.buys_sells is None else ("Buy" if self.buys_sells else "Sale"), days, None])
+        watch_lists.save_screen(name.strip(), spec)
+        #the new screen is screened in full, the others are up to date
+        watch_lists.evaluate(screener, set())
+        self.ui.statusbar.showMessage("Saved screen " + name.strip() + ": " + str(len(watch_lists.screens[name.strip()]["members"])) + " tickers")
+
+    #add the tickers of the selected results to the watchlist, or take them off when they are all on it already
+    def watchTickers(self):
+        if watch_lists is None:
+            return
+        tickers = set(item.text().split("\t")[-1].strip() for item in self.ui.resultsList.selectedItems() if "\t" in item.text())
+        if len(tickers) == 0:
+            self.ui.statusbar.showMessage("Select the results whose tickers to watch")
+            return
+        if tickers.issubset(watch_lists.lists.get(WATCHLIST, [])):
+            watch_lists.unwatch(WATCHLIST, tickers)
+            self.ui.statusbar.showMessage("Not watching " + ", ".join(sorted(tickers)))
+        else:
+            watch_lists.watch(WATCHLIST, tickers)
+            self.ui.statusbar.showMessage("Watching " + ", ".join(sorted(tickers)))
+        watch_lists.save()
+        self.watchLive()
+
+    #write the results of the last filter (every page) to a CSV file or a folder of columns
+    def exportResults(self):
+        if self.exported is None:
+            self.ui.statusbar.showMessage("Filter the results to export first")
+            return
+        path, kind = QFileDialog.getSaveFileName(self, "Export Results", "Data/results.csv", "CSV file (*.csv);;Column folder (*)")
+        if path == "":
+            return
+        frame, rows = self.exported
+        self.ui.statusbar.showMessage("Exporting to " + path + "...")
+        self.ui.repaint()
+        try:
+            count = export.export(frame, path, rows, "csv" if kind.startswith("CSV") else "columns")
+        except (ValueError, OSError) as e:
+            self.ui.statusbar.showMessage("Export failed: " + str(e))
+            return
+        self.ui.statusbar.showMessage("Exported " + str(count) + " rows to " + path)
+
+    #show the alerts of the saved screens
+    def showAlerts(self, alerts):
+        if len(alerts) > 0:
+            self.ui.statusbar.showMessage(str(len(alerts)) + " screen alert(s): " + "; ".join(watchlists.describe(alert) for alert in alerts))
+
+    #new quotes from the poller: keep them and show them, the filter is not run again
+    def liveTicked(self, changed):
+        if self.live is None:
+            return
+        live_prices.update(changed)
+        self.showQuotes(changed)
+        #the bars go into the combined data (and the screener) off the GUI thread, a few ticks at a time
+        if rebuilder is not None:
+            rebuilder.push({"live": list(changed)})
+        self.ui.statusbar.showMessage("Live quotes: " + str(len(changed)) + " tickers changed at " + datetime.datetime.now().strftime("%H:%M:%S") + " (" + str(self.live.counts["requests"]) + " requests)")
+
+    #update the lines on screen of the day of some quotes in place, the bar of a new day (today's, the stored prices end the day
+    #before) is added for the tickers on screen when the date range of the results reaches today
+    def showQuotes(self, changed):
+        shown = self.shown
+        if shown is None or len(shown) == 0 or len(changed) == 0:
+            return
+        names = set(shown["Name"].unique())
+        changed = {ticker: quote for (ticker, quote) in changed.items() if ticker in names}
+        if len(changed) == 0:
+            return
+        bars = quotes.live_rows(changed, stocks_stored)
+        self.shown, replaced, added = quotes.overlay(shown, bars, add=self.ui.endDate.date() >= QDate.currentDate())
+        for position in replaced:
+            self.ui.resultsList.item(int(position)).setText(self.tr(self.stockLine(self.shown.index[position], self.shown.iloc[position])))
+        for position in added:
+            QListWidgetItem(self.tr(self.stockLine(self.shown.index[position], self.shown.iloc[position])), self.ui.resultsList)
+
     #update the insider information in the GUI
     def updateInsiders(self):
         #same as the updateResults function, but with the proper formats for the insider data
         self.ui.resultsList.clear()
+        self.shown = None
+        self.watchLive()
 
         self.page += 1
         if self.page >= self.totalPages:
@@ -699,6 +1022,8 @@ class StockScreener(QMainWindow):
         self.ui.Volume.setText("Insider ID")
 
         if len(self.list_df) > 0:
+            if refresh_state is not None:
+                refresh_state.viewed(self.list_df[self.page]["Ticker"].astype(str).str.strip().unique())
             for i, row in self.list_df[self.page].sort_values(by=["Date"]).iterrows():
                 if len(str(row["Insider Trading"]).strip()) > 10:
                     intr = str(row["Insider Trading"]).strip()[:10].lower()
@@ -717,6 +1042,84 @@ class StockScreener(QMainWindow):
         self.ui.pageOf.setText("Page " + str(self.page + 1) + " of " + str(self.totalPages))
         self.ui.repaint()
 
+    #update the cluster buys ranking in the GUI
+    def updateClusters(self):
+        #same as the updateInsiders function, with one line per ticker and its strongest cluster
+        self.ui.resultsList.clear()
+        self.shown = None
+        self.watchLive()
+
+        self.page += 1
+        if self.page >= self.totalPages:
+            self.page = 0
+
+        self.ui.Open.setText("Rank")
+        self.ui.High.setText("Insiders")
+        self.ui.Low.setText("Buys")
+        self.ui.Close.setText("Value ($)")
+        self.ui.AdjClose.setText("Start")
+        self.ui.Volume.setText("End")
+
+        if len(self.list_df) > 0:
+            if refresh_state is not None:
+                refresh_state.viewed(self.list_df[self.page]["Ticker"].unique())
+            for i, row in self.list_df[self.page].iterrows():
+                QListWidgetItem(self.tr(str(row["Rank"]) + "\t" + str(row["Insiders"]) + "\t" + str(row["Buys"]) + "\t" + "{:.0f}".format(row["Value"]) + "\t" + str(row["Start"]).split()[0] + "\t" + str(row["End"]).split()[0] + "\t" + str(row["Ticker"])), self.ui.resultsList)
+        else:
+            QListWidgetItem(self.tr("No Items for the Selected Parameters"), self.ui.resultsList)
+
+        self.ui.pageOf.setText("Page " + str(self.page + 1) + " of " + str(self.totalPages))
+        self.ui.repaint()
+
+    #the background scheduler refreshed some tickers, bring the combined data up to date with them
+    #runs in the thread of the debouncer (the events of close cycles are merged), the window is told once the new data is built
+    def rebuildData(self, event):
+        #the live quotes of the ticks since the last rebuild (see liveTicked)
+        changed = set(event.pop("live", []))
+        if any(len(tickers) > 0 for tickers in event.values()):
+            self.refreshData(event)
+            #only the tickers whose data changed are screened again for the saved screens (the refreshed ones if nothing changed)
+            changed |= set(ticker for tickers in event.values() for ticker in tickers) if changes_final is None else changes.tickers(changes_final)
+        apply_Live()
+        self.events.refreshed.emit(check_Alerts(changed))
+
+    #replace the rows of the tickers a background refresh changed in the combined data
+    def refreshData(self, event):
+        global SP500, DJI, IXIC, NYA, Russell2000
+        global SP500_stocks, DJI_stocks, IXIC_stocks, NYA_stocks, Russell2000_stocks
+        global SP500_insider, DJI_insider, IXIC_insider, NYA_insider, Russell2000_insider
+        global rebuild_db
+
+        #take the new frames of each market from the scheduler store (the Data files are looked at first, see snapshot.sources)
+        sources = snapshot.sources(scheduler.MARKETS)
+        with background.lock:
+            SP500_stocks, DJI_stocks, IXIC_stocks, NYA_stocks, Russell2000_stocks = [background.store["stocks"][index] for index in scheduler.MARKETS]
+            SP500_insider, DJI_insider, IXIC_insider, NYA_insider, Russell2000_insider = [background.store["insider"][index] for index in scheduler.MARKETS]
+            SP500, DJI, IXIC, NYA, Russell2000 = [background.store["pairs"][index] for index in scheduler.MARKETS]
+
+        #the store connection of the window belongs to the GUI thread
+        if rebuild_db is None:
+            rebuild_db = database.Database()
+        #only the rows of the refreshed tickers are replaced, the price cube only has to be written again if prices changed
+        prepare_Data(rebuild_cube=len(event.get("prices", [])) > 0, sources=sources, refreshed=event, db=rebuild_db)
+        #the snapshot is written at most every SNAPSHOT_INTERVAL seconds (and when the window closes)
+        save_Snapshot(sources, SNAPSHOT_INTERVAL)
+
+    #the combined data was rebuilt after a background refresh, show the alerts and redo the current filter
+    def dataRefreshed(self, alerts):
+        self.showAlerts(alerts)
+
+        #redo the filter of the results on screen and stay on the same page
+        if not hasattr(self, "list_df"):
+            return
+        page = self.page
+        if not self.year_quarter is None or not self.buys_sells is None or self.clusters:
+            self.filterInsiders()
+        else:
+            self.filterResults()
+        self.page = min(page, self.totalPages - 1) - 1
+        self.updateResults()
+
 
 
 
@@ -725,8 +1128,12 @@ class StockScreener(QMainWindow):
 #The google API doesn's give results for last second.
 #Also doesn't give good results for last hour, 4 hours, day, week and month
 def get_Top10_searches_US(keywordList):
+    #the screening server keeps the searches for all of its windows
+    if client is not None:
+        return client.top10(keywordList)
+
     #Create a trend object to request the google API
-    pytrend = TrendReq(hl='en-US', tz=360)
+    pytrend = TrendReq(hl='en-US', tz=360, timeout=(fetch.CONNECT_TIMEOUT, fetch.READ_TIMEOUT), retries=fetch.RETRIES, backoff_factor=fetch.BACKOFF)
 
     #list of topics found
     topics = []
@@ -741,7 +1148,7 @@ def get_Top10_searches_US(keywordList):
         #get the related topics and drop every column except for the topic name and type
         try:
             tmp = pytrend.related_topics()[word]["top"].drop(['formattedValue', 'link', 'topic_mid', 'hasData'], axis=1).values.tolist()
-        except (KeyError, requests.exceptions.ReadTimeout):
+        except (KeyError, requests.exceptions.RequestException):
             tmp = []
         #append to the topic list
         [topics.append(item) for item in tmp]
@@ -767,157 +1174,201 @@ Russell2000 = []
 def load_SP500():
     global SP500
 
+    #the tickers finished before an interrupted refresh are read from the checkpoint
+    job = jobs.Job("SP500", {"run": jobs.current_run()["id"]})
+
     #Load S&P500 components from wikipedia for later searching
-    resp = requests.get('http://en.wikipedia.org/wiki/List_of_S%26P_500_companies')
+    resp = fetch.get('http://en.wikipedia.org/wiki/List_of_S%26P_500_companies')
     soup = BeautifulSoup(resp.text, 'lxml')
+    symbols = []
     try:
         table = soup.find('table', {'class': 'wikitable sortable'})
 
         #Store the components in a list of pairs
         for row in table.findAll('tr')[1:]:
             symbol = "".join(ch for ch in row.findAll('td')[0].text if unicodedata.category(ch)[0]!="C")
-            t = pd.read_html('https://finance.yahoo.com/quote/' + symbol + '/analysis')
-            EPS_LastQ_change = (float(t[2].loc[1][-1]) - float(t[2].loc[1][-2])) / float(t[2].loc[1][-2])
+            symbols.append(symbol)
+            if job.done(symbol):
+                continue
+            try:
+                EPS_LastQ_change = earnings.eps_change(symbol)
+            except (ValueError, IndexError, ZeroDivisionError, fetch.FetchError):
+                EPS_LastQ_change = 0
             ticker = [symbol, row.findAll('td')[1].text, EPS_LastQ_change]
 
-            SP500.append(ticker)
+            job.complete(symbol, ticker)
 
-        SP500 = [[s1.replace('\n', ''), s2.replace('\n', ''), s3] for [s1, s2, s3] in SP500]
     except ValueError:
         pass
 
+    SP500 = [[s1.replace('\n', ''), s2.replace('\n', ''), s3] for [s1, s2, s3] in job.results(symbols)]
+
     #store in file for later reading
-    with open("Data/SP500.csv", "w") as f:
+    with jobs.atomic_file("Data/SP500.csv") as f:
         for pair in SP500:
             f.write(pair[0] + "," + pair[1] + "," + str(round(pair[2], 4)) + "\n")
+    earnings.history.save()
+    job.finish(symbols)
 
 #download DJI ticker list
 def load_DJI():
     global DJI
 
+    #the tickers finished before an interrupted refresh are read from the checkpoint
+    job = jobs.Job("DJI", {"run": jobs.current_run()["id"]})
+
     #Load DJI components from yahoo finance for later searching
-    DJI_top30 = pd.read_html('https://finance.yahoo.com/quote/%5EDJI/components?p=%5EDJI')
+    DJI_top30 = fetch.read_html('https://finance.yahoo.com/quote/%5EDJI/components?p=%5EDJI')
+    symbols = DJI_top30[0]["Symbol"].tolist()
 
     #Store the components in a list of pairs
-    for (s, n) in zip(DJI_top30[0]["Symbol"].tolist(), DJI_top30[0]["Company Name"].tolist()):
-        t = pd.read_html('https://finance.yahoo.com/quote/' + s + '/analysis')
-        EPS_LastQ_change = (float(t[2].loc[1][-1]) - float(t[2].loc[1][-2])) / float(t[2].loc[1][-2])
-        DJI.append([s, n, EPS_LastQ_change])
+    for (s, n) in zip(symbols, DJI_top30[0]["Company Name"].tolist()):
+        if job.done(s):
+            continue
+        try:
+            EPS_LastQ_change = earnings.eps_change(s)
+        except (ValueError, IndexError, ZeroDivisionError, fetch.FetchError):
+            EPS_LastQ_change = 0
+        job.complete(s, [s, n, EPS_LastQ_change])
+
+    DJI = job.results(symbols)
 
     #store in file for later reading
-    with open("Data/DJI.csv", "w") as f:
+    with jobs.atomic_file("Data/DJI.csv") as f:
         for pair in DJI:
             f.write(pair[0] + "," + pair[1] + "," + str(round(pair[2], 4)) + "\n")
+    earnings.history.save()
+    job.finish(symbols)
 
 #download IXIC ticker list
 def load_IXIC():
     global IXIC
 
+    #the tickers finished before an interrupted refresh are read from the checkpoint
+    job = jobs.Job("IXIC", {"run": jobs.current_run()["id"]})
+
     #Load IXIC components from yahoo finance for later searching
-    IXIC_top30 = pd.read_html('https://finance.yahoo.com/quote/%5EIXIC/components?p=%5EIXIC')
+    IXIC_top30 = fetch.read_html('https://finance.yahoo.com/quote/%5EIXIC/components?p=%5EIXIC')
+    symbols = IXIC_top30[0]["Symbol"].tolist()
 
     #Store the components in a list of pairs
-    for (s, n) in zip(IXIC_top30[0]["Symbol"].tolist(), IXIC_top30[0]["Company Name"].tolist()):
+    for (s, n) in zip(symbols, IXIC_top30[0]["Company Name"].tolist()):
+        if job.done(s):
+            continue
         try:
-            t = pd.read_html('https://finance.yahoo.com/quote/' + s + '/analysis')
-            EPS_LastQ_change = (float(t[2].loc[1][-1]) - float(t[2].loc[1][-2])) / float(t[2].loc[1][-2])
-        except ValueError:
+            EPS_LastQ_change = earnings.eps_change(s)
+        except (ValueError, IndexError, ZeroDivisionError, fetch.FetchError):
             EPS_LastQ_change = 0
 
-        IXIC.append([s, n, EPS_LastQ_change])
+        job.complete(s, [s, n, EPS_LastQ_change])
+
+    IXIC = job.results(symbols)
 
     #store in file for later reading
-    with open("Data/IXIC.csv", "w") as f:
+    with jobs.atomic_file("Data/IXIC.csv") as f:
         for pair in IXIC:
             f.write(pair[0] + "," + pair[1] + "," + str(round(pair[2], 4)) + "\n")
+    earnings.history.save()
+    job.finish(symbols)
 
 #download NYA ticker list
 def load_NYA():
     global NYA
 
+    #the tickers finished before an interrupted refresh are read from the checkpoint
+    job = jobs.Job("NYA", {"run": jobs.current_run()["id"]})
+
     #Load NYA components from yahoo finance for later searching
-    NYA_top30 = pd.read_html('https://finance.yahoo.com/quote/%5ENYA/components?p=%5ENYA')
+    NYA_top30 = fetch.read_html('https://finance.yahoo.com/quote/%5ENYA/components?p=%5ENYA')
+    symbols = NYA_top30[0]["Symbol"].tolist()
 
     #Store the components in a list of pairs
-    for (s, n) in zip(NYA_top30[0]["Symbol"].tolist(), NYA_top30[0]["Company Name"].tolist()):
+    for (s, n) in zip(symbols, NYA_top30[0]["Company Name"].tolist()):
+        if job.done(s):
+            continue
         try:
-            t = pd.read_html('https://finance.yahoo.com/quote/' + s + '/analysis')
-            try:
-                EPS_LastQ_change = (float(t[2].loc[1][-1]) - float(t[2].loc[1][-2])) / float(t[2].loc[1][-2])
-            except IndexError:
-                EPS_LastQ_change = 0
-        except ValueError:
+            EPS_LastQ_change = earnings.eps_change(s)
+        except (ValueError, IndexError, ZeroDivisionError, fetch.FetchError):
             EPS_LastQ_change = 0
 
-        NYA.append([s, n, EPS_LastQ_change])
+        job.complete(s, [s, n, EPS_LastQ_change])
+
+    NYA = job.results(symbols)
 
     #store in file for later reading
-    with open("Data/NYA.csv", "w") as f:
+    with jobs.atomic_file("Data/NYA.csv") as f:
         for pair in NYA:
             f.write(pair[0] + "," + pair[1] + "," + str(round(pair[2], 4)) + "\n")
+    earnings.history.save()
+    job.finish(symbols)
 
 #download RUT ticker list
 def load_Russell2000():
     global Russell2000
 
+    #the pages finished before an interrupted refresh are read from the checkpoint
+    job = jobs.Job("Russell2000", {"run": jobs.current_run()["id"]})
+
     #Load Russell2000 components from https://money.cnn.com/data/markets/russell/ for later searching
     headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 6.1; WOW64; rv:50.0) Gecko/20100101 Firefox/50.0'}
 
-    #Read from the website. The third table is the one we are looking for
-    source=requests.get("https://money.cnn.com/data/markets/russell/?%3Forder=d&iid=ob_article_footer&page=1", headers=headers).text
-    Russell = pd.read_html(source)[3]["Company"]
+    #This website splits the indexes in 74 pages of the table
+    pages = ["page" + str(i) for i in range(1, 75)]
+    for page in pages:
+        if job.done(page):
+            continue
 
-    for item in Russell:
-        t = pd.read_html('https://finance.yahoo.com/quote/' + item.split()[0] + '/analysis')
+        #Read from the website. The third table is the one we are looking for
+        #a page that can't be read is skipped instead of stopping the whole list
         try:
-            EPS_LastQ_change = (float(t[2].loc[1][-1]) - float(t[2].loc[1][-2])) / float(t[2].loc[1][-2])
-        except ZeroDivisionError:
-            EPS_LastQ_change = float(t[2].loc[1][-1])
-        except IndexError:
-            EPS_LastQ_change = 0
-
-        Russell2000.append([item.split()[0], " ".join(item.split()[1:]), EPS_LastQ_change])
+            source=fetch.get("https://money.cnn.com/data/markets/russell/?%3Forder=d&iid=ob_article_footer&page=" + page[4:], headers=headers).text
+            tmp = pd.read_html(io.StringIO(source))[3]["Company"]
+        except (ValueError, IndexError, KeyError, fetch.FetchError):
+            continue
 
-    #This website splits the indexes in 74 pages of the table. page 1 has already been loaded
-    for i in range(2, 75):
-        source=requests.get("https://money.cnn.com/data/markets/russell/?%3Forder=d&iid=ob_article_footer&page=" + str(i), headers=headers).text
-        tmp = pd.read_html(source)[3]["Company"]
+        rows = []
         for item in tmp:
             try:
-                t = pd.read_html('https://finance.yahoo.com/quote/' + item.split()[0] + '/analysis')
+                history = earnings.download_history(item.split()[0])
                 try:
-                    EPS_LastQ_change = (float(t[2].loc[1][-1]) - float(t[2].loc[1][-2])) / float(t[2].loc[1][-2])
+                    EPS_LastQ_change = earnings.last_change(history)
                 except ZeroDivisionError:
-                    EPS_LastQ_change = float(t[2].loc[1][-1])
+                    EPS_LastQ_change = history["actual"][-1]
                 except IndexError:
                     EPS_LastQ_change = 0
-            except (ValueError, urllib.error.HTTPError):
+            except (ValueError, fetch.FetchError):
                 EPS_LastQ_change = 0
 
-            Russell2000.append([item.split()[0], " ".join(item.split()[1:]), EPS_LastQ_change])
+            rows.append([item.split()[0], " ".join(item.split()[1:]), EPS_LastQ_change])
+
+        #the page is only marked as finished once all its tickers are read
+        job.complete(page, rows)
 
+    Russell2000 = [row for rows in job.results(pages) for row in rows]
 
     #store in file for later reading
-    with open("Data/Russell2000.csv", "w") as f:
+    with jobs.atomic_file("Data/Russell2000.csv") as f:
         for pair in Russell2000:
             f.write(pair[0] + "," + pair[1] + "," + str(round(pair[2], 4)) + "\n")
+    earnings.history.save()
+    job.finish(pages)
 
 
 #read the ticker information from file
 def read_Pairs(index):
     with open("Data/" + index + ".csv", "r") as f:
         tmp = f.read().splitlines()
-        tmp = [[pair.split(",")[0], pair.split(",")[1], float(pair.split(",")[-1])] for pair in tmp]
+        tmp = [database.split_pair(pair) for pair in tmp]
 
     return tmp
 
-#read the stocks information from file
-def read_Stocks(index):
-    return pd.read_csv("Data/" + index + "_stocks.csv")
+#read the stocks information from file (indexed by date)
+def read_Stocks(index, stats=None):
+    return ingest.read_stocks_csv("Data/" + index + "_stocks.csv", stats=stats)
 
 #read the insider information from file
-def read_Insider(index):
-    return pd.read_csv("Data/" + index + "_insider.csv")
+def read_Insider(index, stats=None):
+    return ingest.read_insider_csv("Data/" + index + "_insider.csv", stats=stats)
 
 
 
@@ -933,186 +1384,221 @@ def load_SP500_stocks(start, end):
     # create empty dataframe
     global SP500_stocks
 
-    tmp_stocks = pd.DataFrame()
+    #the tickers finished before an interrupted refresh are read from the checkpoint
+    job = jobs.Job("SP500_stocks", {"start": str(start), "end": str(end), "run": jobs.current_run()["id"]})
 
     # iterate over each symbol
     for (i, name, _) in SP500:
+        if job.done(i):
+            continue
         # print the symbol which is being downloaded
         #print( str(h) + str(' : ') + i, sep=',', end=',', flush=True)
         try:
             # download the stock price
             stock = []
-            stock = yf.download(i,start=start, end=end, progress=False)
-
-            # append the individual stock prices
-            if len(stock) == 0:
-                None
-            else:
-                stock['Name']=i
-                tmp_stocks = tmp_stocks.append(stock,sort=False)
-        except Exception:
-            None
-
-    tickers = tmp_stocks.Name.unique()
-
-    for tik in tickers:
-        tmp = tmp_stocks[tmp_stocks["Name"] == tik].sort_index()
-        tmp['Close_change'] = tmp['Close'].pct_change()
-        tmp["year"] = tmp.index.year
-        tmp["Q"] = tmp.index.quarter
-        tmp = tmp.merge(tmp.groupby(["year", "Q"])["Close"].sum().pct_change(), left_on = ["year", "Q"], right_index = True)
-
-        SP500_stocks = SP500_stocks.append(tmp)
-
-    SP500_stocks.to_csv("Data/SP500_stocks.csv")
+            stock = fetch.call("query1.finance.yahoo.com", yf.download, i, start=start, end=end, progress=False)
+        except fetch.FetchError:
+            #not marked as finished, so a resumed refresh tries it again
+            continue
+
+        # store the individual stock prices with the daily and quarterly changes
+        if len(stock) == 0:
+            job.complete(i, None)
+        else:
+            tmp = stock.sort_index()
+            tmp['Name']=i
+            tmp['Close_change'] = tmp['Close'].pct_change()
+            tmp["year"] = tmp.index.year
+            tmp["Q"] = tmp.index.quarter
+            tmp = tmp.merge(tmp.groupby(["year", "Q"])["Close"].sum().pct_change(), left_on = ["year", "Q"], right_index = True)
+            job.complete(i, tmp)
+
+    tickers = [i for (i, _, _) in SP500]
+    results = [tmp for tmp in job.results(tickers) if tmp is not None]
+    #the tickers that failed keep their rows of the previous file
+    previous = jobs.previous_rows("Data/SP500_stocks.csv", "Name", job.missing(tickers), index_col=0, parse_dates=True)
+    if len(previous) > 0:
+        results.append(previous)
+    SP500_stocks = pd.concat(results, sort=False) if len(results) > 0 else pd.DataFrame()
+
+    jobs.write_csv(SP500_stocks, "Data/SP500_stocks.csv")
+    job.finish(tickers)
 
 def load_DJI_stocks(start, end):
     # create empty dataframe
     global DJI_stocks
 
-    tmp_stocks = pd.DataFrame()
+    #the tickers finished before an interrupted refresh are read from the checkpoint
+    job = jobs.Job("DJI_stocks", {"start": str(start), "end": str(end), "run": jobs.current_run()["id"]})
 
     # iterate over each symbol
     for (i, name, _) in DJI:
+        if job.done(i):
+            continue
         # print the symbol which is being downloaded
         #print( str(h) + str(' : ') + i, sep=',', end=',', flush=True)
         try:
             # download the stock price
             stock = []
-            stock = yf.download(i,start=start, end=end, progress=False)
-
-            # append the individual stock prices
-            if len(stock) == 0:
-                None
-            else:
-                stock['Name']=i
-                tmp_stocks = tmp_stocks.append(stock,sort=False)
-        except Exception:
-            None
-
-    tickers = tmp_stocks.Name.unique()
-
-    for tik in tickers:
-        tmp = tmp_stocks[tmp_stocks["Name"] == tik].sort_index()
-        tmp['Close_change'] = tmp['Close'].pct_change()
-        tmp["year"] = tmp.index.year
-        tmp["Q"] = tmp.index.quarter
-        tmp = tmp.merge(tmp.groupby(["year", "Q"])["Close"].sum().pct_change(), left_on = ["year", "Q"], right_index = True)
-
-        DJI_stocks = DJI_stocks.append(tmp)
-
-    DJI_stocks.to_csv("Data/DJI_stocks.csv")
+            stock = fetch.call("query1.finance.yahoo.com", yf.download, i, start=start, end=end, progress=False)
+        except fetch.FetchError:
+            #not marked as finished, so a resumed refresh tries it again
+            continue
+
+        # store the individual stock prices with the daily and quarterly changes
+        if len(stock) == 0:
+            job.complete(i, None)
+        else:
+            tmp = stock.sort_index()
+            tmp['Name']=i
+            tmp['Close_change'] = tmp['Close'].pct_change()
+            tmp["year"] = tmp.index.year
+            tmp["Q"] = tmp.index.quarter
+            tmp = tmp.merge(tmp.groupby(["year", "Q"])["Close"].sum().pct_change(), left_on = ["year", "Q"], right_index = True)
+            job.complete(i, tmp)
+
+    tickers = [i for (i, _, _) in DJI]
+    results = [tmp for tmp in job.results(tickers) if tmp is not None]
+    #the tickers that failed keep their rows of the previous file
+    previous = jobs.previous_rows("Data/DJI_stocks.csv", "Name", job.missing(tickers), index_col=0, parse_dates=True)
+    if len(previous) > 0:
+        results.append(previous)
+    DJI_stocks = pd.concat(results, sort=False) if len(results) > 0 else pd.DataFrame()
+
+    jobs.write_csv(DJI_stocks, "Data/DJI_stocks.csv")
+    job.finish(tickers)
 
 def load_IXIC_stocks(start, end):
     # create empty dataframe
     global IXIC_stocks
 
-    tmp_stocks = pd.DataFrame()
+    #the tickers finished before an interrupted refresh are read from the checkpoint
+    job = jobs.Job("IXIC_stocks", {"start": str(start), "end": str(end), "run": jobs.current_run()["id"]})
 
     # iterate over each symbol
     for (i, name, _) in IXIC:
+        if job.done(i):
+            continue
         # print the symbol which is being downloaded
         #print( str(h) + str(' : ') + i, sep=',', end=',', flush=True)
         try:
             # download the stock price
             stock = []
-            stock = yf.download(i,start=start, end=end, progress=False)
-
-            # append the individual stock prices
-            if len(stock) == 0:
-                None
-            else:
-                stock['Name']=i
-                tmp_stocks = tmp_stocks.append(stock,sort=False)
-        except Exception:
-            None
-
-    tickers = tmp_stocks.Name.unique()
-
-    for tik in tickers:
-        tmp = tmp_stocks[tmp_stocks["Name"] == tik].sort_index()
-        tmp['Close_change'] = tmp['Close'].pct_change()
-        tmp["year"] = tmp.index.year
-        tmp["Q"] = tmp.index.quarter
-        tmp = tmp.merge(tmp.groupby(["year", "Q"])["Close"].sum().pct_change(), left_on = ["year", "Q"], right_index = True)
-
-        IXIC_stocks = IXIC_stocks.append(tmp)
-
-    IXIC_stocks.to_csv("Data/IXIC_stocks.csv")
+            stock = fetch.call("query1.finance.yahoo.com", yf.download, i, start=start, end=end, progress=False)
+        except fetch.FetchError:
+            #not marked as finished, so a resumed refresh tries it again
+            continue
+
+        # store the individual stock prices with the daily and quarterly changes
+        if len(stock) == 0:
+            job.complete(i, None)
+        else:
+            tmp = stock.sort_index()
+            tmp['Name']=i
+            tmp['Close_change'] = tmp['Close'].pct_change()
+            tmp["year"] = tmp.index.year
+            tmp["Q"] = tmp.index.quarter
+            tmp = tmp.merge(tmp.groupby(["year", "Q"])["Close"].sum().pct_change(), left_on = ["year", "Q"], right_index = True)
+            job.complete(i, tmp)
+
+    tickers = [i for (i, _, _) in IXIC]
+    results = [tmp for tmp in job.results(tickers) if tmp is not None]
+    #the tickers that failed keep their rows of the previous file
+    previous = jobs.previous_rows("Data/IXIC_stocks.csv", "Name", job.missing(tickers), index_col=0, parse_dates=True)
+    if len(previous) > 0:
+        results.append(previous)
+    IXIC_stocks = pd.concat(results, sort=False) if len(results) > 0 else pd.DataFrame()
+
+    jobs.write_csv(IXIC_stocks, "Data/IXIC_stocks.csv")
+    job.finish(tickers)
 
 def load_NYA_stocks(start, end):
     # create empty dataframe
     global NYA_stocks
 
-    tmp_stocks = pd.DataFrame()
+    #the tickers finished before an interrupted refresh are read from the checkpoint
+    job = jobs.Job("NYA_stocks", {"start": str(start), "end": str(end), "run": jobs.current_run()["id"]})
 
     # iterate over each symbol
     for (i, name, _) in NYA:
+        if job.done(i):
+            continue
         # print the symbol which is being downloaded
         #print( str(h) + str(' : ') + i, sep=',', end=',', flush=True)
         try:
             # download the stock price
             stock = []
-            stock = yf.download(i,start=start, end=end, progress=False)
-
-            # append the individual stock prices
-            if len(stock) == 0:
-                None
-            else:
-                stock['Name']=i
-                tmp_stocks = tmp_stocks.append(stock,sort=False)
-        except Exception:
-            None
-
-    tickers = tmp_stocks.Name.unique()
-
-    for tik in tickers:
-        tmp = tmp_stocks[tmp_stocks["Name"] == tik].sort_index()
-        tmp['Close_change'] = tmp['Close'].pct_change()
-        tmp["year"] = tmp.index.year
-        tmp["Q"] = tmp.index.quarter
-        tmp = tmp.merge(tmp.groupby(["year", "Q"])["Close"].sum().pct_change(), left_on = ["year", "Q"], right_index = True)
-
-        NYA_stocks = NYA_stocks.append(tmp)
-
-    NYA_stocks.to_csv("Data/NYA_stocks.csv")
+            stock = fetch.call("query1.finance.yahoo.com", yf.download, i, start=start, end=end, progress=False)
+        except fetch.FetchError:
+            #not marked as finished, so a resumed refresh tries it again
+            continue
+
+        # store the individual stock prices with the daily and quarterly changes
+        if len(stock) == 0:
+            job.complete(i, None)
+        else:
+            tmp = stock.sort_index()
+            tmp['Name']=i
+            tmp['Close_change'] = tmp['Close'].pct_change()
+            tmp["year"] = tmp.index.year
+            tmp["Q"] = tmp.index.quarter
+            tmp = tmp.merge(tmp.groupby(["year", "Q"])["Close"].sum().pct_change(), left_on = ["year", "Q"], right_index = True)
+            job.complete(i, tmp)
+
+    tickers = [i for (i, _, _) in NYA]
+    results = [tmp for tmp in job.results(tickers) if tmp is not None]
+    #the tickers that failed keep their rows of the previous file
+    previous = jobs.previous_rows("Data/NYA_stocks.csv", "Name", job.missing(tickers), index_col=0, parse_dates=True)
+    if len(previous) > 0:
+        results.append(previous)
+    NYA_stocks = pd.concat(results, sort=False) if len(results) > 0 else pd.DataFrame()
+
+    jobs.write_csv(NYA_stocks, "Data/NYA_stocks.csv")
+    job.finish(tickers)
 
 def load_Russell2000_stocks(start, end):
     # create empty dataframe
     global Russell2000_stocks
 
-    tmp_stocks = pd.DataFrame()
+    #the tickers finished before an interrupted refresh are read from the checkpoint
+    job = jobs.Job("Russell2000_stocks", {"start": str(start), "end": str(end), "run": jobs.current_run()["id"]})
 
     # iterate over each symbol
     for (i, name, _) in Russell2000:
+        if job.done(i):
+            continue
         # print the symbol which is being downloaded
         #print( str(h) + str(' : ') + i, sep=',', end=',', flush=True)
         try:
             # download the stock price
             stock = []
-            stock = yf.download(i,start=start, end=end, progress=False)
-
-            # append the individual stock prices
-            if len(stock) == 0:
-                None
-            else:
-                stock['Name']=i
-                tmp_stocks = tmp_stocks.append(stock,sort=False)
-        except Exception:
-            None
-
-    tickers = tmp_stocks.Name.unique()
-
-    for tik in tickers:
-        tmp = tmp_stocks[tmp_stocks["Name"] == tik].sort_index()
-        tmp['Close_change'] = tmp['Close'].pct_change()
-        tmp["year"] = tmp.index.year
-        tmp["Q"] = tmp.index.quarter
-        tmp = tmp.merge(tmp.groupby(["year", "Q"])["Close"].sum().pct_change(), left_on = ["year", "Q"], right_index = True)
-
-        Russell2000_stocks = Russell2000_stocks.append(tmp)
-
-    Russell2000_stocks.to_csv("Data/Russell2000_stocks.csv")
+            stock = fetch.call("query1.finance.yahoo.com", yf.download, i, start=start, end=end, progress=False)
+        except fetch.FetchError:
+            #not marked as finished, so a resumed refresh tries it again
+            continue
+
+        # store the individual stock prices with the daily and quarterly changes
+        if len(stock) == 0:
+            job.complete(i, None)
+        else:
+            tmp = stock.sort_index()
+            tmp['Name']=i
+            tmp['Close_change'] = tmp['Close'].pct_change()
+            tmp["year"] = tmp.index.year
+            tmp["Q"] = tmp.index.quarter
+            tmp = tmp.merge(tmp.groupby(["year", "Q"])["Close"].sum().pct_change(), left_on = ["year", "Q"], right_index = True)
+            job.complete(i, tmp)
+
+    tickers = [i for (i, _, _) in Russell2000]
+    results = [tmp for tmp in job.results(tickers) if tmp is not None]
+    #the tickers that failed keep their rows of the previous file
+    previous = jobs.previous_rows("Data/Russell2000_stocks.csv", "Name", job.missing(tickers), index_col=0, parse_dates=True)
+    if len(previous) > 0:
+        results.append(previous)
+    Russell2000_stocks = pd.concat(results, sort=False) if len(results) > 0 else pd.DataFrame()
+
+    jobs.write_csv(Russell2000_stocks, "Data/Russell2000_stocks.csv")
+    job.finish(tickers)
 
 
 #variables to store the read insider information for each market
@@ -1126,93 +1612,408 @@ Russell2000_insider = pd.DataFrame()
 def load_SP500_insider():
     global SP500_insider
 
+    #the tickers finished before an interrupted refresh are read from the checkpoint
+    job = jobs.Job("SP500_insider", {"run": jobs.current_run()["id"]})
+
+    #sector and industry of every ticker read from its quote page
+    sector_rows = []
     for (tik, _, _) in SP500:
+        if job.done(tik):
+            continue
+        try:
+            quote = fetch.call("finviz.com", finvizfinance, tik)
+        except fetch.FetchError:
+            #not marked as finished, so a resumed refresh tries it again
+            continue
+        sector_rows.append(sectors.quote_sector(tik, quote))
         try:
-            insider = finvizfinance(tik)
-            df = insider.TickerInsideTrader()
+            df = quote.TickerInsideTrader()
             df["Ticker"] = tik
             df["Date"] = pd.to_datetime(df["Date"], format = "%b %d")
             df["Date"] = df["Date"] + pd.DateOffset(years = (datetime.date.today().year - df["Date"][0].year))
             df["Date"] = np.where(df["Date"].dt.month > datetime.date.today().month, df["Date"] + pd.DateOffset(years = -1), df["Date"])
-            SP500_insider = SP500_insider.append(df)
-        except:
-            pass
-
-    SP500_insider.to_csv("Data/SP500_insider.csv")
+            job.complete(tik, df)
+        except (KeyError, IndexError, TypeError, ValueError):
+            #no insider table for this ticker
+            job.complete(tik, None)
+
+    tickers = [tik for (tik, _, _) in SP500]
+    results = [df for df in job.results(tickers) if df is not None]
+    #the tickers that failed keep their rows of the previous file
+    previous = jobs.previous_rows("Data/SP500_insider.csv", "Ticker", job.missing(tickers), index_col=0, parse_dates=["Date"])
+    if len(previous) > 0:
+        results.append(previous)
+    SP500_insider = pd.concat(results, sort=False) if len(results) > 0 else pd.DataFrame()
+
+    jobs.write_csv(SP500_insider, "Data/SP500_insider.csv")
+    sectors.update_Sectors(sector_rows)
+    job.finish(tickers)
 
 def load_DJI_insider():
     global DJI_insider
 
+    #the tickers finished before an interrupted refresh are read from the checkpoint
+    job = jobs.Job("DJI_insider", {"run": jobs.current_run()["id"]})
+
+    #sector and industry of every ticker read from its quote page
+    sector_rows = []
     for (tik, _, _) in DJI:
+        if job.done(tik):
+            continue
+        try:
+            quote = fetch.call("finviz.com", finvizfinance, tik)
+        except fetch.FetchError:
+            #not marked as finished, so a resumed refresh tries it again
+            continue
+        sector_rows.append(sectors.quote_sector(tik, quote))
         try:
-            insider = finvizfinance(tik)
-            df = insider.TickerInsideTrader()
+            df = quote.TickerInsideTrader()
             df["Ticker"] = tik
             df["Date"] = pd.to_datetime(df["Date"], format = "%b %d")
             df["Date"] = df["Date"] + pd.DateOffset(years = (datetime.date.today().year - df["Date"][0].year))
             df["Date"] = np.where(df["Date"].dt.month > datetime.date.today().month, df["Date"] + pd.DateOffset(years = -1), df["Date"])
-            DJI_insider = DJI_insider.append(df)
-        except:
-            pass
-
-    DJI_insider.to_csv("Data/DJI_insider.csv")
+            job.complete(tik, df)
+        except (KeyError, IndexError, TypeError, ValueError):
+            #no insider table for this ticker
+            job.complete(tik, None)
+
+    tickers = [tik for (tik, _, _) in DJI]
+    results = [df for df in job.results(tickers) if df is not None]
+    #the tickers that failed keep their rows of the previous file
+    previous = jobs.previous_rows("Data/DJI_insider.csv", "Ticker", job.missing(tickers), index_col=0, parse_dates=["Date"])
+    if len(previous) > 0:
+        results.append(previous)
+    DJI_insider = pd.concat(results, sort=False) if len(results) > 0 else pd.DataFrame()
+
+    jobs.write_csv(DJI_insider, "Data/DJI_insider.csv")
+    sectors.update_Sectors(sector_rows)
+    job.finish(tickers)
 
 def load_IXIC_insider():
     global IXIC_insider
 
+    #the tickers finished before an interrupted refresh are read from the checkpoint
+    job = jobs.Job("IXIC_insider", {"run": jobs.current_run()["id"]})
+
+    #sector and industry of every ticker read from its quote page
+    sector_rows = []
     for (tik, _, _) in IXIC:
+        if job.done(tik):
+            continue
         try:
-            insider = finvizfinance(tik)
-            df = insider.TickerInsideTrader()
+            quote = fetch.call("finviz.com", finvizfinance, tik)
+        except fetch.FetchError:
+            #not marked as finished, so a resumed refresh tries it again
+            continue
+        sector_rows.append(sectors.quote_sector(tik, quote))
+        try:
+            df = quote.TickerInsideTrader()
             df["Ticker"] = tik
             df["Date"] = pd.to_datetime(df["Date"], format = "%b %d")
             df["Date"] = df["Date"] + pd.DateOffset(years = (datetime.date.today().year - df["Date"][0].year))
             df["Date"] = np.where(df["Date"].dt.month > datetime.date.today().month, df["Date"] + pd.DateOffset(years = -1), df["Date"])
-            IXIC_insider = IXIC_insider.append(df)
-        except:
-            pass
-
-    IXIC_insider.to_csv("Data/IXIC_insider.csv")
+            job.complete(tik, df)
+        except (KeyError, IndexError, TypeError, ValueError):
+            #no insider table for this ticker
+            job.complete(tik, None)
+
+    tickers = [tik for (tik, _, _) in IXIC]
+    results = [df for df in job.results(tickers) if df is not None]
+    #the tickers that failed keep their rows of the previous file
+    previous = jobs.previous_rows("Data/IXIC_insider.csv", "Ticker", job.missing(tickers), index_col=0, parse_dates=["Date"])
+    if len(previous) > 0:
+        results.append(previous)
+    IXIC_insider = pd.concat(results, sort=False) if len(results) > 0 else pd.DataFrame()
+
+    jobs.write_csv(IXIC_insider, "Data/IXIC_insider.csv")
+    sectors.update_Sectors(sector_rows)
+    job.finish(tickers)
 
 def load_NYA_insider():
     global NYA_insider
 
+    #the tickers finished before an interrupted refresh are read from the checkpoint
+    job = jobs.Job("NYA_insider", {"run": jobs.current_run()["id"]})
+
+    #sector and industry of every ticker read from its quote page
+    sector_rows = []
     for (tik, _, _) in NYA:
+        if job.done(tik):
+            continue
         try:
-            insider = finvizfinance(tik)
-            df = insider.TickerInsideTrader()
+            quote = fetch.call("finviz.com", finvizfinance, tik)
+        except fetch.FetchError:
+            #not marked as finished, so a resumed refresh tries it again
+            continue
+        sector_rows.append(sectors.quote_sector(tik, quote))
+        try:
+            df = quote.TickerInsideTrader()
             df["Ticker"] = tik
             df["Date"] = pd.to_datetime(df["Date"], format = "%b %d")
             df["Date"] = df["Date"] + pd.DateOffset(years = (datetime.date.today().year - df["Date"][0].year))
             df["Date"] = np.where(df["Date"].dt.month > datetime.date.today().month, df["Date"] + pd.DateOffset(years = -1), df["Date"])
-            NYA_insider = NYA_insider.append(df)
-        except:
-            pass
-
-    NYA_insider.to_csv("Data/NYA_insider.csv")
+            job.complete(tik, df)
+        except (KeyError, IndexError, TypeError, ValueError):
+            #no insider table for this ticker
+            job.complete(tik, None)
+
+    tickers = [tik for (tik, _, _) in NYA]
+    results = [df for df in job.results(tickers) if df is not None]
+    #the tickers that failed keep their rows of the previous file
+    previous = jobs.previous_rows("Data/NYA_insider.csv", "Ticker", job.missing(tickers), index_col=0, parse_dates=["Date"])
+    if len(previous) > 0:
+        results.append(previous)
+    NYA_insider = pd.concat(results, sort=False) if len(results) > 0 else pd.DataFrame()
+
+    jobs.write_csv(NYA_insider, "Data/NYA_insider.csv")
+    sectors.update_Sectors(sector_rows)
+    job.finish(tickers)
 
 def load_Russell2000_insider():
     global Russell2000_insider
 
+    #the tickers finished before an interrupted refresh are read from the checkpoint
+    job = jobs.Job("Russell2000_insider", {"run": jobs.current_run()["id"]})
+
+    #sector and industry of every ticker read from its quote page
+    sector_rows = []
     for (tik, _, _) in Russell2000:
+        if job.done(tik):
+            continue
+        try:
+            quote = fetch.call("finviz.com", finvizfinance, tik)
+        except fetch.FetchError:
+            #not marked as finished, so a resumed refresh tries it again
+            continue
+        sector_rows.append(sectors.quote_sector(tik, quote))
         try:
-            insider = finvizfinance(tik)
-            df = insider.TickerInsideTrader()
+            df = quote.TickerInsideTrader()
             df["Ticker"] = tik
             df["Date"] = pd.to_datetime(df["Date"], format = "%b %d")
             df["Date"] = df["Date"] + pd.DateOffset(years = (datetime.date.today().year - df["Date"][0].year))
             df["Date"] = np.where(df["Date"].dt.month > datetime.date.today().month, df["Date"] + pd.DateOffset(years = -1), df["Date"])
-            Russell2000_insider = Russell2000_insider.append(df)
-        except:
-            pass
-
-    Russell2000_insider.to_csv("Data/Russell2000_insider.csv")
+            job.complete(tik, df)
+        except (KeyError, IndexError, TypeError, ValueError):
+            #no insider table for this ticker
+            job.complete(tik, None)
+
+    tickers = [tik for (tik, _, _) in Russell2000]
+    results = [df for df in job.results(tickers) if df is not None]
+    #the tickers that failed keep their rows of the previous file
+    previous = jobs.previous_rows("Data/Russell2000_insider.csv", "Ticker", job.missing(tickers), index_col=0, parse_dates=["Date"])
+    if len(previous) > 0:
+        results.append(previous)
+    Russell2000_insider = pd.concat(results, sort=False) if len(results) > 0 else pd.DataFrame()
+
+    jobs.write_csv(Russell2000_insider, "Data/Russell2000_insider.csv")
+    sectors.update_Sectors(sector_rows)
+    job.finish(tickers)
 
 #variables to store the combined lists of stocks, EPS and insider information for all the markets
 stocks_final = pd.DataFrame()
+#the combined stocks as prepared from the Data files (stocks_final is the same frame with the live bars on top, see apply_Live)
+stocks_stored = pd.DataFrame()
 full_tickersEPS = pd.DataFrame()
 insider_final = pd.DataFrame()
 
+#variables to store the combined quarterly and yearly rollups for all the markets
+quarterly_final = pd.DataFrame()
+yearly_final = pd.DataFrame()
+
+#variable to store the memory mapped price cube of every ticker (dense ticker x date layout)
+price_cube = None
+
+#variable to store the technical indicators of every ticker (dense ticker x date layout)
+indicators_final = None
+
+#variable to store the ranked trend strength table of each market
+forecasts_final = {}
+
+#screener over the combined stocks list (date and ticker indexes are built once)
+screener = None
+
+#version of the combined data (increased by every prepare_Data) and the filter results cached for it
+data_version = 0
+filter_cache = screen.ResultCache()
+
+#refresh times and views of every ticker, used by the background scheduler
+refresh_state = None
+
+#background scheduler refreshing the stalest tickers (None unless the user asked for it)
+background = None
+#rebuilds of the combined data after the background refreshes and the live quotes, and the store connection of their thread
+rebuilder = None
+rebuild_db = None
+
+#seconds between two snapshots written after background refreshes
+SNAPSHOT_INTERVAL = 15 * 60
+#when the last snapshot was written and the sources of the prepared data not written since (None when the snapshot is up to date)
+snapshot_time = 0
+snapshot_pending = None
+
+#indexed store of the ticker lists, EPS and insider transactions of every market
+insider_db = None
+
+#screening server the window is a client of (None when the data is loaded by the window)
+client = None
+
+#sector and industry of every ticker, the sector of every symbol and the daily aggregates of every sector and industry
+sector_list = pd.DataFrame(columns=["Symbol", "Sector", "Industry"])
+sector_names = {}
+sectors_final = {}
+
+#watchlists and saved screens (None until the data is loaded)
+watch_lists = None
+#watchlist of the watch button
+WATCHLIST = "Watchlist"
+
+#latest quote of every ticker polled in live mode, the bar of its day with the columns of the stocks frame (see quotes.parse_quotes)
+live_prices = {}
+
+#variable to store the clusters of insider buys of every ticker
+clusters_final = pd.DataFrame(columns=clusters.COLUMNS)
+
+#variable to store the returns after every insider transaction
+events_final = pd.DataFrame(columns=events.columns())
+
+#what the last prepare_Data changed (the entry of the change feed, None when nothing changed)
+changes_final = None
+
+#combine the data of every market and bring the derived data (rollups, forecasts, cube, indicators, screener) up to date
+#warm is a snapshot read back with snapshot.read_Snapshot, its combined data and screener indexes are used as they are
+#sources are the stats of the Data files taken before the data was read (snapshot.sources), None when they aren't known
+#refreshed are the tickers a background refresh changed ({source: [tickers]}), only their rows are replaced in the combined data
+#db is the store to read from (a thread other than the one that opened insider_db needs a connection of its own)
+def prepare_Data(rebuild_cube=False, warm=None, sources=None, refreshed=None, db=None):
+    global full_tickersEPS, stocks_final, stocks_stored, insider_final, quarterly_final, yearly_final, price_cube, indicators_final, clusters_final, screener, data_version, sector_list, sector_names, sectors_final, events_final, changes_final
+    db = db if db is not None else insider_db
+    #the derived data is built from the stored prices only, the live bars go back on top afterwards
+    stocks_final = stocks_stored
+    frames = {"SP500": (SP500_stocks, SP500_insider), "DJI": (DJI_stocks, DJI_insider), "IXIC": (IXIC_stocks, IXIC_insider), "NYA": (NYA_stocks, NYA_insider), "Russell2000": (Russell2000_stocks, Russell2000_insider)}
+
+    #bring the store up to date with the ticker list and insider files that changed
+    #(after a background refresh only the rows of the refreshed tickers are imported, not the whole insider files)
+    insider_tickers = refreshed.get("insider", []) if refreshed is not None else []
+    for index in scheduler.MARKETS:
+        insider = frames[index][1]
+        db.sync(index, insider.loc[insider["Ticker"].isin(insider_tickers)] if refreshed is not None and len(insider) > 0 else None)
+
+    if warm is not None:
+        #the Data files didn't change since the snapshot was written
+        full_tickersEPS, stocks_final, insider_final = warm["eps"], warm["stocks"], warm["insider"]
+    elif refreshed is not None and len(stocks_final) > 0:
+        #replace the rows of the refreshed tickers in the combined data
+        full_tickersEPS = db.read_EPS(scheduler.MARKETS)
+
+        tickers = refreshed.get("prices", [])
+        if len(tickers) > 0:
+            stocks_final = pd.concat([stocks_final.loc[~stocks_final["Name"].isin(tickers)]] + [stocks.loc[stocks["Name"].isin(tickers)] for (stocks, _) in frames.values() if len(stocks) > 0], sort=False)
+
+        if len(insider_tickers) > 0:
+            insider_final = pd.concat([insider_final.loc[~insider_final["Ticker"].astype(str).str.strip().isin(insider_tickers)], db.read_Insider(tickers=insider_tickers)], sort=False, ignore_index=True)
+    else:
+        #combine the read data of every market (the EPS and insider transactions come from the store, once per ticker)
+        full_tickersEPS = db.read_EPS(scheduler.MARKETS)
+
+        stocks_final = pd.concat([stocks for (stocks, _) in frames.values()], sort=False)
+
+        insider_final = db.read_Insider()
+
+    #detect the clusters of insider buys again for the tickers with new buys
+    clusters_final = clusters.refresh_Clusters(insider_final)
+
+    #join the new insider transactions (and the ones still waiting for their returns) to the following returns
+    events_final = events.refresh_Events(insider_final, stocks_final)
+
+    #bring the stored quarterly and yearly rollups of each market up to date with the new data
+    quarterly_final = pd.DataFrame()
+    yearly_final = pd.DataFrame()
+    for (index, (stocks, insider)) in frames.items():
+        if len(stocks) == 0:
+            continue
+        quarterly, yearly = rollups.refresh_Rollups(index, stocks, insider)
+        #rank the tickers of the market by trend strength (cached until the prices change)
+        forecasts_final[index] = forecast.refresh_Forecast(index, stocks)
+        quarterly_final = pd.concat([quarterly_final, quarterly], sort=False)
+        yearly_final = pd.concat([yearly_final, yearly], sort=False)
+
+    #the same ticker can be listed in more than one market
+    quarterly_final = quarterly_final[~quarterly_final.index.duplicated()]
+    yearly_final = yearly_final[~yearly_final.index.duplicated()]
+
+    #write the price cube after a download (or if there is none yet, or it was written from other stocks files) and map it from disk
+    price_cube = cube.read_Cube(sources)
+    if len(stocks_final) > 0 and (rebuild_cube or price_cube is None):
+        cube.write_Cube(stocks_final, sources)
+        price_cube = cube.read_Cube()
+
+    #bring the cached technical indicators up to date, only the days touched by new data are recomputed
+    indicators_final = None
+    if len(stocks_final) > 0:
+        indicators_final = indicators.refresh_Indicators(stocks_final, price_cube.panel() if price_cube is not None else None)
+
+    #build the screener over the combined data, with the tickers of each market for the market screens
+    markets = {"SP500": [t[0] for t in SP500], "DJI": [t[0] for t in DJI], "IXIC": [t[0] for t in IXIC], "NYA": [t[0] for t in NYA], "Russell2000": [t[0] for t in Russell2000]}
+    #every call builds a new version of the data, the filter results of the previous one are dropped
+    data_version += 1
+    sector_list = sectors.read_Sectors()
+    sector_names = dict(zip(sector_list["Symbol"], sector_list["Sector"]))
+    screener = screen.Screener(stocks_final, markets, full_tickersEPS, insider_final, quarterly_final, indicators_final, clusters_final, data_version, warm["indexes"] if warm is not None else None, sector_list)
+
+    #record which tickers gained price rows, which EPS values moved and which insider transactions are new as a version of the change feed
+    #(after a warm start it is usually None, unless the feed state was written by another run than the snapshot)
+    changes_final = changes.refresh_Changes(stocks_final, full_tickersEPS, insider_final, screener.indexes)
+
+    #add the new days of every ticker to the daily aggregates of its sector and industry
+    sectors_final = sectors.refresh_Sectors(stocks_final, insider_final, sector_list, screener.indexes)
+    stocks_stored = stocks_final
+
+#write the prepared data as the snapshot the next start maps back in
+#sources are the stats of the Data files taken before the data was read (snapshot.sources)
+#every is the least number of seconds since the last snapshot, a skipped one is left pending (see snapshot_pending)
+def save_Snapshot(sources, every=None):
+    global snapshot_time, snapshot_pending
+    if len(stocks_stored) == 0:
+        return
+    if every is not None and time.monotonic() - snapshot_time < every:
+        snapshot_pending = sources
+        return
+    markets = {"SP500": (SP500, SP500_stocks, SP500_insider), "DJI": (DJI, DJI_stocks, DJI_insider), "IXIC": (IXIC, IXIC_stocks, IXIC_insider),
+               "NYA": (NYA, NYA_stocks, NYA_insider), "Russell2000": (Russell2000, Russell2000_stocks, Russell2000_insider)}
+    #the live bars are not stored
+    stored, indexes = stocks_stored, screener.indexes if screener.stocks is stocks_stored else screen.build_indexes(stocks_stored)
+    snapshot.write_Snapshot(sources, markets, stored, insider_final, full_tickersEPS, indexes)
+    snapshot_time = time.monotonic()
+    snapshot_pending = None
+
+#put the live bars (the bar of the day of the last quote of every polled ticker) on top of the stored prices and screen them again
+#(the stored prices end the day before, a live bar of a stored day replaces the stored bar), without live bars the stored prices are used
+def apply_Live():
+    global stocks_final, screener, data_version
+    live = dict(live_prices)
+    if screener is None or len(stocks_stored) == 0 or (len(live) == 0 and stocks_final is stocks_stored):
+        return
+    stocks_final = quotes.overlay(stocks_stored, quotes.live_rows(live, stocks_stored))[0] if len(live) > 0 else stocks_stored
+    data_version += 1
+    screener = screen.Screener(stocks_final, screener.markets, full_tickersEPS, insider_final, quarterly_final, indicators_final, clusters_final, data_version, sectors=sector_list)
+
+#stop the background refresh when the window closes and write the snapshot the last rebuilds left pending
+def stop_Refresh():
+    if background is not None:
+        background.stop()
+    rebuilder.stop()
+    #a rebuild still running would be written half done
+    rebuilder.join(60)
+    if not rebuilder.is_alive() and snapshot_pending is not None:
+        save_Snapshot(snapshot_pending)
+
+#screen the saved screens again, after a refresh only the tickers whose data changed (changed, None for every ticker)
+#returns the alerts of the screens whose members changed
+def check_Alerts(changed=None):
+    if watch_lists is None or screener is None:
+        return []
+    return watch_lists.evaluate(screener, changed)
+
 #Entry Point
 if __name__ == "__main__":
     #create QApplication object
@@ -1220,6 +2021,18 @@ if __name__ == "__main__":
     #add icon to window
     app.setWindowIcon(QIcon('stock_icon.ico'))
 
+    #as a client of a screening server the window loads nothing, every filter is answered by the server
+    if len(sys.argv) > 2 and sys.argv[1] == "--client":
+        client = remote.ScreeningClient(sys.argv[2])
+        pairs = client.pairs()
+        SP500, DJI, IXIC, NYA, Russell2000 = [pairs[index] for index in scheduler.MARKETS]
+        #the watchlists are polled in live mode, the screens are checked by the window loading the data
+        watch_lists = watchlists.Watchlists()
+        widget = StockScreener()
+        widget.ui.show()
+        widget.ui.statusbar.showMessage("Connected to " + client.url + " (data version " + str(client.version) + ")")
+        sys.exit(app.exec_())
+
     #message box for the inicial prompt
     msgBox = QMessageBox()
     msgBox.setIcon(QMessageBox.Information)
@@ -1227,8 +2040,20 @@ if __name__ == "__main__":
     msgBox.setText("Update Ticker and Stock Data Before Starting?")
     msgBox.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
     msgBox.setDefaultButton(QMessageBox.Yes)
+    #the stalest tickers are only refreshed in the background while the window is open if the user asks for it
+    refreshBox = QCheckBox("Keep refreshing the stalest tickers in the background")
+    msgBox.setCheckBox(refreshBox)
     ret = msgBox.exec_()
 
+    #refresh times of every ticker, kept between runs
+    refresh_state = scheduler.RefreshState()
+
+    #open the store of the ticker lists and insider transactions
+    insider_db = database.Database()
+
+    #rows and peak memory of every file read from disk
+    load_stats = []
+
     #if the the user wants to download the data
     if ret == QMessageBox.Yes:
         #start a progress dialog to track the data download progress
@@ -1239,6 +2064,12 @@ if __name__ == "__main__":
 
         progress.setValue(0)
 
+        #every download of the refresh shares the same time budget
+        fetch.policy.start_refresh(fetch.REFRESH_BUDGET)
+        #an interrupted refresh is resumed from its checkpoints, with the prices up to the day it started
+        refresh_run = jobs.start_run()
+        refresh_end = datetime.date.fromisoformat(refresh_run["day"])
+
         load_SP500()
         progress.setValue(1)
 
@@ -1254,19 +2085,19 @@ if __name__ == "__main__":
         load_Russell2000()
         progress.setValue(5)
 
-        load_SP500_stocks(datetime.datetime(1986, 1, 1), datetime.date.today())
+        load_SP500_stocks(datetime.datetime(1986, 1, 1), refresh_end)
         progress.setValue(6)
 
-        load_DJI_stocks(datetime.datetime(1986, 1, 1), datetime.date.today())
+        load_DJI_stocks(datetime.datetime(1986, 1, 1), refresh_end)
         progress.setValue(7)
 
-        load_IXIC_stocks(datetime.datetime(1986, 1, 1), datetime.date.today())
+        load_IXIC_stocks(datetime.datetime(1986, 1, 1), refresh_end)
         progress.setValue(8)
 
-        load_NYA_stocks(datetime.datetime(1986, 1, 1), datetime.date.today())
+        load_NYA_stocks(datetime.datetime(1986, 1, 1), refresh_end)
         progress.setValue(9)
 
-        load_Russell2000_stocks(datetime.datetime(1986, 1, 1), datetime.date.today())
+        load_Russell2000_stocks(datetime.datetime(1986, 1, 1), refresh_end)
         progress.setValue(10)
 
         load_SP500_insider()
@@ -1284,49 +2115,82 @@ if __name__ == "__main__":
         load_Russell2000_insider()
         progress.setValue(15)
 
+        #report the downloads that failed even after retrying
+        if len(fetch.policy.failed) > 0:
+            stats = fetch.policy.stats()
+            msgBox = QMessageBox()
+            msgBox.setIcon(QMessageBox.Warning)
+            msgBox.setWindowTitle("Update Data")
+            msgBox.setText(str(len(fetch.policy.failed)) + " of " + str(stats["requests"]) + " downloads failed, the data of those tickers was not updated.")
+            msgBox.setDetailedText("\n".join(host + ": " + error for (host, error) in fetch.policy.failed))
+            msgBox.exec_()
+
+        #every ticker was just refreshed, the scheduler starts from here
+        refresh_state.mark_all([t[0] for t in SP500 + DJI + IXIC + NYA + Russell2000], datetime.datetime.utcnow())
+        refresh_state.save()
+
+        load_sources = snapshot.sources(scheduler.MARKETS)
+        warm_start = None
+
     else:
-        #if the the user wants to read the data
-        SP500 = read_Pairs("SP500")
-        DJI = read_Pairs("DJI")
-        IXIC = read_Pairs("IXIC")
-        NYA = read_Pairs("NYA")
-        Russell2000 = read_Pairs("Russell2000")
-
-        SP500_stocks = read_Stocks("SP500")
-        DJI_stocks = read_Stocks("DJI")
-        IXIC_stocks = read_Stocks("IXIC")
-        NYA_stocks = read_Stocks("NYA")
-        Russell2000_stocks = read_Stocks("Russell2000")
-
-        SP500_stocks['Date'] = pd.to_datetime(SP500_stocks['Date'])
-        DJI_stocks['Date'] = pd.to_datetime(DJI_stocks['Date'])
-        IXIC_stocks['Date'] = pd.to_datetime(IXIC_stocks['Date'])
-        NYA_stocks['Date'] = pd.to_datetime(NYA_stocks['Date'])
-        Russell2000_stocks['Date'] = pd.to_datetime(Russell2000_stocks['Date'])
-
-        SP500_stocks.set_index('Date', inplace=True)
-        DJI_stocks.set_index('Date', inplace=True)
-        IXIC_stocks.set_index('Date', inplace=True)
-        NYA_stocks.set_index('Date', inplace=True)
-        Russell2000_stocks.set_index('Date', inplace=True)
-
-        SP500_insider = read_Insider("SP500")
-        DJI_insider = read_Insider("DJI")
-        IXIC_insider = read_Insider("IXIC")
-        NYA_insider = read_Insider("NYA")
-        Russell2000_insider = read_Insider("Russell2000")
-
-    #append the read data to the combined data lists
-    full_tickersEPS = full_tickersEPS.append(pd.DataFrame(np.array(SP500)[:, ::-2], columns=["EPS", "Name"])).append(pd.DataFrame(np.array(DJI)[:, ::-2], columns=["EPS", "Name"])).append(pd.DataFrame(np.array(IXIC)[:, ::-2], columns=["EPS", "Name"])).append(pd.DataFrame(np.array(NYA)[:, ::-2], columns=["EPS", "Name"])).append(pd.DataFrame(np.array(Russell2000)[:, ::-2], columns=["EPS", "Name"]))
-    full_tickersEPS = full_tickersEPS.drop_duplicates(subset=['Name'])
-
-    stocks_final = stocks_final.append(SP500_stocks, sort=False).append(DJI_stocks, sort=False).append(IXIC_stocks, sort=False).append(NYA_stocks, sort=False).append(Russell2000_stocks, sort=False)
-
-    insider_final = insider_final.append(SP500_insider, sort=False).append(DJI_insider, sort=False).append(IXIC_insider, sort=False).append(NYA_insider, sort=False).append(Russell2000_insider, sort=False)
+        #the prepared data of the last run is mapped back in if the Data files didn't change since it was written
+        load_sources = snapshot.sources(scheduler.MARKETS)
+        warm_start = snapshot.read_Snapshot(load_sources)
+
+        if warm_start is not None:
+            (SP500, SP500_stocks, SP500_insider), (DJI, DJI_stocks, DJI_insider), (IXIC, IXIC_stocks, IXIC_insider), (NYA, NYA_stocks, NYA_insider), (Russell2000, Russell2000_stocks, Russell2000_insider) = [warm_start["markets"][index] for index in scheduler.MARKETS]
+        else:
+            #if the the user wants to read the data
+            SP500 = read_Pairs("SP500")
+            DJI = read_Pairs("DJI")
+            IXIC = read_Pairs("IXIC")
+            NYA = read_Pairs("NYA")
+            Russell2000 = read_Pairs("Russell2000")
+
+            load_stats = [{} for _ in range(10)]
+
+            SP500_stocks = read_Stocks("SP500", load_stats[0])
+            DJI_stocks = read_Stocks("DJI", load_stats[1])
+            IXIC_stocks = read_Stocks("IXIC", load_stats[2])
+            NYA_stocks = read_Stocks("NYA", load_stats[3])
+            Russell2000_stocks = read_Stocks("Russell2000", load_stats[4])
+
+            SP500_insider = read_Insider("SP500", load_stats[5])
+            DJI_insider = read_Insider("DJI", load_stats[6])
+            IXIC_insider = read_Insider("IXIC", load_stats[7])
+            NYA_insider = read_Insider("NYA", load_stats[8])
+            Russell2000_insider = read_Insider("Russell2000", load_stats[9])
+
+    #combine the data of the markets and build the derived data
+    prepare_Data(rebuild_cube=(ret == QMessageBox.Yes), warm=warm_start, sources=load_sources)
+    #and keep it for the next start
+    if warm_start is None:
+        save_Snapshot(load_sources)
+    #check the saved screens against the data as loaded (what changed since the last run is not known)
+    watch_lists = watchlists.Watchlists()
+    load_alerts = check_Alerts()
 
     #after all the data has been downloaded/parsed, start the main window
     widget = StockScreener()
     #show the main window
     widget.ui.show()
+    if warm_start is not None:
+        widget.ui.statusbar.showMessage("Loaded " + str(len(stocks_final)) + " rows from snapshot " + str(warm_start["number"]))
+    elif len(load_stats) > 0:
+        widget.ui.statusbar.showMessage("Loaded " + str(sum(stats.get("rows", 0) for stats in load_stats)) + " rows, peak " + "{:.1f}".format(max(stats.get("peak", 0) for stats in load_stats) / 2**20) + " MB")
+    widget.showAlerts(load_alerts)
+
+    #the combined data is rebuilt off the GUI thread after the live quotes and the background refreshes
+    rebuilder = scheduler.Debouncer(widget.rebuildData)
+    rebuilder.start()
+    app.aboutToQuit.connect(stop_Refresh)
+    #keep refreshing the stalest tickers in the background while the window is open
+    if refreshBox.isChecked():
+        store = {"stocks": {"SP500": SP500_stocks, "DJI": DJI_stocks, "IXIC": IXIC_stocks, "NYA": NYA_stocks, "Russell2000": Russell2000_stocks},
+                 "insider": {"SP500": SP500_insider, "DJI": DJI_insider, "IXIC": IXIC_insider, "NYA": NYA_insider, "Russell2000": Russell2000_insider},
+                 "pairs": {"SP500": SP500, "DJI": DJI, "IXIC": IXIC, "NYA": NYA, "Russell2000": Russell2000}}
+        background = scheduler.Scheduler(store, state=refresh_state)
+        background.subscribe(rebuilder.push)
+        background.start()
     #in the end exit the program when the close button is clicked
     sys.exit(app.exec_())
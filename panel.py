@@ -0,0 +1,77 @@
+# This Python file uses the following encoding: utf-8
+import hashlib
+
+#pandas and numpy imports for data storage and manipulation
+import pandas as pd
+import numpy as np
+
+#price columns kept in the dense layout
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Adj Close", "Volume", "Close_change"]
+
+
+#dense ticker x trading day layout of the long format stocks frame
+#every column is a 2D float array with one row per ticker and one column per trading day (NaN where a ticker has no data)
+class Panel:
+    def __init__(self, tickers, dates, data):
+        self.tickers = np.asarray(tickers)
+        self.dates = pd.DatetimeIndex(dates)
+        self.data = data
+        #ticker -> row lookup
+        self.codes = {t: i for i, t in enumerate(self.tickers)}
+
+    def __getitem__(self, column):
+        return self.data[column]
+
+    @property
+    def shape(self):
+        return (len(self.tickers), len(self.dates))
+
+    #row and column positions for pairs of ticker names and dates (-1 where they are not in the panel)
+    def locate(self, names, dates):
+        rows = pd.Series(np.asarray(names)).map(self.codes).fillna(-1).astype(np.int64).values
+        dates = pd.DatetimeIndex(dates)
+        cols = self.dates.get_indexer(dates)
+        return rows, cols
+
+    #values of a column for pairs of ticker names and dates (NaN where they are not in the panel)
+    def lookup(self, column, names, dates):
+        rows, cols = self.locate(names, dates)
+        found = (rows >= 0) & (cols >= 0)
+        result = np.full(len(rows), np.nan)
+        result[found] = self.data[column][rows[found], cols[found]]
+        return result
+
+    #wide dates x tickers frame of a column
+    def frame(self, column):
+        return pd.DataFrame(self.data[column].T, index=self.dates, columns=self.tickers)
+
+
+#build the dense layout from the long format stocks frame (Date index, one row per ticker and day)
+def build_panel(stocks, columns=PRICE_COLUMNS, dtype=np.float64):
+    dates = stocks.index if "Date" not in stocks.columns else stocks["Date"]
+    dates = pd.DatetimeIndex(pd.to_datetime(dates))
+
+    #factorize the tickers and trading days once, every column is then scattered with the same codes
+    rows, tickers = pd.factorize(stocks["Name"].values, sort=True)
+    cols, calendar = pd.factorize(dates.values, sort=True)
+
+    data = {}
+    for column in columns:
+        #the stocks loaders rename the daily close to Close_x when merging the quarterly sums
+        source = column if column in stocks.columns else column + "_x"
+        if source not in stocks.columns:
+            continue
+        values = np.full((len(tickers), len(calendar)), np.nan, dtype=dtype)
+        values[rows, cols] = pd.to_numeric(stocks[source], errors="coerce").values
+        data[column] = values
+
+    return Panel(tickers, calendar, data)
+
+#version of the prices in a panel, changes whenever a ticker, a day or a close changes
+def panel_version(panel, columns=("Close",)):
+    digest = hashlib.sha1()
+    digest.update("\n".join(map(str, panel.tickers)).encode())
+    digest.update(panel.dates.asi8.tobytes())
+    for column in columns:
+        digest.update(np.ascontiguousarray(panel.data[column]).tobytes())
+    return digest.hexdigest()
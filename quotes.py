@@ -0,0 +1,293 @@
+# This Python file uses the following encoding: utf-8
+import sys
+import time
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+#pandas and numpy imports for the day of a quote and the bars of the quotes
+import pandas as pd
+import numpy as np
+
+#timeouts and circuit breaking of the quote requests
+import fetch
+
+#quote API of yahoo finance (symbols=A,B,C answers every symbol in one response)
+QUOTE_URL = "https://query1.finance.yahoo.com/v7/finance/quote"
+#the quote API only answers with the crumb of a session cookie: the cookie page sets the cookie (and answers 404),
+#the crumb API gives the crumb of that cookie (the way yfinance gets them)
+COOKIE_URL = "https://fc.yahoo.com"
+CRUMB_URL = "https://query1.finance.yahoo.com/v1/test/getcrumb"
+#symbols per request and requests in flight at the same time
+QUOTE_BATCH = 50
+MAX_REQUESTS = 4
+#seconds between two quotes of a symbol: a moving symbol is asked again after MIN_INTERVAL, a quiet one waits SLOWDOWN
+#times longer every time up to MAX_INTERVAL, and outside the trading session every symbol waits CLOSED_INTERVAL
+MIN_INTERVAL = 2
+MAX_INTERVAL = 60
+CLOSED_INTERVAL = 300
+SLOWDOWN = 1.5
+#symbols due within this many seconds go in the same requests as the symbols already due
+COALESCE = 1.0
+#seconds to wait for a quote response (a late quote is worth less than the next one)
+READ_TIMEOUT = 10
+#columns of the stocks frame a quote updates (the bar of the day of the quote)
+LIVE_COLUMNS = ["Open", "High", "Low", "Close_x", "Adj Close", "Volume"]
+
+
+#quotes of a quote API response: {symbol: {"Date", the LIVE_COLUMNS, "time", "open"}}
+#Date is the day of the quote at the exchange and open whether the regular session is on
+def parse_quotes(payload):
+    quotes = {}
+    for item in (payload.get("quoteResponse") or {}).get("result") or []:
+        price = item.get("regularMarketPrice")
+        if item.get("symbol") is None or price is None:
+            continue
+        when = int(item.get("regularMarketTime", time.time()))
+        day = pd.Timestamp(when + int(item.get("gmtOffSetMilliseconds", 0)) // 1000, unit="s").normalize()
+        quotes[item["symbol"]] = {"Date": day, "Open": float(item.get("regularMarketOpen", price)), "High": float(item.get("regularMarketDayHigh", price)),
+                                  "Low": float(item.get("regularMarketDayLow", price)), "Close_x": float(price), "Adj Close": float(price),
+                                  "Volume": int(item.get("regularMarketVolume", 0)), "time": when, "open": item.get("marketState") == "REGULAR"}
+    return quotes
+
+#cookie page and crumb API that go with a quote API URL (the stand-in answers them under its own address as well)
+def session_urls(url):
+    base, found, _ = url.partition("query1.finance.yahoo.com")
+    if found == "":
+        return COOKIE_URL, CRUMB_URL
+    return base + "fc.yahoo.com", url.replace("/v7/finance/quote", "/v1/test/getcrumb")
+
+#bars of some quotes in the layout of the stocks frame: one row per symbol on the day of its quote (Date index), with the
+#daily change from the last close of the symbol before that day in a stocks frame (NaN without one)
+def live_rows(changed, stocks=None):
+    symbols = sorted(changed)
+    days = pd.DatetimeIndex([changed[symbol]["Date"] for symbol in symbols], name="Date")
+    bars = pd.DataFrame({column: [changed[symbol][column] for symbol in symbols] for column in LIVE_COLUMNS}, index=days)
+    bars["Name"] = symbols
+    previous = np.full(len(symbols), np.nan)
+    if stocks is not None and len(stocks) > 0 and len(symbols) > 0:
+        close = "Close_x" if "Close_x" in stocks.columns else "Close"
+        rows = stocks.loc[stocks["Name"].isin(symbols).values, ["Name", close]]
+        for (i, symbol) in enumerate(symbols):
+            before = rows.loc[(rows["Name"] == symbol).values & (rows.index < days[i])]
+            if len(before) > 0:
+                previous[i] = before[close].values[np.argmax(before.index.values)]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bars["Close_change"] = bars["Close_x"].values / previous - 1
+    bars["year"] = days.year
+    bars["Q"] = days.quarter
+    return bars
+
+#a stocks frame with some bars (see live_rows) in place of its rows of the same symbol and day, the bars of a day the frame
+#doesn't have yet are added at the end (only when add, the other bars are left out)
+#returns the new frame, the positions of the replaced rows and the positions of the added rows (the rows keep their positions)
+def overlay(frame, bars, add=True):
+    keys = {(name, day): i for (i, (name, day)) in enumerate(zip(bars["Name"].values, bars.index))}
+    candidates = np.flatnonzero(frame["Name"].isin(list(bars["Name"].unique())).values)
+    days = pd.DatetimeIndex(frame.index)
+    matched = [(p, keys[(frame["Name"].iat[p], days[p])]) for p in candidates if (frame["Name"].iat[p], days[p]) in keys]
+    replaced = np.array([p for (p, _) in matched], dtype=np.int64)
+    found = set(i for (_, i) in matched)
+    new = [i for i in range(len(bars)) if i not in found] if add else []
+    result = pd.concat([frame, bars.iloc[new]], sort=False) if len(new) > 0 else frame.copy()
+    columns = [column for column in bars.columns if column in frame.columns and column != "Name"]
+    if len(matched) > 0:
+        values = bars.iloc[[i for (_, i) in matched]][columns]
+        for column in columns:
+            position = result.columns.get_loc(column)
+            result.iloc[replaced, position] = values[column].values.astype(result[column].dtype, copy=False)
+    return result, replaced, np.arange(len(frame), len(result))
+
+#whether a quote differs from the last one of its symbol
+def _moved(old, new):
+    return old is None or any(old[column] != new[column] for column in LIVE_COLUMNS) or old["Date"] != new["Date"]
+
+
+#polls the latest quotes of the watched symbols in a background thread until stopped
+#the symbols due are coalesced into multi-symbol requests that run concurrently on an asyncio loop, every symbol has
+#its own interval (short while it moves, longer while it is quiet or the market is closed, longer for every failed request)
+#listener is called from the poller thread with the quotes that changed: {symbol: quote} (see parse_quotes)
+class QuotePoller(threading.Thread):
+    def __init__(self, listener, url=QUOTE_URL, batch=QUOTE_BATCH, requests=MAX_REQUESTS, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL, closed_interval=CLOSED_INTERVAL):
+        super(QuotePoller, self).__init__(daemon=True)
+        self.listener = listener
+        self.url = url
+        self.cookie_url, self.crumb_url = session_urls(url)
+        self.batch = batch
+        self.requests = requests
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.closed_interval = closed_interval
+        #a failed request is not retried, its symbols are asked again later
+        self.policy = fetch.FetchPolicy(read_timeout=READ_TIMEOUT, retries=0)
+        self.pool = ThreadPoolExecutor(requests)
+        self.lock = threading.Lock()
+        #crumb of the session cookie (None until it is asked for, and again once the quote API rejects it)
+        self.crumb = None
+        self.crumb_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.wanted = set()
+        self.loop = None
+        self.wake = None
+        #next time (time.monotonic) and interval of every watched symbol, last quote of every symbol ever polled
+        self.due = {}
+        self.intervals = {}
+        self.last = {}
+        #failed requests in a row
+        self.failures = 0
+        self.counts = {"requests": 0, "symbols": 0, "errors": 0, "changed": 0}
+
+    #poll these symbols from now on (the symbols on screen and on the watchlists)
+    def watch(self, symbols):
+        with self.lock:
+            self.wanted = set(symbols)
+            loop = self.loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self.wake.set)
+
+    def stop(self):
+        self.stopped.set()
+        with self.lock:
+            loop = self.loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self.wake.set)
+
+    def run(self):
+        asyncio.run(self._poll())
+        self.pool.shutdown(wait=False)
+
+    async def _poll(self):
+        wake = asyncio.Event()
+        with self.lock:
+            self.loop = asyncio.get_running_loop()
+            self.wake = wake
+        limit = asyncio.Semaphore(self.requests)
+        while not self.stopped.is_set():
+            wake.clear()
+            now = time.monotonic()
+            with self.lock:
+                wanted = set(self.wanted)
+            for symbol in wanted.difference(self.due):
+                self.due[symbol] = now
+                self.intervals[symbol] = self.min_interval
+            for symbol in set(self.due).difference(wanted):
+                del self.due[symbol]
+                del self.intervals[symbol]
+
+            due = sorted(symbol for (symbol, when) in self.due.items() if when <= now + COALESCE)
+            if len(due) > 0:
+                batches = [due[i:i + self.batch] for i in range(0, len(due), self.batch)]
+                #the changes of a request go out as soon as it is answered
+                for request in asyncio.as_completed([self._request(batch, limit) for batch in batches]):
+                    batch, quotes = await request
+                    changed = self._update(batch, quotes, time.monotonic())
+                    if len(changed) > 0 and not self.stopped.is_set():
+                        self.listener(changed)
+
+            wait = min(self.due.values()) - time.monotonic() if len(self.due) > 0 else self.max_interval
+            try:
+                await asyncio.wait_for(wake.wait(), max(wait, 0.05))
+            except asyncio.TimeoutError:
+                pass
+
+    #quotes of a batch of symbols (None if the request failed)
+    async def _request(self, batch, limit):
+        async with limit:
+            self.counts["requests"] += 1
+            self.counts["symbols"] += len(batch)
+            try:
+                response = await self.loop.run_in_executor(self.pool, lambda: self._get(batch))
+                return batch, parse_quotes(response.json())
+            except (fetch.FetchError, ValueError):
+                return batch, None
+
+    #cookie and crumb of a new session
+    def _session(self):
+        try:
+            self.policy.get(self.cookie_url)
+        except fetch.FetchError:
+            #the cookie page answers 404 with the cookie
+            pass
+        crumb = self.policy.get(self.crumb_url).text.strip()
+        if crumb == "" or "<" in crumb:
+            raise fetch.FetchError("no crumb from " + self.crumb_url)
+        return crumb
+
+    #quote API response of a batch (runs in the pool), a rejected crumb is asked for again once
+    def _get(self, batch):
+        for attempt in range(2):
+            with self.crumb_lock:
+                if self.crumb is None:
+                    self.crumb = self._session()
+                crumb = self.crumb
+            try:
+                return self.policy.get(self.url, params={"symbols": ",".join(batch), "crumb": crumb})
+            except fetch.FetchError as e:
+                if "HTTP 401" not in str(e) or attempt == 1:
+                    raise
+                with self.crumb_lock:
+                    if self.crumb == crumb:
+                        self.crumb = None
+
+    #keep the new quotes of a batch and schedule its symbols again, returns the quotes that changed
+    def _update(self, batch, quotes, now):
+        if quotes is None:
+            #back off while the quote API fails (or limits the rate)
+            self.failures += 1
+            self.counts["errors"] += 1
+            delay = min(self.min_interval * 2 ** self.failures, self.max_interval)
+            for symbol in batch:
+                if symbol in self.due:
+                    self.due[symbol] = now + delay
+            return {}
+
+        self.failures = 0
+        changed = {}
+        for symbol in batch:
+            #symbols no longer watched are dropped when the answer comes
+            if symbol not in self.due:
+                continue
+            quote = quotes.get(symbol)
+            if quote is None:
+                #unknown to the quote API
+                interval = self.max_interval
+            else:
+                if _moved(self.last.get(symbol), quote):
+                    changed[symbol] = quote
+                    interval = self.min_interval
+                else:
+                    interval = min(self.intervals[symbol] * SLOWDOWN, self.max_interval)
+                if not quote["open"]:
+                    interval = self.closed_interval
+                self.last[symbol] = quote
+            self.intervals[symbol] = interval
+            self.due[symbol] = now + interval
+        self.counts["changed"] += len(changed)
+        return changed
+
+
+#python quotes.py [--url URL] [--seconds N] SYMBOL... prints the quotes as they change
+#(python standin.py serve answers at http://127.0.0.1:8765/query1.finance.yahoo.com/v7/finance/quote)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Poll the latest quotes of some symbols")
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--url", default=QUOTE_URL)
+    parser.add_argument("--seconds", type=float, default=60)
+    args = parser.parse_args()
+
+    def show(changed):
+        for (symbol, quote) in sorted(changed.items()):
+            print(symbol + "\t" + str(quote["Date"]).split()[0] + "\t" + "{:.4f}".format(quote["Close_x"]) + "\t" + str(quote["Volume"]), flush=True)
+
+    poller = QuotePoller(show, args.url)
+    poller.watch(args.symbols)
+    poller.start()
+    try:
+        time.sleep(args.seconds)
+    except KeyboardInterrupt:
+        pass
+    poller.stop()
+    poller.join(5)
+    print(str(poller.counts["requests"]) + " requests, " + str(poller.counts["symbols"]) + " symbols asked, " + str(poller.counts["changed"]) + " changes, " + str(poller.counts["errors"]) + " errors")
+    sys.exit(0)
@@ -0,0 +1,86 @@
+# This Python file uses the following encoding: utf-8
+import json
+
+#HTTP client for the screening server
+import requests
+#pandas import for returning the results as data frames
+import pandas as pd
+
+#seconds to connect to the server and to wait for its answer (a large screen can take a while)
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 120
+
+
+#client of a screening server (python server.py), the results come back as the frames the window builds locally
+class ScreeningClient:
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.session = requests.Session()
+        #version of the server data of the last result
+        self.version = None
+
+    def _get(self, path, params=None):
+        response = self.session.get(self.url + path, params=params if params is not None else {}, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        response.raise_for_status()
+        return response.json()
+
+    #a streamed result: a header line with the columns and then the rows in blocks
+    def _frame(self, path, params):
+        params = dict(params)
+        params["stream"] = "1"
+        with self.session.get(self.url + path, params=params, stream=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as response:
+            response.raise_for_status()
+            lines = response.iter_lines()
+            head = json.loads(next(lines))
+            rows = []
+            for line in lines:
+                if line != b"":
+                    rows += json.loads(line)
+        self.version = head["version"]
+        return pd.DataFrame(rows, columns=head["columns"])
+
+    def status(self):
+        return self._get("/status")
+
+    #ticker list of every market as [symbol, name, EPS change]
+    def pairs(self):
+        result = self._get("/pairs")
+        return {index: [[symbol, name, eps if eps is not None else float("nan")] for (symbol, name, eps) in pairs] for (index, pairs) in result["pairs"].items()}
+
+    #stocks matching the boxes of the window (None for an empty box), indexed by date
+    def screen(self, start, end, price=None, sales=None, eps=None):
+        frame = self._frame("/screen", {"start": start, "end": end, "price": price, "sales": sales, "eps": eps})
+        frame["Date"] = pd.to_datetime(frame["Date"])
+        return frame.set_index("Date")
+
+    #insider transactions between two dates of a type (None for any)
+    def insider(self, start=None, end=None, transaction=None):
+        return self._frame("/insider", {"start": start, "end": end, "transaction": transaction})
+
+    #strongest cluster of buys of every ticker ending between two dates
+    def clusters(self, start=None, end=None):
+        frame = self._frame("/clusters", {"start": start, "end": end})
+        frame["Start"] = pd.to_datetime(frame["Start"])
+        frame["End"] = pd.to_datetime(frame["End"])
+        return frame
+
+    #tickers of a market ranked by trend strength (see forecast.compute_forecast)
+    def forecast(self, market="SP500"):
+        return self._frame("/forecast", {"market": market})
+
+    #return, breadth, volume and net insider flow of every sector (or industry) between two dates (see sectors.heatmap)
+    def sectors(self, level="Sector", start=None, end=None):
+        return self._frame("/sectors", {"level": level, "start": start, "end": end})
+
+    #track records of the insiders, relationships or transaction types over a horizon (see events.track_records)
+    def events(self, by="Insider_id", horizon=20, transaction=None, min_events=1):
+        return self._frame("/events", {"by": by, "horizon": horizon, "transaction": transaction, "min_events": min_events})
+
+    #what changed after a version of the server data: the tickers with new price rows, the EPS values that moved and the new
+    #insider transactions (full is True when everything has to be taken again, see changes.changes_since)
+    def changes(self, since=0):
+        return self._get("/changes", {"since": since})
+
+    #Top10 searches related to some keywords
+    def top10(self, keywords):
+        return self._frame("/top10", {"keyword": list(keywords)})
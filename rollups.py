@@ -0,0 +1,150 @@
+# This Python file uses the following encoding: utf-8
+import os
+
+#pandas and numpy imports for data storage and manipulation
+import pandas as pd
+import numpy as np
+
+#key columns for each rollup period (ticker + year or ticker + year + quarter)
+PERIOD_KEYS = {"quarterly": ["Name", "year", "Q"], "yearly": ["Name", "year"]}
+
+#price aggregate columns and how two partial aggregates of the same period are combined
+PRICE_COMBINE = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Adj Close": "last", "Volume": "sum", "Days": "sum", "Close_sum": "sum", "First_date": "min", "Last_date": "max"}
+
+#insider aggregate columns
+INSIDER_COLUMNS = ["Buy_value", "Sale_value", "Net_value", "Buy_shares", "Sale_shares", "Net_shares", "Insider_trades"]
+
+
+#file where the rollup of a market and period is stored
+def rollup_path(index, period):
+    return "Data/" + index + "_" + period + ".csv"
+
+#bring a stocks frame (as downloaded or as read from file) to a flat frame with Date, Name and Close columns
+def _flat_stocks(stocks):
+    tmp = stocks.reset_index() if "Date" not in stocks.columns else stocks
+    #the merge in the stocks loaders renames the daily close to Close_x
+    if "Close" not in tmp.columns:
+        tmp = tmp.rename(columns={"Close_x": "Close"})
+    tmp = tmp[["Date", "Name", "Open", "High", "Low", "Close", "Adj Close", "Volume"]].copy()
+    tmp["Date"] = pd.to_datetime(tmp["Date"])
+    tmp["year"] = tmp["Date"].dt.year
+    tmp["Q"] = tmp["Date"].dt.quarter
+    return tmp
+
+#aggregate daily price rows into one row per ticker and period
+def _price_rollup(flat, period):
+    keys = PERIOD_KEYS[period]
+    flat = flat.sort_values(["Name", "Date"], kind="mergesort")
+    rollup = flat.groupby(keys, sort=True).agg(
+        Open=("Open", "first"),
+        High=("High", "max"),
+        Low=("Low", "min"),
+        Close=("Close", "last"),
+        **{"Adj Close": ("Adj Close", "last")},
+        Volume=("Volume", "sum"),
+        Days=("Close", "size"),
+        Close_sum=("Close", "sum"),
+        First_date=("Date", "min"),
+        Last_date=("Date", "max"))
+    return rollup
+
+#aggregate insider rows into net buy/sell value and share counts per ticker and period
+def _insider_rollup(insider, period):
+    keys = PERIOD_KEYS[period]
+    if len(insider) == 0:
+        return pd.DataFrame(columns=keys + INSIDER_COLUMNS).set_index(keys)
+
+    tmp = pd.DataFrame({"Name": insider["Ticker"].astype(str).str.strip().values})
+    date = pd.to_datetime(insider["Date"]).values
+    tmp["year"] = pd.DatetimeIndex(date).year
+    tmp["Q"] = pd.DatetimeIndex(date).quarter
+
+    #buys count positive and sales negative, every other transaction type is ignored
+    buy = (insider["Transaction"] == "Buy").values
+    sale = (insider["Transaction"] == "Sale").values
+    value = pd.to_numeric(insider["Value ($)"], errors="coerce").fillna(0).values
+    shares = pd.to_numeric(insider["#Shares"], errors="coerce").fillna(0).values
+    tmp["Buy_value"] = np.where(buy, value, 0)
+    tmp["Sale_value"] = np.where(sale, value, 0)
+    tmp["Net_value"] = tmp["Buy_value"] - tmp["Sale_value"]
+    tmp["Buy_shares"] = np.where(buy, shares, 0)
+    tmp["Sale_shares"] = np.where(sale, shares, 0)
+    tmp["Net_shares"] = tmp["Buy_shares"] - tmp["Sale_shares"]
+    tmp["Insider_trades"] = (buy | sale).astype(np.int64)
+
+    return tmp.groupby(keys, sort=True)[INSIDER_COLUMNS].sum()
+
+#quarter over quarter (or year over year) change of the summed close, same as Close_y on the daily rows
+def _add_changes(rollup):
+    rollup = rollup.sort_index()
+    rollup["Close_change"] = rollup.groupby(level="Name")["Close_sum"].pct_change()
+    return rollup
+
+#join the price and insider aggregates of each period
+def _join(price, insider):
+    rollup = price.join(insider, how="outer")
+    rollup[INSIDER_COLUMNS] = rollup[INSIDER_COLUMNS].fillna(0)
+    return _add_changes(rollup)
+
+#build the rollup table of a market from scratch
+def build_rollups(stocks, insider, period):
+    return _join(_price_rollup(_flat_stocks(stocks), period), _insider_rollup(insider, period))
+
+#fold new daily and insider rows into an existing rollup table
+def update_rollups(rollup, stocks, insider, period):
+    keys = PERIOD_KEYS[period]
+    if rollup is None or len(rollup) == 0:
+        return build_rollups(stocks, insider, period)
+
+    #only the daily rows after the last date already rolled up for each ticker are new
+    flat = _flat_stocks(stocks)
+    last = rollup.groupby(level="Name")["Last_date"].max()
+    seen = flat["Name"].map(last)
+    flat = flat.loc[seen.isna() | (flat["Date"] > seen)]
+
+    price = rollup[list(PRICE_COMBINE)]
+    if len(flat) > 0:
+        new = _price_rollup(flat, period)
+        #periods that exist on both sides are combined, the rest are just added
+        both = price.index.intersection(new.index)
+        combined = pd.concat([price.loc[both], new.loc[both]]).groupby(level=keys, sort=False).agg(PRICE_COMBINE)
+        price = pd.concat([price.drop(both), combined, new.drop(both)])
+
+    #the insider pages are re-downloaded as a whole, so the periods they cover are rebuilt from them
+    #the oldest period of a ticker is usually cut by the start of the page (about a year back): it only replaces the stored
+    #period when it has at least as many trades, a period the page fully covers can only gain transactions
+    ins = rollup[INSIDER_COLUMNS]
+    fresh = _insider_rollup(insider, period)
+    if len(fresh) > 0:
+        oldest = ~fresh.index.get_level_values("Name").duplicated()
+        stored = ins["Insider_trades"].reindex(fresh.index).values
+        partial = oldest & ~np.isnan(stored.astype(np.float64)) & (fresh["Insider_trades"].values < stored)
+        fresh = fresh.loc[~partial]
+        ins = pd.concat([ins.drop(ins.index.intersection(fresh.index)), fresh])
+
+    return _join(price, ins)
+
+#read a stored rollup table
+def read_Rollups(index, period):
+    path = rollup_path(index, period)
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    rollup = pd.read_csv(path, parse_dates=["First_date", "Last_date"])
+    return rollup.set_index(PERIOD_KEYS[period])
+
+#bring the stored rollups of a market up to date with the given data and store them again
+def refresh_Rollups(index, stocks, insider):
+    result = []
+    for period in ["quarterly", "yearly"]:
+        rollup = update_rollups(read_Rollups(index, period), stocks, insider, period)
+        rollup.to_csv(rollup_path(index, period))
+        result.append(rollup)
+
+    return result
+
+#keys of the quarters whose summed close changed by the given percentage (the "sales" screen)
+def quarters_matching(quarterly, percent):
+    if len(quarterly) == 0:
+        return pd.MultiIndex.from_arrays([[], [], []], names=PERIOD_KEYS["quarterly"])
+    match = (round(quarterly["Close_change"], 4) * 100 == percent)
+    return quarterly.index[match.values]
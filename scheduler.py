@@ -0,0 +1,428 @@
+# This Python file uses the following encoding: utf-8
+import os
+import sys
+import json
+import math
+import datetime
+import threading
+
+#pandas and numpy imports for data storage and manipulation
+import pandas as pd
+import numpy as np
+
+#finance API imports (yahoo finance and finviz finance) for downloading stock data
+import yfinance as yf
+from finvizfinance.quote import finvizfinance
+
+#timeouts, retries and circuit breaking for every download
+import fetch
+#atomic writes of the stores
+import jobs
+#parsing of the ticker list files
+import database
+#EPS history extraction from the analysis pages
+import earnings
+#chunked loading of the stocks and insider files
+import ingest
+#sector and industry of every ticker
+import sectors
+
+#file where the refresh times and view counts of every ticker are kept
+STATE_PATH = "Data/refresh_state.json"
+#seconds between two refresh cycles
+INTERVAL = 60
+#maximum number of downloads per cycle (the network budget)
+BUDGET = 60
+#sources refreshed by the scheduler and how old (seconds) their data can get before it is stale
+#prices are only stale once a market session closed after the last refresh
+SOURCES = {"prices": None, "insider": 24 * 3600, "eps": 7 * 24 * 3600}
+#first day of the price history
+START = datetime.datetime(1986, 1, 1)
+#markets kept up to date
+MARKETS = ["SP500", "DJI", "IXIC", "NYA", "Russell2000"]
+#seconds the events of the cycles are gathered for before the combined data is rebuilt
+DEBOUNCE = 5
+#columns that identify an insider transaction (the rows already in the insider files are not appended again)
+INSIDER_KEY = ["Ticker", "Date", "Transaction", "Insider_id", "Cost", "#Shares", "#Shares Total", "SEC Form 4"]
+
+
+##########################################
+#NYSE trading calendar (times in UTC)    #
+##########################################
+#n-th weekday (0 = monday) of a month, negative n counts from the end of the month
+def _nth_weekday(year, month, weekday, n):
+    if n > 0:
+        day = datetime.date(year, month, 1)
+        day += datetime.timedelta(days=(weekday - day.weekday()) % 7 + 7 * (n - 1))
+    else:
+        day = datetime.date(year + (month == 12), month % 12 + 1, 1) - datetime.timedelta(days=1)
+        day -= datetime.timedelta(days=(day.weekday() - weekday) % 7)
+    return day
+
+#easter sunday (anonymous gregorian algorithm), good friday is 2 days before
+def _easter(year):
+    a, b, c = year % 19, year // 100, year % 100
+    d = (19 * a + b - b // 4 - (b - (b + 8) // 25 + 1) // 3 + 15) % 30
+    e = (32 + 2 * (b % 4) + 2 * (c // 4) - d - (c % 4)) % 7
+    f = d + e - 7 * ((a + 11 * d + 22 * e) // 451) + 114
+    return datetime.date(year, f // 31, f % 31 + 1)
+
+#fixed date holidays move to friday when on a saturday and to monday when on a sunday
+def _observed(day):
+    if day.weekday() == 5:
+        return day - datetime.timedelta(days=1)
+    if day.weekday() == 6:
+        return day + datetime.timedelta(days=1)
+    return day
+
+#days the exchange is closed in a year
+def holidays(year):
+    days = [_observed(datetime.date(year, 1, 1)), _nth_weekday(year, 1, 0, 3), _nth_weekday(year, 2, 0, 3),
+            _easter(year) - datetime.timedelta(days=2), _nth_weekday(year, 5, 0, -1), _observed(datetime.date(year, 7, 4)),
+            _nth_weekday(year, 9, 0, 1), _nth_weekday(year, 11, 3, 4), _observed(datetime.date(year, 12, 25))]
+    if year >= 2022:
+        days.append(_observed(datetime.date(year, 6, 19)))
+    return set(days)
+
+#whether the exchange has a session on a day
+def is_session(day):
+    return day.weekday() < 5 and day not in holidays(day.year)
+
+#hours between eastern time and UTC (daylight saving from the second sunday of march to the first sunday of november)
+def _eastern_offset(day):
+    dst = _nth_weekday(day.year, 3, 6, 2) <= day < _nth_weekday(day.year, 11, 6, 1)
+    return 4 if dst else 5
+
+#closing time of the session of a day in UTC (13:00 on the early close days, 16:00 otherwise)
+def session_close(day):
+    early = day == _nth_weekday(day.year, 11, 3, 4) + datetime.timedelta(days=1) or (day.month == 12 and day.day == 24) or (day.month == 7 and day.day == 3)
+    hour = (13 if early else 16) + _eastern_offset(day)
+    return datetime.datetime(day.year, day.month, day.day) + datetime.timedelta(hours=hour)
+
+#close of the last session that ended before a UTC time
+def last_close(now):
+    day = now.date()
+    while not is_session(day) or session_close(day) > now:
+        day -= datetime.timedelta(days=1)
+    return session_close(day)
+
+
+##########################################
+#Downloads of a single ticker            #
+##########################################
+#every download goes through the fetch policy of the scheduler (not the one of the loaders, see Scheduler)
+#recompute the daily and quarterly changes of the price rows of a ticker (same columns as the stocks loaders)
+def _with_changes(tmp):
+    tmp = tmp.sort_index()
+    tmp['Close_change'] = tmp['Close'].pct_change()
+    tmp["year"] = tmp.index.year
+    tmp["Q"] = tmp.index.quarter
+    return tmp.merge(tmp.groupby(["year", "Q"])["Close"].sum().pct_change(), left_on = ["year", "Q"], right_index = True)
+
+#download the prices of a ticker after the last stored day and merge them with its stored rows
+def refresh_prices(ticker, rows, policy):
+    start = START if len(rows) == 0 else rows.index.max().to_pydatetime() + datetime.timedelta(days=1)
+    new = policy.call("query1.finance.yahoo.com", yf.download, ticker, start=start, end=datetime.date.today(), progress=False)
+    if len(new) == 0:
+        return None
+    new['Name'] = ticker
+    old = rows.rename(columns={"Close_x": "Close"}).drop(columns=["Close_y", "Close_change", "year", "Q"], errors="ignore")
+    tmp = pd.concat([old, new[~new.index.isin(old.index)]], sort=False)
+    return _with_changes(tmp)
+
+#download the insider transactions of a ticker (same processing as the insider loaders)
+#(the sector and industry of the ticker are kept up to date from the same page)
+def refresh_insider(ticker, rows, policy):
+    quote = policy.call("finviz.com", finvizfinance, ticker)
+    sectors.update_Sectors([sectors.quote_sector(ticker, quote)])
+    df = quote.TickerInsideTrader()
+    df["Ticker"] = ticker
+    df["Date"] = pd.to_datetime(df["Date"], format = "%b %d")
+    df["Date"] = df["Date"] + pd.DateOffset(years = (datetime.date.today().year - df["Date"][0].year))
+    df["Date"] = np.where(df["Date"].dt.month > datetime.date.today().month, df["Date"] + pd.DateOffset(years = -1), df["Date"])
+    return df
+
+#rows of fresh that are not in old yet (the transactions compared by INSIDER_KEY)
+def new_insider(old, fresh):
+    if len(old) == 0:
+        return fresh
+    key = lambda frame: pd.MultiIndex.from_frame(frame[INSIDER_KEY].astype(str).apply(lambda column: column.str.strip()))
+    return fresh.loc[~key(fresh).isin(key(old))]
+
+#download the last quarter EPS change of a ticker
+def refresh_eps(ticker, rows, policy):
+    history = earnings.download_history(ticker, policy)
+    try:
+        return earnings.last_change(history)
+    except ZeroDivisionError:
+        return history["actual"][-1]
+    except IndexError:
+        return 0
+
+
+##########################################
+#Staleness bookkeeping                   #
+##########################################
+#last refresh time of every ticker and source, and how often each ticker was viewed
+class RefreshState:
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.refreshed = {source: {} for source in SOURCES}
+        self.views = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                saved = json.load(f)
+            for source in SOURCES:
+                self.refreshed[source].update(saved.get("refreshed", {}).get(source, {}))
+            self.views.update(saved.get("views", {}))
+
+    def save(self):
+        with self.lock:
+            with jobs.atomic_file(self.path) as f:
+                json.dump({"refreshed": self.refreshed, "views": self.views}, f)
+
+    #count a view of some tickers (results page, peers...)
+    def viewed(self, tickers):
+        with self.lock:
+            for ticker in set(tickers):
+                self.views[ticker] = self.views.get(ticker, 0) + 1
+
+    #when is a UTC time
+    def mark(self, source, ticker, when):
+        with self.lock:
+            self.refreshed[source][ticker] = (when - datetime.datetime(1970, 1, 1)).total_seconds()
+
+    #mark every ticker as refreshed for every source (after a full refresh)
+    def mark_all(self, tickers, when):
+        for source in SOURCES:
+            for ticker in tickers:
+                self.mark(source, ticker, when)
+
+    #tickers without a refresh time take the time their data file was written
+    def seed(self, source, tickers, path):
+        if not os.path.exists(path):
+            return
+        with self.lock:
+            for ticker in tickers:
+                self.refreshed[source].setdefault(ticker, os.path.getmtime(path))
+
+    #seconds the data of a ticker is stale for (0 when it is fresh, infinity when it was never refreshed)
+    def staleness(self, source, ticker, now):
+        last = self.refreshed[source].get(ticker)
+        if last is None:
+            return math.inf
+        last = datetime.datetime.utcfromtimestamp(last)
+        if SOURCES[source] is None:
+            #prices don't change until the next session closes
+            close = last_close(now)
+            return 0 if last >= close else (now - last).total_seconds()
+        age = (now - last).total_seconds()
+        return age if age >= SOURCES[source] else 0
+
+    #stale units ordered by priority: the stalest and most viewed tickers first
+    def plan(self, tickers, now, budget):
+        units = []
+        for source in SOURCES:
+            for ticker in tickers:
+                stale = self.staleness(source, ticker, now)
+                if stale > 0:
+                    weight = 1 + math.log1p(self.views.get(ticker, 0))
+                    units.append((min(stale, 1e12) * weight, source, ticker))
+        units.sort(key=lambda unit: -unit[0])
+        return [(source, ticker) for (_, source, ticker) in units[:budget]]
+
+
+##########################################
+#Background scheduler                    #
+##########################################
+#refreshes the stalest units within the network budget every cycle, in a background thread or headless
+#store holds the data of every market: {"stocks": {index: df}, "insider": {index: df}, "pairs": {index: list}}
+#listeners are called with {source: [tickers]} after each cycle that changed something
+#the downloads go through a fetch policy of its own, so its budget and statistics don't mix with the ones of a refresh of the loaders
+class Scheduler(threading.Thread):
+    def __init__(self, store, lock=None, state=None, interval=INTERVAL, budget=BUDGET, write=True, policy=None):
+        super(Scheduler, self).__init__(daemon=True)
+        self.store = store
+        self.lock = lock if lock is not None else threading.Lock()
+        self.state = state if state is not None else RefreshState()
+        self.interval = interval
+        self.budget = budget
+        self.write = write
+        self.policy = policy if policy is not None else fetch.FetchPolicy()
+        self.listeners = []
+        self.stopped = threading.Event()
+        self.refreshers = {"prices": refresh_prices, "insider": refresh_insider, "eps": refresh_eps}
+
+        #tickers that were never refreshed by the scheduler are as old as their data files
+        for (index, pairs) in store["pairs"].items():
+            tickers = [pair[0] for pair in pairs]
+            self.state.seed("prices", tickers, "Data/" + index + "_stocks.csv")
+            self.state.seed("insider", tickers, "Data/" + index + "_insider.csv")
+            self.state.seed("eps", tickers, "Data/" + index + ".csv")
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def stop(self):
+        self.stopped.set()
+
+    #every ticker of every market and the markets it is listed in
+    def _tickers(self):
+        markets = {}
+        for (index, pairs) in self.store["pairs"].items():
+            for pair in pairs:
+                markets.setdefault(pair[0], []).append(index)
+        return markets
+
+    #rows of a ticker in the stocks or insider frame of a market
+    def _rows(self, frame, ticker, column):
+        if len(frame) == 0 or column not in frame.columns:
+            return frame.iloc[0:0]
+        return frame.loc[frame[column] == ticker]
+
+    #run one refresh cycle, returns the tickers refreshed per source
+    def run_cycle(self, now=None):
+        now = now if now is not None else datetime.datetime.utcnow()
+        markets = self._tickers()
+        plan = self.state.plan(list(markets), now, self.budget)
+        results = {source: {} for source in SOURCES}
+
+        #download every planned unit (the store is only read here)
+        for (source, ticker) in plan:
+            if self.stopped.is_set():
+                break
+            index = markets[ticker][0]
+            if source == "prices":
+                rows = self._rows(self.store["stocks"].get(index, pd.DataFrame()), ticker, "Name")
+            elif source == "insider":
+                rows = self._rows(self.store["insider"].get(index, pd.DataFrame()), ticker, "Ticker")
+            else:
+                rows = None
+            try:
+                results[source][ticker] = self.refreshers[source](ticker, rows, self.policy)
+            except fetch.FetchError:
+                #tried again in a later cycle
+                continue
+            except (KeyError, IndexError, TypeError, ValueError):
+                #nothing to download for this ticker
+                results[source][ticker] = None
+            self.state.mark(source, ticker, now)
+
+        #swap the new frames into the store (copies, so readers of the old frames are not disturbed)
+        #the prices of a ticker are replaced (the changes of its last quarter are recomputed), its new insider transactions are added
+        #deltas holds the rows each Data file gains, only those are written
+        event = {source: [t for (t, value) in results[source].items() if value is not None] for source in SOURCES}
+        deltas = {}
+        with self.lock:
+            for index in set(i for t in event["prices"] for i in markets[t]):
+                frame = self.store["stocks"].get(index, pd.DataFrame())
+                tickers = [t for t in event["prices"] if index in markets[t]]
+                new = [results["prices"][t] for t in tickers]
+                old = [self._rows(frame, t, "Name") for t in tickers]
+                if len(frame) > 0:
+                    frame = frame.loc[~frame["Name"].isin(tickers)]
+                self.store["stocks"][index] = pd.concat([frame] + new, sort=False)
+                deltas[("stocks", index)] = pd.concat([rows.loc[~rows.index.isin(o.index)] for (rows, o) in zip(new, old)], sort=False)
+            for index in set(i for t in event["insider"] for i in markets[t]):
+                frame = self.store["insider"].get(index, pd.DataFrame())
+                tickers = [t for t in event["insider"] if index in markets[t]]
+                new = pd.concat([new_insider(self._rows(frame, t, "Ticker"), results["insider"][t]) for t in tickers], sort=False)
+                self.store["insider"][index] = pd.concat([frame, new], sort=False, ignore_index=True)
+                deltas[("insider", index)] = new
+            for ticker in event["eps"]:
+                for index in markets[ticker]:
+                    self.store["pairs"][index] = [[p[0], p[1], results["eps"][ticker]] if p[0] == ticker else p for p in self.store["pairs"][index]]
+                    deltas[("pairs", index)] = None
+
+        if self.write:
+            self._write(deltas)
+            earnings.history.save()
+        self.state.save()
+
+        if any(len(tickers) > 0 for tickers in event.values()):
+            for listener in self.listeners:
+                listener(event)
+        return event
+
+    #write what changed back to the Data files: the new rows are appended to the stocks and insider files
+    #(the rows already stored keep the quarterly change they were written with until the next full refresh rewrites the files)
+    def _write(self, deltas):
+        for ((key, index), rows) in deltas.items():
+            if key == "stocks":
+                jobs.append_csv(rows, "Data/" + index + "_stocks.csv")
+            elif key == "insider":
+                jobs.append_csv(rows, "Data/" + index + "_insider.csv")
+            else:
+                with jobs.atomic_file("Data/" + index + ".csv") as f:
+                    for pair in self.store["pairs"][index]:
+                        f.write(pair[0] + "," + pair[1] + "," + str(round(pair[2], 4)) + "\n")
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.policy.start_refresh(self.interval * 10)
+            self.run_cycle()
+            self.stopped.wait(self.interval)
+
+
+#hands the events of the scheduler to fn in a thread of its own, one call at a time
+#the events of the cycles that finish within delay seconds (or while fn is running) are merged into a single call
+#so a run of short cycles rebuilds the combined data once instead of once per cycle
+class Debouncer(threading.Thread):
+    def __init__(self, fn, delay=DEBOUNCE):
+        super(Debouncer, self).__init__(daemon=True)
+        self.fn = fn
+        self.delay = delay
+        self.pending = None
+        self.changed = threading.Condition()
+        self.stopped = threading.Event()
+
+    def push(self, event):
+        with self.changed:
+            if self.pending is None:
+                self.pending = {}
+            for (source, tickers) in event.items():
+                merged = self.pending.setdefault(source, [])
+                merged += [ticker for ticker in tickers if ticker not in merged]
+            self.changed.notify()
+
+    def stop(self):
+        self.stopped.set()
+        with self.changed:
+            self.changed.notify()
+
+    def run(self):
+        while not self.stopped.is_set():
+            with self.changed:
+                while self.pending is None and not self.stopped.is_set():
+                    self.changed.wait()
+            #more cycles may finish in the meantime
+            if self.stopped.wait(self.delay):
+                break
+            with self.changed:
+                event, self.pending = self.pending, None
+            self.fn(event)
+
+
+#read the stores of every market from the Data files
+def read_Store(indexes):
+    store = {"stocks": {}, "insider": {}, "pairs": {}}
+    for index in indexes:
+        with open("Data/" + index + ".csv", "r") as f:
+            store["pairs"][index] = [database.split_pair(pair) for pair in f.read().splitlines()]
+        if os.path.exists("Data/" + index + "_stocks.csv"):
+            store["stocks"][index] = ingest.read_stocks_csv("Data/" + index + "_stocks.csv")
+        if os.path.exists("Data/" + index + "_insider.csv"):
+            store["insider"][index] = ingest.read_insider_csv("Data/" + index + "_insider.csv")
+    return store
+
+
+#headless mode: keep refreshing the Data files without the window
+if __name__ == "__main__":
+    indexes = sys.argv[1:] if len(sys.argv) > 1 else MARKETS
+    scheduler = Scheduler(read_Store(indexes))
+    scheduler.subscribe(lambda event: print(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), {source: len(tickers) for (source, tickers) in event.items()}, flush=True))
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        scheduler.stop()
@@ -0,0 +1,585 @@
+# This Python file uses the following encoding: utf-8
+import datetime
+import threading
+from collections import OrderedDict
+
+#pandas and numpy imports for data storage and manipulation
+import pandas as pd
+import numpy as np
+
+#screening predicates over the technical indicators
+from indicators import OPERATORS
+#quarters matching the sales box in the quarterly rollups
+from rollups import quarters_matching
+#clustered insider buys
+from clusters import detect_clusters, WINDOW_DAYS, MIN_INSIDERS
+
+#memory the cached filter results are allowed to use (bytes)
+CACHE_BUDGET = 64 * 1024 * 1024
+
+
+#########################################################################
+#Query model: every node computes a boolean mask for a set of row positions.
+#Index backed nodes can also list the row positions they match directly,
+#the screener starts from the smallest of those and evaluates the rest of
+#the query as a single fused mask over those rows only.
+#Every node also has a normalized key (equal keys match the same rows, None
+#if the node can't be compared) and knows which nodes it implies, this is how
+#the result cache finds a cached result a new query only narrows.
+#########################################################################
+class Node:
+    def key(self):
+        return None
+
+    #every row matched by this node is matched by the other one
+    def implies(self, other):
+        return self.key() is not None and self.key() == other.key()
+
+#keys of a list of nodes, None if one of them has none
+def _keys(nodes):
+    keys = [n.key() for n in nodes]
+    return None if any(k is None for k in keys) else frozenset(keys)
+
+#top level nodes of a query (nested ANDs are flattened)
+def _conjuncts(query):
+    if not isinstance(query, And):
+        return [query]
+    return [n for node in query.nodes for n in _conjuncts(node)]
+
+class And(Node):
+    def __init__(self, *nodes):
+        self.nodes = list(nodes)
+
+    def key(self):
+        keys = _keys(_conjuncts(self))
+        return ("And", keys) if keys is not None else None
+
+    def mask(self, screener, rows):
+        result = np.ones(len(rows), dtype=bool)
+        for node in self.nodes:
+            #only the rows still matching are evaluated by the next node
+            left = np.flatnonzero(result)
+            if len(left) == 0:
+                break
+            result[left] = node.mask(screener, rows[left])
+        return result
+
+class Or(Node):
+    def __init__(self, *nodes):
+        self.nodes = list(nodes)
+
+    def key(self):
+        keys = _keys(self.nodes)
+        return ("Or", keys) if keys is not None else None
+
+    def mask(self, screener, rows):
+        result = np.zeros(len(rows), dtype=bool)
+        for node in self.nodes:
+            #only the rows not matched yet are evaluated by the next node
+            left = np.flatnonzero(~result)
+            if len(left) == 0:
+                break
+            result[left] = node.mask(screener, rows[left])
+        return result
+
+class Not(Node):
+    def __init__(self, node):
+        self.node = node
+
+    def key(self):
+        key = self.node.key()
+        return ("Not", key) if key is not None else None
+
+    def mask(self, screener, rows):
+        return ~self.node.mask(screener, rows)
+
+#rows between two dates (both included)
+class DateRange(Node):
+    def __init__(self, start=None, end=None):
+        self.start = np.datetime64(pd.Timestamp(start), "ns") if start is not None else None
+        self.end = np.datetime64(pd.Timestamp(end), "ns") if end is not None else None
+
+    def key(self):
+        return ("DateRange", self.start, self.end)
+
+    #a window inside another one
+    def implies(self, other):
+        if not isinstance(other, DateRange):
+            return False
+        return (other.start is None or (self.start is not None and self.start >= other.start)) and (other.end is None or (self.end is not None and self.end <= other.end))
+
+    def _bounds(self, screener):
+        lo = 0 if self.start is None else np.searchsorted(screener.sorted_dates, self.start, side="left")
+        hi = len(screener.sorted_dates) if self.end is None else np.searchsorted(screener.sorted_dates, self.end, side="right")
+        return lo, max(hi, lo)
+
+    def size(self, screener):
+        lo, hi = self._bounds(screener)
+        return hi - lo
+
+    def positions(self, screener):
+        lo, hi = self._bounds(screener)
+        return screener.date_order[lo:hi]
+
+    def mask(self, screener, rows):
+        dates = screener.dates[rows]
+        result = np.ones(len(rows), dtype=bool)
+        if self.start is not None:
+            result &= dates >= self.start
+        if self.end is not None:
+            result &= dates <= self.end
+        return result
+
+#rows of a set of tickers
+class Tickers(Node):
+    def __init__(self, names):
+        self.names = set(names)
+        self._cached = None
+
+    def key(self):
+        return ("Tickers", frozenset(self.names))
+
+    #tickers matched by the node
+    def names_for(self, screener):
+        return self.names
+
+    #ticker codes matched by the node (resolved once per screener)
+    def _codes(self, screener):
+        if self._cached is None or self._cached[0] is not screener:
+            codes = [screener.ticker_codes[n] for n in self.names_for(screener) if n in screener.ticker_codes]
+            self._cached = (screener, np.array(sorted(codes), dtype=np.int64))
+        return self._cached[1]
+
+    def size(self, screener):
+        return int(screener.ticker_counts[self._codes(screener)].sum())
+
+    def positions(self, screener):
+        codes = self._codes(screener)
+        if len(codes) == 0:
+            return np.array([], dtype=np.int64)
+        return np.concatenate([screener.ticker_order[screener.ticker_starts[c]:screener.ticker_starts[c + 1]] for c in codes])
+
+    def mask(self, screener, rows):
+        selected = np.zeros(len(screener.ticker_counts), dtype=bool)
+        selected[self._codes(screener)] = True
+        return selected[screener.codes[rows]]
+
+#rows of the tickers listed in a set of markets
+class Market(Tickers):
+    def __init__(self, *indexes):
+        Tickers.__init__(self, [])
+        self.indexes = indexes
+
+    def key(self):
+        return ("Market", frozenset(self.indexes))
+
+    def names_for(self, screener):
+        return set(t for index in self.indexes for t in screener.markets.get(index, []))
+
+#rows whose column is inside a range (both limits included, None for no limit)
+class Range(Node):
+    def __init__(self, column, low=None, high=None):
+        self.column = column
+        self.low = low
+        self.high = high
+
+    def key(self):
+        return ("Range", self.column, self.low, self.high)
+
+    #a range of the same column inside another one
+    def implies(self, other):
+        if not isinstance(other, Range) or other.column != self.column:
+            return False
+        return (other.low is None or (self.low is not None and self.low >= other.low)) and (other.high is None or (self.high is not None and self.high <= other.high))
+
+    def mask(self, screener, rows):
+        values = screener.column(self.column)[rows]
+        result = ~np.isnan(values)
+        if self.low is not None:
+            result &= values >= self.low
+        if self.high is not None:
+            result &= values <= self.high
+        return result
+
+#rows whose column, rounded to some decimals and scaled (to a percentage by default), is equal to a value
+#this is how the price box compares its input to the daily close change
+class Match(Node):
+    def __init__(self, column, value, scale=100, decimals=4):
+        self.column = column
+        self.value = value
+        self.scale = scale
+        self.decimals = decimals
+
+    def key(self):
+        return ("Match", self.column, float(self.value), self.scale, self.decimals)
+
+    def mask(self, screener, rows):
+        return np.round(screener.column(self.column)[rows], self.decimals) * self.scale == self.value
+
+#rows of the quarters whose summed close changed by a percentage (the sales box) according to the quarterly rollups
+class Quarters(Node):
+    def __init__(self, percent):
+        self.percent = percent
+
+    def key(self):
+        return ("Quarters", float(self.percent))
+
+    def mask(self, screener, rows):
+        quarters = quarters_matching(screener.quarterly, self.percent)
+        keys = pd.MultiIndex.from_arrays([screener.column("Name")[rows], screener.column("year")[rows], screener.column("Q")[rows]])
+        return keys.isin(quarters)
+
+#rows of the tickers whose last quarter EPS change is a percentage (the EPS box)
+class EPS(Tickers):
+    def __init__(self, percent, decimals=4):
+        Tickers.__init__(self, [])
+        self.percent = percent
+        self.decimals = decimals
+
+    def key(self):
+        return ("EPS", float(self.percent), self.decimals)
+
+    def names_for(self, screener):
+        eps = pd.to_numeric(screener.eps["EPS"], errors="coerce")
+        return set(screener.eps["Name"].loc[(eps.round(self.decimals) == round(self.percent / 100, self.decimals)).values])
+
+#rows of the tickers whose last quarter EPS change is inside a range of percentages (both limits included, None for no limit)
+class EPSRange(Tickers):
+    def __init__(self, low=None, high=None):
+        Tickers.__init__(self, [])
+        self.low = low
+        self.high = high
+
+    def key(self):
+        return ("EPSRange", self.low, self.high)
+
+    def names_for(self, screener):
+        eps = pd.to_numeric(screener.eps["EPS"], errors="coerce") * 100
+        keep = eps.notna()
+        if self.low is not None:
+            keep &= eps >= self.low
+        if self.high is not None:
+            keep &= eps <= self.high
+        return set(screener.eps["Name"].loc[keep.values])
+
+#rows of the tickers of some GICS sectors (or sub-industries with level="Industry")
+class Sector(Tickers):
+    def __init__(self, names, level="Sector"):
+        Tickers.__init__(self, [])
+        self.sectors = set(names)
+        self.level = level
+
+    def key(self):
+        return ("Sector", frozenset(self.sectors), self.level)
+
+    def names_for(self, screener):
+        if screener.sectors is None or len(screener.sectors) == 0:
+            return set()
+        return set(screener.sectors["Symbol"].loc[screener.sectors[self.level].isin(self.sectors).values])
+
+#date of a node parameter in the keys ("2021-01-05" and a Timestamp of that day are the same)
+def _day(value):
+    return pd.Timestamp(value) if value is not None else None
+
+#rows of the tickers with insider activity (transaction type, date range, minimum total value and number of insiders)
+class Insider(Tickers):
+    def __init__(self, transaction=None, start=None, end=None, min_value=None, min_insiders=None):
+        Tickers.__init__(self, [])
+        self.transaction = transaction
+        self.start = start
+        self.end = end
+        self.min_value = min_value
+        self.min_insiders = min_insiders
+
+    def key(self):
+        return ("Insider", self.transaction, _day(self.start), _day(self.end), self.min_value, self.min_insiders)
+
+    def names_for(self, screener):
+        insider = screener.insider
+        keep = np.ones(len(insider), dtype=bool)
+        if self.transaction is not None:
+            keep &= (insider["Transaction"] == self.transaction).values
+        dates = pd.to_datetime(insider["Date"])
+        if self.start is not None:
+            keep &= (dates >= pd.Timestamp(self.start)).values
+        if self.end is not None:
+            keep &= (dates <= pd.Timestamp(self.end)).values
+        rows = insider.loc[keep]
+        per_ticker = rows.groupby(rows["Ticker"].astype(str).str.strip()).agg(value=("Value ($)", "sum"), insiders=("Insider_id", "nunique"))
+        if self.min_value is not None:
+            per_ticker = per_ticker.loc[per_ticker["value"] >= self.min_value]
+        if self.min_insiders is not None:
+            per_ticker = per_ticker.loc[per_ticker["insiders"] >= self.min_insiders]
+        return set(per_ticker.index)
+
+#rows of the tickers where several distinct insiders bought within a window (clusters ending between two dates)
+class Cluster(Tickers):
+    def __init__(self, start=None, end=None, min_insiders=MIN_INSIDERS, min_value=None, window=WINDOW_DAYS):
+        Tickers.__init__(self, [])
+        self.start = start
+        self.end = end
+        self.min_insiders = min_insiders
+        self.min_value = min_value
+        self.window = window
+
+    def key(self):
+        return ("Cluster", _day(self.start), _day(self.end), self.min_insiders, self.min_value, self.window)
+
+    def names_for(self, screener):
+        #the clusters detected with the default window are kept by the screener
+        if screener.clusters is not None and self.window == WINDOW_DAYS and self.min_insiders == MIN_INSIDERS:
+            clusters = screener.clusters
+        else:
+            clusters = detect_clusters(screener.insider, self.window, self.min_insiders)
+        keep = (clusters["Insiders"] >= self.min_insiders).values
+        if self.start is not None:
+            keep &= (pd.to_datetime(clusters["End"]) >= pd.Timestamp(self.start)).values
+        if self.end is not None:
+            keep &= (pd.to_datetime(clusters["End"]) <= pd.Timestamp(self.end)).values
+        if self.min_value is not None:
+            keep &= (clusters["Value"] >= self.min_value).values
+        return set(clusters["Ticker"].loc[keep])
+
+#rows where an indicator (or price column) compares to a number or to another indicator, e.g. Indicator("Close", ">", "SMA_200")
+class Indicator(Node):
+    def __init__(self, left, op, right):
+        self.left = left
+        self.op = op
+        self.right = right
+
+    def key(self):
+        return ("Indicator", self.left, self.op, self.right)
+
+    def _values(self, screener, name, rows):
+        if screener.indicators is not None and name in screener.indicators.data:
+            return screener.indicators.lookup(name, screener.column("Name")[rows], screener.dates[rows])
+        return screener.column(name)[rows]
+
+    def mask(self, screener, rows):
+        values = self._values(screener, self.left, rows)
+        other = self._values(screener, self.right, rows) if isinstance(self.right, str) else self.right
+        with np.errstate(invalid="ignore"):
+            return OPERATORS[self.op](values, other)
+
+
+#query of the input boxes of the window: a date range and the price, sales and EPS boxes that are filled (None if empty)
+def form_query(start, end, price=None, sales=None, eps=None):
+    query = [DateRange(start, end)]
+    #compare the price in the input to the daily close change
+    if price is not None:
+        query.append(Match("Close_change", float(price)))
+    #compare the sales in the input to the quarters in the quarterly rollups
+    if sales is not None:
+        query.append(Quarters(float(sales)))
+    #compare the eps in the input to the eps of each ticker
+    if eps is not None:
+        query.append(EPS(float(eps)))
+    return And(*query)
+
+
+#node classes a saved query can use and the positions of their date arguments
+NODES = {cls.__name__: cls for cls in [And, Or, Not, DateRange, Tickers, Market, Range, Match, Quarters, EPS, EPSRange, Sector, Insider, Cluster, Indicator]}
+DATE_ARGUMENTS = {"DateRange": [0, 1], "Insider": [1, 2], "Cluster": [0, 1]}
+
+#JSON form of a query (the saved screens): [node class, arguments...] with the sub-queries nested and the dates as ISO days
+def to_spec(node):
+    if isinstance(node, (And, Or)):
+        return [type(node).__name__] + [to_spec(n) for n in node.nodes]
+    if isinstance(node, Not):
+        return ["Not", to_spec(node.node)]
+    key = node.key()
+    if key is None:
+        raise ValueError("a " + type(node).__name__ + " node can't be saved")
+    args = []
+    for value in key[1:]:
+        if isinstance(value, frozenset):
+            value = sorted(value)
+        elif isinstance(value, (np.datetime64, pd.Timestamp)):
+            value = str(pd.Timestamp(value).date())
+        args.append(value)
+    return [key[0]] + args
+
+#query of a JSON form, a date given as a number of days is relative to today (e.g. -90 for the last quarter)
+def from_spec(spec, today=None):
+    name, args = spec[0], list(spec[1:])
+    if name not in NODES:
+        raise ValueError("unknown node " + str(name))
+    if name in ["And", "Or", "Not"]:
+        return NODES[name](*[from_spec(arg, today) for arg in args])
+    today = pd.Timestamp(today if today is not None else datetime.date.today()).normalize()
+    for i in DATE_ARGUMENTS.get(name, []):
+        if i < len(args) and isinstance(args[i], (int, float)):
+            args[i] = str((today + pd.Timedelta(days=args[i])).date())
+    if name == "Market":
+        return Market(*args[0])
+    return NODES[name](*args)
+
+#whether a JSON form has relative dates (its matches move with the days)
+def is_relative(spec):
+    if spec[0] in ["And", "Or", "Not"]:
+        return any(is_relative(arg) for arg in spec[1:])
+    return any(i + 1 < len(spec) and isinstance(spec[i + 1], (int, float)) for i in DATE_ARGUMENTS.get(spec[0], []))
+
+
+#date order and ticker blocks of a stocks frame, the indexes of a screener (and what a snapshot stores of it)
+def build_indexes(stocks):
+    #sort permutation of the rows by date
+    dates = pd.DatetimeIndex(stocks.index).values.astype("datetime64[ns]")
+    date_order = np.argsort(dates, kind="mergesort")
+
+    #rows of each ticker as contiguous blocks of a sort permutation by ticker
+    codes, tickers = pd.factorize(stocks["Name"].values)
+    counts = np.bincount(codes, minlength=len(tickers))
+    return {"dates": dates, "date_order": date_order, "sorted_dates": dates[date_order], "codes": codes, "tickers": np.asarray(tickers, dtype=object),
+            "ticker_order": np.argsort(codes, kind="mergesort"), "ticker_counts": counts, "ticker_starts": np.concatenate([[0], np.cumsum(counts)])}
+
+
+#compiles and runs queries over the stocks frame
+#the date order and the ticker blocks are computed once (or given, e.g. by a snapshot) and used by the index backed nodes
+class Screener:
+    def __init__(self, stocks, markets=None, eps=None, insider=None, quarterly=None, indicators=None, clusters=None, version=0, indexes=None, sectors=None):
+        self.stocks = stocks
+        #version of the data the screener was built from, the cached results of other versions are dropped
+        self.version = version
+        self.markets = markets if markets is not None else {}
+        self.eps = eps
+        self.insider = insider
+        self.quarterly = quarterly
+        self.indicators = indicators
+        self.clusters = clusters
+        #sector and sub-industry of the tickers (sectors.read_Sectors)
+        self.sectors = sectors
+        self._columns = {}
+
+        self.indexes = indexes if indexes is not None else build_indexes(stocks)
+        self.dates = self.indexes["dates"]
+        self.date_order = self.indexes["date_order"]
+        self.sorted_dates = self.indexes["sorted_dates"]
+        self.codes = self.indexes["codes"]
+        self.ticker_codes = {t: i for i, t in enumerate(self.indexes["tickers"])}
+        self.ticker_order = self.indexes["ticker_order"]
+        self.ticker_counts = self.indexes["ticker_counts"]
+        self.ticker_starts = self.indexes["ticker_starts"]
+
+    #column of the stocks frame as an array (the daily close is stored as Close_x)
+    def column(self, name):
+        if name not in self._columns:
+            source = name if name in self.stocks.columns else name + "_x"
+            self._columns[name] = self.stocks[source].values
+        return self._columns[name]
+
+    #compile a query: the index backed nodes of the top level AND are sorted by how many rows they match,
+    #the smallest one gives the starting rows and the others are turned into masks over them
+    def compile(self, query):
+        nodes = list(query.nodes) if isinstance(query, And) else [query]
+        indexed = sorted([n for n in nodes if hasattr(n, "positions")], key=lambda n: n.size(self))
+        others = [n for n in nodes if not hasattr(n, "positions")]
+        if len(indexed) == 0:
+            return None, And(*others)
+        return indexed[0], And(*(indexed[1:] + others))
+
+    #row positions in the stocks frame matching a query, in the frame order
+    def rows(self, query):
+        start, rest = self.compile(query)
+        rows = np.arange(len(self.stocks)) if start is None else np.sort(start.positions(self))
+        return rows[rest.mask(self, rows)]
+
+    #stocks matching a query (the only copy made of the data), the rows come from a result cache if one is given
+    def run(self, query, cache=None):
+        return self.stocks.iloc[cache.rows(self, query) if cache is not None else self.rows(query)]
+
+    #tickers of some row positions
+    def tickers(self, rows):
+        return set(self.indexes["tickers"][np.unique(self.codes[rows])])
+
+    #screener over the rows of some tickers only, with their EPS, insider transactions, quarters and clusters
+    #(the stock rows come from the ticker blocks, so it is built in proportion to the rows of those tickers)
+    def subset(self, tickers):
+        names = set(tickers)
+        rows = np.sort(Tickers(names).positions(self))
+        def keep(frame, column):
+            if frame is None or len(frame) == 0:
+                return frame
+            #the distinct tickers are stripped rather than every row (the insider tickers can have spaces)
+            codes, uniques = pd.factorize(frame[column].values)
+            hit = np.append(pd.Index(uniques).astype(str).str.strip().isin(names), False)
+            return frame.loc[hit[codes]]
+        quarterly = self.quarterly
+        if quarterly is not None and len(quarterly) > 0:
+            quarterly = quarterly.loc[quarterly.index.get_level_values("Name").isin(names)]
+        return Screener(self.stocks.iloc[rows], self.markets, keep(self.eps, "Name"), keep(self.insider, "Ticker"), quarterly, self.indicators, keep(self.clusters, "Ticker"), self.version, sectors=self.sectors)
+
+
+#least recently used results of the queries (their row positions), with eviction by the memory they take
+#a query that only narrows a cached one (a smaller date window, an added filter) is evaluated on the cached rows
+#several threads can share the cache, the queries themselves run outside of the lock
+class ResultCache:
+    def __init__(self, budget=CACHE_BUDGET):
+        self.budget = budget
+        self.entries = OrderedDict()
+        self.size = 0
+        self.version = None
+        self.counts = {"hits": 0, "narrowed": 0, "misses": 0}
+        self.lock = threading.Lock()
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    #row positions matching a query, in the frame order (the array is shared with the cache and read only)
+    def rows(self, screener, query):
+        nodes = _conjuncts(query)
+        key = _keys(nodes)
+        with self.lock:
+            #results of an older version of the data are no longer valid (and a reader still on an older version doesn't use the cache)
+            if self.version is None or screener.version > self.version:
+                self.clear()
+                self.version = screener.version
+            if key is None or screener.version < self.version:
+                key = None
+            elif key in self.entries:
+                self.entries.move_to_end(key)
+                self.counts["hits"] += 1
+                return self.entries[key][1]
+            else:
+                base = self._narrowed(nodes)
+        if key is None:
+            return screener.rows(query)
+
+        #the cached rows are only used when they are fewer than the rows an index of the query starts from
+        start, _ = screener.compile(query)
+        if base is not None and start is not None and start.size(screener) < len(base[1]):
+            base = None
+        if base is None:
+            rows = screener.rows(query)
+            kind = "misses"
+        else:
+            #only the nodes the cached query doesn't have are evaluated, over its rows
+            cached_keys, cached_rows = base
+            rest = And(*[n for n in nodes if n.key() not in cached_keys])
+            rows = cached_rows[rest.mask(screener, cached_rows)]
+            kind = "narrowed"
+
+        rows.setflags(write=False)
+        with self.lock:
+            self.counts[kind] += 1
+            if screener.version == self.version and key not in self.entries:
+                self._put(key, nodes, rows)
+        return rows
+
+    #smallest cached result of a query implied by the nodes (every cached node is implied by one of them)
+    def _narrowed(self, nodes):
+        best = None
+        for (key, (cached, rows)) in self.entries.items():
+            if all(any(n.implies(c) for n in nodes) for c in cached):
+                if best is None or len(rows) < len(best[1]):
+                    best = (key, rows)
+        return best
+
+    def _put(self, key, nodes, rows):
+        if rows.nbytes > self.budget:
+            return
+        self.entries[key] = (nodes, rows)
+        self.size += rows.nbytes
+        while self.size > self.budget:
+            self.size -= self.entries.popitem(last=False)[1][1].nbytes
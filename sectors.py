@@ -0,0 +1,201 @@
+# This Python file uses the following encoding: utf-8
+import os
+import json
+import argparse
+
+#pandas and numpy imports for data storage and manipulation
+import pandas as pd
+import numpy as np
+
+#atomic writes of the sector list
+import jobs
+
+#file with the sector and industry of every ticker of every market, kept per ticker
+#(read from the finviz quote page of the ticker, the page its insider transactions come from)
+SECTORS_PATH = "Data/sectors.csv"
+#folder of the daily aggregates of every sector and industry
+AGGREGATES_DIR = "Data/sectors"
+#version of the stored aggregates, aggregates stored with another layout are rebuilt
+LAYOUT = 1
+#levels the tickers are grouped by
+LEVELS = ["Sector", "Industry"]
+
+#columns summed over the tickers of a group on a day (the prices of a ticker are only added once per day)
+PRICE_COLUMNS = ["Tickers", "Returns", "Return_sum", "Advancers", "Decliners", "Volume"]
+#insider values of the tickers of a group on a day (rebuilt from the insider transactions, they are re-downloaded as a whole)
+INSIDER_COLUMNS = ["Buy_value", "Sale_value"]
+
+
+##########################################
+#Sector and industry of every ticker     #
+##########################################
+#sector and industry of a ticker from its finviz quote page (a finvizfinance object): [symbol, sector, industry]
+#(None when the page doesn't have them)
+def quote_sector(ticker, quote):
+    try:
+        fundament = quote.TickerFundament()
+        return [ticker, fundament["Sector"].strip(), fundament["Industry"].strip()]
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+
+#add or replace the rows of some tickers in the sector list, rows of [symbol, sector, industry] (None rows are skipped)
+#the other tickers keep their rows, and the file is only written when a row changed
+def update_Sectors(rows, path=SECTORS_PATH):
+    rows = pd.DataFrame([row for row in rows if row is not None], columns=["Symbol", "Sector", "Industry"]).drop_duplicates(subset=["Symbol"], keep="last")
+    if len(rows) == 0:
+        return
+    old = read_Sectors(path)
+    kept = old.loc[~old["Symbol"].isin(rows["Symbol"])]
+    if len(kept) + len(rows) == len(old) and rows.merge(old, how="left", indicator=True)["_merge"].eq("both").all():
+        return
+    jobs.write_csv(pd.concat([kept, rows], sort=False), path, index=False)
+
+#read the sector list as a frame with Symbol, Sector and Industry (empty when it was never downloaded)
+def read_Sectors(path=SECTORS_PATH):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=["Symbol", "Sector", "Industry"])
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+
+##########################################
+#Daily aggregates of the groups          #
+##########################################
+#equal weighted return, breadth and net insider flow of the summed columns
+def _with_ratios(daily):
+    daily = daily.copy()
+    daily["Return"] = daily["Return_sum"] / daily["Returns"].where(daily["Returns"] > 0)
+    daily["Breadth"] = (daily["Advancers"] - daily["Decliners"]) / daily["Tickers"].where(daily["Tickers"] > 0)
+    daily["Net_insider"] = daily["Buy_value"] - daily["Sale_value"]
+    return daily
+
+#sums of the price columns per group and day for some rows of the stocks frame
+def _price_daily(level, groups, dates, change, volume):
+    frame = pd.DataFrame({level: groups, "Date": dates, "Tickers": np.ones(len(groups), dtype=np.int64), "Returns": (~np.isnan(change)).astype(np.int64),
+                          "Return_sum": np.nan_to_num(change), "Advancers": (change > 0).astype(np.int64), "Decliners": (change < 0).astype(np.int64), "Volume": volume})
+    return frame.groupby([level, "Date"], sort=True)[PRICE_COLUMNS].sum()
+
+#buy and sale values per group and day of the insider transactions
+def _insider_daily(level, insider, groups):
+    if insider is None or len(insider) == 0:
+        return pd.DataFrame(columns=[level, "Date"] + INSIDER_COLUMNS).set_index([level, "Date"])
+    tickers = insider["Ticker"].astype(str).str.strip()
+    value = pd.to_numeric(insider["Value ($)"], errors="coerce").fillna(0).values
+    frame = pd.DataFrame({level: tickers.map(groups).values, "Date": pd.to_datetime(insider["Date"]).values,
+                          "Buy_value": np.where((insider["Transaction"] == "Buy").values, value, 0), "Sale_value": np.where((insider["Transaction"] == "Sale").values, value, 0)})
+    frame = frame.loc[frame[level].notna()]
+    return frame.groupby([level, "Date"], sort=True)[INSIDER_COLUMNS].sum()
+
+#bring the daily aggregates of a level up to date with the stocks and insider frames
+#daily holds the stored sums and last the last day already added for every ticker, only the later rows of each ticker are added
+#groups maps every ticker to its group, a ticker moved to another group makes the aggregates be built again
+#indexes are the screener indexes of the stocks frame (dates and ticker codes)
+def update_daily(level, daily, last, stored_groups, stocks, insider, groups, indexes):
+    tickers = [str(t) for t in indexes["tickers"]]
+    if daily is None or any(groups.get(t) != g for (t, g) in stored_groups.items() if t in last):
+        daily = None
+        last = {}
+
+    #last added day (as datetime64[ns], NaT when none) and group (-1 when none) of every ticker code
+    seen = np.array([np.datetime64(last[t], "ns") if t in last else np.datetime64("NaT", "ns") for t in tickers], dtype="datetime64[ns]")
+    names = np.array(sorted(set(groups.values())), dtype=object)
+    position = {name: i for (i, name) in enumerate(names)}
+    group = np.array([position.get(groups.get(t), -1) for t in tickers], dtype=np.int64)
+    codes = indexes["codes"]
+    dates = indexes["dates"]
+    new = (group[codes] >= 0) & (np.isnat(seen[codes]) | (dates > seen[codes]))
+
+    price = daily[PRICE_COLUMNS] if daily is not None else None
+    rows = np.flatnonzero(new)
+    if len(rows) > 0:
+        #a ticker listed in several markets has its rows once per market, its day is added once
+        day = dates[rows].astype("datetime64[D]").astype(np.int64)
+        _, first = np.unique(codes[rows].astype(np.int64) * 2**20 + (day - day.min()), return_index=True)
+        rows = rows[np.sort(first)]
+        change = stocks["Close_change"].values[rows].astype(np.float64)
+        volume = stocks["Volume"].values[rows].astype(np.float64)
+        added = _price_daily(level, names[group[codes[rows]]], dates[rows], change, volume)
+        price = added if price is None else price.add(added, fill_value=0)
+
+        latest = pd.Series(dates[rows]).groupby(codes[rows]).max()
+        for (code, when) in latest.items():
+            last[tickers[code]] = str(pd.Timestamp(when).date())
+
+    if price is None:
+        price = pd.DataFrame(columns=[level, "Date"] + PRICE_COLUMNS).set_index([level, "Date"])
+    daily = price.join(_insider_daily(level, insider, groups), how="outer")
+    daily[PRICE_COLUMNS + INSIDER_COLUMNS] = daily[PRICE_COLUMNS + INSIDER_COLUMNS].fillna(0)
+    return _with_ratios(daily.sort_index()), last
+
+#read the stored aggregates of a level, their watermarks and the groups they were built with (None when there are none)
+def read_Daily(level, path=AGGREGATES_DIR):
+    meta_path = os.path.join(path, level + ".json")
+    if not os.path.exists(meta_path):
+        return None, {}, {}
+    with open(meta_path, "r") as f:
+        meta = json.load(f)
+    if meta.get("layout") != LAYOUT:
+        return None, {}, {}
+    data = np.load(os.path.join(path, level + ".npz"), allow_pickle=False)
+    index = pd.MultiIndex.from_arrays([data["groups"].astype(object), pd.DatetimeIndex(data["dates"])], names=[level, "Date"])
+    daily = pd.DataFrame({column: data[column] for column in PRICE_COLUMNS + INSIDER_COLUMNS}, index=index)
+    return _with_ratios(daily), meta["last"], meta["groups"]
+
+#store the aggregates of a level with their watermarks and groups
+def store_Daily(level, daily, last, groups, path=AGGREGATES_DIR):
+    os.makedirs(path, exist_ok=True)
+    with jobs.atomic_file(os.path.join(path, level + ".npz"), "wb") as f:
+        np.savez(f, groups=np.asarray(daily.index.get_level_values(0), dtype=str), dates=daily.index.get_level_values(1).values.astype("datetime64[ns]"),
+                 **{column: daily[column].values.astype(np.float64) for column in PRICE_COLUMNS + INSIDER_COLUMNS})
+    with jobs.atomic_file(os.path.join(path, level + ".json")) as f:
+        json.dump({"layout": LAYOUT, "last": last, "groups": groups}, f)
+
+#bring the stored aggregates of every level up to date and store them again: {level: daily frame}
+#sectors is the sector list (read_Sectors), the tickers without a sector are left out
+def refresh_Sectors(stocks, insider, sectors, indexes, path=AGGREGATES_DIR):
+    result = {}
+    for level in LEVELS:
+        groups = {symbol: group for (symbol, group) in zip(sectors["Symbol"], sectors[level]) if group != ""}
+        daily, last, stored_groups = read_Daily(level, path)
+        if len(stocks) == 0:
+            result[level] = daily
+            continue
+        daily, last = update_daily(level, daily, last, stored_groups, stocks, insider, groups, indexes)
+        store_Daily(level, daily, last, groups, path)
+        result[level] = daily
+    return result
+
+
+##########################################
+#Reading the aggregates                  #
+##########################################
+#one row per group between two days: compounded equal weighted return, mean breadth, total volume and net insider flow
+#(the table a heatmap or a sector screen reads, built from the daily aggregates only)
+def heatmap(daily, start=None, end=None):
+    if daily is None or len(daily) == 0:
+        return pd.DataFrame(columns=["Return", "Breadth", "Volume", "Net_insider", "Days"])
+    dates = daily.index.get_level_values("Date")
+    keep = np.ones(len(daily), dtype=bool)
+    if start is not None:
+        keep &= dates >= pd.Timestamp(start)
+    if end is not None:
+        keep &= dates <= pd.Timestamp(end)
+    rows = daily.loc[keep]
+    grouped = rows.groupby(level=0)
+    table = pd.DataFrame({"Return": grouped["Return"].apply(lambda r: np.prod(1 + r.dropna()) - 1), "Breadth": grouped["Breadth"].mean(),
+                          "Volume": grouped["Volume"].sum(), "Net_insider": grouped["Net_insider"].sum(), "Days": grouped.size()})
+    return table.sort_values("Return", ascending=False)
+
+
+#python sectors.py [--level Industry] [--start DAY] [--end DAY] prints the stored aggregates of every group between two days
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Returns, breadth, volume and insider flow of every sector")
+    parser.add_argument("--level", choices=LEVELS, default="Sector")
+    parser.add_argument("--start", default=None)
+    parser.add_argument("--end", default=None)
+    args = parser.parse_args()
+
+    daily, _, _ = read_Daily(args.level)
+    if daily is None:
+        print("no aggregates yet, they are built when the window loads the data")
+    else:
+        print(heatmap(daily, args.start, args.end).to_string(formatters={"Return": "{:.2%}".format, "Breadth": "{:+.3f}".format, "Volume": "{:.0f}".format, "Net_insider": "{:.0f}".format}))
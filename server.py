@@ -0,0 +1,346 @@
+# This Python file uses the following encoding: utf-8
+import sys
+import json
+import weakref
+import traceback
+import time
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+#pandas import for data storage and manipulation
+import pandas as pd
+
+#loading of the Data files, the combined data and the Top10 searches are the ones of the window
+import main
+#refresh times and background refresh of the stalest tickers
+import scheduler
+#indexed store of the ticker lists, EPS and insider transactions
+import database
+#screening queries and the cache of their results
+import screen
+#clustered insider buys
+import clusters
+#warm start from the prepared data of the last run
+import snapshot
+#CSV export of the results in bounded chunks
+import export
+#change feed of what every refresh changed
+import changes
+#trend forecasts of every market
+import forecast
+#daily aggregates of every sector and industry
+import sectors
+#returns after the insider transactions
+import events
+
+#port the server listens on (the stand-in of the market data websites uses 8765)
+SERVER_PORT = 8766
+#rows of a page when a page size isn't given (the page size of the window)
+PAGE_SIZE = 20000
+#rows per line of a streamed result
+STREAM_BLOCK = 5000
+#threads running the queries and seconds the Top10 searches of some keywords are kept
+WORKERS = 4
+TOP10_TTL = 3600
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+#one loaded version of the data, never changed once built (a refresh builds a new one)
+#a request keeps the snapshot it started with, so refreshes don't block or disturb the readers
+class Dataset:
+    def __init__(self):
+        self.version = main.data_version
+        self.screener = main.screener
+        self.insider = main.insider_final
+        self.clusters = main.clusters_final
+        #ranked trend strength table of every market
+        self.forecasts = dict(main.forecasts_final)
+        #daily aggregates of every sector and industry
+        self.sectors = dict(main.sectors_final)
+        #returns after every insider transaction
+        self.events = main.events_final
+        self.pairs = {index: getattr(main, index) for index in scheduler.MARKETS}
+        #version of the change feed the data is at
+        self.changes = changes.version()
+        self.loaded = time.time()
+
+
+#last value of a query parameter (None if missing or empty)
+def _param(params, name):
+    values = params.get(name, [])
+    return values[-1] if len(values) > 0 and values[-1] != "" else None
+
+#rows of a frame as a JSON array of arrays (dates in ISO format, NaN as null)
+def _values(frame):
+    return frame.to_json(orient="values", date_format="iso")
+
+#EPS change of a ticker list in JSON (NaN as null)
+def _pairs(pairs):
+    return [[pair[0], pair[1], pair[2] if pair[2] == pair[2] else None] for pair in pairs]
+
+
+#local HTTP/JSON server keeping one loaded dataset for every client
+#the requests are served by an asyncio loop, the queries run in a thread pool and the data is loaded and
+#rebuilt in a thread of its own (the SQLite store is only used from the thread that opened it)
+#GET /status, /pairs, /screen, /insider, /clusters, /forecast, /sectors, /events, /top10 and /changes, the results are paginated (page, size) or streamed (stream=1)
+#the screen and insider results can also be streamed as CSV (format=csv)
+class ScreeningServer:
+    def __init__(self, port=SERVER_PORT, refresh=False, workers=WORKERS):
+        self.port = port
+        self.refresh = refresh
+        self.dataset = None
+        self.cache = screen.ResultCache()
+        self.top10 = {}
+        self.top10_lock = threading.Lock()
+        self.readers = ThreadPoolExecutor(workers)
+        self.loader = ThreadPoolExecutor(1)
+        #connections whose response was started (an error after that can't be answered with a status anymore)
+        self.answered = weakref.WeakSet()
+        self.background = None
+        self.rebuilder = None
+        self.routes = {"/status": self.status, "/pairs": self.pairs, "/screen": self.screen, "/insider": self.insider, "/clusters": self.clusters, "/forecast": self.forecast, "/sectors": self.sectors,
+                       "/events": self.events, "/top10": self.top10_searches, "/changes": self.changes}
+
+    #read the Data files (or map the snapshot of the last run) and start the background refresh
+    def load(self):
+        main.refresh_state = scheduler.RefreshState()
+        main.insider_db = database.Database()
+        sources = snapshot.sources(scheduler.MARKETS)
+        warm = snapshot.read_Snapshot(sources)
+        if warm is not None:
+            store = {name: {index: warm["markets"][index][i] for index in scheduler.MARKETS} for (i, name) in enumerate(["pairs", "stocks", "insider"])}
+        else:
+            store = scheduler.read_Store(scheduler.MARKETS)
+        self._prepare(store, False, warm, sources)
+        if warm is None:
+            main.save_Snapshot(sources)
+        if self.refresh:
+            self.background = scheduler.Scheduler(store, state=main.refresh_state)
+            #the events of close cycles are merged, the rebuild runs in the loader thread (the one the store connection belongs to)
+            self.rebuilder = scheduler.Debouncer(lambda event: self.loader.submit(self._refreshed, event).result())
+            self.background.subscribe(self.rebuilder.push)
+            self.rebuilder.start()
+            self.background.start()
+
+    #build the combined data of a store and publish it as the new snapshot
+    #refreshed are the tickers of a background refresh, only their rows are replaced
+    def _prepare(self, store, rebuild_cube, warm=None, sources=None, refreshed=None):
+        for index in scheduler.MARKETS:
+            setattr(main, index, store["pairs"].get(index, []))
+            setattr(main, index + "_stocks", store["stocks"].get(index, pd.DataFrame()))
+            setattr(main, index + "_insider", store["insider"].get(index, pd.DataFrame()))
+        main.prepare_Data(rebuild_cube=rebuild_cube, warm=warm, sources=sources, refreshed=refreshed)
+        self.dataset = Dataset()
+
+    #the scheduler refreshed some tickers, the readers keep the old snapshot until the new one is built
+    def _refreshed(self, event):
+        sources = snapshot.sources(scheduler.MARKETS)
+        with self.background.lock:
+            store = {name: dict(frames) for (name, frames) in self.background.store.items()}
+        self._prepare(store, len(event.get("prices", [])) > 0, sources=sources, refreshed=event)
+        main.save_Snapshot(sources, main.SNAPSHOT_INTERVAL)
+
+    #serve until interrupted, the data is loaded while the server already answers (503 until it is ready)
+    def serve_forever(self):
+        asyncio.run(self._serve())
+
+    async def _serve(self):
+        self.loader.submit(self.load)
+        server = await asyncio.start_server(self.handle, "127.0.0.1", self.port)
+        async with server:
+            await server.serve_forever()
+
+    #one request per connection
+    async def handle(self, reader, writer):
+        try:
+            request = (await reader.readline()).decode("latin-1").split()
+            #the headers are not used
+            while (await reader.readline()) not in [b"\r\n", b"\n", b""]:
+                pass
+            if len(request) < 2:
+                return
+            if request[0] != "GET":
+                await self._send(writer, 405, {"error": "only GET is supported"})
+                return
+            url = urlsplit(request[1])
+            route = self.routes.get(url.path)
+            if route is None:
+                await self._send(writer, 404, {"error": "unknown path " + url.path})
+                return
+            dataset = self.dataset
+            if dataset is None:
+                await self._send(writer, 503, {"error": "loading"})
+                return
+            try:
+                await route(dataset, parse_qs(url.query), writer)
+            except ValueError as e:
+                await self._send(writer, 400, {"error": str(e)})
+        except ConnectionError:
+            pass
+        except Exception as e:
+            #any other error is answered too, instead of a connection closed without a response
+            #(a streamed answer already under way can only be cut short)
+            traceback.print_exc()
+            if writer not in self.answered:
+                try:
+                    await self._send(writer, 500, {"error": type(e).__name__ + ": " + str(e)})
+                except ConnectionError:
+                    pass
+        finally:
+            writer.close()
+
+    def _head(self, writer, status, headers):
+        self.answered.add(writer)
+        writer.write(("HTTP/1.1 " + str(status) + " " + STATUS_TEXT[status] + "\r\n").encode("latin-1"))
+        for (name, value) in list(headers.items()) + [("Connection", "close")]:
+            writer.write((name + ": " + value + "\r\n").encode("latin-1"))
+        writer.write(b"\r\n")
+
+    async def _send(self, writer, status, body, kind="application/json"):
+        data = (body if isinstance(body, str) else json.dumps(body)).encode("utf-8")
+        self._head(writer, status, {"Content-Type": kind, "Content-Length": str(len(data))})
+        writer.write(data)
+        await writer.drain()
+
+    #one line of a chunked response
+    def _chunk(self, writer, line):
+        data = (line + "\n").encode("utf-8")
+        writer.write(("%x\r\n" % len(data)).encode("latin-1") + data + b"\r\n")
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.readers, function, *args)
+
+    #a result frame as a page ({"version", "total", "page", "pages", "columns", "rows"})
+    #or streamed as JSON lines, a header ({"version", "total", "columns"}) and then the rows in blocks of STREAM_BLOCK
+    async def _send_frame(self, writer, dataset, frame, params):
+        columns = [str(c) for c in frame.columns]
+        if _param(params, "stream") == "1":
+            self._head(writer, 200, {"Content-Type": "application/x-ndjson", "Transfer-Encoding": "chunked"})
+            self._chunk(writer, json.dumps({"version": dataset.version, "total": len(frame), "columns": columns}))
+            for i in range(0, len(frame), STREAM_BLOCK):
+                self._chunk(writer, await self._run(_values, frame.iloc[i:i+STREAM_BLOCK]))
+                #a slow client holds the stream back instead of the rows piling up in memory
+                await writer.drain()
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+            return
+
+        size = int(_param(params, "size") or PAGE_SIZE)
+        page = int(_param(params, "page") or 0)
+        if size <= 0 or page < 0:
+            raise ValueError("page and size must be positive")
+        rows = await self._run(_values, frame.iloc[page*size:(page+1)*size])
+        pages = max(1, -(-len(frame) // size))
+        await self._send(writer, 200, '{"version": ' + str(dataset.version) + ', "total": ' + str(len(frame)) + ', "page": ' + str(page) + ', "pages": ' + str(pages) +
+                         ', "columns": ' + json.dumps(columns) + ', "rows": ' + rows + '}')
+
+    #rows of a frame streamed as CSV, a chunk of export.CHUNK_ROWS rows at a time copied out of the frame
+    async def _send_csv(self, writer, frame, rows):
+        self._head(writer, 200, {"Content-Type": "text/csv", "Transfer-Encoding": "chunked"})
+        texts = export.csv_chunks(frame, rows)
+        while True:
+            text = await self._run(next, texts, None)
+            if text is None:
+                break
+            data = text.encode("utf-8")
+            writer.write(("%x\r\n" % len(data)).encode("latin-1") + data + b"\r\n")
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def status(self, dataset, params, writer):
+        await self._send(writer, 200, {"version": dataset.version, "loaded": dataset.loaded, "stocks": len(dataset.screener.stocks), "insider": len(dataset.insider),
+                                       "clusters": len(dataset.clusters), "changes": dataset.changes, "cache": dict(self.cache.counts)})
+
+    #ticker list of every market
+    async def pairs(self, dataset, params, writer):
+        await self._send(writer, 200, {"version": dataset.version, "pairs": {index: _pairs(pairs) for (index, pairs) in dataset.pairs.items()}})
+
+    #stocks matching the boxes of the window: start, end, price, sales and eps
+    async def screen(self, dataset, params, writer):
+        query = screen.form_query(_param(params, "start"), _param(params, "end"), _param(params, "price"), _param(params, "sales"), _param(params, "eps"))
+        if _param(params, "format") == "csv":
+            await self._send_csv(writer, dataset.screener.stocks, await self._run(self.cache.rows, dataset.screener, query))
+            return
+        frame = await self._run(lambda: dataset.screener.run(query, self.cache).reset_index())
+        await self._send_frame(writer, dataset, frame, params)
+
+    #insider transactions between two dates (start, end) of a type (transaction, e.g. Buy or Sale)
+    async def insider(self, dataset, params, writer):
+        start = _param(params, "start")
+        end = _param(params, "end")
+        transaction = _param(params, "transaction")
+        rows = await self._run(export.insider_rows, dataset.insider, start, end, transaction)
+        if _param(params, "format") == "csv":
+            await self._send_csv(writer, dataset.insider, rows)
+            return
+        await self._send_frame(writer, dataset, dataset.insider.iloc[rows], params)
+
+    #strongest cluster of buys of every ticker ending between two dates (start, end)
+    async def clusters(self, dataset, params, writer):
+        frame = await self._run(clusters.rank_clusters, dataset.clusters, _param(params, "start"), _param(params, "end"))
+        await self._send_frame(writer, dataset, frame, params)
+
+    #tickers of a market (market, SP500 by default) ranked by trend strength
+    async def forecast(self, dataset, params, writer):
+        market = _param(params, "market") or scheduler.MARKETS[0]
+        if market not in scheduler.MARKETS:
+            raise ValueError("unknown market " + market)
+        frame = dataset.forecasts.get(market)
+        await self._send_frame(writer, dataset, frame if frame is not None else pd.DataFrame(columns=forecast.COLUMNS), params)
+
+    #return, breadth, volume and net insider flow of every sector (level, Sector or Industry) between two dates (start, end)
+    async def sectors(self, dataset, params, writer):
+        level = _param(params, "level") or sectors.LEVELS[0]
+        if level not in sectors.LEVELS:
+            raise ValueError("unknown level " + level)
+        frame = await self._run(sectors.heatmap, dataset.sectors.get(level), _param(params, "start"), _param(params, "end"))
+        frame.index.name = level
+        await self._send_frame(writer, dataset, frame.reset_index(), params)
+
+    #track records of the insiders (by, Insider_id, Relationship or Transaction) over a horizon (horizon, trading days), of the
+    #transactions of a type (transaction) and the groups with at least min_events events
+    async def events(self, dataset, params, writer):
+        by = _param(params, "by") or events.GROUPS[-1]
+        horizon = int(_param(params, "horizon") or events.HORIZONS[1])
+        if by not in events.GROUPS or horizon not in events.HORIZONS:
+            raise ValueError("unknown group or horizon")
+        min_events = int(_param(params, "min_events") or 1)
+        frame = await self._run(events.track_records, dataset.events, by, horizon, _param(params, "transaction"), min_events)
+        await self._send_frame(writer, dataset, frame.reset_index(), params)
+
+    #what changed in the prices, EPS and insider transactions after a version of the change feed (since, 0 for everything)
+    async def changes(self, dataset, params, writer):
+        since = int(_param(params, "since") or 0)
+        await self._send(writer, 200, await self._run(changes.changes_since, since))
+
+    #Top10 searches related to some keywords (keyword=...&keyword=...), shared by the clients for TOP10_TTL seconds
+    async def top10_searches(self, dataset, params, writer):
+        keywords = tuple(params.get("keyword", []))
+        if len(keywords) == 0:
+            raise ValueError("no keyword")
+        with self.top10_lock:
+            cached = self.top10.get(keywords)
+        if cached is None or time.time() - cached[0] > TOP10_TTL:
+            cached = (time.time(), await self._run(main.get_Top10_searches_US, list(keywords)))
+            with self.top10_lock:
+                self.top10[keywords] = cached
+        await self._send_frame(writer, dataset, cached[1], params)
+
+
+#python server.py [--port PORT] [--refresh] serves the Data folder to the windows started with python main.py --client URL
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local screening server shared by the stock screener windows")
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--refresh", action="store_true", help="refresh the stalest tickers in the background")
+    args = parser.parse_args()
+
+    print("serving on http://127.0.0.1:" + str(args.port), flush=True)
+    try:
+        ScreeningServer(args.port, args.refresh).serve_forever()
+    except KeyboardInterrupt:
+        sys.exit(0)
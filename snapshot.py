@@ -0,0 +1,129 @@
+# This Python file uses the following encoding: utf-8
+import os
+import json
+
+#pandas and numpy imports for data storage and manipulation
+import pandas as pd
+import numpy as np
+
+#the schemas the stocks and insider files are read with
+from ingest import STOCKS_SCHEMA, INSIDER_SCHEMA
+#versioned folder of the snapshots
+import jobs
+
+#folder of the snapshots, every snapshot is a subfolder and current.json names the one to read
+SNAPSHOT_DIR = "Data/snapshot"
+#version of the files layout, a snapshot written with another layout (or other schemas) is rebuilt
+LAYOUT = 1
+
+
+#files the prepared data is built from
+def _source_paths(indexes):
+    return ["Data/" + index + suffix for index in indexes for suffix in [".csv", "_stocks.csv", "_insider.csv"]]
+
+#modification time and size of the source files (None for a missing file)
+#taken before the data is read, so a file written while the data is prepared makes the snapshot stale
+def sources(indexes):
+    stats = {}
+    for path in _source_paths(indexes):
+        stats[path] = [os.path.getmtime(path), os.path.getsize(path)] if os.path.exists(path) else None
+    return stats
+
+#signature of the schemas, a snapshot of frames read with other columns or types is not used
+def _schemas():
+    return [sorted(STOCKS_SCHEMA.items()), sorted(INSIDER_SCHEMA.items())]
+
+
+#store an array in the snapshot folder: numbers and dates as they are, strings as codes into their distinct values
+def _write_array(path, name, values):
+    values = np.asarray(values)
+    if values.dtype == object or values.dtype.kind in "USO":
+        codes, uniques = pd.factorize(values)
+        np.save(os.path.join(path, name + ".codes.npy"), codes.astype(np.int32))
+        np.save(os.path.join(path, name + ".strings.npy"), np.asarray(uniques).astype(str))
+        return "strings"
+    np.save(os.path.join(path, name + ".npy"), values)
+    return "values"
+
+#read an array of the snapshot folder, the numbers and dates are mapped read only from disk
+def _read_array(path, name, kind):
+    if kind == "strings":
+        codes = np.load(os.path.join(path, name + ".codes.npy"))
+        strings = np.load(os.path.join(path, name + ".strings.npy")).astype(object)
+        #code -1 is a missing value
+        return np.append(strings, np.nan)[codes]
+    return np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+
+#store the columns (and the index) of a frame, returns how to read them back
+def _write_frame(path, name, frame):
+    columns = []
+    for (i, column) in enumerate(frame.columns):
+        columns.append([column, _write_array(path, name + "." + str(i), frame[column].values)])
+    index = None
+    if frame.index.name is not None:
+        index = [frame.index.name, _write_array(path, name + ".index", frame.index.values)]
+    return {"columns": columns, "index": index, "rows": len(frame)}
+
+def _read_frame(path, name, layout):
+    data = {column: _read_array(path, name + "." + str(i), kind) for (i, (column, kind)) in enumerate(layout["columns"])}
+    frame = pd.DataFrame(data, columns=[column for (column, _) in layout["columns"]], copy=False)
+    if layout["index"] is not None:
+        frame.index = pd.Index(_read_array(path, name + ".index", layout["index"][1]), name=layout["index"][0])
+    return frame
+
+
+#write the prepared data as a new snapshot and make it the current one
+#markets is {index: (pairs, stocks, insider)} in the order of the combined frames, stocks and insider the combined frames,
+#eps the EPS of every ticker and indexes the arrays of the screener built over stocks
+#the previous snapshots are removed (a snapshot still mapped by a running window is removed by a later write)
+def write_Snapshot(stats, markets, stocks, insider, eps, indexes, path=SNAPSHOT_DIR):
+    tmp, number = jobs.new_version(path)
+
+    #the market frames are stored once, concatenated, with the rows of each market
+    bounds = {}
+    for key in ["stocks", "insider"]:
+        frames = [markets[index][1 if key == "stocks" else 2] for index in markets]
+        sizes = [len(frame) for frame in frames]
+        starts = np.concatenate([[0], np.cumsum(sizes)]).astype(int).tolist()
+        bounds[key] = {index: [starts[i], starts[i + 1]] for (i, index) in enumerate(markets)}
+        frames = [frame for frame in frames if len(frame) > 0]
+        combined = pd.concat(frames, sort=False) if len(frames) > 0 else pd.DataFrame()
+        bounds[key + "_layout"] = _write_frame(tmp, "markets_" + key, combined)
+
+    meta = {"layout": LAYOUT, "number": number, "schemas": _schemas(), "sources": stats, "markets": list(markets), "bounds": bounds,
+            "pairs": {index: [[pair[0], pair[1], pair[2] if pair[2] == pair[2] else None] for pair in markets[index][0]] for index in markets},
+            "frames": {"stocks": _write_frame(tmp, "stocks", stocks), "insider": _write_frame(tmp, "insider", insider), "eps": _write_frame(tmp, "eps", eps)},
+            "indexes": {name: _write_array(tmp, "index_" + name, values) for (name, values) in indexes.items()}}
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    jobs.publish_version(path, tmp, number)
+
+#map the current snapshot back in (None when there is none, it was written with another layout or schemas,
+#or the source files changed since): {"markets": {index: (pairs, stocks, insider)}, "stocks", "insider", "eps", "indexes", "number"}
+def read_Snapshot(stats, path=SNAPSHOT_DIR):
+    folder = jobs.current_folder(path)
+    if folder is None:
+        return None
+    try:
+        with open(os.path.join(folder, "meta.json"), "r") as f:
+            meta = json.load(f)
+        if meta["layout"] != LAYOUT or meta["schemas"] != json.loads(json.dumps(_schemas())) or meta["sources"] != json.loads(json.dumps(stats)):
+            return None
+
+        markets = {}
+        combined = {key: _read_frame(folder, "markets_" + key, meta["bounds"][key + "_layout"]) for key in ["stocks", "insider"]}
+        for index in meta["markets"]:
+            pairs = [[symbol, name, eps if eps is not None else float("nan")] for (symbol, name, eps) in meta["pairs"][index]]
+            frames = []
+            for key in ["stocks", "insider"]:
+                start, end = meta["bounds"][key][index]
+                frames.append(combined[key].iloc[start:end] if end > start else pd.DataFrame())
+            markets[index] = (pairs, frames[0], frames[1])
+
+        return {"markets": markets, "stocks": _read_frame(folder, "stocks", meta["frames"]["stocks"]), "insider": _read_frame(folder, "insider", meta["frames"]["insider"]),
+                "eps": _read_frame(folder, "eps", meta["frames"]["eps"]), "indexes": {name: _read_array(folder, "index_" + name, kind) for (name, kind) in meta["indexes"].items()},
+                "number": meta["number"]}
+    except (OSError, KeyError, ValueError):
+        #a snapshot that can't be read is rebuilt
+        return None
@@ -0,0 +1,446 @@
+# This Python file uses the following encoding: utf-8
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import shutil
+import argparse
+import tempfile
+import datetime
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, quote, unquote
+
+#HTTP requests of the loaders and of the finance libraries
+import requests
+
+#numpy import for the synthetic prices
+import numpy as np
+
+#folder of the recorded responses, served instead of the synthetic ones when present
+#(Data/fixtures/standin/<host>/<quoted path and query>, the analysis pages saved by earnings.py are used as well)
+RECORDED_DIR = "Data/fixtures/standin"
+ANALYSIS_DIR = "Data/fixtures/analysis"
+#default size of the synthetic markets
+TICKERS = {"SP500": 50, "DJI": 30, "IXIC": 30, "NYA": 30, "Russell2000": 74}
+#pages of the Russell 2000 list (the loader always reads all of them)
+RUSSELL_PAGES = 74
+#insider transactions per ticker
+INSIDER_ROWS = 12
+#session cookie of the cookie page and its crumb (the quote API answers 401 without them)
+COOKIE = "A3=standin"
+CRUMB = "standincrumb"
+#keywords of the Top10 tables refreshed by the load test
+KEYWORDS = ["stocks", "shares", "invest"]
+
+
+##########################################
+#Synthetic market data                   #
+##########################################
+#deterministic random generator of a name (the same ticker always gets the same data)
+def _rng(name):
+    return np.random.RandomState(zlib.crc32(name.encode()) & 0x7fffffff)
+
+#tickers of every market, the DJI is part of the S&P 500 like the real one
+def universe(sizes=TICKERS):
+    markets = {}
+    markets["SP500"] = ["S" + str(i).zfill(3) for i in range(sizes["SP500"])]
+    markets["DJI"] = markets["SP500"][:min(sizes["DJI"], sizes["SP500"])]
+    markets["IXIC"] = ["Q" + str(i).zfill(3) for i in range(sizes["IXIC"])]
+    markets["NYA"] = ["N" + str(i).zfill(3) for i in range(sizes["NYA"])]
+    markets["Russell2000"] = ["R" + str(i).zfill(3) for i in range(sizes["Russell2000"])]
+    return markets
+
+def _company(ticker):
+    return "Company " + ticker + ", Inc."
+
+#sector and industry of a ticker (a few of each, some industry names have commas like the real ones)
+def _sector(ticker):
+    sector = ["Information Technology", "Health Care", "Financials", "Industrials", "Energy"][zlib.crc32(ticker.encode()) % 5]
+    return sector, sector + " " + ["Equipment", "Services", "Hotels, Resorts & Cruise Lines"][zlib.crc32((ticker + "industry").encode()) % 3]
+
+def _table(title, header, rows, attrs=""):
+    html = "<table " + attrs + "><thead><tr>" + "".join("<th><span>" + str(h) + "</span></th>" for h in [title] + header) + "</tr></thead><tbody>"
+    for row in rows:
+        html += "<tr>" + "".join("<td><span>" + str(c) + "</span></td>" for c in row) + "</tr>"
+    return html + "</tbody></table>"
+
+def _page(body):
+    #the real pages are mostly scripts, a bulky one keeps the parse cost realistic
+    return "<html><head><script>window.App = {\"state\": \"" + "x" * 200000 + "\"};</script></head><body>" + body + "</body></html>"
+
+#S&P 500 list page of Wikipedia
+def sp500_page(markets):
+    rows = "".join("<tr><td><a>" + t + "</a></td><td>" + _company(t) + "</td><td>" + _sector(t)[0] + "</td><td>" + _sector(t)[1] + "</td></tr>" for t in markets["SP500"])
+    return _page("<table class=\"wikitable sortable\"><tbody><tr><th>Symbol</th><th>Security</th><th>GICS Sector</th><th>GICS Sub-Industry</th></tr>" + rows + "</tbody></table>")
+
+#components page of an index on Yahoo
+def components_page(tickers):
+    return _page("<table><thead><tr><th>Symbol</th><th>Company Name</th><th>Last Price</th></tr></thead><tbody>" + "".join("<tr><td>" + t + "</td><td>" + _company(t) + "</td><td>1.0</td></tr>" for t in tickers) + "</tbody></table>")
+
+#analysis page of a ticker on Yahoo
+def analysis_page(ticker):
+    rng = _rng(ticker + "eps")
+    quarters = ["6/29/2020", "9/29/2020", "12/30/2020", "3/30/2021"]
+    estimate = np.round(rng.uniform(-1, 3, len(quarters)), 2)
+    actual = np.round(estimate + rng.normal(0, 0.3, len(quarters)), 2)
+    body = _table("Earnings Estimate", ["Current Qtr.", "Next Qtr."], [["No. of Analysts", 5, 6], ["Avg. Estimate", estimate[-1], estimate[-1]]])
+    body += _table("Revenue Estimate", ["Current Qtr.", "Next Qtr."], [["No. of Analysts", 5, 6]])
+    body += _table("Earnings History", quarters, [["EPS Est."] + list(estimate), ["EPS Actual"] + list(actual), ["Difference"] + list(np.round(actual - estimate, 2)), ["Surprise %"] + ["0.00%"] * len(quarters)])
+    body += _table("EPS Trend", ["Current Qtr."], [["Current Estimate", estimate[-1]]])
+    return _page(body)
+
+#page of the Russell 2000 list on CNN (the companies are in the fourth table)
+def russell_page(markets, page):
+    tickers = markets["Russell2000"][page - 1::RUSSELL_PAGES]
+    body = "".join(_table("Index", ["Value"], [["x", 1]]) for _ in range(3))
+    body += "<table><thead><tr><th>Company</th><th>Price</th></tr></thead><tbody>" + "".join("<tr><td>" + t + " " + _company(t) + "</td><td>1.0</td></tr>" for t in tickers) + "</tbody></table>"
+    return _page(body)
+
+#daily bars of a ticker between two unix times in the chart API format used by yfinance
+def chart_json(ticker, period1, period2):
+    days = np.arange(np.datetime64("1986-01-01"), np.datetime64("today") + 1)
+    days = days[np.is_busday(days)]
+    rng = _rng(ticker)
+    close = 20 * np.exp(np.cumsum(rng.normal(0.0001, 0.015, len(days))))
+    open_ = close * (1 + rng.normal(0, 0.005, len(days)))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, len(days))))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, len(days))))
+    volume = rng.randint(1e5, 1e7, len(days))
+    stamps = (days.astype("datetime64[s]").astype(np.int64) + 14 * 3600 + 30 * 60)
+    keep = (stamps >= period1) & (stamps < period2)
+    stamps = stamps[keep]
+    quote = {"open": open_[keep].round(4).tolist(), "high": high[keep].round(4).tolist(), "low": low[keep].round(4).tolist(), "close": close[keep].round(4).tolist(), "volume": volume[keep].tolist()}
+    meta = {"currency": "USD", "symbol": ticker, "exchangeName": "NYQ", "instrumentType": "EQUITY", "firstTradeDate": 504950400, "gmtoffset": -14400, "timezone": "EDT", "exchangeTimezoneName": "America/New_York", "priceHint": 2, "dataGranularity": "1d", "range": "", "validRanges": ["1d", "5d", "1mo", "max"],
+            "regularMarketPrice": quote["close"][-1] if len(stamps) > 0 else None, "currentTradingPeriod": {"regular": {"timezone": "EDT", "start": 0, "end": 0, "gmtoffset": -14400}}}
+    return {"chart": {"result": [{"meta": meta, "timestamp": stamps.tolist(), "indicators": {"quote": [quote], "adjclose": [{"adjclose": quote["close"]}]}}], "error": None}}
+
+#latest quotes of some tickers in the quote API format, the day starts at the last close of the chart and every ticker
+#moves every few seconds (some often, some rarely) with the volume growing through the day
+def quote_json(symbols, now=None):
+    now = time.time() if now is None else now
+    result = []
+    for symbol in symbols:
+        bars = chart_json(symbol, int(now) - 10 * 86400, int(now))["chart"]["result"][0]["indicators"]["quote"][0]
+        if len(bars["close"]) == 0:
+            continue
+        rng = _rng(symbol + "quote")
+        every = 2 + rng.randint(0, 30)
+        step = int(now // every)
+        open_ = bars["close"][-1]
+        price = round(open_ * (1 + 0.01 * _rng(symbol + str(step)).normal()), 4)
+        result.append({"symbol": symbol, "marketState": "REGULAR", "regularMarketTime": int(now), "gmtOffSetMilliseconds": -14400000,
+                       "regularMarketOpen": open_, "regularMarketDayHigh": max(open_, price), "regularMarketDayLow": min(open_, price),
+                       "regularMarketPrice": price, "regularMarketVolume": int(1000 * (step % 100000))})
+    return {"quoteResponse": {"result": result, "error": None}}
+
+#quote page of a ticker on finviz with its insider transactions table
+def finviz_page(ticker):
+    rng = _rng(ticker + "insider")
+    today = datetime.date.today()
+    rows = ""
+    for i in range(INSIDER_ROWS):
+        insider_id = 1000000 + rng.randint(0, 999999)
+        day = today - datetime.timedelta(days=int(rng.randint(1, 360)))
+        cost = round(float(rng.uniform(10, 300)), 2)
+        shares = int(rng.randint(100, 50000))
+        transaction = ["Buy", "Sale", "Option Exercise"][rng.randint(0, 3)]
+        rows += ("<tr><td><a href=\"insidertrading.ashx?oc=" + str(insider_id) + "&tc=7\">Insider " + str(insider_id) + "</a></td><td>Director</td><td>" + day.strftime("%b %d") + "</td><td>" + transaction + "</td><td>" + str(cost) + "</td><td>" + format(shares, ",") + "</td><td>" + format(int(cost * shares), ",") + "</td><td>" + format(shares * 3, ",")
+                 + "</td><td><a href=\"https://www.sec.gov/Archives/edgar/data/" + str(insider_id) + ".xml\">" + day.strftime("%b %d") + " 06:00 PM</a></td></tr>")
+    header = "<tr>" + "".join("<td>" + h + "</td>" for h in ["Insider Trading", "Relationship", "Date", "Transaction", "Cost", "#Shares", "Value ($)", "#Shares Total", "SEC Form 4"]) + "</tr>"
+    #quote header (the sixth table of the page) with the sector and industry, then the snapshot table
+    title = "".join("<table><tr><td></td></tr></table>" for i in range(5)) + "<table class=\"fullview-title\"><tr><td>" + ticker + "</td></tr><tr><td>" + _company(ticker) + "</td></tr><tr><td>" + " | ".join(_sector(ticker)) + " | USA</td></tr></table>"
+    snapshot = "<table class=\"snapshot-table2\"><tr><td>Index</td><td>-</td><td>P/E</td><td>-</td></tr></table>"
+    return _page(title + snapshot + "<table class=\"body-table\">" + header + rows + "</table>")
+
+#Google Trends explore and related topics responses (JSON behind the anti-hijacking prefix)
+def trends_explore(keyword):
+    request = {"restriction": {"geo": {"country": "US"}, "time": "today 3-m", "complexKeywordsRestriction": {"keyword": [{"type": "BROAD", "value": keyword}]}}, "keywordType": "ENTITY", "metric": ["TOP", "RISING"]}
+    widgets = [{"id": "TIMESERIES", "token": "t0", "request": {}}, {"id": "RELATED_TOPICS", "token": "t1", "request": request, "title": "Related topics"}, {"id": "RELATED_QUERIES", "token": "t2", "request": request, "title": "Related queries"}]
+    return ")]}'" + json.dumps({"widgets": widgets})
+
+def trends_related(keyword, markets):
+    rng = _rng(keyword)
+    tickers = [t for tickers in markets.values() for t in tickers]
+    top = [{"topic": {"mid": "/m/" + str(i), "title": _company(tickers[rng.randint(0, len(tickers))]) if i % 2 == 0 else keyword + " topic " + str(i), "type": "Topic"}, "value": 100 - 5 * i, "formattedValue": str(100 - 5 * i), "hasData": True, "link": "/trends/explore"} for i in range(10)]
+    return ")]}'," + json.dumps({"default": {"rankedList": [{"rankedKeyword": top}, {"rankedKeyword": []}]}})
+
+
+##########################################
+#Stand-in server                         #
+##########################################
+#failure injection and accounting shared by the handlers
+class Conditions:
+    def __init__(self, latency=0.0, tail=0.0, error_rate=0.0, rate_limit=None, seed=0):
+        self.latency = latency
+        self.tail = tail
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.counts = {}
+
+    #count a request of a host, returns the status to fail it with (None to serve it)
+    def admit(self, host):
+        with self.lock:
+            count = self.counts.setdefault(host, {"requests": 0, "errors": 0, "limited": 0})
+            count["requests"] += 1
+            #token bucket per host, refilled at rate_limit tokens per second
+            if self.rate_limit is not None:
+                now = time.monotonic()
+                tokens, last = self.buckets.get(host, (self.rate_limit, now))
+                tokens = min(self.rate_limit, tokens + (now - last) * self.rate_limit)
+                if tokens < 1:
+                    self.buckets[host] = (tokens, now)
+                    count["limited"] += 1
+                    return 429
+                self.buckets[host] = (tokens - 1, now)
+            if self.random.random() < self.error_rate:
+                count["errors"] += 1
+                return 503
+            delay = self.latency + (self.random.expovariate(1 / self.tail) if self.tail > 0 else 0)
+        time.sleep(delay)
+        return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.do_GET()
+
+    def do_GET(self):
+        #redirected requests keep their original host as the first part of the path
+        url = urlparse(self.path)
+        parts = url.path.split("/", 2)
+        host, path = (parts[1], "/" + (parts[2] if len(parts) > 2 else "")) if len(parts) > 1 and "." in parts[1] else (self.headers.get("Host", ""), url.path)
+        if self.headers.get("Content-Length"):
+            self.rfile.read(int(self.headers["Content-Length"]))
+
+        status = self.server.conditions.admit(host)
+        if status is not None:
+            self._send(status, "text/plain", "stand-in failure", {"Retry-After": "1"} if status == 429 else {})
+            return
+
+        #the quote API wants the session cookie and its crumb, like the real one
+        if host.endswith("finance.yahoo.com") and path.startswith("/v7/finance/quote") and not self._authorized(parse_qs(url.query)):
+            self._send(401, "application/json", json.dumps({"finance": {"result": None, "error": {"code": "Unauthorized", "description": "Invalid Crumb"}}}))
+            return
+
+        recorded = os.path.join(RECORDED_DIR, host, quote(path + ("?" + url.query if url.query else ""), safe=""))
+        if os.path.exists(recorded):
+            with open(recorded, "rb") as f:
+                self._send(200, "text/html; charset=utf-8", f.read())
+            return
+        response = self.server.route(host, path, parse_qs(url.query))
+        if response is None:
+            self._send(404, "text/plain", "not found")
+        else:
+            self._send(200, response[0], response[1], response[2] if len(response) > 2 else {})
+
+    def _authorized(self, query):
+        cookies = [cookie.strip() for cookie in self.headers.get("Cookie", "").split(";")]
+        return COOKIE in cookies and query.get("crumb", [""])[0] == CRUMB
+
+    def _send(self, status, kind, body, headers=None):
+        body = body.encode("utf-8") if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", kind)
+        self.send_header("Content-Length", str(len(body)))
+        for (key, value) in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+#local server answering in the shapes the loaders and the finance libraries expect
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, conditions=None, sizes=TICKERS):
+        ThreadingHTTPServer.__init__(self, ("127.0.0.1", port), _Handler)
+        self.conditions = conditions if conditions is not None else Conditions()
+        self.markets = universe(sizes)
+        self.thread = None
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:" + str(self.server_address[1])
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    #content type, body and headers of a synthetic response (None for unknown paths)
+    def route(self, host, path, query):
+        html = "text/html; charset=utf-8"
+        if host.endswith("wikipedia.org") and "List_of_S" in unquote(path):
+            return html, sp500_page(self.markets)
+        if host == "finance.yahoo.com" and path.startswith("/quote/"):
+            symbol = unquote(path.split("/")[2])
+            if path.endswith("/components"):
+                index = {"^DJI": "DJI", "^IXIC": "IXIC", "^NYA": "NYA"}.get(symbol)
+                return (html, components_page(self.markets[index])) if index is not None else None
+            if path.endswith("/analysis"):
+                saved = os.path.join(ANALYSIS_DIR, symbol + ".html")
+                if os.path.exists(saved):
+                    with open(saved, "r", encoding="utf-8") as f:
+                        return html, f.read()
+                return html, analysis_page(symbol)
+            return html, _page("")
+        if host.endswith("finance.yahoo.com") and path.startswith("/v8/finance/chart/"):
+            period1 = int(query.get("period1", ["0"])[0])
+            period2 = int(query.get("period2", [str(int(time.time()))])[0])
+            return "application/json", json.dumps(chart_json(unquote(path.split("/")[4]), period1, period2))
+        if host.endswith("finance.yahoo.com") and path.startswith("/v7/finance/quote"):
+            symbols = [symbol for symbol in query.get("symbols", [""])[0].split(",") if symbol != ""]
+            return "application/json", json.dumps(quote_json(symbols))
+        if host.endswith("finance.yahoo.com") and "getcrumb" in path:
+            return "text/plain", CRUMB
+        if host == "fc.yahoo.com":
+            #no Domain, the redirected requests all go to the address of the stand-in
+            return "text/plain", "", {"Set-Cookie": COOKIE + "; Path=/"}
+        if host == "money.cnn.com" and path.startswith("/data/markets/russell"):
+            return html, russell_page(self.markets, int(query.get("page", ["1"])[0]))
+        if host == "finviz.com" and path.startswith("/quote.ashx"):
+            return html, finviz_page(query.get("t", [""])[0])
+        if host == "trends.google.com":
+            if path.startswith("/trends/api/explore"):
+                keyword = json.loads(query.get("req", ["{}"])[0]).get("comparisonItem", [{"keyword": ""}])[0].get("keyword", "")
+                return "application/json", trends_explore(keyword)
+            if path.startswith("/trends/api/widgetdata/relatedsearches"):
+                request = json.loads(query.get("req", ["{}"])[0])
+                keyword = request.get("restriction", {}).get("complexKeywordsRestriction", {}).get("keyword", [{"value": ""}])[0]["value"]
+                return "application/json", trends_related(keyword, self.markets)
+            return html, _page(""), {"Set-Cookie": "NID=standin; Domain=.google.com; Path=/"}
+        return None
+
+
+#send every request made through the requests library (the loaders, yfinance, finvizfinance, pytrends) to the stand-in
+#the original host goes first in the path, the calls of the requests are timed for the harness
+class Redirect:
+    def __init__(self, base):
+        self.base = base
+        self.latencies = []
+        self.statuses = {}
+        self.lock = threading.Lock()
+        self.original = None
+
+    def __enter__(self):
+        self.original = requests.adapters.HTTPAdapter.send
+        redirect = self
+
+        def send(adapter, request, **kwargs):
+            url = urlparse(request.url)
+            request.url = redirect.base + "/" + url.netloc + url.path + ("?" + url.query if url.query else "")
+            start = time.perf_counter()
+            try:
+                resp = redirect.original(adapter, request, **kwargs)
+                status = resp.status_code
+                return resp
+            except requests.exceptions.RequestException:
+                status = "error"
+                raise
+            finally:
+                with redirect.lock:
+                    redirect.latencies.append(time.perf_counter() - start)
+                    redirect.statuses[status] = redirect.statuses.get(status, 0) + 1
+
+        requests.adapters.HTTPAdapter.send = send
+        return self
+
+    def __exit__(self, *args):
+        requests.adapters.HTTPAdapter.send = self.original
+
+
+##########################################
+#Refresh load test                       #
+##########################################
+#percentile of sorted values
+def _percentile(values, q):
+    return values[int(q * (len(values) - 1))] if len(values) > 0 else None
+
+#run a full refresh (ticker lists, prices, insider trades and the trends of the Top10 tables) against the stand-in
+#in a scratch folder and report the throughput, latencies and wall time
+def load_test(conditions=None, sizes=TICKERS, keywords=KEYWORDS):
+    server = StandInServer(conditions=conditions, sizes=sizes).start()
+    cwd = os.getcwd()
+    scratch = tempfile.mkdtemp()
+    os.makedirs(os.path.join(scratch, "Data"))
+    sys.path.insert(0, cwd)
+    try:
+        #the loaders write to Data in the working folder
+        os.chdir(scratch)
+        import main
+        import fetch
+        with Redirect(server.url) as redirect:
+            fetch.policy.start_refresh(fetch.REFRESH_BUDGET)
+            start = time.perf_counter()
+            steps = {}
+            for name in ["load_SP500", "load_DJI", "load_IXIC", "load_NYA", "load_Russell2000"]:
+                step = time.perf_counter()
+                getattr(main, name)()
+                steps[name] = time.perf_counter() - step
+            for index in ["SP500", "DJI", "IXIC", "NYA", "Russell2000"]:
+                step = time.perf_counter()
+                getattr(main, "load_" + index + "_stocks")(datetime.datetime(1986, 1, 1), datetime.date.today())
+                steps["load_" + index + "_stocks"] = time.perf_counter() - step
+            for index in ["SP500", "DJI", "IXIC", "NYA", "Russell2000"]:
+                step = time.perf_counter()
+                getattr(main, "load_" + index + "_insider")()
+                steps["load_" + index + "_insider"] = time.perf_counter() - step
+            step = time.perf_counter()
+            main.get_Top10_searches_US(list(keywords))
+            steps["get_Top10_searches_US"] = time.perf_counter() - step
+            wall = time.perf_counter() - start
+
+        latencies = sorted(redirect.latencies)
+        return {"wall": wall, "requests": len(latencies), "requests_per_second": len(latencies) / wall if wall > 0 else None,
+                "p50": _percentile(latencies, 0.50), "p99": _percentile(latencies, 0.99), "statuses": redirect.statuses,
+                "failed": len(fetch.policy.failed), "steps": steps, "server": server.conditions.counts}
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(scratch, ignore_errors=True)
+        server.stop()
+
+
+#python standin.py serve [--port N] runs the stand-in, python standin.py loadtest runs a full refresh against it
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the market data websites")
+    parser.add_argument("mode", choices=["serve", "loadtest"])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every response")
+    parser.add_argument("--tail", type=float, default=0.0, help="mean of an exponential extra delay (seconds)")
+    parser.add_argument("--errors", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--rate", type=float, default=None, help="requests per second allowed per host before 429")
+    parser.add_argument("--tickers", type=int, default=None, help="tickers per market (the DJI is capped at 30)")
+    args = parser.parse_args()
+
+    conditions = Conditions(args.latency, args.tail, args.errors, args.rate)
+    sizes = dict(TICKERS) if args.tickers is None else {"SP500": args.tickers, "DJI": min(args.tickers, 30), "IXIC": args.tickers, "NYA": args.tickers, "Russell2000": args.tickers}
+    if args.mode == "serve":
+        server = StandInServer(args.port, conditions, sizes)
+        print("serving on " + server.url + " (send requests to " + server.url + "/<host>/<path>)", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+    else:
+        report = load_test(conditions, sizes)
+        print("wall time: " + "{:.2f}".format(report["wall"]) + " s")
+        print("requests: " + str(report["requests"]) + " (" + "{:.1f}".format(report["requests_per_second"]) + " req/s), failed downloads: " + str(report["failed"]))
+        print("latency p50: " + "{:.1f}".format(1000 * report["p50"]) + " ms, p99: " + "{:.1f}".format(1000 * report["p99"]) + " ms")
+        print("statuses: " + str(report["statuses"]))
+        for (step, seconds) in report["steps"].items():
+            print("  " + step + ": " + "{:.2f}".format(seconds) + " s")
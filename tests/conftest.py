@@ -0,0 +1,26 @@
+# This Python file uses the following encoding: utf-8
+import os
+import sys
+
+import pytest
+
+#the modules of the app are at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+#stand-in of the market data websites
+import standin
+
+
+#stand-in server started with some failure conditions (standin.Conditions arguments), stopped after the test
+@pytest.fixture
+def stand_in():
+    servers = []
+
+    def start(**conditions):
+        server = standin.StandInServer(conditions=standin.Conditions(**conditions)).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
@@ -0,0 +1,71 @@
+# This Python file uses the following encoding: utf-8
+import numpy as np
+import pandas as pd
+import pytest
+
+#the command line backtests read the market list of the scheduler (which downloads with yfinance and finvizfinance)
+pytest.importorskip("yfinance")
+pytest.importorskip("finvizfinance")
+
+#backtests under test
+import backtest
+import screen
+from panel import build_panel
+
+
+#daily closes of two tickers over the first half of 2020 with their quarterly sums, and an insider buy of AAA traded on
+#2020-03-02 and filed on 2020-03-05
+@pytest.fixture
+def screener():
+    days = pd.bdate_range("2020-01-01", "2020-06-30")
+    stocks = pd.concat([pd.DataFrame({"Close": np.linspace(10, 20, len(days)), "Name": ticker}, index=pd.DatetimeIndex(days, name="Date")) for ticker in ["AAA", "BBB"]])
+    stocks["year"] = stocks.index.year
+    stocks["Q"] = stocks.index.quarter
+    stocks["Close_change"] = 0.0
+    quarterly = pd.DataFrame({"Close_change": [0.25, 0.1]}, index=pd.MultiIndex.from_tuples([("AAA", 2020, 1), ("BBB", 2020, 1)], names=["Name", "year", "Q"]))
+    insider = pd.DataFrame({"Ticker": ["AAA"], "Date": [pd.Timestamp("2020-03-02")], "Transaction": ["Buy"], "Value ($)": [2000000.0], "Insider_id": [1],
+                            "SEC Form 4": ["Mar 05 06:00 PM"]})
+    return screen.Screener(stocks, {"M": ["AAA", "BBB"]}, insider=insider, quarterly=quarterly)
+
+#days a ticker matches a query
+def _days(spec, screener):
+    panel = build_panel(screener.stocks)
+    matrix = backtest.signals(spec, screener, panel)
+    return {t: panel.dates[matrix[panel.codes[t]]] for t in panel.tickers}
+
+
+#the quarters of the sales box are seen from the first day after they end until the end of the next quarter
+def test_quarters_after_the_quarter(screener):
+    days = _days(["Quarters", 25.0], screener)
+    assert days["AAA"][0] == pd.Timestamp("2020-04-01")
+    assert days["AAA"][-1] == pd.Timestamp("2020-06-30")
+    assert len(days["BBB"]) == 0
+
+#an insider window with absolute dates only matches from the day the transaction was filed, not over the whole history
+def test_insider_absolute_point_in_time(screener):
+    days = _days(["Insider", "Buy", "2020-01-01", "2020-03-31", 1000000, None], screener)
+    assert days["AAA"][0] == pd.Timestamp("2020-03-05")
+    assert days["AAA"][-1] == pd.Timestamp("2020-06-30")
+    assert len(days["BBB"]) == 0
+
+    #a transaction outside of the dates never matches
+    assert len(_days(["Insider", "Buy", "2020-04-01", "2020-06-30", 1000000, None], screener)["AAA"]) == 0
+
+#a relative insider window starts on the day the transaction was filed, not on the day it was traded
+def test_insider_relative_from_filing(screener):
+    days = _days(["Insider", "Buy", -10, 0, 1000000, None], screener)
+    assert days["AAA"][0] == pd.Timestamp("2020-03-05")
+    assert days["AAA"][-1] == pd.Timestamp("2020-03-13")
+
+#a cluster is seen from the last filing of its buys
+def test_cluster_from_filing(screener):
+    screener.insider = pd.DataFrame({"Ticker": "AAA", "Date": pd.to_datetime(["2020-03-02", "2020-03-03", "2020-03-04"]), "Transaction": "Buy", "Value ($)": 1000.0,
+                                     "Insider_id": [1, 2, 3], "SEC Form 4": ["Mar 03 06:00 PM", "Mar 04 06:00 PM", "Mar 09 06:00 PM"]})
+    days = _days(["Cluster", "2020-01-01", "2020-06-30"], screener)
+    assert days["AAA"][0] == pd.Timestamp("2020-03-09")
+    assert len(days["BBB"]) == 0
+
+#the nodes that use the data as it is now are reported
+def test_lookahead():
+    assert backtest.lookahead(["And", ["EPSRange", 10, None], ["Not", ["EPS", 5.0]], ["Quarters", 25.0]]) == ["EPS", "EPSRange"]
+    assert backtest.lookahead(["Insider", "Buy", -90, 0, 1000000, None]) == []
@@ -0,0 +1,108 @@
+# This Python file uses the following encoding: utf-8
+import json
+
+import numpy as np
+import pandas as pd
+
+#change feed under test
+import changes
+import screen
+
+
+#daily closes of some tickers in the layout of the stocks files: {ticker: (first day, last day)}
+def _stocks(spans):
+    frames = []
+    for (ticker, (first, last)) in spans.items():
+        days = pd.bdate_range(first, last)
+        frames.append(pd.DataFrame({"Close": np.arange(1.0, len(days) + 1), "Volume": 100.0, "Name": ticker}, index=pd.DatetimeIndex(days, name="Date")))
+    return pd.concat(frames)
+
+#price changes between two stocks frames
+def _changes(old, new):
+    old_indexes = screen.build_indexes(old)
+    stored = changes.partitions(changes._price_rows(old, old_indexes), old_indexes["tickers"])
+    indexes = screen.build_indexes(new)
+    rows = changes._price_rows(new, indexes)
+    return changes.price_changes(stored, rows, changes.partitions(rows, indexes["tickers"]), indexes["tickers"])
+
+OLD = {"AAA": ("2020-01-01", "2020-01-10"), "BBB": ("2020-01-01", "2020-01-10")}
+
+
+#new days after the last stored day are appended, the stored days are left as they were
+def test_appended_days():
+    result, removed = _changes(_stocks(OLD), _stocks(dict(OLD, AAA=("2020-01-01", "2020-01-14"))))
+    assert result == {"AAA": {"first": "2020-01-13", "last": "2020-01-14", "rows": 2, "rewritten": False}}
+    assert removed == []
+
+    #the new days of a new year are a new partition, still appended
+    result, _ = _changes(_stocks(OLD), pd.concat([_stocks(OLD), _stocks({"BBB": ("2021-01-04", "2021-01-05")})]))
+    assert result == {"BBB": {"first": "2021-01-04", "last": "2021-01-05", "rows": 2, "rewritten": False}}
+
+    #nothing changed
+    assert _changes(_stocks(OLD), _stocks(OLD)) == ({}, [])
+
+#a stored day that changed rewrites the ticker from the first day of its partition, and so do removed days
+def test_rewritten_day():
+    new = _stocks(OLD)
+    new.loc[(new.index == "2020-01-06") & (new["Name"] == "BBB"), "Close"] = 99.0
+    result, removed = _changes(_stocks(OLD), new)
+    assert result == {"BBB": {"first": "2020-01-01", "last": "2020-01-10", "rows": 0, "rewritten": True}}
+    assert removed == []
+
+    #the days of a year that are all gone rewrite the ticker from that year
+    longer = pd.concat([_stocks(OLD), _stocks({"BBB": ("2021-01-04", "2021-01-05")})])
+    result, _ = _changes(longer, _stocks(OLD))
+    assert result == {"BBB": {"first": "2021-01-04", "last": "2020-01-10", "rows": -2, "rewritten": True}}
+
+#a ticker without any row left is removed, a new ticker is added from its first day
+def test_removed_and_new_ticker():
+    result, removed = _changes(_stocks(OLD), _stocks({"AAA": OLD["AAA"], "CCC": ("2020-01-08", "2020-01-10")}))
+    assert removed == ["BBB"]
+    assert result == {"CCC": {"first": "2020-01-08", "last": "2020-01-10", "rows": 3, "rewritten": False}}
+
+#the new insider transactions by ticker and the tickers whose transactions are gone
+def test_insider_changes():
+    old_keys, old_tickers = np.array([1, 2, 3], dtype=np.uint64), np.array(["AAA", "BBB", "BBB"])
+    keys, tickers = np.array([1, 3, 4, 5], dtype=np.uint64), np.array(["AAA", "BBB", "CCC", "AAA"])
+    assert changes.insider_changes(old_keys, old_tickers, keys, tickers) == ({"AAA": ["5"], "CCC": ["4"]}, ["BBB"])
+
+#the entries after a version are merged into one, an older version than the feed keeps or a full entry means everything
+def test_changes_since(tmp_path):
+    path = str(tmp_path / "changes.jsonl")
+    empty = {"prices": {}, "removed": [], "eps": {}, "insider": {}, "insider_removed": []}
+    feed = [{"version": 3, "full": True},
+            dict(empty, version=4, prices={"AAA": {"first": "2020-01-13", "last": "2020-01-13", "rows": 1, "rewritten": False}}, eps={"AAA": [0.1, 0.2]}),
+            dict(empty, version=5, prices={"AAA": {"first": "2020-01-14", "last": "2020-01-14", "rows": 1, "rewritten": False}}, removed=["BBB"],
+                 eps={"AAA": [0.2, 0.1], "CCC": [None, 0.3]}, insider={"CCC": ["7"]})]
+    with open(path, "w") as f:
+        for entry in feed:
+            f.write(json.dumps(entry) + "\n")
+
+    result = changes.changes_since(3, path)
+    assert not result["full"] and result["version"] == 5
+    assert result["prices"] == {"AAA": {"first": "2020-01-13", "last": "2020-01-14", "rows": 2, "rewritten": False}}
+    assert result["removed"] == ["BBB"]
+    #an EPS value that moved back is not a change
+    assert result["eps"] == {"CCC": [None, 0.3]}
+    assert changes.tickers(result) == {"AAA", "BBB", "CCC"}
+
+    assert changes.changes_since(2, path)["full"]
+    assert changes.changes_since(1, path)["full"]
+    assert changes.tickers(changes.changes_since(1, path)) is None
+    assert changes.changes_since(5, path)["prices"] == {}
+
+#the first refresh is a full version, a refresh without changes adds no version
+def test_refresh_feed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Data").mkdir()
+    eps = pd.DataFrame({"Name": ["AAA", "BBB"], "EPS": [0.1, 0.2]})
+    insider = pd.DataFrame(columns=["Ticker", "Date", "Transaction", "Insider_id"])
+    stocks = _stocks(OLD)
+    assert changes.refresh_Changes(stocks, eps, insider, screen.build_indexes(stocks))["full"]
+    assert changes.refresh_Changes(stocks, eps, insider, screen.build_indexes(stocks)) is None
+
+    stocks = _stocks(dict(OLD, AAA=("2020-01-01", "2020-01-13")))
+    entry = changes.refresh_Changes(stocks, eps.assign(EPS=[0.1, 0.4]), insider, screen.build_indexes(stocks))
+    assert entry["version"] == 2
+    assert list(entry["prices"]) == ["AAA"] and entry["eps"] == {"BBB": [0.2, 0.4]}
+    assert changes.version() == 2
@@ -0,0 +1,49 @@
+# This Python file uses the following encoding: utf-8
+import numpy as np
+import pytest
+
+#the chart module draws with Qt
+pytest.importorskip("PySide2.QtWidgets")
+
+#levels of the price chart under test
+import chart
+
+
+#a year and a half of daily closes with a spike and a dip in the middle of some weeks
+def _levels():
+    dates = np.arange(np.datetime64("2020-01-01"), np.datetime64("2021-07-01"))
+    dates = dates[(dates.astype(np.int64) + 3) % 7 < 5]
+    values = 100 + np.sin(np.arange(len(dates)) / 9.0)
+    values[100] = 150.0
+    values[200] = 50.0
+    return chart.Levels(dates, values), dates.astype(np.int64), values
+
+
+#a window that fits the daily level is drawn as it is
+def test_daily_as_is():
+    levels, days, values = _levels()
+    name, shown, points = levels.view(days[10], days[59], 400)
+    assert name == "Daily"
+    assert np.array_equal(shown, days[10:60])
+    assert np.array_equal(points, values[10:60])
+
+#a coarse level that fits the width (fewer weeks than pixels) still has the first, low, high and last value of every period, in time order
+def test_coarse_keeps_the_extremes():
+    levels, days, values = _levels()
+    name, shown, points = levels.view(days[0], days[-1], 90)
+    assert name == "Weekly"
+    assert np.all(np.diff(shown) >= 0)
+    assert points.max() == 150.0 and points.min() == 50.0
+    assert shown[np.argmax(points)] == days[100] and shown[np.argmin(points)] == days[200]
+    assert points[0] == values[0] and points[-1] == values[-1]
+    #more points than periods, the weeks are not reduced to their last close
+    assert len(points) > len(np.unique((days + 3) // 7))
+
+#every level keeps the peaks when the window is wider than the pixels
+def test_reduced_to_pixels():
+    levels, days, values = _levels()
+    for width in [5, 20, 100]:
+        name, shown, points = levels.view(days[0], days[-1], width)
+        assert len(points) <= 4 * width
+        assert points.max() == 150.0 and points.min() == 50.0
+        assert np.all(np.diff(shown) >= 0)
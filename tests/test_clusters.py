@@ -0,0 +1,62 @@
+# This Python file uses the following encoding: utf-8
+import numpy as np
+import pandas as pd
+
+#clustered insider buys under test
+import clusters
+
+
+#insider transactions in the layout of the insider files: (ticker, day, insider, value), buys unless a transaction is given
+def _insider(rows, transaction="Buy"):
+    return pd.DataFrame({"Ticker": [r[0] for r in rows], "Date": pd.to_datetime([r[1] for r in rows]), "Transaction": transaction,
+                         "Insider_id": [r[2] for r in rows], "Value ($)": [r[3] for r in rows]})
+
+#buys of random insiders of some tickers over a year
+def _random_buys(seed=0, n=400):
+    rng = np.random.RandomState(seed)
+    days = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.randint(0, 365, n), unit="D")
+    return pd.DataFrame({"Ticker": rng.choice(["AAA", "BBB", "CCC", "DDD"], n), "Date": days, "Transaction": rng.choice(["Buy", "Sale"], n, p=[0.8, 0.2]),
+                         "Insider_id": rng.randint(0, 12, n), "Value ($)": rng.randint(1, 100, n) * 1000.0})
+
+
+#three distinct insiders within the window make a cluster, the buys of a single insider or spread out don't
+def test_detect():
+    insider = _insider([("AAA", "2020-01-02", 1, 100.0), ("AAA", "2020-01-10", 2, 200.0), ("AAA ", "2020-01-25", 3, 300.0), ("AAA", "2020-01-26", 1, 50.0),
+                        ("BBB", "2020-01-02", 1, 100.0), ("BBB", "2020-01-03", 1, 100.0), ("BBB", "2020-01-04", 1, 100.0),
+                        ("CCC", "2020-01-02", 1, 100.0), ("CCC", "2020-02-15", 2, 100.0), ("CCC", "2020-03-30", 3, 100.0)])
+    found = clusters.detect_clusters(insider)
+    assert found["Ticker"].tolist() == ["AAA"]
+    row = found.iloc[0]
+    assert (row["Start"], row["End"]) == (pd.Timestamp("2020-01-02"), pd.Timestamp("2020-01-26"))
+    assert (row["Insiders"], row["Buys"], row["Value"]) == (3, 4, 650.0)
+
+    #the sales don't count, a larger window joins the buys of CCC
+    assert len(clusters.detect_clusters(pd.concat([insider, _insider([("BBB", "2020-01-05", 2, 1.0), ("BBB", "2020-01-05", 3, 1.0)], "Sale")]))) == 1
+    assert clusters.detect_clusters(insider, window=90)["Ticker"].tolist() == ["AAA", "CCC"]
+
+#windows of a ticker that overlap are one cluster, windows apart are two
+def test_merge_windows():
+    insider = _insider([("AAA", "2020-01-02", 1, 1.0), ("AAA", "2020-01-03", 2, 1.0), ("AAA", "2020-01-04", 3, 1.0), ("AAA", "2020-01-30", 4, 1.0),
+                        ("AAA", "2020-06-01", 1, 1.0), ("AAA", "2020-06-02", 2, 1.0), ("AAA", "2020-06-03", 3, 1.0)])
+    found = clusters.detect_clusters(insider)
+    assert found["End"].tolist() == [pd.Timestamp("2020-01-30"), pd.Timestamp("2020-06-03")]
+    assert found["Insiders"].tolist() == [4, 3]
+    ranked = clusters.rank_clusters(found, start="2020-02-01")
+    assert ranked["End"].tolist() == [pd.Timestamp("2020-06-03")] and ranked["Rank"].tolist() == [1]
+
+#only the tickers whose buys changed are detected again, with the clusters a full detection gives
+def test_update_matches_full(monkeypatch):
+    insider = _random_buys()
+    old, checksums = clusters.update_clusters(None, {}, insider)
+    assert len(old) > 0
+
+    more = pd.concat([insider, _insider([("BBB", "2020-12-30", 20, 1.0), ("BBB", "2020-12-30", 21, 1.0), ("BBB", "2020-12-31", 22, 1.0)])], ignore_index=True)
+    detected = []
+    detect = clusters.detect_clusters
+    monkeypatch.setattr(clusters, "detect_clusters", lambda rows, *args: detected.append(set(rows["Ticker"])) or detect(rows, *args))
+    updated, _ = clusters.update_clusters(old, checksums, more)
+    assert detected == [{"BBB"}]
+    pd.testing.assert_frame_equal(updated, detect(more).sort_values(["Ticker", "Start"], kind="mergesort").reset_index(drop=True), check_dtype=False)
+
+    #nothing changed
+    assert clusters.update_clusters(updated, clusters._checksums(more), more)[0] is updated
@@ -0,0 +1,56 @@
+# This Python file uses the following encoding: utf-8
+import os
+
+import numpy as np
+import pandas as pd
+
+#blockwise correlation under test
+import correlation
+import jobs
+from panel import build_panel
+
+
+#daily changes of some tickers over 120 trading days in the layout of the stocks files, some days missing
+def _stocks(seed=0):
+    rng = np.random.RandomState(seed)
+    days = pd.bdate_range("2020-01-01", periods=120)
+    market = rng.standard_normal(len(days))
+    frames = []
+    for (i, ticker) in enumerate(["AAA", "BBB", "CCC", "DDD", "EEE"]):
+        change = 0.01 * (market * (i % 3) + rng.standard_normal(len(days)))
+        frame = pd.DataFrame({"Close_change": change, "Name": ticker}, index=pd.DatetimeIndex(days, name="Date"))
+        frames.append(frame.drop(frame.index[rng.choice(len(days), 10, replace=False)]))
+    return pd.concat(frames)
+
+
+#the matrix computed in small blocks is the pairwise complete correlation of the returns
+def test_blocks_match_pandas():
+    stocks = _stocks()
+    panel = build_panel(stocks, ["Close_change"])
+    matrix = correlation.correlation_matrix(panel, budget=8 * 1024)
+    expected = panel.frame("Close_change").corr(min_periods=correlation.MIN_PERIODS).values
+    assert np.allclose(matrix, expected, equal_nan=True)
+
+#the stored matrix is mapped back while the prices don't change, new prices make a new version next to the mapped one
+def test_refresh_versions(tmp_path, monkeypatch):
+    path = str(tmp_path / "correlation")
+    calls = []
+    compute = correlation.correlation_matrix
+    monkeypatch.setattr(correlation, "correlation_matrix", lambda *args, **kwargs: calls.append(args) or compute(*args, **kwargs))
+
+    stocks = _stocks()
+    tickers, first = correlation.refresh_Correlation("M", stocks, path=path)
+    again = correlation.refresh_Correlation("M", stocks, path=path)[1]
+    assert len(calls) == 1
+    assert np.array_equal(first, again, equal_nan=True)
+    assert list(tickers) == ["AAA", "BBB", "CCC", "DDD", "EEE"]
+
+    kept = np.array(first)
+    moved = correlation.refresh_Correlation("M", _stocks(1), path=path)[1]
+    assert len(calls) == 2
+    assert not np.array_equal(moved, kept, equal_nan=True)
+    #the mapped matrix of the previous version is left as it was
+    assert np.array_equal(first, kept, equal_nan=True)
+    folder = jobs.current_folder(path)
+    assert sorted(os.listdir(folder)) == ["matrix.npy", "meta.json"]
+    assert sorted(os.listdir(path)) == ["current.json", "v2"]
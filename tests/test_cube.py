@@ -0,0 +1,52 @@
+# This Python file uses the following encoding: utf-8
+import os
+
+import numpy as np
+import pandas as pd
+
+#memory mapped price cube under test
+import cube
+import jobs
+
+
+#daily prices of two tickers in the layout of the stocks files (the daily close as Close_x, as the loaders store it), BBB
+#missing a day
+def _stocks():
+    days = pd.bdate_range("2020-01-01", periods=5)
+    aaa = pd.DataFrame({"Close_x": [1.0, 2.0, 3.0, 4.0, 5.0], "Volume": 3e9, "Name": "AAA"}, index=pd.DatetimeIndex(days, name="Date"))
+    bbb = pd.DataFrame({"Close_x": [10.0, 11.0, 12.0, 13.0], "Volume": 1.0, "Name": "BBB"}, index=pd.DatetimeIndex(days[[0, 1, 3, 4]], name="Date"))
+    return pd.concat([bbb, aaa])
+
+
+#the cube written from a stocks frame maps back the series and cross sections of the prices
+def test_write_read(tmp_path):
+    path = str(tmp_path / "cube")
+    cube.write_Cube(_stocks(), path=path)
+    prices = cube.read_Cube(path=path)
+    assert list(prices.tickers) == ["AAA", "BBB"]
+    assert prices.meta["columns"] == ["Close", "Volume"]
+    assert isinstance(prices["Close"], np.memmap) and prices["Close"].dtype == np.float32
+    assert prices.series("AAA").tolist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert np.isnan(prices.cross_section("2020-01-03")[1])
+    assert prices.day("2020-01-04") == -1
+    #the volumes keep every digit
+    assert prices["Volume"].dtype == np.float64 and prices.series("AAA", "Volume")[0] == 3e9
+
+    panel = prices.panel()
+    assert panel.lookup("Close", ["BBB"], [pd.Timestamp("2020-01-07")])[0] == 13.0
+
+#a cube of other stocks files isn't read, a new one is a new version next to the mapped one
+def test_sources(tmp_path):
+    path = str(tmp_path / "cube")
+    sources = {"Data/M_stocks.csv": [100, 1.0], "Data/M.csv": [10, 1.0]}
+    cube.write_Cube(_stocks(), sources, path=path)
+    first = cube.read_Cube(sources, path=path)
+    assert first is not None
+    #the other Data files don't matter
+    assert cube.read_Cube(dict(sources, **{"Data/M.csv": [11, 2.0]}), path=path) is not None
+    assert cube.read_Cube({"Data/M_stocks.csv": [101, 2.0]}, path=path) is None
+
+    cube.write_Cube(_stocks().iloc[:4], {"Data/M_stocks.csv": [101, 2.0]}, path=path)
+    assert first.series("AAA").tolist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert os.path.basename(jobs.current_folder(path)) == "v2"
+    assert list(cube.read_Cube(path=path).tickers) == ["BBB"]
@@ -0,0 +1,74 @@
+# This Python file uses the following encoding: utf-8
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+#store of the ticker lists and insider transactions under test
+import database
+
+
+#insider transactions in the layout of the insider files: (ticker, day, transaction, value)
+def _insider(rows):
+    return pd.DataFrame({"Insider Trading": "Someone", "Relationship": "CEO", "Date": pd.to_datetime([r[1] for r in rows]), "Transaction": [r[2] for r in rows],
+                         "Cost": 10.0, "#Shares": 100.0, "Value ($)": [r[3] for r in rows], "#Shares Total": 1000.0, "SEC Form 4": "Jan 10 06:00 PM",
+                         "Insider_id": 1, "Ticker": [r[0] for r in rows]})
+
+#a store over the Data files of a scratch folder
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Data").mkdir()
+    db = database.Database()
+    yield db
+    db.close()
+
+
+#the ticker list and insider files of a market are imported, and only again once they changed
+def test_sync(store):
+    with open("Data/M.csv", "w") as f:
+        f.write("AAA,The AAA Company, Inc.,0.25\nBBB,BBB Corp,nan\n")
+    _insider([("AAA ", "2020-01-06", "Buy", 1000.0), ("BBB", "2020-02-03", "Sale", 500.0)]).to_csv("Data/M_insider.csv")
+    store.sync("M")
+    pairs = store.read_Pairs("M")
+    assert pairs[0] == ["AAA", "The AAA Company, Inc.", 0.25]
+    assert pairs[1][0] == "BBB" and np.isnan(pairs[1][2])
+    assert store.read_Insider()["Ticker"].tolist() == ["AAA", "BBB"]
+
+    #a file with the modification time it was imported with is not read again
+    imported = os.path.getmtime("Data/M_insider.csv")
+    _insider([("CCC", "2020-02-03", "Buy", 1.0)]).to_csv("Data/M_insider.csv")
+    os.utime("Data/M_insider.csv", (imported, imported))
+    store.sync("M")
+    assert store.read_Insider()["Ticker"].tolist() == ["AAA", "BBB"]
+
+    #a delisted ticker leaves the market
+    with open("Data/M.csv", "w") as f:
+        f.write("BBB,BBB Corp,0.5\n")
+    os.utime("Data/M.csv", (imported + 10, imported + 10))
+    store.sync("M")
+    assert store.read_Pairs("M") == [["BBB", "BBB Corp", 0.5]]
+
+#the EPS of a ticker listed in several markets is read once
+def test_read_eps(store):
+    store.upsert_Pairs("M", [["AAA", "A", 0.1], ["BBB", "B", float("nan")]])
+    store.upsert_Pairs("N", [["BBB", "B", float("nan")], ["CCC", "C", 0.3]])
+    eps = store.read_EPS(["M", "N"])
+    assert eps["Name"].tolist() == ["AAA", "BBB", "CCC"]
+    assert eps["EPS"].dtype == np.float64 and np.isnan(eps["EPS"].iloc[1])
+
+#the same transaction imported twice is updated, the filters select the matching rows only
+def test_read_insider(store):
+    store.upsert_Pairs("M", [["AAA", "A", 0.1]])
+    store.upsert_Insider(_insider([("AAA", "2020-01-06", "Buy", 1000.0), ("AAA", "2020-02-03", "Sale", 500.0), ("BBB", "2020-02-04", "Buy", 300.0)]))
+    store.upsert_Insider(_insider([("AAA", "2020-01-06", "Buy", 2000.0)]))
+    rows = store.read_Insider()
+    assert len(rows) == 3
+    assert rows.loc[rows["Transaction"] == "Buy", "Value ($)"].tolist() == [2000.0, 300.0]
+    assert list(rows.columns) == list(database.INSIDER_COLUMNS)
+
+    assert store.read_Insider(markets=["M"])["Ticker"].tolist() == ["AAA", "AAA"]
+    assert store.read_Insider(tickers=["BBB"])["Value ($)"].tolist() == [300.0]
+    assert store.read_Insider(start="2020-02-01", end="2020-02-03")["Transaction"].tolist() == ["Sale"]
+    assert store.read_Insider(transaction="Buy", start="2020-02-01")["Ticker"].tolist() == ["BBB"]
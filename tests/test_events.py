@@ -0,0 +1,46 @@
+# This Python file uses the following encoding: utf-8
+import numpy as np
+import pandas as pd
+
+#returns after the insider transactions under test
+import events
+
+
+#closes of some tickers on the trading days of November and December 2020 in the layout of the stocks files
+def _stocks(tickers):
+    days = pd.bdate_range("2020-11-02", "2020-12-31")
+    return pd.concat([pd.DataFrame({"Close": np.arange(1.0, len(days) + 1), "Name": ticker}, index=pd.DatetimeIndex(days, name="Date")) for ticker in tickers])
+
+#insider transactions in the layout of the insider files: (ticker, traded day, SEC Form 4)
+def _insider(rows):
+    return pd.DataFrame({"Insider Trading": "Someone", "Relationship": "CEO", "Date": pd.to_datetime([r[1] for r in rows]), "Transaction": "Buy", "Cost": 10.0,
+                         "#Shares": 100.0, "Value ($)": 1000.0, "#Shares Total": 1000.0, "SEC Form 4": [r[2] for r in rows], "Insider_id": 1, "Ticker": [r[0] for r in rows]})
+
+
+#the filing day is the first day with the month and day of the SEC Form 4 column on or after the transaction
+def test_filing_dates():
+    insider = _insider([("AAA", "2020-11-20", "Nov 23 07:00 PM"), ("AAA", "2020-12-30", "Jan 04 06:00 AM"), ("AAA", "2020-11-20", "")])
+    assert list(pd.DatetimeIndex(events.filing_dates(insider))) == [pd.Timestamp("2020-11-23"), pd.Timestamp("2021-01-04"), pd.Timestamp("2020-11-20")]
+
+#a transaction is entered after the day it was filed, not after the day it was traded
+def test_entered_after_filing():
+    insider = _insider([("AAA", "2020-11-20", "Nov 23 07:00 PM")])
+    result = events.event_returns(insider, events.transaction_keys(insider), _stocks(["AAA", "BBB"]))
+    assert result["Filed"].tolist() == [pd.Timestamp("2020-11-23")]
+    assert result["Entry"].tolist() == [pd.Timestamp("2020-11-24")]
+    assert not result["Unmatched"].iloc[0]
+
+#the transactions of a ticker without prices are unmatched and stay as they are when the prices change
+def test_unmatched_not_joined_again(tmp_path):
+    path, meta_path = str(tmp_path / "events.csv"), str(tmp_path / "events.json")
+    insider = _insider([("AAA", "2020-11-20", "Nov 23 07:00 PM"), ("ZZZ", "2020-11-20", "Nov 23 07:00 PM")])
+    first = events.refresh_Events(insider, _stocks(["AAA"]), path=path, meta_path=meta_path)
+    assert first.set_index("Ticker")["Unmatched"].to_dict() == {"AAA": False, "ZZZ": True}
+
+    #more prices: only AAA (its 60 days hadn't passed) is joined again
+    stored = events.read_Events(path=path, meta_path=meta_path)
+    assert stored.set_index("Ticker")["Unmatched"].to_dict() == {"AAA": False, "ZZZ": True}
+    kept = events.update_events(stored, insider, _stocks(["AAA", "BBB"]), recheck=True)
+    assert (kept["Ticker"] == "ZZZ").sum() == 1
+    unmatched = stored.loc[stored["Ticker"] == "ZZZ"]
+    assert events.update_events(unmatched, insider.iloc[1:], _stocks(["AAA", "BBB"]), recheck=True) is unmatched
@@ -0,0 +1,37 @@
+# This Python file uses the following encoding: utf-8
+import pandas as pd
+import pytest
+
+#exports of the results under test
+import export
+
+
+#rows of a small screen result
+def _frame():
+    return pd.DataFrame({"Close": [1.0, 2.0, 3.0], "Name": ["AAA", "BBB", "AAA"]}, index=pd.Index(pd.to_datetime(["2020-01-02"] * 3), name="Date"))
+
+
+#a previous export is replaced and nothing is left next to it
+def test_replace_previous_export(tmp_path):
+    path = str(tmp_path / "results")
+    export.write_columns(_frame(), path)
+    assert export.write_columns(_frame(), path, rows=[2]) == 1
+
+    assert export.read_columns(path)["Close"].tolist() == [3.0]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["results"]
+
+#a file, or a folder that isn't an export, is not replaced
+def test_refuse_other_paths(tmp_path):
+    (tmp_path / "notes.txt").write_text("keep")
+    with pytest.raises(ValueError):
+        export.write_columns(_frame(), str(tmp_path / "notes.txt"))
+    assert (tmp_path / "notes.txt").read_text() == "keep"
+
+    folder = tmp_path / "folder"
+    folder.mkdir()
+    (folder / "meta.json").write_text("{}")
+    (folder / "report.docx").write_text("keep")
+    with pytest.raises(ValueError):
+        export.write_columns(_frame(), str(folder))
+    assert (folder / "report.docx").read_text() == "keep"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["folder", "notes.txt"]
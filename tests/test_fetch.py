@@ -0,0 +1,136 @@
+# This Python file uses the following encoding: utf-8
+import time
+from urllib.parse import urlparse
+
+import pytest
+
+#fetch policy under test
+import fetch
+
+
+#a page of the stand-in, the host of the real website goes first in the path
+def _url(server, ticker="S001"):
+    return server.url + "/finviz.com/quote.ashx?t=" + ticker
+
+#host the policy keeps the circuit of the stand-in under
+def _host(server):
+    return urlparse(server.url).netloc
+
+#policy with no waiting between the attempts
+def _policy(**kwargs):
+    kwargs.setdefault("backoff", 0)
+    return fetch.FetchPolicy(**kwargs)
+
+
+#a slow answer is abandoned after the read timeout, every attempt counts against the host
+def test_timeout(stand_in):
+    server = stand_in(latency=1.0)
+    policy = _policy(read_timeout=0.2, retries=1)
+    start = time.monotonic()
+    with pytest.raises(fetch.FetchError):
+        policy.get(_url(server))
+    assert time.monotonic() - start < 0.9
+    assert policy.errors == 2
+    assert policy.breaker(_host(server)).failures == 2
+
+#server errors are retried until an attempt succeeds
+def test_retries_server_errors(stand_in):
+    server = stand_in(error_rate=0.5, seed=3)
+    policy = _policy(retries=10)
+    for i in range(10):
+        assert policy.get(_url(server, "S00" + str(i))).status_code == 200
+    counts = server.conditions.counts["finviz.com"]
+    assert counts["errors"] > 0
+    assert counts["requests"] == 10 + counts["errors"]
+    assert policy.errors == counts["errors"]
+
+#a request failing every attempt raises once the retries are used up, and is kept in the failed list
+def test_retries_used_up(stand_in):
+    server = stand_in(error_rate=1.0)
+    policy = _policy(retries=2, failures_to_open=100)
+    with pytest.raises(fetch.FetchError):
+        policy.get(_url(server))
+    assert server.conditions.counts["finviz.com"]["requests"] == 3
+    assert len(policy.failed) == 1 and "503" in policy.failed[0][1]
+
+#a missing page is not retried and doesn't count against the host
+def test_missing_page_not_retried(stand_in):
+    server = stand_in()
+    policy = _policy(retries=3)
+    with pytest.raises(fetch.FetchError):
+        policy.get(server.url + "/finviz.com/missing")
+    assert server.conditions.counts["finviz.com"]["requests"] == 1
+    assert policy.breaker(_host(server)).failures == 0
+
+#rate limited requests (429) are retried with backoff until the host lets them through
+def test_rate_limit(stand_in):
+    server = stand_in(rate_limit=5)
+    policy = fetch.FetchPolicy(retries=6, backoff=0.2, backoff_max=1)
+    for i in range(12):
+        policy.get(_url(server, "S0" + str(i).zfill(2)))
+    assert server.conditions.counts["finviz.com"]["limited"] > 0
+
+#the circuit opens after consecutive failures, the host is then not contacted until a trial call after open_seconds
+def test_circuit_breaker(stand_in):
+    server = stand_in(error_rate=1.0)
+    policy = _policy(retries=10, failures_to_open=3, open_seconds=0.3)
+    with pytest.raises(fetch.CircuitOpenError):
+        policy.get(_url(server))
+    assert server.conditions.counts["finviz.com"]["requests"] == 3
+    with pytest.raises(fetch.CircuitOpenError):
+        policy.get(_url(server))
+    assert server.conditions.counts["finviz.com"]["requests"] == 3
+
+    #half open: the trial call goes through and closes the circuit once the host is back
+    server.conditions.error_rate = 0.0
+    time.sleep(0.35)
+    assert policy.get(_url(server)).status_code == 200
+    assert policy.breaker(_host(server)).opened_at is None
+    assert server.conditions.counts["finviz.com"]["requests"] == 4
+
+#other hosts keep working while the circuit of one is open
+def test_circuit_per_host(stand_in):
+    failing = stand_in(error_rate=1.0)
+    working = stand_in()
+    policy = _policy(retries=0, failures_to_open=1)
+    with pytest.raises(fetch.FetchError):
+        policy.get(_url(failing))
+    with pytest.raises(fetch.CircuitOpenError):
+        policy.get(_url(failing))
+    assert policy.get(_url(working)).status_code == 200
+
+#the read timeout is capped to what is left of the refresh budget, and nothing is fetched once it is used up
+def test_budget(stand_in):
+    server = stand_in(latency=1.0)
+    policy = _policy(read_timeout=30, retries=5)
+    policy.start_refresh(0.3)
+    start = time.monotonic()
+    with pytest.raises(fetch.FetchError):
+        policy.get(_url(server))
+    assert time.monotonic() - start < 0.9
+    with pytest.raises(fetch.BudgetExceededError):
+        policy.get(_url(server))
+
+#the latencies of the slow tail show in the percentiles of the refresh
+def test_stats_tail(stand_in):
+    server = stand_in(tail=0.02, seed=1)
+    policy = _policy()
+    policy.start_refresh(60)
+    for i in range(20):
+        policy.get(_url(server, "S0" + str(i).zfill(2)))
+    stats = policy.stats()
+    assert stats["requests"] == 20 and stats["errors"] == 0
+    assert stats["p99"] >= stats["p50"] > 0
+
+#a library call that hangs is abandoned after the read timeout and retried
+def test_call_timeout():
+    policy = _policy(read_timeout=0.1, retries=1)
+    calls = []
+
+    def hang():
+        calls.append(1)
+        time.sleep(0.5)
+
+    with pytest.raises(fetch.FetchError):
+        policy.call("query1.finance.yahoo.com", hang)
+    assert len(calls) == 2
@@ -0,0 +1,58 @@
+# This Python file uses the following encoding: utf-8
+import numpy as np
+import pandas as pd
+
+#trend forecasts under test
+import forecast
+
+
+#closes of some tickers over WINDOW trading days in the layout of the stocks files (a NaN close is a missing day)
+def _stocks(closes):
+    days = pd.bdate_range("2020-01-01", periods=forecast.WINDOW)
+    return pd.concat([pd.DataFrame({"Close": values, "Name": ticker}, index=pd.DatetimeIndex(days, name="Date")).dropna() for (ticker, values) in closes.items()])
+
+#a rising, a falling and a noisy series with missing days
+def _closes():
+    rng = np.random.RandomState(0)
+    x = np.arange(forecast.WINDOW)
+    noisy = 50 * np.exp(0.002 * x + 0.02 * rng.standard_normal(forecast.WINDOW))
+    noisy[[3, 17, 40]] = np.nan
+    return {"UP": 10 * np.exp(0.01 * x), "DOWN": 30 * np.exp(-0.005 * x + 0.001 * np.sin(x)), "NOISY": noisy}
+
+
+#the slopes fitted to every ticker at once are the least squares lines of each one (the missing days left out)
+def test_slopes_match_polyfit():
+    closes = _closes()
+    y = np.log(np.array(list(closes.values())))
+    w = np.isfinite(y)
+    slope, r2, _ = forecast._regression(np.where(w, y, np.nan), w)
+    x = np.arange(forecast.WINDOW)
+    for (i, values) in enumerate(y):
+        fit = np.polyfit(x[w[i]], values[w[i]], 1)
+        assert np.isclose(slope[i], fit[0])
+        fitted = np.polyval(fit, x[w[i]])
+        assert np.isclose(r2[i], 1 - ((values[w[i]] - fitted) ** 2).sum() / ((values[w[i]] - values[w[i]].mean()) ** 2).sum())
+
+    table = forecast.compute_forecast(forecast.build_panel(_stocks(closes), ["Close"])).set_index("Ticker")
+    assert np.isclose(table.loc["UP", "Slope"], np.expm1(0.01 * forecast.YEAR))
+    assert table.loc["UP", "Rank"] == 1 and table.loc["DOWN", "Rank"] == 3
+    assert list(table.reset_index().columns) == forecast.COLUMNS
+
+#the stored ranking is read back while the prices don't change, and computed again when they do
+def test_refresh_cache_hit(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Data").mkdir()
+    stocks = _stocks(_closes())
+    first = forecast.refresh_Forecast("M", stocks)
+
+    calls = []
+    compute = forecast.compute_forecast
+    monkeypatch.setattr(forecast, "compute_forecast", lambda panel: calls.append(panel) or compute(panel))
+    again = forecast.refresh_Forecast("M", stocks)
+    assert len(calls) == 0
+    pd.testing.assert_frame_equal(again, first, check_dtype=False)
+
+    moved = stocks.copy()
+    moved.iloc[-1, moved.columns.get_loc("Close")] *= 2
+    forecast.refresh_Forecast("M", moved)
+    assert len(calls) == 1
@@ -0,0 +1,65 @@
+# This Python file uses the following encoding: utf-8
+import os
+
+import numpy as np
+import pandas as pd
+
+#technical indicators under test
+import indicators
+import jobs
+from panel import build_panel
+
+
+#daily prices of some tickers over 300 trading days in the layout of the stocks files, a ticker listed later than the others
+def _stocks(days=300, seed=0):
+    rng = np.random.RandomState(seed)
+    dates = pd.bdate_range("2019-01-01", periods=days)
+    frames = []
+    for (i, ticker) in enumerate(["AAA", "BBB", "CCC"]):
+        close = 20 * np.exp(np.cumsum(0.01 * rng.standard_normal(days)))
+        frame = pd.DataFrame({"High": close * 1.01, "Low": close * 0.99, "Close": close, "Name": ticker}, index=pd.DatetimeIndex(dates, name="Date"))
+        frames.append(frame.iloc[40 * i:])
+    return pd.concat(frames)
+
+
+#the indicators continued over new days are the ones computed from all the days at once (up to the float32 they are stored as)
+def test_update_matches_full():
+    stocks = _stocks()
+    full = indicators.compute_indicators(build_panel(stocks, ["High", "Low", "Close"]))
+    early = build_panel(stocks.loc[stocks.index < stocks.index.unique()[260]], ["High", "Low", "Close"])
+    old = indicators.compute_indicators(early)
+    updated = indicators.update_indicators(old, indicators._checksums(early), build_panel(stocks, ["High", "Low", "Close"]))
+    for name in indicators.indicator_names():
+        assert np.allclose(updated[name], full[name], equal_nan=True, rtol=1e-4, atol=1e-4), name
+
+    #the simple moving average is the rolling mean of the closes
+    close = build_panel(stocks, ["Close"]).frame("Close")
+    assert np.allclose(full.frame("SMA_50").values, close.rolling(50).mean().values, equal_nan=True, rtol=1e-5)
+
+#the indicators are stored in versioned folders and read back while the prices don't change
+def test_refresh_versions(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Data").mkdir()
+    stocks = _stocks()
+    first = indicators.refresh_Indicators(stocks)
+    again = indicators.refresh_Indicators(stocks)
+    assert np.allclose(again["RSI_14"], first["RSI_14"], equal_nan=True)
+    assert isinstance(again["RSI_14"], np.memmap)
+    assert sorted(os.listdir(indicators.INDICATORS_DIR)) == ["current.json", "v1"]
+
+    #a changed close makes a new version, the mapped arrays of the previous one are left as they were
+    kept = np.array(again["SMA_20"])
+    moved = stocks.copy()
+    moved.iloc[-1, moved.columns.get_loc("Close")] *= 2
+    indicators.refresh_Indicators(moved)
+    assert np.array_equal(np.asarray(again["SMA_20"]), kept, equal_nan=True)
+    assert os.path.basename(jobs.current_folder(indicators.INDICATORS_DIR)) == "v2"
+
+#the screening predicates compare an indicator to a number or to a price column
+def test_indicator_mask():
+    stocks = _stocks()
+    panel = indicators.compute_indicators(build_panel(stocks, ["High", "Low", "Close"]))
+    above = indicators.indicator_mask(panel, stocks, "Close", ">", "SMA_20")
+    sma = panel.lookup("SMA_20", stocks["Name"].values, stocks.index)
+    assert np.array_equal(above, stocks["Close"].values > sma)
+    assert not indicators.indicator_mask(panel, stocks, "RSI_14", ">", 100).any()
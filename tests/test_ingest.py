@@ -0,0 +1,63 @@
+# This Python file uses the following encoding: utf-8
+import numpy as np
+import pandas as pd
+
+#chunked loading of the Data files under test
+import ingest
+
+
+#a stocks file as the loaders write it (the daily close as Close_x, the quarterly sum change as Close_y)
+def _write_stocks(path, rows=3000):
+    days = pd.bdate_range("2000-01-03", periods=rows // 2)
+    frames = []
+    for ticker in ["AAA", "BBB"]:
+        close = np.arange(1.0, len(days) + 1)
+        frames.append(pd.DataFrame({"Open": close, "High": close, "Low": close, "Close_x": close, "Adj Close": close, "Volume": 1000, "Name": ticker,
+                                    "Close_change": 0.01, "year": days.year, "Q": days.quarter, "Close_y": 0.1}, index=pd.DatetimeIndex(days, name="Date")))
+    stocks = pd.concat(frames)
+    stocks.to_csv(path)
+    return stocks
+
+#an insider file as the loaders write it (with its unnamed index column)
+def _write_insider(path):
+    insider = pd.DataFrame({"Insider Trading": ["Someone", "Other"], "Relationship": "CEO", "Date": ["2020-01-02", "2020-01-03"], "Transaction": ["Buy", "Sale"],
+                            "Cost": 10.0, "#Shares": 100.0, "Value ($)": [1000.0, 2000.0], "#Shares Total": 1000.0, "SEC Form 4": "Jan 03 06:00 PM",
+                            "Insider_id": [1, 2], "Ticker": ["AAA ", "BBB"]})
+    insider.to_csv(path)
+    return insider
+
+
+#a file read in many small chunks is the file read at once, with the columns narrowed to the schema
+def test_stocks_chunks(tmp_path):
+    path = str(tmp_path / "M_stocks.csv")
+    stocks = _write_stocks(path)
+    stats = {}
+    read = ingest.read_stocks_csv(path, budget=1000, stats=stats)
+    assert stats["rows"] == len(stocks) and stats["chunks"] > 1
+    assert read.index.name == "Date" and isinstance(read.index, pd.DatetimeIndex)
+    assert read["Volume"].dtype == np.int64 and read["year"].dtype == np.int16 and read["Q"].dtype == np.int8
+    pd.testing.assert_frame_equal(read, stocks, check_dtype=False, check_index_type=False, check_freq=False)
+    #the strings of the chunks are shared
+    names = read["Name"].values
+    assert names[0] is names[1] and names[-1] is names[-2]
+
+#a missing volume widens the column instead of failing
+def test_missing_values(tmp_path):
+    path = str(tmp_path / "M_stocks.csv")
+    stocks = _write_stocks(path, 20)
+    stocks["Volume"] = stocks["Volume"].astype(float)
+    stocks.iloc[-1, stocks.columns.get_loc("Volume")] = np.nan
+    stocks.to_csv(path)
+    read = ingest.read_stocks_csv(path, budget=100)
+    assert read["Volume"].dtype == np.float64
+    assert np.isnan(read["Volume"].iloc[-1]) and read["Volume"].iloc[0] == 1000
+
+#the insider file keeps the columns of the schema only, the ticker as written
+def test_insider(tmp_path):
+    path = str(tmp_path / "M_insider.csv")
+    insider = _write_insider(path)
+    read = ingest.read_insider_csv(path)
+    assert list(read.columns) == list(ingest.INSIDER_SCHEMA)
+    assert read["Date"].tolist() == list(pd.to_datetime(insider["Date"]))
+    assert read["Insider_id"].dtype == np.int64
+    assert read["Ticker"].tolist() == ["AAA ", "BBB"]
@@ -0,0 +1,72 @@
+# This Python file uses the following encoding: utf-8
+import time
+
+import pandas as pd
+
+#checkpointed refresh jobs under test
+import jobs
+
+
+#a job with missing units keeps its checkpoint, the finished units are not lost
+def test_checkpoint_kept_until_all_done(tmp_path):
+    job = jobs.Job("stocks", {"start": "1986-01-01"}, root=str(tmp_path))
+    job.complete("AAA", [1, 2])
+    job.finish(["AAA", "BBB"])
+
+    job = jobs.Job("stocks", {"start": "1986-01-01"}, root=str(tmp_path))
+    assert job.done("AAA")
+    assert job.missing(["AAA", "BBB"]) == ["BBB"]
+
+    job.complete("BBB", [3])
+    job.finish(["AAA", "BBB"])
+    assert not (tmp_path / "stocks").exists()
+
+#a checkpoint left with other parameters (another day or end date) is started again
+def test_checkpoint_other_params(tmp_path):
+    job = jobs.Job("stocks", {"end": "2026-10-18"}, root=str(tmp_path))
+    job.complete("AAA", [1])
+
+    job = jobs.Job("stocks", {"end": "2026-10-19"}, root=str(tmp_path))
+    assert not job.done("AAA")
+
+#an interrupted refresh is resumed with its checkpoints (after midnight too) until it is RUN_HOURS old
+def test_run_resumed(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    run = jobs.start_run(root)
+    job = jobs.Job("stocks", {"run": jobs.current_run(root)["id"]}, root=root)
+    job.complete("AAA", [1])
+
+    again = jobs.start_run(root)
+    assert again == run
+    assert jobs.Job("stocks", {"run": again["id"]}, root=root).done("AAA")
+
+    #too old to be resumed
+    started = time.time()
+    monkeypatch.setattr(jobs.time, "time", lambda: started + (jobs.RUN_HOURS + 1) * 3600)
+    later = jobs.start_run(root)
+    assert later["id"] != run["id"]
+    assert not jobs.Job("stocks", {"run": later["id"]}, root=root).done("AAA")
+
+#a refresh that finished every job leaves nothing to resume, the next one is a new one
+def test_run_finished(tmp_path):
+    root = str(tmp_path)
+    run = jobs.start_run(root)
+    job = jobs.Job("stocks", {"run": run["id"]}, root=root)
+    job.complete("AAA", [1])
+    job.finish(["AAA"])
+    assert jobs.start_run(root)["id"] != run["id"]
+
+#the rows of the failed tickers are read back from the previous file
+def test_previous_rows(tmp_path):
+    path = str(tmp_path / "stocks.csv")
+    dates = pd.to_datetime(["2020-01-02", "2020-01-03"] * 2)
+    previous = pd.DataFrame({"Close": [1.0, 2.0, 3.0, 4.0], "Name": ["AAA", "AAA", "BBB", "BBB"]}, index=pd.Index(dates, name="Date"))
+    jobs.write_csv(previous, path)
+
+    rows = jobs.previous_rows(path, "Name", ["BBB"], chunksize=1, index_col=0, parse_dates=True)
+    assert rows["Name"].tolist() == ["BBB", "BBB"]
+    assert rows["Close"].tolist() == [3.0, 4.0]
+    assert isinstance(rows.index, pd.DatetimeIndex)
+
+    assert len(jobs.previous_rows(path, "Name", [])) == 0
+    assert len(jobs.previous_rows(str(tmp_path / "missing.csv"), "Name", ["AAA"])) == 0
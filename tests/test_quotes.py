@@ -0,0 +1,98 @@
+# This Python file uses the following encoding: utf-8
+import threading
+
+import pandas as pd
+import pytest
+import requests
+
+#quote poller under test
+import quotes
+
+
+#quote API of the stand-in
+def _url(server):
+    return server.url + "/query1.finance.yahoo.com/v7/finance/quote"
+
+#poll some symbols until every one of them has a quote (or the time is up), returns the quotes and the poller
+def _poll(url, symbols, crumb=None):
+    seen = {}
+    done = threading.Event()
+
+    def listener(changed):
+        seen.update(changed)
+        if set(symbols).issubset(seen):
+            done.set()
+
+    poller = quotes.QuotePoller(listener, url, min_interval=0.2)
+    poller.crumb = crumb
+    poller.watch(symbols)
+    poller.start()
+    done.wait(10)
+    poller.stop()
+    poller.join(5)
+    return seen, poller
+
+
+#the cookie and crumb are asked for before the first quotes, every symbol is answered
+def test_quotes_with_crumb(stand_in):
+    server = stand_in()
+    seen, poller = _poll(_url(server), ["S001", "S002", "S003"])
+
+    assert set(seen) == {"S001", "S002", "S003"}
+    assert all(quote["Close_x"] > 0 for quote in seen.values())
+    assert poller.crumb == "standincrumb"
+    assert poller.counts["errors"] == 0
+    assert server.conditions.counts["fc.yahoo.com"]["requests"] == 1
+
+#a rejected crumb is asked for again and the request goes through
+def test_stale_crumb(stand_in):
+    server = stand_in()
+    seen, poller = _poll(_url(server), ["S001"], crumb="stale")
+
+    assert "S001" in seen
+    assert poller.crumb == "standincrumb"
+    assert poller.counts["errors"] == 0
+
+#the stand-in rejects quote requests without the cookie and crumb, like the quote API
+def test_standin_wants_crumb(stand_in):
+    server = stand_in()
+    assert requests.get(_url(server), params={"symbols": "S001"}, timeout=5).status_code == 401
+    assert requests.get(_url(server), params={"symbols": "S001", "crumb": "standincrumb"}, timeout=5).status_code == 401
+
+#the cookie page and crumb API go with the quote API they are used for
+def test_session_urls():
+    assert quotes.session_urls(quotes.QUOTE_URL) == (quotes.COOKIE_URL, quotes.CRUMB_URL)
+    assert quotes.session_urls("http://127.0.0.1:8765/query1.finance.yahoo.com/v7/finance/quote") == ("http://127.0.0.1:8765/fc.yahoo.com", "http://127.0.0.1:8765/query1.finance.yahoo.com/v1/test/getcrumb")
+
+#stored bars of some tickers on some days in the layout of the stocks frame
+def _stocks(rows):
+    stocks = pd.DataFrame({"Open": 1.0, "High": 1.0, "Low": 1.0, "Close_x": [r[2] for r in rows], "Adj Close": [r[2] for r in rows], "Volume": 100,
+                           "Name": [r[0] for r in rows], "Close_change": 0.0}, index=pd.DatetimeIndex(pd.to_datetime([r[1] for r in rows]), name="Date"))
+    stocks["year"] = stocks.index.year
+    stocks["Q"] = stocks.index.quarter
+    return stocks
+
+#a polled quote replaces the bar of its day on screen, and adds it when the stored prices end the day before
+def test_quotes_overlay(stand_in):
+    server = stand_in()
+    seen, _ = _poll(_url(server), ["S001", "S002"])
+    day = seen["S001"]["Date"]
+    yesterday = day - pd.Timedelta(days=1)
+    #S001 has a stored bar of the day of the quote, S002 ends the day before, S003 isn't polled
+    shown = _stocks([("S002", yesterday, 10.0), ("S003", yesterday, 5.0), ("S001", day, 1.0)])
+
+    bars = quotes.live_rows(seen, shown)
+    result, replaced, added = quotes.overlay(shown, bars)
+    assert list(replaced) == [2]
+    assert list(added) == [3]
+    assert result["Close_x"].iat[2] == seen["S001"]["Close_x"]
+    assert result.index[3] == day and result["Name"].iat[3] == "S002"
+    assert result["Close_x"].iat[3] == seen["S002"]["Close_x"]
+    assert result["Close_change"].iat[3] == pytest.approx(seen["S002"]["Close_x"] / 10.0 - 1)
+    assert result["Volume"].iat[3] == seen["S002"]["Volume"]
+    #the frame shown before is left as it is
+    assert shown["Close_x"].iat[2] == 1.0 and len(shown) == 3
+
+    #results whose dates end before today only get their rows replaced
+    result, replaced, added = quotes.overlay(shown, bars, add=False)
+    assert len(result) == 3 and list(replaced) == [2] and len(added) == 0
@@ -0,0 +1,58 @@
+# This Python file uses the following encoding: utf-8
+import numpy as np
+import pandas as pd
+
+#quarterly and yearly rollups under test
+import rollups
+
+
+#daily prices of two tickers between two days in the layout of the stocks files
+def _stocks(first, last):
+    days = pd.bdate_range(first, last)
+    frames = []
+    for (ticker, scale) in [("AAA", 1.0), ("BBB", 3.0)]:
+        close = scale * np.arange(1.0, len(days) + 1)
+        frames.append(pd.DataFrame({"Open": close - 0.5, "High": close + 1, "Low": close - 1, "Close": close, "Adj Close": close, "Volume": 10.0, "Name": ticker},
+                                   index=pd.DatetimeIndex(days, name="Date")))
+    return pd.concat(frames)
+
+#a buy and a sale of AAA, and a gift that isn't counted
+def _insider():
+    return pd.DataFrame({"Ticker": ["AAA ", "AAA", "BBB"], "Date": pd.to_datetime(["2020-02-03", "2020-05-04", "2020-05-05"]), "Transaction": ["Buy", "Sale", "Gift"],
+                         "Value ($)": [1000.0, 400.0, 50.0], "#Shares": [100.0, 20.0, 5.0]})
+
+
+#folding the new days into the stored rollups gives the rollups built from all the days at once
+def test_update_matches_build():
+    stocks = _stocks("2020-01-01", "2020-06-30")
+    for period in ["quarterly", "yearly"]:
+        old = rollups.build_rollups(stocks.loc[stocks.index <= "2020-05-15"], _insider(), period)
+        updated = rollups.update_rollups(old, stocks, _insider(), period)
+        pd.testing.assert_frame_equal(updated.sort_index(), rollups.build_rollups(stocks, _insider(), period).sort_index(), check_dtype=False)
+
+    quarterly = rollups.build_rollups(stocks, _insider(), "quarterly")
+    assert quarterly.loc[("AAA", 2020, 1), "Net_value"] == 1000.0
+    assert quarterly.loc[("AAA", 2020, 2), "Net_shares"] == -20.0
+    assert quarterly.loc[("BBB", 2020, 2), "Insider_trades"] == 0
+    assert quarterly.loc[("AAA", 2020, 2), "Open"] == stocks.loc[(stocks["Name"] == "AAA") & (stocks.index == "2020-04-01"), "Open"].iloc[0]
+
+#the rollups are stored per market and period and read back with their keys
+def test_refresh_stores(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Data").mkdir()
+    quarterly, yearly = rollups.refresh_Rollups("M", _stocks("2020-01-01", "2020-06-30"), _insider())
+    stored = rollups.read_Rollups("M", "quarterly")
+    assert list(stored.index.names) == rollups.PERIOD_KEYS["quarterly"]
+    assert len(stored) == len(quarterly) == 4
+    assert list(rollups.read_Rollups("M", "yearly").index) == [("AAA", 2020), ("BBB", 2020)]
+
+    #the stored rollups are brought up to date with the later days only
+    quarterly, _ = rollups.refresh_Rollups("M", _stocks("2020-01-01", "2020-09-30"), _insider())
+    assert len(quarterly) == 6
+    assert quarterly.loc[("AAA", 2020, 3), "Days"] == len(pd.bdate_range("2020-07-01", "2020-09-30"))
+
+#the quarters whose summed close changed by a percentage
+def test_quarters_matching():
+    quarterly = pd.DataFrame({"Close_change": [np.nan, 0.25, 0.1]}, index=pd.MultiIndex.from_tuples([("AAA", 2020, 1), ("AAA", 2020, 2), ("BBB", 2020, 2)], names=rollups.PERIOD_KEYS["quarterly"]))
+    assert list(rollups.quarters_matching(quarterly, 25.0)) == [("AAA", 2020, 2)]
+    assert len(rollups.quarters_matching(pd.DataFrame(), 25.0)) == 0
@@ -0,0 +1,109 @@
+# This Python file uses the following encoding: utf-8
+import datetime
+import threading
+
+import pandas as pd
+import pytest
+
+#the scheduler downloads with yfinance and finvizfinance
+pytest.importorskip("yfinance")
+pytest.importorskip("finvizfinance")
+
+#background refresh under test
+import scheduler
+import jobs
+import fetch
+
+
+#prices of a ticker in the layout of the stocks files
+def _prices(ticker, days):
+    tmp = pd.DataFrame({"Close": [float(i + 1) for i in range(len(days))]}, index=pd.DatetimeIndex(pd.to_datetime(days), name="Date"))
+    tmp["Name"] = ticker
+    return scheduler._with_changes(tmp)
+
+#insider transactions of a ticker in the layout of the insider files
+def _insider(ticker, days):
+    return pd.DataFrame({"Insider Trading": "Someone", "Relationship": "CEO", "Date": pd.to_datetime(days), "Transaction": "Buy", "Cost": 10.0,
+                         "#Shares": 100.0, "Value ($)": 1000.0, "#Shares Total": 1000.0, "SEC Form 4": "Nov 23 07:00 PM", "Insider_id": 1, "Ticker": ticker})
+
+#market with two tickers written to the Data files of a temporary folder
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Data").mkdir()
+    stocks = pd.concat([_prices("AAA", ["2020-01-02", "2020-01-03"]), _prices("BBB", ["2020-01-02", "2020-01-03"])], sort=False)
+    insider = pd.concat([_insider("AAA", ["2020-01-02"]), _insider("BBB", ["2020-01-02"])], ignore_index=True)
+    jobs.write_csv(stocks, "Data/M_stocks.csv")
+    jobs.write_csv(insider, "Data/M_insider.csv")
+    with open("Data/M.csv", "w") as f:
+        f.write("AAA,A,0.1\nBBB,B,0.2\n")
+    return {"stocks": {"M": stocks}, "insider": {"M": insider}, "pairs": {"M": [["AAA", "A", 0.1], ["BBB", "B", 0.2]]}}
+
+#scheduler whose downloads add a day of prices and an insider transaction to AAA
+def _scheduler(store, tmp_path, calls):
+    background = scheduler.Scheduler(store, state=scheduler.RefreshState(str(tmp_path / "state.json")), budget=10)
+
+    def prices(ticker, rows, policy):
+        calls.append(policy)
+        if ticker != "AAA":
+            raise fetch.FetchError("down")
+        return _prices(ticker, ["2020-01-02", "2020-01-03", "2020-01-06"])
+
+    def insider(ticker, rows, policy):
+        if ticker != "AAA":
+            raise fetch.FetchError("down")
+        return _insider(ticker, ["2020-01-02", "2020-01-06"])
+
+    def eps(ticker, rows, policy):
+        raise fetch.FetchError("down")
+
+    background.refreshers = {"prices": prices, "insider": insider, "eps": eps}
+    return background
+
+
+#a cycle only appends the new rows to the Data files and the downloads use the policy of the scheduler
+def test_cycle_appends_new_rows(store, tmp_path):
+    calls = []
+    background = _scheduler(store, tmp_path, calls)
+    #the tickers are as old as the Data files, ten days later every source is stale
+    event = background.run_cycle(datetime.datetime.utcnow() + datetime.timedelta(days=10))
+
+    assert event == {"prices": ["AAA"], "insider": ["AAA"], "eps": []}
+    assert all(policy is background.policy for policy in calls)
+    assert background.policy is not fetch.policy
+
+    stocks = pd.read_csv("Data/M_stocks.csv", index_col=0, parse_dates=True)
+    assert stocks.groupby("Name").size().to_dict() == {"AAA": 3, "BBB": 2}
+    assert list(stocks.columns) == list(store["stocks"]["M"].columns)
+    insider = pd.read_csv("Data/M_insider.csv", index_col=0)
+    assert insider.groupby("Ticker").size().to_dict() == {"AAA": 2, "BBB": 1}
+
+    #the store holds the same rows as the files
+    assert store["stocks"]["M"].groupby("Name").size().to_dict() == {"AAA": 3, "BBB": 2}
+    assert store["insider"]["M"].groupby("Ticker").size().to_dict() == {"AAA": 2, "BBB": 1}
+
+#the transactions already stored are not added again
+def test_new_insider():
+    old = _insider("AAA", ["2020-01-02"])
+    fresh = _insider("AAA", ["2020-01-02", "2020-01-06"])
+    assert scheduler.new_insider(old, fresh)["Date"].tolist() == [pd.Timestamp("2020-01-06")]
+    assert len(scheduler.new_insider(old.iloc[0:0], fresh)) == 2
+
+#the events pushed while the debouncer waits are merged into a single call
+def test_debouncer_merges_events():
+    calls = []
+    done = threading.Event()
+
+    def rebuild(event):
+        calls.append(event)
+        done.set()
+
+    rebuilder = scheduler.Debouncer(rebuild, delay=0.2)
+    rebuilder.start()
+    rebuilder.push({"prices": ["AAA"], "insider": []})
+    rebuilder.push({"prices": ["BBB", "AAA"], "insider": ["CCC"]})
+    assert done.wait(5)
+    rebuilder.stop()
+    rebuilder.join(5)
+
+    assert calls == [{"prices": ["AAA", "BBB"], "insider": ["CCC"]}]
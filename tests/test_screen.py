@@ -0,0 +1,108 @@
+# This Python file uses the following encoding: utf-8
+import numpy as np
+import pandas as pd
+import pytest
+
+#screener and queries under test
+import screen
+
+
+#daily closes of three tickers over January 2020 in the layout of the stocks files, with their EPS and insider buys
+@pytest.fixture
+def screener():
+    days = pd.bdate_range("2020-01-01", "2020-01-31")
+    stocks = pd.concat([pd.DataFrame({"Close": np.linspace(start, start + 10, len(days)), "Name": ticker}, index=pd.DatetimeIndex(days, name="Date"))
+                        for (ticker, start) in [("AAA", 10.0), ("BBB", 20.0), ("CCC", 30.0)]])
+    eps = pd.DataFrame({"Name": ["AAA", "BBB", "CCC"], "EPS": [0.1, 0.3, -0.2]})
+    insider = pd.DataFrame({"Ticker": ["AAA ", "CCC"], "Date": pd.to_datetime(["2020-01-10", "2020-01-15"]), "Transaction": "Buy",
+                            "Value ($)": [2000000.0, 500.0], "Insider_id": [1, 2]})
+    return screen.Screener(stocks, {"M": ["AAA", "BBB", "CCC"]}, eps=eps, insider=insider)
+
+
+#a query saved in its JSON form is read back into the same query
+def test_spec_round_trip():
+    query = screen.And(screen.DateRange("2020-01-02", "2020-01-31"), screen.Market("M"), screen.Not(screen.Tickers(["BBB", "AAA"])),
+                       screen.Or(screen.EPSRange(10, None), screen.Insider("Buy", "2020-01-01", None, 1000000, None)))
+    spec = screen.to_spec(query)
+    assert spec == ["And", ["DateRange", "2020-01-02", "2020-01-31"], ["Market", ["M"]], ["Not", ["Tickers", ["AAA", "BBB"]]],
+                    ["Or", ["EPSRange", 10, None], ["Insider", "Buy", "2020-01-01", None, 1000000, None]]]
+    assert screen.to_spec(screen.from_spec(spec)) == spec
+    assert not screen.is_relative(spec)
+
+    with pytest.raises(ValueError):
+        screen.from_spec(["Nothing", 1])
+
+#the days given as numbers are relative to today
+def test_spec_relative_days():
+    spec = ["And", ["Range", "Close", 1.0, None], ["Not", ["Insider", "Buy", -90, 0, None, None]]]
+    assert screen.is_relative(spec)
+    #the numbers of the other nodes are not days
+    assert not screen.is_relative(["Range", "Close", 1.0, None])
+    query = screen.from_spec(spec, today="2020-04-10")
+    assert screen.to_spec(query)[2] == ["Not", ["Insider", "Buy", "2020-01-11", "2020-04-10", None, None]]
+
+#the screener over some tickers only has their rows, EPS and insider transactions, and matches them as the full screener does
+def test_subset(screener):
+    subset = screener.subset({"AAA", "CCC"})
+    assert set(subset.stocks["Name"]) == {"AAA", "CCC"}
+    assert list(subset.eps["Name"]) == ["AAA", "CCC"]
+    assert list(subset.insider["Ticker"].str.strip()) == ["AAA", "CCC"]
+
+    query = screen.And(screen.DateRange("2020-01-15", None), screen.Range("Close", 15.0, 35.0))
+    assert subset.tickers(subset.rows(query)) == screener.tickers(screener.rows(query)) - {"BBB"}
+    query = screen.Insider("Buy", None, None, 1000000, None)
+    assert subset.tickers(subset.rows(query)) == screener.tickers(screener.rows(query)) == {"AAA"}
+
+#the rows a query matches are the ones a row by row filter of the frame keeps, in the frame order
+def test_rows_match_filter(screener):
+    stocks = screener.stocks
+    screener.markets["N"] = ["BBB", "CCC"]
+    dates = stocks.index
+    cases = [(screen.form_query("2020-01-10", "2020-01-20"), (dates >= "2020-01-10") & (dates <= "2020-01-20")),
+             (screen.And(screen.Market("N"), screen.Range("Close", 25.0, None)), stocks["Name"].isin(["BBB", "CCC"]) & (stocks["Close"] >= 25.0)),
+             (screen.And(screen.DateRange(None, "2020-01-15"), screen.Or(screen.Tickers(["AAA"]), screen.Not(screen.Range("Close", None, 35.0)))),
+              (dates <= "2020-01-15") & ((stocks["Name"] == "AAA") | ~(stocks["Close"] <= 35.0))),
+             (screen.And(screen.EPSRange(0, None), screen.Range("Close", 12.0, 22.0)), stocks["Name"].isin(["AAA", "BBB"]) & stocks["Close"].between(12.0, 22.0)),
+             (screen.Range("Close", 100.0, None), np.zeros(len(stocks), dtype=bool))]
+    for (query, expected) in cases:
+        assert np.array_equal(screener.rows(query), np.flatnonzero(np.asarray(expected)))
+
+#the index backed node matching the fewest rows is the one the rows start from, the others become masks
+def test_compile_starts_from_smallest(screener):
+    start, rest = screener.compile(screen.And(screen.DateRange("2020-01-01", "2020-01-31"), screen.Range("Close", 1.0, None), screen.Tickers(["BBB"])))
+    assert isinstance(start, screen.Tickers)
+    assert [type(n) for n in rest.nodes] == [screen.DateRange, screen.Range]
+    #a query without an index backed node is a mask over every row
+    start, rest = screener.compile(screen.Range("Close", 1.0, None))
+    assert start is None
+    assert len(screener.rows(screen.Range("Close", 1.0, None))) == len(screener.stocks)
+
+#a repeated query is a hit, a query only narrowing a cached one is evaluated over its rows, both give the rows of the screener
+def test_result_cache(screener):
+    cache = screen.ResultCache()
+    wide = screen.And(screen.DateRange("2020-01-02", "2020-01-30"), screen.Range("Close", 32.0, None))
+    narrow = screen.And(screen.DateRange("2020-01-06", "2020-01-30"), screen.Range("Close", 32.0, None), screen.Range("Close", None, 38.0))
+    assert np.array_equal(cache.rows(screener, wide), screener.rows(wide))
+    assert np.array_equal(cache.rows(screener, wide), screener.rows(wide))
+    assert np.array_equal(cache.rows(screener, narrow), screener.rows(narrow))
+    assert cache.counts == {"hits": 1, "narrowed": 1, "misses": 1}
+    #the cached rows are shared, not written to
+    assert not cache.rows(screener, wide).flags.writeable
+
+    #a screener of a newer version drops the cached results, a reader of an older version doesn't use the cache
+    newer = screen.Screener(screener.stocks, screener.markets, screener.eps, screener.insider, version=1)
+    cache.rows(newer, wide)
+    assert cache.counts["misses"] == 2 and len(cache.entries) == 1
+    assert np.array_equal(cache.rows(screener, narrow), screener.rows(narrow))
+    assert len(cache.entries) == 1
+
+#the least recently used results are evicted once the cache takes more than its budget
+def test_result_cache_budget(screener):
+    queries = [screen.Tickers([t]) for t in ["AAA", "BBB", "CCC"]]
+    cache = screen.ResultCache(budget=2 * screener.rows(queries[0]).nbytes)
+    for query in queries[:2]:
+        cache.rows(screener, query)
+    cache.rows(screener, queries[0])
+    cache.rows(screener, queries[2])
+    assert [set(key) for key in cache.entries] == [{("Tickers", frozenset(["AAA"]))}, {("Tickers", frozenset(["CCC"]))}]
+    assert cache.size <= cache.budget
@@ -0,0 +1,32 @@
+# This Python file uses the following encoding: utf-8
+import pytest
+
+#sector list under test
+import sectors
+import standin
+
+
+#the rows of the updated tickers are replaced, the other tickers of the list are kept
+def test_update_sectors(tmp_path):
+    path = str(tmp_path / "sectors.csv")
+    sectors.update_Sectors([["AAA", "Energy", "Oil"], ["BBB", "Financials", "Banks"]], path)
+    sectors.update_Sectors([["BBB", "Financials", "Insurance"], None, ["CCC", "Industrials", "Hotels, Resorts & Cruise Lines"]], path)
+
+    rows = sectors.read_Sectors(path).set_index("Symbol")
+    assert rows["Industry"].to_dict() == {"AAA": "Oil", "BBB": "Insurance", "CCC": "Hotels, Resorts & Cruise Lines"}
+
+    #nothing changed, the file is not written again
+    mtime = (tmp_path / "sectors.csv").stat().st_mtime_ns
+    sectors.update_Sectors([["AAA", "Energy", "Oil"], None], path)
+    sectors.update_Sectors([None], path)
+    assert (tmp_path / "sectors.csv").stat().st_mtime_ns == mtime
+
+#the sector and industry of any ticker (not only the S&P 500 ones) are read from its quote page
+def test_quote_sector(stand_in):
+    finvizfinance = pytest.importorskip("finvizfinance.quote").finvizfinance
+    server = stand_in()
+    with standin.Redirect(server.url):
+        quote = finvizfinance("XYZW")
+        assert sectors.quote_sector("XYZW", quote) == ["XYZW"] + list(standin._sector("XYZW"))
+
+    assert sectors.quote_sector("XYZW", None) is None
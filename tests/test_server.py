@@ -0,0 +1,93 @@
+# This Python file uses the following encoding: utf-8
+import asyncio
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+
+#the server serves the data of the window (main.py, with its Qt and download modules)
+main = pytest.importorskip("main")
+
+#screening server and its client under test
+import server
+import remote
+import scheduler
+import screen
+import events
+import forecast
+
+
+#a server over a small dataset in the globals of the window, answering on a free port in a thread of its own
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Data").mkdir()
+    days = pd.bdate_range("2020-01-01", "2020-01-31")
+    stocks = pd.concat([pd.DataFrame({"Close": np.linspace(start, start + 10, len(days)), "Close_change": 0.01, "Name": ticker}, index=pd.DatetimeIndex(days, name="Date"))
+                        for (ticker, start) in [("AAA", 10.0), ("BBB", 20.0)]])
+    insider = pd.DataFrame({"Ticker": ["AAA", "BBB", "BBB"], "Date": pd.to_datetime(["2020-01-06", "2020-01-07", "2020-01-20"]), "Transaction": ["Buy", "Sale", "Buy"],
+                            "Value ($)": [1000.0, 500.0, 300.0], "Insider_id": [1, 2, 3]})
+    for index in scheduler.MARKETS:
+        monkeypatch.setattr(main, index, [["AAA", "AAA Inc.", 0.1], ["BBB", "BBB Corp", float("nan")]] if index == "SP500" else [])
+    monkeypatch.setattr(main, "data_version", 7)
+    monkeypatch.setattr(main, "screener", screen.Screener(stocks, {"SP500": ["AAA", "BBB"]}, insider=insider, version=7))
+    monkeypatch.setattr(main, "insider_final", insider)
+    monkeypatch.setattr(main, "clusters_final", pd.DataFrame(columns=["Ticker", "Start", "End", "Insiders", "Buys", "Value"]))
+    monkeypatch.setattr(main, "forecasts_final", {})
+    monkeypatch.setattr(main, "sectors_final", {})
+    monkeypatch.setattr(main, "events_final", pd.DataFrame(columns=events.columns()))
+
+    served = server.ScreeningServer()
+    loop = asyncio.new_event_loop()
+    listening = loop.run_until_complete(asyncio.start_server(served.handle, "127.0.0.1", 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    served.dataset = server.Dataset()
+    yield served, remote.ScreeningClient("http://127.0.0.1:" + str(listening.sockets[0].getsockname()[1]))
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    listening.close()
+    served.readers.shutdown()
+
+
+#the screened stocks come back as the frame the window builds locally, streamed or a page at a time
+def test_screen(client):
+    served, screening = client
+    frame = screening.screen("2020-01-10", "2020-01-20")
+    expected = main.screener.run(screen.form_query("2020-01-10", "2020-01-20"))
+    assert screening.version == 7
+    assert list(frame.index) == list(expected.index) and frame["Name"].tolist() == expected["Name"].tolist()
+    assert np.allclose(frame["Close"], expected["Close"])
+
+    page = screening._get("/screen", {"start": "2020-01-10", "end": "2020-01-20", "size": 5, "page": 1})
+    assert (page["total"], page["pages"], len(page["rows"])) == (len(expected), -(-len(expected) // 5), 5)
+    assert served.cache.counts["hits"] >= 1
+
+    status = screening.status()
+    assert (status["version"], status["stocks"], status["insider"]) == (7, len(main.screener.stocks), 3)
+    pairs = screening.pairs()
+    assert pairs["SP500"][0] == ["AAA", "AAA Inc.", 0.1] and np.isnan(pairs["SP500"][1][2])
+
+#the insider transactions are filtered by the server, an empty table keeps its columns
+def test_insider_and_empty_tables(client):
+    _, screening = client
+    assert screening.insider(start="2020-01-07", transaction="Buy")["Ticker"].tolist() == ["BBB"]
+    assert screening.clusters().empty
+    assert list(screening.forecast().columns) == forecast.COLUMNS
+    assert screening.sectors().empty
+    assert screening.events().empty
+    assert screening.changes(0)["version"] == 0
+
+#wrong parameters are a 400, an unknown path a 404 and a server still loading a 503
+def test_errors(client):
+    served, screening = client
+    for (path, params, status) in [("/forecast", {"market": "Nowhere"}, 400), ("/screen", {"start": "2020-01-01", "size": 0}, 400), ("/nothing", {}, 404)]:
+        with pytest.raises(requests.HTTPError) as error:
+            screening._get(path, params)
+        assert error.value.response.status_code == status
+    served.dataset = None
+    with pytest.raises(requests.HTTPError) as error:
+        screening.status()
+    assert error.value.response.status_code == 503
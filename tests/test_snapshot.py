@@ -0,0 +1,83 @@
+# This Python file uses the following encoding: utf-8
+import os
+
+import numpy as np
+import pandas as pd
+
+#warm start snapshots under test
+import snapshot
+import screen
+
+
+#two markets in the layout of the window: ticker list, stocks and insider frames (the second market without insider rows)
+def _markets():
+    days = pd.bdate_range("2020-01-01", periods=4)
+    markets = {}
+    for (index, tickers) in [("M", ["AAA", "BBB"]), ("N", ["CCC"])]:
+        stocks = pd.concat([pd.DataFrame({"Close_x": np.arange(1.0, 5.0), "Volume": np.arange(4, dtype=np.int64), "Name": ticker}, index=pd.DatetimeIndex(days, name="Date"))
+                            for ticker in tickers])
+        insider = pd.DataFrame({"Date": pd.to_datetime(["2020-01-02"]), "Value ($)": [1000.0], "Ticker": [tickers[0]], "Relationship": [np.nan]}) if index == "M" else pd.DataFrame()
+        markets[index] = ([[t, t + " Inc.", 0.1 if t != "BBB" else float("nan")] for t in tickers], stocks, insider)
+    return markets
+
+#same frames, the mapped columns compared by their values
+def _assert_equal(frame, expected):
+    assert list(frame.columns) == list(expected.columns)
+    assert list(frame.index) == list(expected.index) and frame.index.name == expected.index.name
+    for column in expected.columns:
+        assert np.asarray(frame[column]).tolist() == expected[column].tolist()
+
+def _write(path, stats):
+    markets = _markets()
+    stocks = pd.concat([frames[1] for frames in markets.values()])
+    eps = pd.DataFrame({"Name": ["AAA", "BBB", "CCC"], "EPS": [0.1, np.nan, 0.1]})
+    snapshot.write_Snapshot(stats, markets, stocks, markets["M"][2], eps, screen.build_indexes(stocks), path=path)
+    return markets, stocks
+
+
+#the prepared data is mapped back as it was written, with the frames of every market
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "snapshot")
+    stats = {"Data/M_stocks.csv": [1.0, 100], "Data/N_insider.csv": None}
+    markets, stocks = _write(path, stats)
+    warm = snapshot.read_Snapshot(stats, path=path)
+
+    _assert_equal(warm["stocks"], stocks)
+    #the numbers are mapped from disk, not copied
+    assert isinstance(warm["stocks"]["Volume"].values, np.memmap)
+    for index in ["M", "N"]:
+        pairs, frame, insider = warm["markets"][index]
+        assert pairs[0] == markets[index][0][0]
+        _assert_equal(frame, markets[index][1])
+        assert len(insider) == len(markets[index][2])
+    assert np.isnan(warm["markets"]["M"][0][1][2])
+    #a missing string stays missing
+    assert warm["insider"]["Relationship"].isna().all()
+    assert np.isnan(warm["eps"]["EPS"].iloc[1])
+
+    #the screener indexes are mapped back as they were built
+    indexes = screen.build_indexes(stocks)
+    for (name, values) in indexes.items():
+        assert np.array_equal(np.asarray(warm["indexes"][name]), values)
+    assert screen.Screener(warm["stocks"], indexes=warm["indexes"]).tickers(np.arange(len(stocks))) == {"AAA", "BBB", "CCC"}
+
+#a snapshot of other source files isn't read, a new one replaces it
+def test_stale_sources(tmp_path):
+    path = str(tmp_path / "snapshot")
+    stats = {"Data/M_stocks.csv": [1.0, 100]}
+    _write(path, stats)
+    assert snapshot.read_Snapshot({"Data/M_stocks.csv": [2.0, 100]}, path=path) is None
+    assert snapshot.read_Snapshot(None, path=str(tmp_path / "none")) is None
+
+    _write(path, {"Data/M_stocks.csv": [2.0, 100]})
+    assert snapshot.read_Snapshot({"Data/M_stocks.csv": [2.0, 100]}, path=path)["number"] == 2
+    assert sorted(os.listdir(path)) == ["current.json", "v2"]
+
+#the stats of the source files, None for a missing one
+def test_sources(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Data").mkdir()
+    (tmp_path / "Data" / "M.csv").write_text("AAA,AAA Inc.,0.1\n")
+    stats = snapshot.sources(["M"])
+    assert stats["Data/M.csv"][1] == len("AAA,AAA Inc.,0.1\n")
+    assert stats["Data/M_stocks.csv"] is None and stats["Data/M_insider.csv"] is None
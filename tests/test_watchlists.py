@@ -0,0 +1,69 @@
+# This Python file uses the following encoding: utf-8
+import numpy as np
+import pandas as pd
+
+#saved screens under test
+import screen
+import watchlists
+
+
+#daily closes of some tickers over January 2020 in the layout of the stocks files, each one at a flat price
+def _screener(prices, version=0):
+    days = pd.bdate_range("2020-01-01", "2020-01-31")
+    stocks = pd.concat([pd.DataFrame({"Close": np.full(len(days), price), "Name": ticker}, index=pd.DatetimeIndex(days, name="Date"))
+                        for (ticker, price) in prices.items()])
+    eps = pd.DataFrame({"Name": list(prices), "EPS": [0.2] * len(prices)})
+    return screen.Screener(stocks, {"M": list(prices)}, eps=eps, version=version)
+
+#the tickers at or above $15 in January 2020
+QUERY = ["And", ["DateRange", "2020-01-01", "2020-01-31"], ["Range", "Close", 15.0, None]]
+
+
+#screening only the changed tickers gives the members a full evaluation gives, and the change is an alert
+def test_incremental_matches_full(tmp_path):
+    lists = watchlists.Watchlists(str(tmp_path / "watchlists.json"))
+    lists.save_screen("cheap", QUERY)
+    before = _screener({"AAA": 10.0, "BBB": 12.0, "CCC": 20.0, "DDD": 30.0})
+    assert lists.evaluate(before, today="2020-02-03") == []
+    assert lists.screens["cheap"]["members"] == ["CCC", "DDD"]
+
+    after = _screener({"AAA": 10.0, "BBB": 18.0, "CCC": 11.0, "DDD": 30.0}, version=1)
+    alerts = lists.evaluate(after, changed={"BBB", "CCC"}, today="2020-02-03")
+
+    full = watchlists.Watchlists(str(tmp_path / "full.json"))
+    full.save_screen("cheap", QUERY)
+    full.evaluate(after, today="2020-02-03")
+    assert lists.screens["cheap"]["members"] == full.screens["cheap"]["members"] == ["BBB", "DDD"]
+    assert [(a["screen"], a["entered"], a["left"]) for a in alerts] == [("cheap", ["BBB"], ["CCC"])]
+    assert watchlists.describe(alerts[0]) == "cheap: +BBB -CCC"
+
+    #the members and the alerts are kept in the file
+    again = watchlists.Watchlists(str(tmp_path / "watchlists.json"))
+    assert again.screens["cheap"]["members"] == ["BBB", "DDD"]
+    assert len(again.alerts) == 1
+
+#a screen limited to a watchlist only has its tickers, and is screened again in full when the watchlist changes
+def test_watchlist_screen(tmp_path):
+    lists = watchlists.Watchlists(str(tmp_path / "watchlists.json"))
+    lists.watch("mine", ["AAA", "DDD"])
+    lists.save_screen("mine cheap", QUERY, watchlist="mine")
+    data = _screener({"AAA": 10.0, "BBB": 18.0, "CCC": 20.0, "DDD": 30.0})
+    lists.evaluate(data, today="2020-02-03")
+    assert lists.screens["mine cheap"]["members"] == ["DDD"]
+
+    lists.watch("mine", ["CCC"])
+    alerts = lists.evaluate(data, changed=set(), today="2020-02-03")
+    assert lists.screens["mine cheap"]["members"] == ["CCC", "DDD"]
+    assert alerts[0]["entered"] == ["CCC"]
+
+#a screen with dates relative to today is screened in full on a new day even when nothing changed
+def test_relative_screen_new_day(tmp_path):
+    lists = watchlists.Watchlists(str(tmp_path / "watchlists.json"))
+    lists.save_screen("recent", ["And", ["DateRange", -3, None], ["Range", "Close", 15.0, None]])
+    data = _screener({"AAA": 10.0, "CCC": 20.0})
+    lists.evaluate(data, today="2020-01-31")
+    assert lists.screens["recent"]["members"] == ["CCC"]
+
+    alerts = lists.evaluate(data, changed=set(), today="2020-03-02")
+    assert lists.screens["recent"]["members"] == []
+    assert alerts[0]["left"] == ["CCC"]
@@ -0,0 +1,183 @@
+# This Python file uses the following encoding: utf-8
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+
+#pandas import for the day of the evaluations
+import pandas as pd
+
+#saved queries and the screener they run on
+import screen
+#atomic writes of the watchlists file
+import jobs
+
+#file where the watchlists, the saved screens with their members and the alerts are kept
+WATCHLISTS_PATH = "Data/watchlists.json"
+#alerts kept in the file (the newest ones)
+MAX_ALERTS = 500
+
+
+#watchlists (named lists of tickers) and saved screens (named queries, optionally limited to a watchlist)
+#the members of every screen (the tickers with a matching row) are kept, and after a refresh only the tickers whose
+#data changed are screened again: an alert is raised for every screen whose members changed
+class Watchlists:
+    def __init__(self, path=WATCHLISTS_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.lists = {}
+        self.screens = {}
+        self.alerts = []
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                saved = json.load(f)
+            self.lists.update(saved.get("watchlists", {}))
+            self.screens.update(saved.get("screens", {}))
+            self.alerts += saved.get("alerts", [])
+
+    def save(self):
+        with self.lock:
+            with jobs.atomic_file(self.path) as f:
+                json.dump({"watchlists": self.lists, "screens": self.screens, "alerts": self.alerts[-MAX_ALERTS:]}, f)
+
+    #every ticker on a watchlist
+    def tickers(self):
+        with self.lock:
+            return set(t for tickers in self.lists.values() for t in tickers)
+
+    #add tickers to a watchlist (created if new), the screens limited to it are screened again in full
+    def watch(self, name, tickers):
+        with self.lock:
+            self.lists[name] = sorted(set(self.lists.get(name, [])).union(tickers))
+            self._touch(name)
+
+    def unwatch(self, name, tickers):
+        with self.lock:
+            if name not in self.lists:
+                return
+            self.lists[name] = sorted(set(self.lists[name]).difference(tickers))
+            self._touch(name)
+
+    def _touch(self, name):
+        for saved in self.screens.values():
+            if saved["watchlist"] == name:
+                saved["day"] = None
+
+    #save a query (a screen.Node or its JSON form, see screen.to_spec) under a name, limited to the tickers of a watchlist or not
+    #its members are found on the next evaluation, without alerts
+    def save_screen(self, name, query, watchlist=None):
+        spec = query if isinstance(query, list) else screen.to_spec(query)
+        #checked before it is kept
+        screen.from_spec(spec)
+        with self.lock:
+            self.screens[name] = {"query": spec, "watchlist": watchlist, "members": None, "day": None}
+
+    def remove_screen(self, name):
+        with self.lock:
+            self.screens.pop(name, None)
+
+    #query of a saved screen on a day
+    def _query(self, saved, today):
+        query = screen.from_spec(saved["query"], today)
+        if saved["watchlist"] is not None:
+            query = screen.And(screen.Tickers(self.lists.get(saved["watchlist"], [])), query)
+        return query
+
+    #screen the saved screens again after the data changed, returns the new alerts
+    #changed is the set of tickers whose prices, EPS or insider transactions changed (None when it isn't known)
+    #a screen is screened in full when its members are not known, when changed is None, and on a new day if its dates are
+    #relative to today, otherwise only the changed tickers are screened (on a screener over their rows only) and the others
+    #keep their membership
+    def evaluate(self, screener, changed=None, today=None):
+        today = pd.Timestamp(today if today is not None else pd.Timestamp.now()).normalize()
+        day = str(today.date())
+        with self.lock:
+            screens = {name: dict(saved) for (name, saved) in self.screens.items()}
+        subset = None
+        alerts = []
+        for (name, saved) in screens.items():
+            query = self._query(saved, today)
+            old = set(saved["members"]) if saved["members"] is not None else None
+            moved = saved["day"] != day and screen.is_relative(saved["query"])
+            if old is None or changed is None or saved["day"] is None or moved:
+                members = screener.tickers(screener.rows(query))
+            else:
+                if subset is None:
+                    subset = screener.subset(changed)
+                members = old.difference(changed).union(subset.tickers(subset.rows(query)))
+
+            if old is not None and members != old:
+                alerts.append({"time": time.time(), "screen": name,
+                               "entered": sorted(members - old), "left": sorted(old - members)})
+            saved["members"] = sorted(members)
+            saved["day"] = day
+            screens[name] = saved
+
+        with self.lock:
+            for (name, saved) in screens.items():
+                #a screen saved again or removed meanwhile is left as it is
+                if name in self.screens and self.screens[name]["query"] == saved["query"]:
+                    self.screens[name] = saved
+            self.alerts += alerts
+        self.save()
+        return alerts
+
+
+#one line describing an alert
+def describe(alert):
+    parts = []
+    if len(alert["entered"]) > 0:
+        parts.append("+" + ", +".join(alert["entered"]))
+    if len(alert["left"]) > 0:
+        parts.append("-" + ", -".join(alert["left"]))
+    return alert["screen"] + ": " + " ".join(parts)
+
+
+#one line describing a saved screen
+def describe_screen(name, saved):
+    where = " on " + saved["watchlist"] if saved["watchlist"] is not None else ""
+    members = saved["members"]
+    count = str(len(members)) + " tickers" if members is not None else "not evaluated yet"
+    return "screen " + name + where + ": " + json.dumps(saved["query"]) + " -> " + count
+
+
+#change the watchlists or the saved screens as a command asks
+def run_command(lists, command, name, values, watchlist=None):
+    if command == "watch":
+        lists.watch(name, values)
+    elif command == "unwatch":
+        lists.unwatch(name, values)
+    elif command == "screen":
+        lists.save_screen(name, json.loads(" ".join(values)), watchlist)
+    elif command == "remove":
+        lists.remove_screen(name)
+
+
+#python watchlists.py show | watch LIST TICKER... | unwatch LIST TICKER... | screen NAME QUERY [--watchlist LIST] | remove NAME
+#QUERY is the JSON form of a query, e.g. '["And", ["EPSRange", 10, null], ["Insider", "Buy", -90, null, 1000000, null]]'
+#(EPS change above 10% and more than $1M of insider buys in the last 90 days), the screens are evaluated by the window
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watchlists and saved screens")
+    parser.add_argument("command", choices=["show", "watch", "unwatch", "screen", "remove"])
+    parser.add_argument("name", nargs="?")
+    parser.add_argument("values", nargs="*")
+    parser.add_argument("--watchlist", default=None)
+    args = parser.parse_args()
+
+    lists = Watchlists()
+    try:
+        run_command(lists, args.command, args.name, args.values, args.watchlist)
+    except (ValueError, TypeError, IndexError) as e:
+        print("invalid query: " + str(e))
+        sys.exit(1)
+    if args.command != "show":
+        lists.save()
+
+    for (name, tickers) in sorted(lists.lists.items()):
+        print("watchlist " + name + ": " + " ".join(tickers))
+    for (name, saved) in sorted(lists.screens.items()):
+        print(describe_screen(name, saved))
+    for alert in lists.alerts[-20:]:
+        print(time.strftime("%Y-%m-%d %H:%M", time.localtime(alert["time"])) + "  " + describe(alert))